@@ -35,11 +35,13 @@ from knowledge_api.manage.api_router import manage_router
 from knowledge_api.manage.ws.game_play import wx_manage_router
 from knowledge_api.mapper.cache_mid.cache.init_redis_cache import redis_cache_lifespan, get_cache_manager
 from app_rag_chat.app_router import app_router
-from knowledge_api.utils.log_config import get_logger
+from knowledge_api.utils.log_config import get_logger, APILogger, LogConfig
 from knowledge_api.framework.auth.auth_middleware import setup_auth_middleware
 from knowledge_api.framework.exception.exception_handlers import setup_exception_handlers
-from knowledge_api.framework.exception.response_wrapper import setup_response_wrapper
+from knowledge_api.framework.exception.response_wrapper import setup_response_wrapper, StandardJSONResponse
 from knowledge_api.framework.redis.config import reset_redis_config
+from knowledge_api.framework.warmup.warmup import WARMUP_GATE_TIMEOUT, get_warmup_orchestrator
+from knowledge_api.framework.redis.connection import get_redis_connection_manager
 from plugIns.memory_system.graphiti_memory.disable_neo4j_logs import disable_all_neo4j_logs
 
 # Disable Neo4j logs immediately
@@ -85,6 +87,8 @@ def load_environment(env_file='.env'):
 
     # Check critical environment variables
     check_environment_vars()
+    # Rebuild the logging pipeline with the LOG_* variables of the environment file
+    APILogger.get_instance(LogConfig.from_env(), recreate=True)
 
 
 def check_environment_vars():
@@ -114,7 +118,9 @@ app = FastAPI(
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Routes render the standard {code, message, data} envelope themselves
+    default_response_class=StandardJSONResponse
 )
 
 app.mount("/static", StaticFiles(directory="./static/dist", html=True), name="static")
@@ -127,6 +133,23 @@ async def new_endpoint():
     return {"message": "Hello, world!"}
 
 
+@app.get("/health")
+async def health():
+    """Liveness probe: the process serves requests, also while it warms up"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the critical components are warmed, with the warm time of each component
+and the Redis health (the probe is not authenticated, so the pool metrics are not exposed)"""
+    report = get_warmup_orchestrator().report()
+    report["redis"] = {"healthy": get_redis_connection_manager().healthy}
+    if not report["ready"]:
+        return StandardJSONResponse(status_code=503, content=report)
+    return report
+
+
 mcp = FastApiMCP(app,
                  # include_operations=["create_card_series","create_card","get_all_blind_boxes","create_blind_box"]
                  include_tags=[
@@ -168,6 +191,7 @@ setup_auth_middleware(
         "/api/auth/register",
         "/auth/register",
         "/health",
+        "/ready",
         # Client API temporarily without authentication
         "/app/.*",
         "/assets/.*",
@@ -185,6 +209,21 @@ setup_auth_middleware(
 add_pagination(app)
 
 
+# Requests arriving while the critical components warm up wait for them instead of loading them a second time.
+# Probes, CORS preflights, documentation, static files and login do not use the warmed components
+_WARMUP_GATE_SKIP = ("/health", "/ready", "/docs", "/redoc", "/openapi.json", "/static", "/assets", "/touchflow",
+                     "/api/auth/login", "/api/auth/register", "/auth/register", "/new/endpoint/")
+
+
+@app.middleware("http")
+async def wait_for_warmup(request: Request, call_next):
+    orchestrator = get_warmup_orchestrator()
+    if (WARMUP_GATE_TIMEOUT > 0 and not orchestrator.settled and request.method != "OPTIONS"
+            and not request.url.path.startswith(_WARMUP_GATE_SKIP)):
+        await orchestrator.wait_settled(WARMUP_GATE_TIMEOUT)
+    return await call_next(request)
+
+
 # # Request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -50,6 +50,8 @@ class ChatInput(BaseModel):
     long_term_memory: Optional[bool] = Field(default=False, description="Is long-term memory switched on?")
     # memory level
     memory_level: Optional[int] = Field(default=6, description="Memory level, 6 is dialogue memory, 7 is memory 0, and 10 is dialogue memory")
+    # Streaming voice
+    voice_stream: Optional[bool] = Field(default=False, description="Synthesize the answer sentence by sentence while it is generated, audio frames <audio>{seq, text, data}</audio> are interleaved with the text")
 
 
 class ChatResponse(BaseModel):
@@ -1,32 +1,51 @@
-from datetime import datetime
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from knowledge_api.chat.base_chat import BaseChat
 from knowledge_api.framework.redis.cache_manager import CacheManager
+from knowledge_api.framework.task.task_manager import get_task_manager
 
-from knowledge_api.mapper.chat_session.base import SessionCreate
+from knowledge_api.framework.database.database import get_thread_local_session
+from knowledge_api.mapper.chat_session.base import Session as ChatSession, SessionCreate
+from knowledge_api.mapper.chat_session_summary.base import ChatSessionSummary
+from knowledge_api.mapper.chat_session_summary.crud import ChatSessionSummaryCRUD
+from knowledge_api.mapper.conversations.base import Conversation, ConversationCreate
 from knowledge_api.framework.memory.enhanced_chat_memory_manager import EnhancedChatMemoryManager
 
+# Turns (user message + reply) restored into the memory of a session, older turns live in the summary
+CHAT_HISTORY_TURNS = int(os.environ.get("CHAT_HISTORY_TURNS", "5"))
+
 
 class RAGChatService(BaseChat):
     """RAG chat service"""
 
-    def __init__(self, role, world):
+    def __init__(self, chat_type: str = "default"):
         """Initialize RAG chat service"""
         # Flag initialized only once
-        super().__init__(role, world)
+        super().__init__(chat_type)
+        self.task_manager = get_task_manager()
+        self.summary_db = ChatSessionSummaryCRUD(get_thread_local_session())
+
+    async def save_db(self, session_id: str, user_info: Optional[Dict[str, Any]] = None) -> Optional[ChatSession]:
+        """Store the session if it is not stored yet
 
-    async def save_db(self, session_id: str):
+Returns:
+The stored session, None on error"""
         try:
-            if not self.session_db.get_by_id(session_id=session_id):
-                self.session_db.create(
-                    session=SessionCreate(user_id=self.user_info.get("user_id"),
-                                          session_id=session_id,
-                                          role_id=self.user_info.get("role_id"),
+            session = await self.session_db.get_by_id(session_id)
+            if not session:
+                user_info = user_info or await self.get_user_info(session_id)
+                session = await self.session_db.create(
+                    session=SessionCreate(user_id=str(user_info.get("user_id")),
+                                          role_id=user_info.get("role_id") or "",
                                           model_name=await CacheManager().get_system_config("DEFAULT_LLM_MODEL"),
                                           session_status="active",
                                           type_session="user"
-                                          )
+                                          ),
+                    session_id=session_id
                 )
+            return session
         except Exception as e:
             print(f"Error saving session data: {e}")
             import traceback
@@ -34,30 +53,67 @@ class RAGChatService(BaseChat):
             # Make sure to close the thread session
             from knowledge_api.framework.database.database import close_thread_session
             close_thread_session()
+        return None
 
     async def save_sessions(self, session_id):
         await self.task_manager.submit(
             self.save_db,
-            session_id,  # function object            description="Asynchronous Storage Session Task",
+            session_id,
+            description="Asynchronous Storage Session Task",
+            lane="chat",
         )
 
+    async def load_history_window(self, session_id: str, turns: Optional[int] = None
+                                  ) -> Optional[Tuple[List[Conversation], Optional[ChatSessionSummary], int]]:
+        """Load the tail of a stored session: the rounds not covered by its rolling summary
+
+The rounds covered by the summary are represented by it, only the later ones are read through
+the (session_id, created_at) index, and at least the last turns rounds.
+A session without summary is loaded whole, so that the summarizer covers its earlier messages.
+
+Args:
+session_id: Session ID
+turns: number of turns, CHAT_HISTORY_TURNS if None
+
+Returns:
+(messages oldest first, summary, number of stored rounds), None if the session is not stored"""
+        session = await self.session_db.get_by_id(session_id)
+        if session is None:
+            return None
+        turns = turns or CHAT_HISTORY_TURNS
+        rounds = await self.msg_db.count(filters={"session_id": session_id, "role": "user"})
+        summary = await self.summary_db.get_by_id(session_id)
+        limit = None
+        if summary is not None:
+            limit = max(turns, rounds - min(summary.summarized_rounds, rounds)) * 2
+        messages = await self.msg_db.get_recent_by_session_id(session_id, limit=limit)
+        return messages, summary, rounds
+
     async def search_db_session(self, session_id):
-        """Query whether this session is stored in the database"""
+        """Query whether this session is stored in the database and restore its last turns"""
+        if not session_id:
+            return None
         try:
-            session = self.session_db.get_by_id(session_id=session_id)
-            if session is not None:
-                # query message log table
-                msg_list = self.msg_db.get_by_session_id(session_id=session_id)
+            window = await self.load_history_window(session_id)
+            if window is not None:
+                msg_list, summary, rounds = window
                 memory_manager = EnhancedChatMemoryManager(
-                    k=5,
+                    k=CHAT_HISTORY_TURNS,
                     system_message="",
                     memory_type='buffer_window',
                 )
+                if summary is not None:
+                    memory_manager.update_summary_message(summary.summary)
                 for msg in msg_list:
                     if msg.role == "user":
                         memory_manager.add_user_message(msg.content)
                     elif msg.role == "assistant":
                         memory_manager.add_ai_message(msg.content)
+                # Rounds are counted from the start of the session, so that the next summary
+                # stored for it counts the rounds covered by the earlier one
+                memory_manager.exchange_count = rounds
+                if summary is not None:
+                    memory_manager.summarized_exchange_count = min(summary.summarized_rounds, rounds)
                 return memory_manager
         except Exception as e:
             print(f"Error querying session data: {e}")
@@ -68,33 +124,63 @@ class RAGChatService(BaseChat):
             reset_database_state()
         return None
 
+    def create_msg(self, session_id: str, user_info: Dict[str, Any], content: str, role: str,
+                   parent_message_id: Optional[str] = None) -> ConversationCreate:
+        """Build the record of one message of a session"""
+        return ConversationCreate(
+            user_id=str(user_info.get("user_id")),
+            session_id=session_id,
+            chat_role_id=user_info.get("role_id"),
+            conversation_id=session_id,
+            message_id=str(uuid.uuid4()),
+            parent_message_id=parent_message_id,
+            role=role,
+            content=content,
+        )
+
+    async def store_summary(self, session_id: str, memory_manager: EnhancedChatMemoryManager) -> None:
+        """Write the summary made by the summarizer into the cached session and the summary table
 
-    async def update_chat(self, response, msg):
+The stored summary replaces the rounds it covers when the session is restored from the database
+
+Args:
+session_id: Session ID
+memory_manager: Memory manager holding the new summary"""
+        await super().store_summary(session_id, memory_manager)
+        await self.task_manager.submit(
+            self.summary_db.save,
+            session_id, memory_manager.summary_message, int(memory_manager.summarized_exchange_count),
+            description="Asynchronous Storage Session Summary Task",
+            lane="chat",
+        )
+
+    async def update_chat(self, response: Union[str, Any], msg: str, session_id: Optional[str] = None):
+        await super().update_chat(response=response, msg=msg, session_id=session_id)
+        if not session_id:
+            return
         await self.task_manager.submit(
             self._background_update_chat,
-            response, msg
+            response, msg, session_id,
+            description="Asynchronous Storage Chat Task",
+            lane="chat",
         )
 
-    async def _background_update_chat(self,response, msg):
+    async def _background_update_chat(self, response, msg, session_id: str):
         try:
-            memory_manager=self.session["memory_manager"]
-            memory_manager.add_user_message(msg)
-            response_save = response
-            if type(response) is not str:
+            if isinstance(response, str):
+                response_save = response
+            elif isinstance(response, dict):
                 response_save = response.get("content")
-                # Add complete answers to history
-                memory_manager.add_ai_message(response_save)
             else:
-                memory_manager.add_ai_message(response)
-
-            # Update session information
-            self.session["message_count"] += 2  # User message + system reply            self.session["last_activity"] = datetime.now().isoformat()
-            user_info = self.session.get("user_info", {})
-            user_msg =self.create_msg(msg, "user")
-            self.msg_db.create(conversation=user_msg)
+                response_save = getattr(response, "content", str(response))
 
-            ai_msg =self.create_msg(response_save, "assistant")
-            self.msg_db.create(conversation=ai_msg)
+            user_info = await self.get_user_info(session_id)
+            await self.save_db(session_id, user_info)
+            # User message and reply of the turn in one batch insert
+            user_msg = self.create_msg(session_id, user_info, msg, "user")
+            ai_msg = self.create_msg(session_id, user_info, response_save, "assistant",
+                                     parent_message_id=user_msg.message_id)
+            await self.msg_db.create_many([user_msg, ai_msg])
         except Exception as e:
             # Log errors without interrupting the main program
             print(f"Error updating chat history: {str (e) }")
@@ -0,0 +1,95 @@
+"""Parallel branch benchmark: N independent slow nodes between a fork and a join
+
+Builds a workflow where a start node fans out to --branches function tool nodes, each
+awaiting --latency-ms (standing in for an LLM call), joined by a message node. The same
+graph is run as the internal nodes of a loop, where the branch nodes are marked parallel. Reports the wall time of one run with the
+session concurrency limit at 1 (branches one after the other) and at --limit.
+
+Usage:
+    python -m benchmarks.branch_benchmark --branches 6 --latency-ms 300
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+from knowledge_api.framework.workflow.compiler import get_workflow_plan
+from knowledge_api.framework.workflow.engine import WorkflowEngine
+from knowledge_api.framework.workflow.nodes.loop import LoopNode
+from knowledge_api.framework.workflow.types import WorkflowContext
+
+
+def _graph(branches: int, latency: float) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    slow_impl = (
+        "async def main(args, context):\n"
+        "    import asyncio\n"
+        f"    await asyncio.sleep({latency})\n"
+        "    return {'done': True}\n"
+    )
+    nodes = [{"id": "start", "name": "start", "component_type": "message",
+              "config": {"initialMessage": "start"}, "inputs": [], "outputs": []}]
+    edges = []
+    for i in range(branches):
+        node_id = f"speaker_{i}"
+        nodes.append({"id": node_id, "name": node_id, "component_type": "function_tool",
+                      "config": {"function_impl": slow_impl, "parallel": True}, "inputs": [],
+                      "outputs": [{"key": f"speech_{i}", "type": "string"}]})
+        edges.append({"source": "start", "target": node_id})
+        edges.append({"source": node_id, "target": "join"})
+    nodes.append({"id": "join", "name": "join", "component_type": "message",
+                  "config": {"initialMessage": "all spoke"}, "inputs": [], "outputs": []})
+    return nodes, edges
+
+
+async def _broadcast_message(session_id, message):
+    return None
+
+
+def _context() -> Dict[str, Any]:
+    return {"session_id": "branch-benchmark", "broadcast_message": _broadcast_message}
+
+
+async def _run_workflow(nodes, edges, limit: int) -> float:
+    engine = WorkflowEngine.from_plan(get_workflow_plan({"id": "branch_benchmark", "start_node": "start",
+                                                         "nodes": nodes, "edges": edges}))
+    engine._branch_semaphore = asyncio.Semaphore(limit)
+    start = time.perf_counter()
+    await engine.execute_workflow(_context())
+    elapsed = time.perf_counter() - start
+    assert "join" in engine.node_results and len(engine.node_results) == len(nodes)
+    return elapsed
+
+
+async def _run_loop(nodes, edges, limit: int) -> float:
+    loop = LoopNode("loop", "loop", {"loop_mode": "fixed", "max_iterations": 1,
+                                     "internal_nodes": nodes, "internal_edges": edges})
+    loop._branch_semaphore = asyncio.Semaphore(limit)
+    start = time.perf_counter()
+    result = await loop.execute(WorkflowContext(data=_context()))
+    elapsed = time.perf_counter() - start
+    assert len(result["loop_results"][0]["internal_results"]) == len(nodes)
+    return elapsed
+
+
+async def _run(args) -> None:
+    nodes, edges = _graph(args.branches, args.latency_ms / 1000)
+    print(f"{args.branches} branches of {args.latency_ms:.0f} ms between a fork and a join")
+    for name, runner in (("workflow", _run_workflow), ("loop", _run_loop)):
+        for limit in (1, args.limit):
+            elapsed = await runner(nodes, edges, limit)
+            print(f"{name:<9} concurrency {limit:>2}   {elapsed * 1000:8.1f} ms")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Workflow parallel branch benchmark")
+    parser.add_argument("--branches", type=int, default=6, help="Independent nodes between fork and join")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latency of each branch node")
+    parser.add_argument("--limit", type=int, default=8, help="Session concurrency limit of the parallel run")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Workflow broadcast benchmark: sequential sends vs per-connection outbound queues
+
+Registers --clients connections on one session, one of them slow (every send takes
+--slow-ms), broadcasts --messages messages --interval-ms apart and reports, for the
+fast clients, the delivery time of each message (broadcast call to frame written),
+and how long the broadcasting node was blocked.
+
+- sequential: the previous broadcast_message, one awaited send_json per connection
+- queued:     broadcast_message with ConnectionSender queues, send timeout and eviction
+
+Usage:
+    python -m benchmarks.broadcast_benchmark --clients 50 --messages 40 --slow-ms 1000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List
+
+from knowledge_api.manage.ws import workflow_play
+
+
+class _FakeWebSocket:
+    """Client connection with a fixed cost per frame, records when each message arrives"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.arrivals: Dict[int, float] = {}
+        self.closed = False
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(self.latency)
+        self._arrive(json.loads(data))
+
+    async def send_json(self, data: Dict[str, Any]) -> None:
+        await asyncio.sleep(self.latency)
+        self._arrive(data)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+    def _arrive(self, message: Dict[str, Any]) -> None:
+        if "seq" in message:
+            self.arrivals[message["seq"]] = time.perf_counter()
+
+
+async def _sequential_broadcast(session_id: str, message: Dict[str, Any]) -> None:
+    """Previous broadcast_message: awaits every connection in turn"""
+    for ws in list(workflow_play.websockets.get(session_id, ())):
+        try:
+            await ws.send_json(message)
+        except Exception:
+            workflow_play.websockets[session_id].discard(ws)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def _run_once(mode: str, args) -> Dict[str, Any]:
+    session_id = f"broadcast-benchmark-{mode}"
+    clients = [_FakeWebSocket(args.fast_ms / 1000) for _ in range(args.clients - 1)]
+    slow = _FakeWebSocket(args.slow_ms / 1000)
+    workflow_play.websockets[session_id] = set()
+    for ws in clients + [slow]:
+        if mode == "queued":
+            await workflow_play.register_websocket(session_id, ws)
+        else:
+            workflow_play.websockets[session_id].add(ws)
+
+    sent_at: Dict[int, float] = {}
+    blocked: List[float] = []
+    broadcast = workflow_play.broadcast_message if mode == "queued" else _sequential_broadcast
+    for seq in range(args.messages):
+        sent_at[seq] = start = time.perf_counter()
+        await broadcast(session_id, {"type": "agent_message", "seq": seq, "content": "x" * args.size})
+        blocked.append(time.perf_counter() - start)
+        await asyncio.sleep(args.interval_ms / 1000)
+
+    # Wait until every fast client has all messages
+    deadline = time.perf_counter() + 60
+    while any(len(ws.arrivals) < args.messages for ws in clients) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+    delivery = [(ws.arrivals[seq] - sent_at[seq]) * 1000 for ws in clients for seq in ws.arrivals]
+    for ws in clients + [slow]:
+        await workflow_play.unregister_websocket(session_id, ws)
+    workflow_play.websockets.pop(session_id, None)
+    workflow_play.message_logs.pop(session_id, None)
+    workflow_play.message_log_index.pop(session_id, None)
+    return {
+        "p50": _percentile(delivery, 50),
+        "p99": _percentile(delivery, 99),
+        "blocked_p99": _percentile(blocked, 99) * 1000,
+        "slow_received": len(slow.arrivals),
+        "slow_evicted": slow.closed,
+    }
+
+
+async def _run(args) -> None:
+    workflow_play.SEND_TIMEOUT = args.send_timeout
+    print(f"{args.clients} clients, 1 slow ({args.slow_ms} ms/frame), {args.messages} messages, "
+          f"send timeout {args.send_timeout}s")
+    for mode in ("sequential", "queued"):
+        result = await _run_once(mode, args)
+        print(f"{mode:<11} delivery p50 {result['p50']:9.1f} ms   p99 {result['p99']:9.1f} ms   "
+              f"broadcaster blocked p99 {result['blocked_p99']:9.1f} ms   "
+              f"slow client got {result['slow_received']}/{args.messages}"
+              f"{' (evicted)' if result['slow_evicted'] else ''}")
+
+
+def main(argv=None) -> None:
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="Workflow websocket broadcast benchmark")
+    parser.add_argument("--clients", type=int, default=50, help="Connections on the session, one of them slow")
+    parser.add_argument("--messages", type=int, default=40, help="Messages broadcast")
+    parser.add_argument("--interval-ms", type=float, default=20, help="Pause between broadcasts")
+    parser.add_argument("--size", type=int, default=512, help="Message content size")
+    parser.add_argument("--fast-ms", type=float, default=0.2, help="Send cost of a healthy client")
+    parser.add_argument("--slow-ms", type=float, default=1000, help="Send cost of the slow client")
+    parser.add_argument("--send-timeout", type=float, default=0.5, help="Send timeout of the queued broadcaster")
+    asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Chat history benchmark: session restore and turn writes
+
+Builds a synthetic SQLite llm_conversations table with --sessions sessions of --messages
+messages each, then times for one session:
+
+- restore:
+    full:   every message of the session, ordered by created_at (what the memory is rebuilt from)
+    window: last --turns turns through the (session_id, created_at) index
+- turn write (--writes turns):
+    create x2:   one INSERT and one commit per message, as before
+    create_many: both messages of the turn in one multi-row INSERT and one commit
+
+Usage:
+    python -m benchmarks.conversations_benchmark --sessions 200 --messages 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from knowledge_api.mapper.conversations.base import Conversation, ConversationCreate
+from knowledge_api.mapper.conversations.crud import ConversationCRUD
+
+
+def _populate(engine, sessions: int, messages: int, batch_size: int = 50000) -> None:
+    """Insert sessions of alternating user / assistant messages, interleaved in time"""
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=365)
+    columns = ("user_id", "session_id", "chat_role_id", "conversation_id", "message_id", "role", "content",
+               "is_sync", "created_at")
+    sql = f"INSERT INTO llm_conversations ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        batch = []
+        for i in range(messages):
+            for s in range(sessions):
+                created = (start + timedelta(seconds=i * 60 + s)).strftime("%Y-%m-%d %H:%M:%S.%f")
+                role = "user" if i % 2 == 0 else "assistant"
+                batch.append((f"user_{s}", f"session_{s}", "role_1", f"session_{s}", uuid.uuid4().hex, role,
+                              "x" * rng.randint(20, 200), 0, created))
+                if len(batch) >= batch_size:
+                    cursor.executemany(sql, batch)
+                    batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _timed(label: str, fn, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = asyncio.run(fn())
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<40} best {min(timings) * 1000:10.2f} ms   avg {sum(timings) / len(timings) * 1000:10.2f} ms")
+    return result
+
+
+def _turn(session_id: str, i: int):
+    user = ConversationCreate(user_id="user_0", session_id=session_id, conversation_id=session_id,
+                              message_id=uuid.uuid4().hex, role="user", content=f"question {i}")
+    reply = ConversationCreate(user_id="user_0", session_id=session_id, conversation_id=session_id,
+                               message_id=uuid.uuid4().hex, parent_message_id=user.message_id,
+                               role="assistant", content=f"answer {i}")
+    return user, reply
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Chat history restore / write benchmark")
+    parser.add_argument("--sessions", type=int, default=200, help="Synthetic sessions")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages per session")
+    parser.add_argument("--turns", type=int, default=5, help="Turns restored by the window")
+    parser.add_argument("--writes", type=int, default=200, help="Turns written per mode")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per restore")
+    parser.add_argument("--db", default=None, help="SQLite file (a temporary file by default)")
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "conversation_benchmark.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine, tables=[Conversation.__table__])
+    start = time.perf_counter()
+    _populate(engine, args.sessions, args.messages)
+    print(f"{args.sessions * args.messages} messages ({args.sessions} sessions x {args.messages}) "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    session_id = f"session_{args.sessions // 2}"
+    with Session(engine) as db:
+        crud = ConversationCRUD(db)
+        full = _timed("restore full history", lambda: crud.get_by_session_id(session_id, limit=args.messages),
+                      args.repeat)
+        window = _timed(f"restore last {args.turns} turns",
+                        lambda: crud.get_recent_by_session_id(session_id, limit=args.turns * 2), args.repeat)
+        assert [m.message_id for m in window] == [m.message_id for m in full[-args.turns * 2:]]
+
+        async def write_single():
+            for i in range(args.writes):
+                user, reply = _turn("write_single", i)
+                await crud.create(user)
+                await crud.create(reply)
+
+        async def write_batch():
+            for i in range(args.writes):
+                await crud.create_many(list(_turn("write_batch", i)))
+
+        _timed(f"write {args.writes} turns, create x2", write_single, 1)
+        _timed(f"write {args.writes} turns, create_many", write_batch, 1)
+        restored = asyncio.run(crud.get_recent_by_session_id("write_batch", limit=2))
+        assert [m.role for m in restored] == ["user", "assistant"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Database access load test: synchronous Session vs AsyncSession behind BaseCRUD
+
+Mounts the same two routes on a small FastAPI app twice, once with the synchronous
+Session (get_session) and once with the AsyncSession (get_async_session): a fast
+card series listing and a deliberately slow query. Both apps are driven in-process
+on a single event loop, like the single uvicorn worker, with a few slow requests
+mixed into many fast ones, and the throughput and fast request latency are reported.
+
+Usage:
+    python -m benchmarks.database_load_benchmark --requests 400 --slow 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from knowledge_api.mapper.card_series import CardSeries, CardSeriesCRUD
+
+# sleep_ms() is registered on every connection and stands in for a query waiting on the
+# database server (lock wait, full scan), the client side only waits on the socket
+SLOW_QUERY = text("SELECT sleep_ms(:ms)")
+
+
+def _register_sleep(engine) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000) or ms)
+
+
+def _prepare_database(path: str, series: int = 50) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine, tables=[CardSeries.__table__])
+    with Session(engine) as session:
+        for i in range(series):
+            session.add(CardSeries(name=f"series_{i}", code=f"S{i:04d}", status=1, sort_order=i))
+        session.commit()
+    engine.dispose()
+
+
+def _build_sync_app(path: str, slow_ms: int) -> FastAPI:
+    # Unbounded overflow: a checkout blocking the event loop can never be satisfied, because the
+    # connections are only returned by dependency teardowns which need the same loop to run
+    engine = create_engine(f"sqlite:///{path}", pool_size=20, max_overflow=-1,
+                           connect_args={"check_same_thread": False})
+    _register_sleep(engine)
+
+    def get_session():
+        with Session(engine) as session:
+            yield session
+
+    app = FastAPI()
+
+    @app.get("/fast")
+    async def fast(db: Session = Depends(get_session)):
+        return len(await CardSeriesCRUD(db).get_active_series())
+
+    @app.get("/slow")
+    async def slow(db: Session = Depends(get_session)):
+        return (await CardSeriesCRUD(db)._exec(SLOW_QUERY.bindparams(ms=slow_ms))).one()[0]
+
+    return app
+
+
+def _build_async_app(path: str, slow_ms: int) -> FastAPI:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=20, max_overflow=20)
+    _register_sleep(engine.sync_engine)
+
+    async def get_async_session():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    app = FastAPI()
+
+    @app.get("/fast")
+    async def fast(db: AsyncSession = Depends(get_async_session)):
+        return len(await CardSeriesCRUD(db).get_active_series())
+
+    @app.get("/slow")
+    async def slow(db: AsyncSession = Depends(get_async_session)):
+        return (await CardSeriesCRUD(db)._exec(SLOW_QUERY.bindparams(ms=slow_ms))).one()[0]
+
+    return app
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def _drive(app: FastAPI, requests: int, slow: int, concurrency: int) -> dict:
+    """Send `requests` fast and `slow` slow requests with at most `concurrency` in flight"""
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    fast_latencies: List[float] = []
+    slow_latencies: List[float] = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+        async def call(path: str, sink: List[float]):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                sink.append(time.perf_counter() - start)
+
+        # Spread the slow requests evenly over the fast ones
+        paths = ["/fast"] * requests
+        step = max(1, requests // max(slow, 1))
+        for i in range(slow):
+            paths.insert(i * (step + 1), "/slow")
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            call(path, slow_latencies if path == "/slow" else fast_latencies) for path in paths
+        ])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed": elapsed,
+        "rps": len(paths) / elapsed,
+        "fast_p50": _percentile(fast_latencies, 50) * 1000,
+        "fast_p99": _percentile(fast_latencies, 99) * 1000,
+        "slow_p50": _percentile(slow_latencies, 50) * 1000 if slow_latencies else 0.0,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Sync vs async database session load test")
+    parser.add_argument("--requests", type=int, default=400, help="Number of fast requests")
+    parser.add_argument("--slow", type=int, default=8, help="Number of slow requests mixed in")
+    parser.add_argument("--slow-ms", type=int, default=500, help="Duration of the slow query")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(), "database_load_benchmark.db")
+    _prepare_database(path)
+
+    for label, builder in (("sync Session", _build_sync_app), ("AsyncSession", _build_async_app)):
+        result = asyncio.run(_drive(builder(path, args.slow_ms), args.requests, args.slow, args.concurrency))
+        print(f"{label:<14} {result['rps']:8.1f} req/s   fast p50 {result['fast_p50']:8.1f} ms   "
+              f"fast p99 {result['fast_p99']:8.1f} ms   slow p50 {result['slow_p50']:8.1f} ms   "
+              f"total {result['elapsed']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+记忆写入基准测试：Redis锁与等待队列 vs 分区消费者
+
+--sessions 个会话同时写入，每个会话按顺序写入 --dialogs 条对话（间隔 0~--gap-ms 毫秒），
+批次大小 --batch-size，记忆系统每次写入耗时 --store-ms，两种模式使用同一个 DialogBatchProcessor：
+
+- legacy:       对话缓存列表 + RedisLock + 等待队列（改造前的写入流程）
+- partitioned:  按会话哈希写入 --partitions 个 Redis Stream 分区，每个分区一个消费者
+
+每种模式输出吞吐、每条对话的Redis往返与命令数、乱序/丢失/重复的会话数。
+会话同时发起的写入不超过 --concurrency 个（相当于应用进程的并发上限），
+连接池没有空闲连接时等待连接释放，未设置 REDIS_MAX_CONNECTIONS 时按并发数放大连接池。
+
+用法:
+    python -m benchmarks.ingestion_benchmark --sessions 1000 --dialogs 10
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from redis.asyncio.client import Pipeline, Redis
+
+from knowledge_api.framework.redis.connection import get_async_redis
+from knowledge_api.framework.redis.redis_lock import RedisLock
+from plugIns.memory_system.cache_system.memory_ingestion import PartitionedMemoryIngestion
+from plugIns.memory_system.memory_interface import UserMetadata
+from plugIns.memory_system.processors.dialog_batch_processor import DialogBatchProcessor
+from plugIns.memory_system.utils.json_utils import deserialize_datetime_aware, serialize_with_datetime
+
+_STREAM_PREFIX = "benchmark:memory_ingest"
+_LEGACY_PREFIX = "benchmark:memory_legacy"
+
+
+class _Counter:
+    """Redis往返与命令计数"""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.commands: Counter = Counter()
+        self._execute_command = Redis.execute_command
+        self._pipeline_execute = Pipeline.execute
+
+    def install(self) -> None:
+        counter = self
+
+        async def execute_command(client, *args, **options):
+            if not isinstance(client, Pipeline):
+                counter.round_trips += 1
+                counter.commands[str(args[0]).upper()] += 1
+            return await counter._execute_command(client, *args, **options)
+
+        async def pipeline_execute(pipe, *args, **kwargs):
+            counter.round_trips += 1
+            for command_args, _ in pipe.command_stack:
+                counter.commands[str(command_args[0]).upper()] += 1
+            return await counter._pipeline_execute(pipe, *args, **kwargs)
+
+        Redis.execute_command = execute_command
+        Pipeline.execute = pipeline_execute
+
+    def uninstall(self) -> None:
+        Redis.execute_command = self._execute_command
+        Pipeline.execute = self._pipeline_execute
+
+    def reset(self) -> None:
+        self.round_trips = 0
+        self.commands.clear()
+
+
+class _RecordingMemory:
+    """记忆系统：按写入顺序记录每个会话的对话序号"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.stored: Dict[str, List[int]] = defaultdict(list)
+
+    async def store(self, memory_context, user_metadata: UserMetadata = None) -> bool:
+        await asyncio.sleep(self.latency)
+        dialogs = memory_context.source_dialog or [memory_context.dict()]
+        self.stored[user_metadata.session_id].extend(dialog["metadata"]["seq"] for dialog in dialogs)
+        return True
+
+    async def store_many(self, items, user_metadata: UserMetadata = None) -> list:
+        await asyncio.sleep(self.latency)
+        self.stored[user_metadata.session_id].extend(item.metadata["seq"] for item in items)
+        return [None] * len(items)
+
+
+class _History:
+    async def store_dialog_batch(self, user_id, role_id, session_id, dialog_batch) -> bool:
+        return True
+
+
+class _StubManager:
+    """DialogBatchProcessor 使用的记忆管理器接口"""
+
+    def __init__(self, memory: _RecordingMemory, batch_size: int):
+        self._current_memory = memory
+        self._history_manager = _History()
+        self._auto_summarize = True
+        self._dialog_batch_size = batch_size
+
+    async def get_or_create_user_metadata(self, user_id: str, role_id: str, session_id: Optional[str] = None):
+        return UserMetadata(user_id=user_id, role_id=role_id, session_id=session_id)
+
+    async def get_dialog_history(self, user_id: str, role_id: str, session_id: Optional[str] = None) -> list:
+        return []
+
+
+class _LegacyIngestion:
+    """改造前的写入流程：对话缓存列表 + 处理锁 + 等待队列"""
+
+    def __init__(self, processor: DialogBatchProcessor, batch_size: int):
+        self.processor = processor
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _key(kind: str, user_id: str, role_id: str, session_id: str) -> str:
+        return f"{_LEGACY_PREFIX}:{kind}:{user_id}:{role_id}:{session_id}"
+
+    async def store(self, data: Dict[str, Any], user_id: str, role_id: str, session_id: str) -> None:
+        redis = await get_async_redis()
+        is_processing = await redis.exists(f"redis_lock:{self._key('processing', user_id, role_id, session_id)}")
+        cache_key = self._key("dialog_cache", user_id, role_id, session_id)
+        await redis.rpush(cache_key, serialize_with_datetime(data))
+        if await redis.llen(cache_key) >= self.batch_size and not is_processing:
+            asyncio.create_task(self.process_dialog_batch(user_id, role_id, session_id))
+
+    async def _take(self, key: str) -> List[Dict[str, Any]]:
+        redis = await get_async_redis()
+        async with redis.pipeline() as pipe:
+            await pipe.lrange(key, 0, -1)
+            await pipe.delete(key)
+            results = await pipe.execute()
+        return [deserialize_datetime_aware(item) for item in results[0]]
+
+    async def _push(self, key: str, dialogs: List[Dict[str, Any]]) -> int:
+        redis = await get_async_redis()
+        pipe = redis.pipeline()
+        for dialog in dialogs:
+            pipe.rpush(key, serialize_with_datetime(dialog))
+        await pipe.execute()
+        return await redis.llen(key)
+
+    async def process_dialog_batch(self, user_id: str, role_id: str, session_id: str) -> None:
+        lock = RedisLock(self._key("processing", user_id, role_id, session_id), expire=60, max_retries=3)
+        cache_key = self._key("dialog_cache", user_id, role_id, session_id)
+        if not await lock.acquire():
+            dialogs = await self._take(cache_key)
+            if dialogs:
+                await self._push(self._key("waiting", user_id, role_id, session_id), dialogs)
+            return
+        dialogs = await self._take(cache_key)
+        if not dialogs:
+            await lock.release()
+            return
+        asyncio.create_task(self._background_store(user_id, role_id, session_id, dialogs, lock))
+
+    async def _background_store(self, user_id: str, role_id: str, session_id: str,
+                                dialogs: List[Dict[str, Any]], lock: RedisLock) -> None:
+        pending = await self.processor.store_dialog_batch(user_id, role_id, session_id, dialogs)
+        if pending:
+            redis = await get_async_redis()
+            for dialog in pending:
+                await redis.lpush(self._key("dialog_cache", user_id, role_id, session_id), serialize_with_datetime(dialog))
+        await lock.release()
+        redis = await get_async_redis()
+        waiting_key = self._key("waiting", user_id, role_id, session_id)
+        if await redis.llen(waiting_key) > 0:
+            waiting = await self._take(waiting_key)
+            if waiting and await self._push(self._key("dialog_cache", user_id, role_id, session_id), waiting) >= self.batch_size:
+                await self.process_dialog_batch(user_id, role_id, session_id)
+        elif await redis.llen(self._key("dialog_cache", user_id, role_id, session_id)) >= self.batch_size:
+            asyncio.create_task(self.process_dialog_batch(user_id, role_id, session_id))
+
+
+async def _session(store, session: int, rng: random.Random, gate: asyncio.Semaphore, args) -> None:
+    for seq in range(args.dialogs):
+        await asyncio.sleep(rng.random() * args.gap_ms / 1000)
+        data = {"content": f"第{seq}句", "source": "user" if seq % 2 == 0 else "assistant",
+                "timestamp": datetime.now().isoformat(), "metadata": {"seq": seq}}
+        async with gate:
+            await store(data, "bench_user", "bench_role", f"session_{session}")
+
+
+async def _clean() -> None:
+    redis = await get_async_redis()
+    keys = await redis.keys(f"{_STREAM_PREFIX}:*") + await redis.keys(f"{_LEGACY_PREFIX}:*")
+    keys += await redis.keys(f"redis_lock:{_LEGACY_PREFIX}:*")
+    if keys:
+        await redis.delete(*keys)
+
+
+async def _run_mode(name: str, counter: _Counter, args) -> None:
+    await _clean()
+    memory = _RecordingMemory(args.store_ms / 1000)
+    processor = DialogBatchProcessor(_StubManager(memory, args.batch_size))
+    ingestion = None
+    if name == "legacy":
+        legacy = _LegacyIngestion(processor, args.batch_size)
+        store = legacy.store
+    else:
+        ingestion = PartitionedMemoryIngestion(processor.store_dialog_batch, args.batch_size,
+                                               partitions=args.partitions, worker_count=1,
+                                               block_ms=200, stream_prefix=_STREAM_PREFIX)
+        await ingestion.start()
+        store = ingestion.submit
+
+    rng = random.Random(7)
+    gate = asyncio.Semaphore(args.concurrency)
+    total = args.sessions * args.dialogs
+    counter.reset()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_session(store, i, rng, gate, args) for i in range(args.sessions)),
+                                   return_exceptions=True)
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    submitted = time.perf_counter() - start
+    # 等待写入完成（乱序的旧流程可能有对话一直留在缓存中）
+    while sum(len(seqs) for seqs in memory.stored.values()) < total and time.perf_counter() - start < args.timeout:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    round_trips, commands = counter.round_trips, sum(counter.commands.values())
+    per_command = "  ".join(f"{command} {count / total:.2f}" for command, count in counter.commands.most_common(8))
+    if ingestion is not None:
+        await ingestion.close()
+    await _clean()
+
+    stored = sum(len(seqs) for seqs in memory.stored.values())
+    reordered = sum(1 for seqs in memory.stored.values() if seqs != sorted(seqs))
+    duplicated = sum(1 for seqs in memory.stored.values() if len(seqs) != len(set(seqs)))
+    missing = sum(1 for i in range(args.sessions) if len(set(memory.stored.get(f"session_{i}", []))) < args.dialogs)
+    print(f"{name:<12} {stored / elapsed:8.0f} dialogs/s   stored {stored}/{total} in {elapsed:6.2f} s "
+          f"(submitted in {submitted:5.2f} s)   {round_trips / total:5.2f} round trips / dialog   "
+          f"{commands / total:5.2f} commands / dialog")
+    print(f"{'':<12} sessions out of order {reordered}   with missing dialogs {missing}   with duplicates {duplicated}   "
+          f"with failed writes {failed}")
+    print(f"{'':<12} {per_command}")
+
+
+async def _run(args) -> None:
+    counter = _Counter()
+    counter.install()
+    try:
+        for name in ("legacy", "partitioned"):
+            await _run_mode(name, counter, args)
+    finally:
+        counter.uninstall()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="记忆写入基准测试")
+    parser.add_argument("--sessions", type=int, default=1000, help="同时写入的会话数")
+    parser.add_argument("--dialogs", type=int, default=10, help="每个会话的对话数")
+    parser.add_argument("--gap-ms", type=float, default=20, help="会话内两条对话的最大间隔")
+    parser.add_argument("--batch-size", type=int, default=2, help="对话批次大小")
+    parser.add_argument("--store-ms", type=float, default=20, help="记忆系统写入耗时")
+    parser.add_argument("--concurrency", type=int, default=64, help="同时进行的写入数")
+    parser.add_argument("--partitions", type=int, default=8, help="分区数量")
+    parser.add_argument("--timeout", type=float, default=120, help="最长等待时间(秒)")
+    args = parser.parse_args(argv)
+    os.environ.setdefault("REDIS_MAX_CONNECTIONS", str(args.concurrency * 4 + 32))
+    logging.disable(logging.INFO)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
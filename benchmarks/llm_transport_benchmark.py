@@ -0,0 +1,238 @@
+"""LLM transport benchmark against a local fault-injecting mock server
+
+Starts an OpenAI compatible mock server on 127.0.0.1 serving a "primary" and a "secondary"
+provider. Each scenario injects faults on the primary provider and sends --requests requests
+(--concurrency at a time), once straight to the implementation of the client (no deadline,
+retry or failover, as before) and once through BaseLLM with the resilient transport:
+
+- flaky:   25% of the requests answer HTTP 503                        (retries)
+- hung:    10% of the requests hang for 10 s                          (attempt deadline + retry)
+- outage:  every request answers HTTP 503, the secondary is healthy   (circuit breaker + failover)
+- tail:    10% of the requests take 1.5 s                             (hedging at p90 to the secondary)
+- stream:  20% of the streams stall 10 s before their first token     (first token deadline + retry)
+
+Usage:
+    python -m benchmarks.llm_transport_benchmark --requests 100
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from aiohttp import web
+
+from knowledge_api.framework.ai_collect.base_llm import BaseLLM
+from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
+from knowledge_api.framework.ai_collect.transport import TransportPolicy, set_transport_policy
+from knowledge_api.model.llm_token_model import LLMTokenResponse
+
+_MESSAGES = [{"role": "user", "content": "Is the man alive?"}]
+
+# Short deadlines so that the scenarios run in seconds
+_POLICY = TransportPolicy(attempt_timeout=1.0, first_token_timeout=0.5, total_timeout=5.0, max_retries=2,
+                          retry_base_delay=0.05, retry_max_delay=0.5, breaker_reset=60.0,
+                          hedge_percentile=90, hedge_min_samples=20)
+
+
+class _Faults:
+    """Faults injected on the requests of one provider"""
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, hang_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 1.5, stall_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.stall_rate = stall_rate
+        self.requests = 0
+
+
+def _mock_app(faults: Dict[str, _Faults]) -> web.Application:
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        provider = faults[request.match_info["provider"]]
+        provider.requests += 1
+        payload = await request.json()
+        draw = random.random()
+        if draw < provider.error_rate:
+            await asyncio.sleep(provider.latency / 5)
+            return web.json_response({"error": "overloaded"}, status=503)
+        if draw < provider.error_rate + provider.hang_rate:
+            await asyncio.sleep(10)
+        elif draw < provider.error_rate + provider.hang_rate + provider.slow_rate:
+            await asyncio.sleep(provider.slow_latency)
+
+        if not payload.get("stream"):
+            await asyncio.sleep(provider.latency)
+            return web.json_response({
+                "id": uuid.uuid4().hex, "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "No."}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            if random.random() < provider.stall_rate:
+                await asyncio.sleep(10)
+            for token in ("The ", "man ", "is ", "alive."):
+                await asyncio.sleep(provider.latency / 4)
+                chunk = {"id": "stream", "choices": [{"index": 0, "delta": {"content": token}}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+        except ConnectionResetError:
+            # The client gave up on the stalled stream
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_post("/{provider}/chat/completions", chat_completions)
+    return app
+
+
+class _MockServerLLM(BaseLLM):
+    """OpenAI compatible client of one provider of the mock server, not registered as an LLM type"""
+
+    def __init__(self, provider: str, base_url: str):
+        super().__init__(api_key="mock", base_url=f"{base_url}/{provider}", model=f"{provider}-model")
+        # Breakers and latencies are kept per provider
+        self.llm_type = provider
+
+    def _initialize(self) -> None:
+        self.headers = {"Content-Type": "application/json"}
+
+    async def _chat_completion_impl(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                                    max_tokens: Optional[int] = None, **kwargs) -> LLMTokenResponse:
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}/chat/completions",
+                                json={"model": self.model, "messages": messages}) as response:
+            result = await response.json()
+        return LLMTokenResponse(id=result["id"], model=self.model, content=result["choices"][0]["message"]["content"])
+
+    async def _chat_completion_stream_impl(self, messages, temperature=0.7, max_tokens=None,
+                                           **kwargs) -> AsyncGenerator[LLMTokenResponse, None]:
+        payload = {"model": self.model, "messages": messages, "stream": True}
+        async with self._get_streaming_response(f"{self.base_url}/chat/completions", payload) as response:
+            async for line in response.content:
+                line = line.decode().strip()
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                delta = json.loads(line[6:])["choices"][0]["delta"]
+                yield LLMTokenResponse(id="stream", model=self.model, content=delta.get("content", ""))
+
+    async def _function_call_impl(self, messages, tools: ToolRegistry, model: str = None):
+        raise NotImplementedError
+
+    def completion(self, prompt: str, temperature: float = 0.7, max_tokens: Optional[int] = None, **kwargs):
+        raise NotImplementedError
+
+    def embeddings(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def _log_token_stats(self, response, start_time=None, messages=None, application_scenario=None) -> float:
+        # No usage records for the mock providers
+        return 0.0
+
+
+_SCENARIOS = {
+    "flaky": ({"error_rate": 0.25}, False, False),
+    "hung": ({"hang_rate": 0.1}, False, False),
+    "outage": ({"error_rate": 1.0}, True, False),
+    "tail": ({"slow_rate": 0.1}, True, False),
+    "stream": ({"stall_rate": 0.2}, False, True),
+}
+
+
+async def _stream_text(client: BaseLLM, resilient: bool) -> str:
+    chunks = client.chat_completion_stream(_MESSAGES) if resilient else client._chat_completion_stream_impl(_MESSAGES)
+    text = ""
+    async for chunk in chunks:
+        if chunk.finish_reason == "error":
+            raise RuntimeError(chunk.content)
+        text += chunk.content
+    return text
+
+
+async def _request(client: BaseLLM, resilient: bool, stream: bool) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        if stream:
+            content = await _stream_text(client, resilient)
+        elif resilient:
+            content = (await client.chat_completion(_MESSAGES)).content
+        else:
+            content = (await client._chat_completion_impl(_MESSAGES)).content
+        ok = bool(content)
+    except Exception:
+        ok = False
+    return {"ok": ok, "seconds": time.perf_counter() - start}
+
+
+async def _run_scenario(base_url: str, faults: Dict[str, _Faults], name: str, args) -> None:
+    primary_faults, with_fallback, stream = _SCENARIOS[name]
+    for resilient in (False, True):
+        faults["primary"] = _Faults(**primary_faults)
+        faults["secondary"] = _Faults()
+        set_transport_policy(_POLICY)
+        primary = _MockServerLLM("primary", base_url)
+        if with_fallback:
+            primary.fallback = _MockServerLLM("secondary", base_url)
+        if name == "tail" and resilient:
+            # Latency history of the primary for the percentile
+            for _ in range(_POLICY.hedge_min_samples):
+                await primary.chat_completion(_MESSAGES)
+            faults["primary"].requests = 0
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded():
+            async with semaphore:
+                return await _request(primary, resilient, stream)
+
+        results = await asyncio.gather(*(bounded() for _ in range(args.requests)))
+        await primary.close()
+        if primary.fallback:
+            await primary.fallback.close()
+        seconds = sorted(result["seconds"] for result in results)
+        outcome = Counter("ok" if result["ok"] else "failed" for result in results)
+        print(f"{name:<7} {'transport' if resilient else 'direct':<10} "
+              f"ok {outcome['ok']:>4}/{len(results):<4} p50 {seconds[len(seconds) // 2] * 1000:7.0f} ms   "
+              f"p99 {seconds[min(len(seconds) - 1, int(len(seconds) * 0.99))] * 1000:7.0f} ms   "
+              f"primary hits {faults['primary'].requests:>4}   secondary hits {faults['secondary'].requests:>4}")
+
+
+async def _run(args) -> None:
+    faults: Dict[str, _Faults] = {}
+    runner = web.AppRunner(_mock_app(faults))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    print(f"{args.requests} requests per run, {args.concurrency} at a time")
+    try:
+        for name in args.scenarios:
+            await _run_scenario(base_url, faults, name, args)
+    finally:
+        set_transport_policy(None)
+        await runner.cleanup()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="LLM transport benchmark with fault injection")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight")
+    parser.add_argument("--scenarios", nargs="+", default=list(_SCENARIOS), choices=list(_SCENARIOS))
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the injected faults")
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+    logging.disable(logging.WARNING)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
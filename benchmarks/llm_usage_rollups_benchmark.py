@@ -0,0 +1,116 @@
+"""LLM usage statistics benchmark: raw table aggregation vs rollups
+
+Builds a synthetic SQLite llm_usage_records table, rebuilds the rollups from it and
+times the statistics queries on both paths.
+
+Usage:
+    python -m benchmarks.llm_usage_rollups_benchmark --rows 5000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from knowledge_api.mapper.llm_usage_records.base import LLMUsageRecord
+from knowledge_api.mapper.llm_usage_records.crud import LLMUsageRecordCRUD
+from knowledge_api.mapper.llm_usage_rollups.base import LLMUsageRollup
+from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD, REBUILD_CLOSE_DELAY
+
+MODELS = [("doubao", "doubao-pro-32k"), ("doubao", "doubao-lite-32k"), ("deepseek", "deepseek-chat"),
+          ("kimi", "moonshot-v1-8k"), ("ernie_bot", "ernie-4.0"), ("claude", "claude-sonnet")]
+SCENARIOS = ["chat", "chat_stream", "game-function_call", "memory_summary", "task_judge", None]
+
+
+def _populate(engine, rows: int, days: int, batch_size: int = 50000) -> None:
+    """Insert synthetic usage records spread over the `days` days before the last closed day"""
+    rng = random.Random(42)
+    # Only closed buckets are rebuilt, the open ones are kept up to date by the usage writer
+    now = (datetime.utcnow() - REBUILD_CLOSE_DELAY).replace(hour=0, minute=0, second=0, microsecond=0) \
+        - timedelta(microseconds=1)
+    span = days * 86400
+    columns = ("request_id", "vendor_type", "model_id", "input_tokens", "output_tokens", "total_tokens",
+               "application_scenario", "total_price", "content", "role", "finish_reason", "elapsed_time",
+               "created_at", "updated_at")
+    sql = f"INSERT INTO llm_usage_records ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for _ in range(min(batch_size, rows - offset)):
+                vendor, model = rng.choice(MODELS)
+                input_tokens = rng.randint(50, 4000)
+                output_tokens = rng.randint(10, 1000)
+                created = (now - timedelta(seconds=rng.randint(0, span))).strftime("%Y-%m-%d %H:%M:%S.%f")
+                batch.append((None, vendor, model, input_tokens, output_tokens, input_tokens + output_tokens,
+                              rng.choice(SCENARIOS), round((input_tokens + output_tokens) * 0.000002, 8), "",
+                              "assistant", "stop", rng.random() * 5, created, created))
+            cursor.executemany(sql, batch)
+            connection.commit()
+    finally:
+        connection.close()
+
+
+def _timed(label: str, fn, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = asyncio.run(fn())
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<40} best {min(timings) * 1000:10.1f} ms   avg {sum(timings) / len(timings) * 1000:10.1f} ms")
+    return result
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="LLM usage statistics benchmark")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Synthetic raw usage rows")
+    parser.add_argument("--days", type=int, default=90, help="Time span of the synthetic rows")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per query")
+    parser.add_argument("--db", default=None, help="SQLite file (a temporary file by default)")
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "llm_usage_benchmark.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine, tables=[LLMUsageRecord.__table__, LLMUsageRollup.__table__])
+
+    start = time.perf_counter()
+    _populate(engine, args.rows, args.days)
+    print(f"Inserted {args.rows} raw rows in {time.perf_counter() - start:.1f}s ({path})")
+
+    with Session(engine) as session:
+        rollup_crud = LLMUsageRollupCRUD(session)
+        record_crud = LLMUsageRecordCRUD(session)
+
+        start = time.perf_counter()
+        buckets = asyncio.run(rollup_crud.rebuild(datetime.utcnow() - timedelta(days=args.days + 1), datetime.utcnow()))
+        print(f"Rebuilt {buckets} rollup buckets in {time.perf_counter() - start:.1f}s")
+
+        week_ago = (datetime.utcnow() - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+        # end_date includes its whole day
+        yesterday = week_ago + timedelta(days=6)
+        raw_summary = _timed("raw   get_statistics (all time)", record_crud.get_statistics, args.repeat)
+        rollup_summary = _timed("rollup get_statistics (all time)", rollup_crud.get_statistics, args.repeat)
+        _timed("raw   get_statistics (last 7 days)", lambda: record_crud.get_statistics(start_date=week_ago), args.repeat)
+        _timed("rollup get_statistics (last 7 days)", lambda: rollup_crud.get_statistics(start_date=week_ago), args.repeat)
+        raw_week = _timed("raw   get_statistics (7 closed days)",
+                          lambda: record_crud.get_statistics(start_date=week_ago, end_date=yesterday), args.repeat)
+        rollup_week = _timed("rollup get_statistics (7 closed days)",
+                             lambda: rollup_crud.get_statistics(start_date=week_ago, end_date=yesterday), args.repeat)
+        _timed("raw   get_daily_statistics (30 days)", record_crud.get_daily_statistics, args.repeat)
+        _timed("rollup get_daily_statistics (30 days)", rollup_crud.get_daily_statistics, args.repeat)
+
+    assert raw_summary.total_records == rollup_summary.total_records, "rollup totals do not match the raw table"
+    assert raw_summary.total_tokens == rollup_summary.total_tokens, "rollup tokens do not match the raw table"
+    assert raw_week.total_records == rollup_week.total_records, "rollup range totals do not match the raw table"
+    print("Rollup totals match the raw table")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Logging benchmark: request throughput with INFO logging enabled
+
+Builds an app whose endpoint logs --lines INFO records per request (as broadcast_message,
+the workflow engine and BaseLLM do on a game turn) and drives it in-process with
+--concurrency requests in flight. The console and file handlers write to a temporary
+directory, the console stream optionally sleeps --sink-latency-ms per write to stand in
+for a slow stdout pipe or disk. Records dropped because the queue was full are reported
+("queue full", sized with --queue-size). Modes:
+
+- sync:     handlers called on the event loop thread, as before
+- async:    QueueHandler + listener thread
+- sampled:  async, 10% of the INFO records of this module kept
+- json:     async with structured JSON output
+
+Usage:
+    python -m benchmarks.log_benchmark --requests 2000 --lines 20 --sink-latency-ms 0.05
+"""
+import argparse
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from knowledge_api.utils.log_config import APILogger, LogConfig, get_logger
+
+_MODES = {
+    "sync": {"async_log": False},
+    "async": {},
+    "sampled": {"sample_rates": {"benchmarks.log_benchmark": 0.1}},
+    "json": {"json_log": True},
+}
+
+
+class _SlowStream:
+    """Console stream writing to a file, sleeping on every write"""
+
+    def __init__(self, path: str, latency: float):
+        self._file = open(path, "w", encoding="utf-8")
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._file.write(text)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _build_app(lines: int) -> FastAPI:
+    app = FastAPI()
+    logger = get_logger()
+
+    @app.get("/turn/{session_id}")
+    async def turn(session_id: str):
+        for i in range(lines):
+            logger.info(f"广播消息到会话 {session_id}: 节点 node_{i} 执行完成", {"round": i, "status": "running"})
+            if i % 5 == 4:
+                await asyncio.sleep(0)
+        return {"session_id": session_id, "status": "ok"}
+
+    return app
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def _drive(app: FastAPI, requests: int, concurrency: int) -> Dict[str, float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        (await client.get("/turn/warmup")).raise_for_status()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def call(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                (await client.get(f"/turn/session-{i % 50}")).raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[call(i) for i in range(requests)])
+        elapsed = time.perf_counter() - start
+    return {"rps": requests / elapsed, "p50": _percentile(latencies, 50), "p99": _percentile(latencies, 99)}
+
+
+def _run_mode(name: str, args, directory: str) -> None:
+    log_dir = os.path.join(directory, name)
+    os.makedirs(log_dir)
+    console = _SlowStream(os.path.join(log_dir, "console.log"), args.sink_latency_ms / 1000)
+    stdout, sys.stdout = sys.stdout, console
+    try:
+        instance = APILogger.get_instance(LogConfig(log_dir=log_dir, queue_size=args.queue_size,
+                                                          **_MODES[name]), recreate=True)
+    finally:
+        sys.stdout = stdout
+
+    result = asyncio.run(_drive(_build_app(args.lines), args.requests, args.concurrency))
+    stats = instance.get_stats()
+    start = time.perf_counter()
+    instance.shutdown()
+    drain = (time.perf_counter() - start) * 1000
+    console.close()
+    with open(glob.glob(os.path.join(log_dir, "fastapi-app_*.log"))[0], encoding="utf-8") as f:
+        written = sum(1 for _ in f)
+    print(f"{name:<8} {result['rps']:8.1f} req/s   p50 {result['p50']:7.2f} ms   p99 {result['p99']:7.2f} ms   "
+          f"drain {drain:7.1f} ms   lines {written:>6}   sampled {stats['sampled']:>6}   "
+          f"queue full {stats['queue_full']:>4}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Logging pipeline benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode")
+    parser.add_argument("--lines", type=int, default=20, help="INFO records logged per request")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--sink-latency-ms", type=float, default=0.0, help="Sleep of the console stream per write")
+    parser.add_argument("--queue-size", type=int, default=10000, help="Records the queue holds, beyond that INFO is dropped")
+    parser.add_argument("--modes", nargs="+", default=list(_MODES), choices=list(_MODES))
+    args = parser.parse_args(argv)
+    print(f"{args.requests} requests, {args.lines} INFO records each, console sink latency {args.sink_latency_ms} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.modes:
+            _run_mode(name, args, directory)
+    APILogger.get_instance(recreate=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Middleware benchmark: BaseHTTPMiddleware stack vs pure ASGI stack
+
+Builds two apps with the same authenticated JSON endpoints, one behind the previous
+BaseHTTPMiddleware implementations of the response wrapper and JWT authentication
+(kept here for comparison), one behind the pure ASGI middlewares with the route
+level envelope. Both are driven in-process and requests/sec is reported for a small
+JSON endpoint and a large paginated one.
+
+The session store is an in-memory stand-in for Redis with a configurable round trip
+latency, so the benchmark runs without a Redis server.
+
+Usage:
+    python -m benchmarks.middleware_benchmark --requests 2000 --items 1000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from knowledge_api.framework.auth.auth_middleware import JWTAuthMiddleware
+from knowledge_api.framework.auth.jwt_utils import JWTUtils
+from knowledge_api.framework.auth.session_manager import UserSession, get_session_manager
+from knowledge_api.framework.auth.token_util import TokenUtil
+from knowledge_api.framework.exception.response_wrapper import (
+    ResponseWrapperMiddleware, StandardJSONResponse, StandardResponse
+)
+
+
+class _MemorySessionCache:
+    """Stand-in for the RedisCache of the session manager"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.data: Dict[str, Any] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        await asyncio.sleep(self.latency)
+        return self.data.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        await asyncio.sleep(self.latency)
+        self.data[key] = value
+        return True
+
+    async def delete(self, key: str) -> bool:
+        await asyncio.sleep(self.latency)
+        return self.data.pop(key, None) is not None
+
+
+class _LegacyResponseWrapperMiddleware(BaseHTTPMiddleware):
+    """Previous response wrapper: buffers the body, parses and re-serializes it"""
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        response = await call_next(request)
+        if "application/json" not in response.headers.get("content-type", ""):
+            return response
+        body = b""
+        async for chunk in response.body_iterator:
+            body += chunk
+        json_body = json.loads(body)
+        if isinstance(json_body, dict) and "code" in json_body and "message" in json_body:
+            return Response(content=body, status_code=response.status_code,
+                            headers=dict(response.headers), media_type=response.media_type)
+        return JSONResponse(
+            content=StandardResponse.wrap(json_body, response.status_code),
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+        )
+
+
+class _LegacyJWTAuthMiddleware(BaseHTTPMiddleware):
+    """Previous authentication: verify + decode + session lookup + activity refresh per request"""
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        if not JWTUtils.verify_token(token):
+            return JSONResponse(content=StandardResponse.error(message="Invalid token", code=401), status_code=401)
+        token_data = JWTUtils.decode_token(token)
+        session = await TokenUtil.get_session(token)
+        if not session:
+            return JSONResponse(content=StandardResponse.error(message="expired", code=50014), status_code=401)
+        request.state.session = session
+        request.state.token_data = token_data
+        request.state.token = token
+        asyncio.create_task(self._refresh_session_activity(token))
+        return await call_next(request)
+
+    async def _refresh_session_activity(self, token: str):
+        async with TokenUtil.refresh_session_context(token) as _:
+            pass
+
+
+def _add_routes(app: FastAPI, items: int) -> None:
+    page = {
+        "items": [
+            {"id": i, "name": f"card_{i}", "rarity": i % 5, "description": "x" * 64, "image_url": f"/img/{i}.png"}
+            for i in range(items)
+        ],
+        "total": items * 10,
+        "page": 1,
+        "size": items,
+        "pages": 10,
+    }
+
+    @app.get("/small")
+    async def small(request: Request):
+        return {"user_id": request.state.token_data["user_id"], "status": "ok"}
+
+    @app.get("/large")
+    async def large():
+        return page
+
+
+def _build_legacy_app(items: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(_LegacyResponseWrapperMiddleware)
+    app.add_middleware(_LegacyJWTAuthMiddleware)
+    _add_routes(app, items)
+    return app
+
+
+def _build_asgi_app(items: int) -> FastAPI:
+    app = FastAPI(default_response_class=StandardJSONResponse)
+    app.add_middleware(ResponseWrapperMiddleware)
+    app.add_middleware(JWTAuthMiddleware, exclude_paths=["/docs.*"])
+    _add_routes(app, items)
+    return app
+
+
+async def _drive(app: FastAPI, path: str, requests: int, concurrency: int, token: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers=headers) as client:
+        # Warm up and check the envelope
+        response = await client.get(path)
+        response.raise_for_status()
+        assert response.json()["code"] == 200, response.text
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with semaphore:
+                (await client.get(path)).raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[call() for _ in range(requests)])
+        return requests / (time.perf_counter() - start)
+
+
+async def _run(args) -> None:
+    manager = get_session_manager()
+    manager.cache = _MemorySessionCache(args.redis_latency_ms)
+    session = UserSession(user_id=1, username="benchmark", session_id="benchmark-session",
+                          expire_at=time.time() + 3600)
+    await manager.cache.set(manager._get_session_key(session.session_id), json.dumps(session.to_dict()))
+    token = JWTUtils.create_access_token(user_id=1, username="benchmark", session_id=session.session_id)
+
+    for label, builder in (("BaseHTTPMiddleware", _build_legacy_app), ("pure ASGI", _build_asgi_app)):
+        app = builder(args.items)
+        small = await _drive(app, "/small", args.requests, args.concurrency, token)
+        large = await _drive(app, "/large", max(args.requests // 10, 1), args.concurrency, token)
+        print(f"{label:<20} small {small:9.1f} req/s   large ({args.items} items) {large:8.1f} req/s")
+
+
+def main(argv=None) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description="Response wrapper / JWT auth middleware benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests against the small endpoint")
+    parser.add_argument("--items", type=int, default=1000, help="Items in the large paginated response")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--redis-latency-ms", type=float, default=0.3, help="Simulated session store round trip")
+    asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Workflow plan benchmark: session start latency and loop iterations per second
+
+Builds a template with --nodes message nodes, a conditional node and a fixed loop of
+--internal internal nodes (message and function tool nodes), then measures:
+
+- session start: read the template and create the engine of a new session
+    legacy:   json.load of the template file + the previous load_workflow
+              (inspect-based constructor matching for every node, per edge logging)
+    compiled: cached WorkflowPlan of the template file + WorkflowEngine.from_plan
+- loop: iterations per second of LoopNode
+    legacy:   internal node instances and graph rebuilt on every iteration
+    compiled: internal plan compiled once, instances reused across iterations
+
+Usage:
+    python -m benchmarks.plan_benchmark --sessions 500 --iterations 2000
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from knowledge_api.framework.workflow.compiler import clear_plan_cache, get_template_plan
+from knowledge_api.framework.workflow.engine import WorkflowEngine
+from knowledge_api.framework.workflow.nodes.loop import LoopNode
+from knowledge_api.framework.workflow.nodes.node_registry import node_registry
+from knowledge_api.framework.workflow.types import WorkflowContext
+from knowledge_api.utils.log_config import get_logger
+
+_FUNCTION_IMPL = """async def main(args, context):
+    return {"score": 1}
+"""
+
+
+def _message_node(node_id: str, index: int) -> Dict[str, Any]:
+    return {
+        "id": node_id,
+        "name": f"message {index}",
+        "component_type": "message",
+        "config": {"content_template": f"Round {{{{ loop_index }}}}: {{{{ state.status }}}} #{index}"},
+        "inputs": [{"key": "status", "sourceNode": "global", "sourceOutput": "state.status"}],
+        "outputs": [{"key": "message", "type": "string"}],
+    }
+
+
+def _build_template(nodes: int, internal: int, iterations: int) -> Dict[str, Any]:
+    internal_nodes, internal_edges = [], []
+    for i in range(internal):
+        node_id = f"inner_{i}"
+        if i % 2:
+            internal_nodes.append({
+                "id": node_id, "name": f"tool {i}", "component_type": "function_tool",
+                "config": {"function_impl": _FUNCTION_IMPL},
+                "inputs": [], "outputs": [{"key": "score", "type": "number"}],
+            })
+        else:
+            internal_nodes.append(_message_node(node_id, i))
+        if i:
+            internal_edges.append({"source": f"inner_{i - 1}", "target": node_id})
+
+    template_nodes = [_message_node(f"node_{i}", i) for i in range(nodes)]
+    edges = [{"source": f"node_{i - 1}", "target": f"node_{i}"} for i in range(1, nodes)]
+    template_nodes.append({
+        "id": "check", "name": "check", "component_type": "conditional",
+        "config": {"condition_key": "state.status"}, "inputs": [], "outputs": [],
+    })
+    template_nodes.append({
+        "id": "loop", "name": "loop", "component_type": "loop",
+        "config": {"loop_mode": "fixed", "max_iterations": iterations,
+                   "internal_nodes": internal_nodes, "internal_edges": internal_edges},
+        "inputs": [], "outputs": [],
+    })
+    edges.append({"source": f"node_{nodes - 1}", "target": "check"})
+    edges.append({"source": "check", "target": "loop",
+                  "condition": {"key": "state.status", "value": "running", "operator": "=="}})
+    return {"id": "plan_benchmark", "name": "plan benchmark", "start_node": "node_0",
+            "nodes": template_nodes, "edges": edges}
+
+
+def _legacy_create(node_class, node_id: str, node_name: str, component_type: str, config: Dict[str, Any]):
+    """Previous node creation: constructor matched with inspect for every node"""
+    init_params = list(inspect.signature(node_class.__init__).parameters.keys())
+    if len(init_params) == 4 and 'config' in init_params:
+        return node_class(node_id, node_name, config)
+    return node_class(node_id, node_name, component_type, config)
+
+
+def _legacy_load(template_path: str) -> WorkflowEngine:
+    """Previous session start: json.load of the template and load_workflow"""
+    logger = get_logger()
+    with open(template_path, "r", encoding="utf-8") as f:
+        definition = json.load(f)
+    engine = WorkflowEngine()
+    engine.nodes, connections, conditional_edges = {}, {}, {}
+    for node_config in definition["nodes"]:
+        node_id, component_type = node_config["id"], node_config["component_type"]
+        logger.info(f"正在处理节点: ID={node_id}, 类型={component_type}")
+        node = _legacy_create(node_registry[component_type], node_id, node_config.get("name"),
+                              component_type, node_config.get("config", {}))
+        node.inputs = node_config.get("inputs", [])
+        node.outputs = node_config.get("outputs", [])
+        engine.nodes[node_id] = node
+        logger.info(f"已成功创建节点: {node_id}")
+    for edge in definition["edges"]:
+        logger.info(f"边缘: {edge}")
+        if edge.get("condition"):
+            conditional_edges.setdefault(edge["source"], []).append({"target": edge["target"], **edge["condition"]})
+        else:
+            connections.setdefault(edge["source"], []).append(edge["target"])
+    for node_id, edge_conditions in conditional_edges.items():
+        engine.nodes[node_id].set_edge_conditions(edge_conditions)
+    engine.connections, engine.conditional_edges = connections, conditional_edges
+    engine.start_node = definition.get("start_node")
+    return engine
+
+
+class _LegacyLoopNode(LoopNode):
+    """LoopNode creating its internal nodes again on every iteration, as before"""
+
+    def _get_internal_node_instances(self):
+        if self.internal_plan is None:
+            # Only the graph (edges and start nodes) is taken from the plan
+            super()._get_internal_node_instances()
+        instances = {}
+        for node_def in self.internal_nodes:
+            node = _legacy_create(node_registry[node_def["component_type"]], node_def["id"], node_def.get("name"),
+                                  node_def["component_type"], node_def.get("config", {}))
+            node.inputs = node_def.get("inputs", [])
+            node.outputs = node_def.get("outputs", [])
+            instances[node_def["id"]] = node
+        return instances
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _bench_session_start(template_path: str, sessions: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    clear_plan_cache()
+    for mode in ("legacy", "compiled"):
+        timings = []
+        for _ in range(sessions):
+            start = time.perf_counter()
+            if mode == "legacy":
+                _legacy_load(template_path)
+            else:
+                WorkflowEngine.from_plan(get_template_plan(template_path))
+            timings.append((time.perf_counter() - start) * 1000)
+        results[mode] = {"p50": _percentile(timings, 50), "p99": _percentile(timings, 99),
+                         "first": timings[0]}
+    return results
+
+
+async def _bench_loop(template: Dict[str, Any], iterations: int) -> Dict[str, float]:
+    loop_config = next(node for node in template["nodes"] if node["id"] == "loop")["config"]
+
+    async def broadcast_message(session_id, message):
+        return None
+
+    results = {}
+    for mode, node_class in (("legacy", _LegacyLoopNode), ("compiled", LoopNode)):
+        node = node_class("loop", "loop", dict(loop_config, max_iterations=iterations))
+        context = WorkflowContext(data={
+            "session_id": "plan-benchmark",
+            "broadcast_message": broadcast_message,
+            "global": {"state": {"status": "running"}},
+            "state": {"status": "running"},
+        })
+        start = time.perf_counter()
+        result = await node.execute(context)
+        elapsed = time.perf_counter() - start
+        assert result["total_iterations"] == iterations
+        results[mode] = iterations / elapsed
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Workflow plan benchmark")
+    parser.add_argument("--nodes", type=int, default=30, help="Message nodes in the template")
+    parser.add_argument("--internal", type=int, default=6, help="Internal nodes of the loop")
+    parser.add_argument("--sessions", type=int, default=500, help="Sessions started per mode")
+    parser.add_argument("--iterations", type=int, default=2000, help="Loop iterations per mode")
+    parser.add_argument("--log", action="store_true", help="Keep the INFO logging of the workflow engine")
+    args = parser.parse_args(argv)
+    if not args.log:
+        logging.disable(logging.INFO)
+
+    template = _build_template(args.nodes, args.internal, args.iterations)
+    with tempfile.TemporaryDirectory() as directory:
+        template_path = os.path.join(directory, "plan_benchmark.json")
+        with open(template_path, "w", encoding="utf-8") as f:
+            json.dump(template, f, ensure_ascii=False)
+
+        print(f"template: {args.nodes + 2} nodes, loop of {args.internal} internal nodes")
+        starts = _bench_session_start(template_path, args.sessions)
+        for mode, result in starts.items():
+            print(f"session start {mode:<9} p50 {result['p50']:8.3f} ms   p99 {result['p99']:8.3f} ms   "
+                  f"first {result['first']:8.3f} ms")
+
+    loops = asyncio.run(_bench_loop(template, args.iterations))
+    for mode, rate in loops.items():
+        print(f"loop {mode:<18} {rate:10.0f} iterations/s")
+
+
+if __name__ == "__main__":
+    main()
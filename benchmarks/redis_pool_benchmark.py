@@ -0,0 +1,199 @@
+"""Redis connection benchmark of cache reads under concurrent requests
+
+--concurrency requests are sent at once, --rounds times, against two connection managers:
+
+- legacy:  a simplified rewrite of the connection manager before the shared client, not the original code:
+           one cached client that is pinged on every get_client, on a pool of 10 connections that fails
+           when all are in use
+- pooled:  RedisConnectionManager, one shared client on a pool of REDIS_MAX_CONNECTIONS connections
+           that waits for a free connection, health checked in the background
+
+Two workloads are measured: CacheManager.get_role (the role cache keeps its client) and
+SessionCacheManager.load_session (asks get_async_redis for a client on every call). For each one the
+failed reads, the Redis round trips per request, the p50 / p99 latency and the pool metrics are reported.
+
+Usage:
+    python -m benchmarks.redis_pool_benchmark --concurrency 200 --rounds 10
+"""
+import argparse
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, List
+
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+
+from knowledge_api.framework.redis import connection
+from knowledge_api.framework.redis.cache_manager import CacheManager
+from knowledge_api.framework.redis.cache_system import role_cache
+from knowledge_api.framework.redis.cache_system.session_cache import SessionCacheManager
+from knowledge_api.framework.redis.config import get_redis_config
+from knowledge_api.framework.redis.connection import RedisConnectionManager
+from knowledge_api.mapper.roles.base import Role
+
+_ROLES = 50
+_SESSION_PREFIX = "benchmark:redis_pool:"
+
+
+class _LegacyConnectionManager:
+    """Simplified rewrite of the former connection manager (not the original code)
+
+Keeps one cached client, pings it on every get_client and reconnects when the ping fails, on a non-blocking
+pool of 10 connections"""
+
+    def __init__(self):
+        self.pool = None
+        self.client = None
+
+    async def get_client(self) -> Redis:
+        if self.client is not None:
+            try:
+                await self.client.ping()
+                return self.client
+            except Exception:
+                self.client = None
+        if self.pool is None:
+            config = get_redis_config()
+            self.pool = ConnectionPool(host=config.HOST, port=config.PORT, db=config.DB, max_connections=10,
+                                       password=config.PASSWORD or None, decode_responses=False)
+        client = Redis(connection_pool=self.pool)
+        await client.ping()
+        self.client = client
+        return client
+
+    def report_error(self, error: Exception) -> None:
+        pass
+
+    def get_stats(self):
+        return None
+
+    def close_all_connections(self) -> None:
+        self.client = None
+        self.pool = None
+
+
+class _RoundTrips:
+    """Counts Redis round trips (a pipeline is one round trip)"""
+
+    def __init__(self):
+        self.count = 0
+        self._execute_command = Redis.execute_command
+        self._pipeline_execute = Pipeline.execute
+
+    def install(self) -> None:
+        counter = self
+
+        async def execute_command(client, *args, **options):
+            if not isinstance(client, Pipeline):
+                counter.count += 1
+            return await counter._execute_command(client, *args, **options)
+
+        async def pipeline_execute(pipe, *args, **kwargs):
+            counter.count += 1
+            return await counter._pipeline_execute(pipe, *args, **kwargs)
+
+        Redis.execute_command = execute_command
+        Pipeline.execute = pipeline_execute
+
+    def uninstall(self) -> None:
+        Redis.execute_command = self._execute_command
+        Pipeline.execute = self._pipeline_execute
+
+
+@contextmanager
+def _no_database():
+    """Role cache misses would query the database, the benchmark counts them as failed reads"""
+    raise RuntimeError("database not used in the benchmark")
+    yield
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def _seed() -> None:
+    cache = CacheManager().role_config_cache.cache
+    cache.redis = None
+    roles = {f"bench_role_{i}": Role(id=f"bench_role_{i}", role_id=f"bench_role_{i}", name=f"role {i}",
+                                     llm_choose="bench") for i in range(_ROLES)}
+    await cache.set_many(roles, ttl=600)
+    redis = await connection.get_async_redis()
+    for i in range(_ROLES):
+        await redis.set(f"{_SESSION_PREFIX}{i}", SessionCacheManager.serialize_session({"index": i}), ex=600)
+
+
+async def _clean() -> None:
+    await CacheManager().role_config_cache.cache.delete_many([f"bench_role_{i}" for i in range(_ROLES)])
+    redis = await connection.get_async_redis()
+    keys = await redis.keys(f"{_SESSION_PREFIX}*")
+    if keys:
+        await redis.delete(*keys)
+
+
+async def _measure(name: str, read: Callable[[int], Awaitable[object]], counter: _RoundTrips, args) -> None:
+    # One burst first, so that the pool has opened its connections
+    await asyncio.gather(*(read(i % _ROLES) for i in range(args.concurrency)))
+    latencies, failed = [], 0
+    counter.count = 0
+
+    async def request(i: int) -> None:
+        nonlocal failed
+        started = time.perf_counter()
+        if await read(i % _ROLES) is None:
+            failed += 1
+        latencies.append(time.perf_counter() - started)
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        await asyncio.gather(*(request(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    total = args.concurrency * args.rounds
+    print(f"  {name:<14} {total / elapsed:7.0f} req/s   failed {failed:5d}/{total}   "
+          f"{counter.count / total:4.2f} round trips / request   "
+          f"p50 {_percentile(latencies, 50) * 1000:7.1f} ms   p99 {_percentile(latencies, 99) * 1000:7.1f} ms")
+
+
+async def _run_mode(name: str, manager, counter: _RoundTrips, args) -> None:
+    connection._connection_manager = manager
+    CacheManager().role_config_cache.cache.redis = None
+    await _seed()
+    print(name)
+    await _measure("get_role", lambda i: CacheManager().get_role(f"bench_role_{i}"), counter, args)
+    await _measure("load_session", lambda i: SessionCacheManager.load_session(str(i), prefix=_SESSION_PREFIX),
+                   counter, args)
+    stats = manager.get_stats()
+    if stats is not None:
+        print(f"  pool {stats['pool']}")
+    await _clean()
+    CacheManager().role_config_cache.cache.redis = None
+    if isinstance(manager, RedisConnectionManager):
+        manager.close_all_connections()
+        await asyncio.sleep(0)
+
+
+async def _run(args) -> None:
+    role_cache.get_db_session = _no_database
+    counter = _RoundTrips()
+    counter.install()
+    try:
+        await _run_mode("legacy", _LegacyConnectionManager(), counter, args)
+        await _run_mode("pooled", RedisConnectionManager(), counter, args)
+    finally:
+        counter.uninstall()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Redis connection benchmark of cache reads")
+    parser.add_argument("--concurrency", type=int, default=200, help="Requests sent at once")
+    parser.add_argument("--rounds", type=int, default=10, help="Bursts of concurrent requests per workload")
+    args = parser.parse_args(argv)
+    # The legacy pool logs every read it fails
+    logging.disable(logging.CRITICAL)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
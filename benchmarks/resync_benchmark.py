@@ -0,0 +1,140 @@
+"""Reconnect resync benchmark for the game and workflow websockets
+
+Seeds a session log of each length, then measures the time a reconnecting client
+needs to get back in sync:
+
+- legacy:   the previous replay, one send_json per message with a 50 ms pause
+- full:     history frames from the session log, client without last_msg_id
+- tail:     history frames after the last_msg_id of a client that missed --missed messages
+
+The game path reads the record log from the configured Redis (see .env), the keys
+of the benchmark session are removed afterwards. The workflow path is in memory.
+
+Usage:
+    python -m benchmarks.resync_benchmark --lengths 100,400,2000 --missed 20
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List
+
+from knowledge_api.game_play.base_game import BaseGame
+from knowledge_api.game_play.game_session_manager import GameSessionManager
+from knowledge_api.manage.ws import workflow_play
+
+
+class _RecordingWebSocket:
+    """Collects the frames sent to the client, each send costs frame_latency seconds"""
+
+    def __init__(self, frame_latency: float):
+        self.frame_latency = frame_latency
+        self.frames: List[Dict[str, Any]] = []
+
+    async def send_json(self, data: Dict[str, Any]) -> None:
+        await asyncio.sleep(self.frame_latency)
+        self.frames.append(data)
+
+
+class _BenchmarkGame(BaseGame):
+    """BaseGame with only the state needed by the websocket registration"""
+    game_type = "resync_benchmark"
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self._local_websockets = {}
+        self._local_message_queue = {}
+
+
+async def _legacy_replay(game: BaseGame, websocket: _RecordingWebSocket, session_id: str) -> None:
+    """Previous register_websocket replay: every record, one frame each, 50 ms apart"""
+    for message in await GameSessionManager.get_game_records(session_id, game.game_type):
+        await websocket.send_json(message)
+        await asyncio.sleep(0.05)
+
+
+def _message(session_id: str, i: int) -> Dict[str, Any]:
+    return {
+        "msgId": str(uuid.uuid4()),
+        "role": "assistant" if i % 2 else "user",
+        "agentId": f"agent_{i % 4}",
+        "content": f"message {i} " + "x" * 120,
+        "timestamp": int(time.time() * 1000),
+        "sessionId": session_id,
+    }
+
+
+async def _timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return (time.perf_counter() - start) * 1000
+
+
+async def _bench_game(length: int, missed: int, frame_latency: float, legacy_max: int) -> Dict[str, Any]:
+    session_id = f"resync-benchmark-{uuid.uuid4()}"
+    game = _BenchmarkGame(session_id)
+    try:
+        messages = [_message(session_id, i) for i in range(length)]
+        for message in messages:
+            await GameSessionManager.append_game_record(session_id, message, game.game_type)
+        last_seen = messages[-missed - 1]["msgId"] if missed < length else None
+
+        result = {"legacy": None}
+        if length <= legacy_max:
+            result["legacy"] = await _timed(_legacy_replay(game, _RecordingWebSocket(frame_latency), session_id))
+
+        websocket = _RecordingWebSocket(frame_latency)
+        result["full"] = await _timed(game.replay_history(websocket, session_id))
+        result["full_frames"] = len(websocket.frames)
+        assert sum(len(frame["messages"]) for frame in websocket.frames) == length
+
+        websocket = _RecordingWebSocket(frame_latency)
+        result["tail"] = await _timed(game.replay_history(websocket, session_id, last_seen))
+        assert sum(len(frame["messages"]) for frame in websocket.frames) == min(missed, length)
+        return result
+    finally:
+        await GameSessionManager.clear_game_records(session_id, game.game_type)
+
+
+async def _bench_workflow(length: int, missed: int, frame_latency: float) -> Dict[str, Any]:
+    session_id = f"resync-benchmark-{uuid.uuid4()}"
+    try:
+        for i in range(length):
+            workflow_play.record_message(session_id, {"type": "agent_message", "content": f"message {i}"})
+        log = workflow_play.message_logs[session_id]
+        last_seen = log[-missed - 1]["msg_id"] if missed < length else None
+
+        websocket = _RecordingWebSocket(frame_latency)
+        full = await _timed(workflow_play.replay_messages(session_id, websocket))
+        tail = await _timed(workflow_play.replay_messages(session_id, _RecordingWebSocket(frame_latency), last_seen))
+        return {"full": full, "full_frames": len(websocket.frames), "tail": tail}
+    finally:
+        workflow_play.drop_message_log(session_id)
+
+
+async def _run(args) -> None:
+    frame_latency = args.frame_latency_ms / 1000
+    lengths = [int(length) for length in args.lengths.split(",")]
+
+    print(f"{'messages':>8} | {'game legacy':>12} {'game full':>10} {'frames':>6} {'game tail':>10} | "
+          f"{'wf full':>8} {'frames':>6} {'wf tail':>8}   (ms)")
+    for length in lengths:
+        game = await _bench_game(length, args.missed, frame_latency, args.legacy_max)
+        workflow = await _bench_workflow(length, args.missed, frame_latency)
+        legacy = f"{game['legacy']:12.1f}" if game["legacy"] is not None else f"{'skipped':>12}"
+        print(f"{length:>8} | {legacy} {game['full']:10.1f} {game['full_frames']:>6} {game['tail']:10.1f} | "
+              f"{workflow['full']:8.1f} {workflow['full_frames']:>6} {workflow['tail']:8.1f}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Websocket reconnect resync benchmark")
+    parser.add_argument("--lengths", default="100,400,2000", help="Comma separated session lengths")
+    parser.add_argument("--missed", type=int, default=20, help="Messages missed by the reconnecting client")
+    parser.add_argument("--frame-latency-ms", type=float, default=0.2, help="Simulated cost of one websocket frame")
+    parser.add_argument("--legacy-max", type=int, default=400,
+                        help="Longest session replayed the legacy way (50 ms per message)")
+    asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Chat session benchmark: Redis commands per chat turn
+
+Runs --turns chat turns (--sessions sessions, streaming and non streaming) through BaseChat
+against the configured Redis, with stubbed roles, prompts, retrieval and LLM, and counts
+the Redis round trips and commands of each turn. Modes:
+
+- legacy:  every session read and update goes to Redis (get = GET + SET, update = GET + SET + SET)
+- turn:    session unit of work, one read at turn start and one compare-and-set at turn end
+
+A last check runs two turns of the same session concurrently and verifies that no turn
+was lost (the second writer merges on version conflict).
+
+Usage:
+    python -m benchmarks.session_benchmark --turns 200 --sessions 20
+"""
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from redis.asyncio.client import Pipeline, Redis
+
+from knowledge_api.chat.base_chat import BaseChat
+from knowledge_api.chat.session_manager import ChatSessionManager
+from knowledge_api.framework.redis.cache_system.session_cache import SessionCacheManager
+from knowledge_api.model.llm_token_model import LLMTokenResponse
+
+_PREFIX = "benchmark:chat_session:"
+
+
+class _Counter:
+    """Redis round trips and commands, counted by patching the client"""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.commands: Counter = Counter()
+        self._execute_command = Redis.execute_command
+        self._pipeline_execute = Pipeline.execute
+
+    def install(self) -> None:
+        counter = self
+
+        async def execute_command(client, *args, **options):
+            if not isinstance(client, Pipeline):
+                counter.round_trips += 1
+                counter.commands[str(args[0]).upper()] += 1
+            return await counter._execute_command(client, *args, **options)
+
+        async def pipeline_execute(pipe, *args, **kwargs):
+            counter.round_trips += 1
+            for command_args, _ in pipe.command_stack:
+                counter.commands[str(command_args[0]).upper()] += 1
+            return await counter._pipeline_execute(pipe, *args, **kwargs)
+
+        Redis.execute_command = execute_command
+        Pipeline.execute = pipeline_execute
+
+    def uninstall(self) -> None:
+        Redis.execute_command = self._execute_command
+        Pipeline.execute = self._pipeline_execute
+
+    def reset(self) -> None:
+        self.round_trips = 0
+        self.commands.clear()
+
+
+class _StubLLM:
+    """LLM answering a fixed text, streamed in a few chunks"""
+
+    async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> LLMTokenResponse:
+        await asyncio.sleep(0)
+        return LLMTokenResponse(id="stub", model="stub", content="他笑了笑, 没有回答。")
+
+    async def chat_completion_stream(self, messages: List[Dict[str, str]], **kwargs):
+        for token in ("他笑了笑, ", "没有", "回答。"):
+            await asyncio.sleep(0)
+            yield LLMTokenResponse(id="stub", model="stub", content=token)
+
+
+class _StubCache:
+    """Roles and prompts of the cache manager"""
+
+    def __init__(self):
+        self.llm = _StubLLM()
+
+    async def get_role(self, role_id: str) -> Dict[str, Any]:
+        return {"role_id": role_id, "name": "雷诺"}
+
+    async def get_nearest_prompt(self, role_id: str, current_level: int):
+        return SimpleNamespace(id="prompt_1", model_dump=lambda: {"prompt_text": "你是雷诺", "timbre": None})
+
+    async def get_ai(self):
+        return self.llm
+
+
+class _StubContext:
+    async def create_retrieval_template(self, query, top_k, prompt_type, user_info, extended, role_data):
+        return [], [], f"你是雷诺, 与{user_info.get('user')}对话"
+
+
+class _BenchmarkChat(BaseChat):
+    """BaseChat without database, retrieval or TTS"""
+
+    def __init__(self):
+        self.session_manager = ChatSessionManager("default")
+        self.session_manager.session_prefix = _PREFIX
+        self.cache = _StubCache()
+        self.context_manager = _StubContext()
+        self.bytedance_tts = None
+
+
+class _LegacyChat(_BenchmarkChat):
+    """Chat without session unit of work"""
+
+    @asynccontextmanager
+    async def session_turn(self, session_id):
+        yield None
+
+
+def _input(session_id: str, message: str):
+    return SimpleNamespace(session_id=session_id, role_id="role_1", level=1, user_level=1, user_id="user_1",
+                           user_name="玩家", relationship_level=0, message=message, top_k=3, temperature=0.7,
+                           include_sources=False, way="full")
+
+
+async def _turn(chat: BaseChat, session_id: str, i: int) -> None:
+    data = _input(session_id, f"第 {i} 个问题")
+    if i % 2:
+        await chat.chat(data)
+    else:
+        async for _ in chat.chat_stream(data):
+            pass
+
+
+async def _run_mode(name: str, chat: BaseChat, counter: _Counter, args) -> None:
+    for s in range(args.sessions):
+        await SessionCacheManager.delete_session(f"{name}_{s}", prefix=_PREFIX)
+    counter.reset()
+    start = time.perf_counter()
+    for i in range(args.turns):
+        await _turn(chat, f"{name}_{i % args.sessions}", i)
+    elapsed = time.perf_counter() - start
+    per_turn = {command: count / args.turns for command, count in counter.commands.most_common()}
+    session = await chat.session_manager.get_session(f"{name}_0")
+    history = len(session["memory_manager"].get_chat_history()) if session else 0
+    print(f"{name:<7} {counter.round_trips / args.turns:6.2f} round trips / turn   "
+          f"{sum(counter.commands.values()) / args.turns:6.2f} commands / turn   "
+          f"{elapsed / args.turns * 1000:7.2f} ms / turn   history of session 0: {history} messages")
+    print("        " + "  ".join(f"{command} {count:.2f}" for command, count in per_turn.items()))
+
+
+async def _run_conflict(chat: BaseChat) -> None:
+    session_id = "turn_conflict"
+    await SessionCacheManager.delete_session(session_id, prefix=_PREFIX)
+    await _turn(chat, session_id, 0)
+    await asyncio.gather(_turn(chat, session_id, 1), _turn(chat, session_id, 3))
+    session = await chat.session_manager.get_session(session_id)
+    print(f"concurrent turns: message_count {session.get('message_count')} (3 expected)")
+
+
+async def _run(args) -> None:
+    counter = _Counter()
+    counter.install()
+    try:
+        await _run_mode("legacy", _LegacyChat(), counter, args)
+        await _run_mode("turn", _BenchmarkChat(), counter, args)
+        await _run_conflict(_BenchmarkChat())
+    finally:
+        counter.uninstall()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Redis commands per chat turn")
+    parser.add_argument("--turns", type=int, default=200, help="Chat turns per mode")
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions the turns are spread over")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Simultaneous speak benchmark against a local mock LLM server
+
+Starts an OpenAI compatible mock server on 127.0.0.1 answering every chat completion after
+--latency-ms (tool requests are answered with the judge tool calls), then times one AI round
+with --players AI players in the sequential and in the simultaneous speak mode:
+
+- workflow: AIPlayerSpeakNode with every player speaking
+- turtle soup: TurtleSoup.play_round, questions of all players and the questioner's judgement
+    sequential:   one question, then one judge call, player after player
+    simultaneous: all questions at the same time, then a single batch judge call
+
+The turtle soup round keeps its session in Redis, configured as for the service (REDIS_HOST...).
+
+Usage:
+    python -m benchmarks.speak_benchmark --players 6 --latency-ms 300
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from aiohttp import web
+
+from knowledge_api.framework.ai_collect.base_llm import BaseLLM
+from knowledge_api.framework.ai_collect.function_call.tool_manager import ToolManager
+from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
+from knowledge_api.framework.workflow.nodes.ai_player_speak import AIPlayerSpeakNode
+from knowledge_api.framework.workflow.types import WorkflowContext
+from knowledge_api.game_play.game_session_manager import GameSessionManager
+from knowledge_api.game_play.turtle_soup import TurtleSoup
+from knowledge_api.model.agent.game_agent import GameRole, TurtleSoupGameAgent
+from knowledge_api.model.llm_token_model import LLMTokenResponse
+from knowledge_api.model.task_game_model import TaskGameInput
+
+_NUMBERED = re.compile(r"^(\d+)\. ", re.MULTILINE)
+
+
+def _mock_app(latency: float) -> web.Application:
+    """OpenAI compatible /chat/completions answering after the given latency"""
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        message: Dict[str, Any] = {"role": "assistant", "content": f"Is it about the {uuid.uuid4().hex[:6]}?"}
+        tool_names = [tool["function"]["name"] for tool in payload.get("tools") or []]
+        if tool_names:
+            question = payload["messages"][-1]["content"]
+            numbers = [int(number) for number in _NUMBERED.findall(question)]
+            if numbers and "function_judge_answers" in tool_names:
+                name, arguments = "function_judge_answers", {"judgements": [
+                    {"index": number, "is_solved": 0, "answer": "no."} for number in numbers
+                ]}
+            else:
+                name, arguments = "function_judge_answer", {"is_solved": 0, "answer": "no."}
+            message = {"role": "assistant", "content": "", "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }]}
+        return web.json_response({
+            "id": uuid.uuid4().hex, "model": payload.get("model"), "created": int(time.time()),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat_completions)
+    return app
+
+
+class _MockServerLLM(BaseLLM):
+    """OpenAI compatible client of the mock server, not registered as an LLM type"""
+
+    def _initialize(self) -> None:
+        self.headers = {"Content-Type": "application/json"}
+
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}/chat/completions", json=payload) as response:
+            return await response.json()
+
+    async def _chat_completion_impl(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                                    max_tokens: Optional[int] = None, **kwargs) -> LLMTokenResponse:
+        return self._format_chat_response(await self._post({"model": self.model, "messages": messages}))
+
+    async def _function_call_impl(self, messages, tools: ToolRegistry, model: str = None):
+        result = await self._post({"model": model or self.model, "messages": messages,
+                                   "tools": tools.get_all_tools()})
+        message = result["choices"][0]["message"]
+        if not message.get("tool_calls"):
+            return message["content"], None, self._format_chat_response(result)
+        tool_calls = [SimpleNamespace(id=call["id"], type=call["type"], function=SimpleNamespace(**call["function"]))
+                      for call in message["tool_calls"]]
+        tool_results = await ToolManager(tools).handle_tool_calls_async(tool_calls)
+        return tool_results, message, self._format_chat_response(result)
+
+    async def _chat_completion_stream_impl(self, messages, temperature=0.7, max_tokens=None,
+                                           **kwargs) -> AsyncGenerator[LLMTokenResponse, None]:
+        yield await self._chat_completion_impl(messages, temperature, max_tokens)
+
+    def completion(self, prompt: str, temperature: float = 0.7, max_tokens: Optional[int] = None, **kwargs):
+        raise NotImplementedError
+
+    def embeddings(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def _format_chat_response(self, response: Dict[str, Any]) -> LLMTokenResponse:
+        usage = response.get("usage", {})
+        return LLMTokenResponse(
+            id=response.get("id"), model=response.get("model"),
+            content=response["choices"][0]["message"].get("content") or "",
+            input_tokens=usage.get("prompt_tokens", 0), output_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+        )
+
+    async def _log_token_stats(self, response, start_time=None, messages=None, application_scenario=None) -> float:
+        # No usage records for the mock provider
+        return 0.0
+
+
+def _agents(client: BaseLLM, players: int) -> List[TurtleSoupGameAgent]:
+    agents = []
+    for i in range(players + 1):
+        identity = "setter" if i == 0 else "player"
+        agent = TurtleSoupGameAgent(GameRole(role_id=f"role_{i}", model_id="mock",
+                                             role_info={"name": f"{identity}_{i}"}),
+                                    system="You are playing turtle soup.", identity=identity)
+        agent.client = client
+        agents.append(agent)
+    return agents
+
+
+async def _run_node(client: BaseLLM, players: int, speak_mode: str) -> float:
+    speakers = _agents(client, players)[1:]
+    node = AIPlayerSpeakNode("speak", "speak", {"speaker_id": "none", "speak_mode": speak_mode,
+                                                "speech_template": "Ask your question."})
+    context = WorkflowContext(data={"players": speakers, "current_node_inputs": {"players": speakers}})
+    start = time.perf_counter()
+    result = await node.process(context)
+    elapsed = time.perf_counter() - start
+    assert len(result["message"].split("\n")) == players
+    return elapsed
+
+
+async def _run_turtle_soup(client: BaseLLM, players: int, speak_mode: str) -> float:
+    session_id = f"speak-benchmark-{uuid.uuid4().hex[:8]}"
+    game = TurtleSoup(None, TaskGameInput(task_id="0", session_id=session_id, game_type=TurtleSoup.game_type,
+                                          roles=[], user_info={}))
+    game.game_config = {"speak_mode": speak_mode, "decision_making": "mock"}
+    game._register_tool()
+    game.agents = _agents(client, players)
+    await GameSessionManager.create_session(session_id, game.game_type, {"current_round": 0, "is_game_over": False})
+    start = time.perf_counter()
+    result = await game.play_round()
+    elapsed = time.perf_counter() - start
+    assert result["status"] == "waiting_for_human"
+    return elapsed
+
+
+async def _run(args) -> None:
+    runner = web.AppRunner(_mock_app(args.latency_ms / 1000))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    client = _MockServerLLM(api_key="mock", base_url=f"http://127.0.0.1:{port}", model="mock")
+    print(f"{args.players} AI players, mock LLM server latency {args.latency_ms:.0f} ms")
+    try:
+        for name, run in (("workflow", _run_node), ("turtle soup", _run_turtle_soup)):
+            for speak_mode in ("sequential", "simultaneous"):
+                elapsed = await run(client, args.players, speak_mode)
+                print(f"{name:<12} {speak_mode:<13} {elapsed * 1000:8.1f} ms")
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Simultaneous speak benchmark")
+    parser.add_argument("--players", type=int, default=6, help="AI players in the round")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latency of every mock LLM call")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
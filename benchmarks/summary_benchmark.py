@@ -0,0 +1,179 @@
+"""Conversation summary benchmark: polling loops vs the summary scheduler
+
+Runs --conversations conversations for --seconds seconds, each one adding an exchange
+(user message + AI reply) every --exchange-ms on average, and summarizes them every
+--interval exchanges with a stub LLM answering after --llm-ms (at most --llm-capacity
+requests at a time, like a rate limited provider). Modes:
+
+- polling:    a background task per conversation checks should_summarize() every --sleep-ms (as before)
+- scheduler:  memory managers report the crossed threshold to the summary scheduler (--workers workers)
+
+For each mode the loop wakeups, the summary LLM calls, the lag from the crossed threshold
+to the updated summary and the scheduler metrics are reported.
+
+Usage:
+    python -m benchmarks.summary_benchmark --conversations 2000 --seconds 20
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from knowledge_api.framework.memory.conversation_summarizer import ConversationSummarizer
+from knowledge_api.framework.memory.enhanced_chat_memory_manager import EnhancedChatMemoryManager
+from knowledge_api.framework.memory.summary_scheduler import SummaryScheduler
+
+
+class _StubLLM:
+    """LangChain style LLM answering a fixed summary"""
+
+    def __init__(self, latency: float, capacity: int):
+        self.latency = latency
+        self.calls = 0
+        self._capacity = asyncio.Semaphore(capacity)
+
+    async def agenerate(self, prompts):
+        self.calls += 1
+        async with self._capacity:
+            await asyncio.sleep(self.latency)
+        return SimpleNamespace(generations=[[SimpleNamespace(text="玩家与雷诺讨论了森林里的失踪案。")]])
+
+
+class _TimedMemory(EnhancedChatMemoryManager):
+    """Memory manager recording when the summary threshold was crossed and when the summary was updated"""
+
+    def __init__(self, interval: int, lags: List[float]):
+        super().__init__(system_message="你是雷诺", k=4)
+        self.interval = interval
+        self.lags = lags
+        self.crossed_at: Optional[float] = None
+
+    def add_exchange(self, user_message: str, ai_message: str) -> None:
+        super().add_exchange(user_message, ai_message)
+        if self.crossed_at is None and self.exchange_count % self.interval == 0:
+            self.crossed_at = time.perf_counter()
+
+    def update_summary_message(self, new_summary: str) -> None:
+        super().update_summary_message(new_summary)
+        if self.crossed_at is not None:
+            self.lags.append(time.perf_counter() - self.crossed_at)
+            self.crossed_at = None
+
+
+class _PollingSummarizer(ConversationSummarizer):
+    """Summarizer with a polling task per conversation (as before)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wakeups = 0
+        self.running_tasks: Dict[str, asyncio.Task] = {}
+
+    def start_background_summary_service(self, memory_manager, conversation_id="default") -> None:
+        self.running_tasks[conversation_id] = asyncio.create_task(self._loop(memory_manager))
+
+    async def _loop(self, memory_manager) -> None:
+        while True:
+            self.wakeups += 1
+            try:
+                await self.summarize_if_needed(memory_manager)
+            except Exception:
+                pass
+            await asyncio.sleep(self.sleep_interval)
+
+    def stop_all_services(self) -> None:
+        for task in self.running_tasks.values():
+            task.cancel()
+        self.running_tasks.clear()
+
+
+class _CountingScheduler(SummaryScheduler):
+    """Summary scheduler counting the worker wakeups"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wakeups = 0
+
+    async def _next_job(self):
+        self.wakeups += 1
+        return await super()._next_job()
+
+
+async def _conversation(memory: EnhancedChatMemoryManager, rng: random.Random, args, deadline: float) -> None:
+    i = 0
+    while True:
+        delay = rng.expovariate(1000 / args.exchange_ms)
+        if time.perf_counter() + delay > deadline:
+            return
+        await asyncio.sleep(delay)
+        memory.add_exchange(f"第{i}个问题", f"第{i}个回答")
+        i += 1
+
+
+async def _run_mode(name: str, args) -> None:
+    llm = _StubLLM(args.llm_ms / 1000, args.llm_capacity)
+    scheduler = _CountingScheduler(workers=args.workers, priority=args.priority)
+    summarizer_class = _PollingSummarizer if name == "polling" else ConversationSummarizer
+    summarizer = summarizer_class(llm=llm, summary_interval=args.interval, sleep_interval=args.sleep_ms / 1000,
+                                  max_retry_attempts=1, scheduler=scheduler)
+    rng = random.Random(7)
+    lags: List[float] = []
+    memories = [_TimedMemory(args.interval, lags) for _ in range(args.conversations)]
+    for i, memory in enumerate(memories):
+        summarizer.start_background_summary_service(memory, f"conversation_{i}")
+
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    await asyncio.gather(*(_conversation(memory, rng, args, deadline) for memory in memories))
+    # Let the summaries of the last thresholds finish
+    settle = time.perf_counter()
+    while (sum(memory.crossed_at is not None for memory in memories) and
+           time.perf_counter() - settle < args.settle_seconds):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    unsummarized = sum(memory.crossed_at is not None for memory in memories)
+    wakeups = summarizer.wakeups if name == "polling" else scheduler.wakeups
+    summarizer.stop_all_services()
+    await scheduler.close()
+
+    lags.sort()
+    exchanges = sum(memory.exchange_count for memory in memories)
+    thresholds = sum(int(memory.exchange_count // args.interval) for memory in memories)
+    p50 = lags[len(lags) // 2] * 1000 if lags else 0.0
+    p99 = lags[min(len(lags) - 1, len(lags) * 99 // 100)] * 1000 if lags else 0.0
+    print(f"{name:<9} wakeups {wakeups:>8} ({wakeups / elapsed:8.0f}/s)   exchanges {exchanges:>7.0f}   "
+          f"thresholds {thresholds:>5}   LLM calls {llm.calls:>5}   lag p50 {p50:7.0f} ms   p99 {p99:7.0f} ms   "
+          f"unsummarized {unsummarized}")
+    if name == "scheduler":
+        stats = scheduler.stats()
+        print(f"          events {stats['events']}   coalesced {stats['coalesced']}   dropped {stats['dropped']}   "
+              f"completed {stats['completed']}   LLM {stats['llm']['calls']} calls "
+              f"{stats['llm']['prompt_chars']} prompt chars {stats['llm']['seconds']:.1f} s")
+
+
+async def _run(args) -> None:
+    for name in ("polling", "scheduler"):
+        await _run_mode(name, args)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Conversation summary: polling loops vs the summary scheduler")
+    parser.add_argument("--conversations", type=int, default=2000, help="Live conversations")
+    parser.add_argument("--seconds", type=float, default=20, help="Duration of the conversations")
+    parser.add_argument("--exchange-ms", type=float, default=4000, help="Mean delay between exchanges of a conversation")
+    parser.add_argument("--interval", type=int, default=5, help="Exchanges between summaries")
+    parser.add_argument("--sleep-ms", type=float, default=1000, help="Polling interval of the legacy loops")
+    parser.add_argument("--llm-ms", type=float, default=200, help="Latency of a summary LLM request")
+    parser.add_argument("--llm-capacity", type=int, default=32, help="Summary LLM requests served at a time")
+    parser.add_argument("--workers", type=int, default=32, help="Summary scheduler workers")
+    parser.add_argument("--priority", default="oldest", choices=("oldest", "backlog"), help="Scheduler priority")
+    parser.add_argument("--settle-seconds", type=float, default=30, help="Maximum wait for the last summaries")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Throughput benchmark of the blind box simulator (pytest-benchmark)
+
+Usage:
+    python -m pytest benchmarks/test_blind_box_simulator_benchmark.py --benchmark-only
+"""
+import pytest
+
+from knowledge_api.framework.blind_box.blind_box_algorithm import BlindBoxEngine
+from knowledge_api.framework.blind_box.blind_box_simulator import BlindBoxSimulator
+from knowledge_api.mapper.card.base import CardAlg
+
+pytest.importorskip("pytest_benchmark")
+
+USERS = 10000
+DRAWS_PER_USER = 100
+
+
+@pytest.fixture(scope="module")
+def simulator():
+    cards = [CardAlg(id=i, name=f"card_{i}", rarity=1 + i % 4, weight=10 - i % 4, series_id=0)
+             for i in range(1, 41)]
+    probability_rules = BlindBoxEngine().generate_dynamic_probability_rules(cards)
+    return BlindBoxSimulator(cards, probability_rules, history_limit=120, random_seed=0)
+
+
+def test_simulate_one_million_draws(benchmark, simulator):
+    report = benchmark(simulator.run, USERS, DRAWS_PER_USER)
+    assert report['total_draws'] == USERS * DRAWS_PER_USER
+    benchmark.extra_info['draws_per_second'] = report['draws_per_second']
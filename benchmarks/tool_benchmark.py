@@ -0,0 +1,246 @@
+"""Tool runtime benchmark against a local mock LLM server
+
+Starts an OpenAI compatible mock server on 127.0.0.1 answering every chat completion after --latency-ms.
+A turn has --steps tool steps; each step the model asks for --lookups card lookups (pure, async, --tool-ms),
+one dice roll (synchronous, --tool-ms, at most 2 at the same time) and one archive call (synchronous,
+hangs --hang-ms, declared timeout --timeout-ms), then answers. Every step asks for the same cards.
+
+- sequential:   the model returns one tool call per response, tools run by the former ToolManager
+- parallel:     the model returns the tool calls of a step at once, tools run by the former ToolManager
+                (gathered, synchronous tools in the default executor without timeout, no reuse)
+- runtime:      parallel tool calls run by ToolManager in a tool turn: per-tool timeout and concurrency,
+                lookups reused within the turn, each result streamed to the listener as its tool returns
+
+For each mode the turn latency, the LLM round trips, the tool executions and the time until the first
+tool result reached the conversation are reported over --turns turns.
+
+Usage:
+    python -m benchmarks.tool_benchmark --turns 5 --steps 3
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from aiohttp import web
+
+from knowledge_api.framework.ai_collect.base_llm import BaseLLM
+from knowledge_api.framework.ai_collect.function_call.tool_manager import ToolManager, tool_turn
+from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
+from knowledge_api.model.llm_token_model import LLMTokenResponse
+
+
+def _plan(args) -> List[List[Dict[str, Any]]]:
+    """Tool calls of each step of a turn"""
+    steps = []
+    for step in range(args.steps):
+        calls = [("lookup_card", {"card_id": f"card_{index}"}) for index in range(args.lookups)]
+        calls += [("roll_dice", {"sides": 6}), ("archive", {"record": f"step {step}"})]
+        steps.append([{"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                       "function": {"name": name, "arguments": json.dumps(arguments)}} for name, arguments in calls])
+    return steps
+
+
+def _mock_app(latency: float, args) -> web.Application:
+    """OpenAI compatible /chat/completions asking for the planned tool calls"""
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        plan = _plan(args)
+        answered = sum(1 for message in payload["messages"] if message.get("role") == "tool")
+        if payload.get("parallel_tool_calls", True):
+            step = sum(1 for message in payload["messages"] if message.get("tool_calls"))
+            calls = plan[step] if step < len(plan) else []
+        else:
+            flat = [call for step in plan for call in step]
+            calls = flat[answered:answered + 1]
+        message: Dict[str, Any] = {"role": "assistant", "content": "The cards are ready."}
+        if calls:
+            message = {"role": "assistant", "content": "", "tool_calls": calls}
+        return web.json_response({
+            "id": uuid.uuid4().hex, "model": payload.get("model"), "created": int(time.time()),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat_completions)
+    return app
+
+
+class _LegacyToolManager:
+    """Former ToolManager.handle_tool_calls_async: gathered calls, executor without timeout, no reuse"""
+
+    def __init__(self, registry: ToolRegistry):
+        self.registry = registry
+
+    async def handle_tool_calls_async(self, tool_calls) -> List[Dict[str, Any]]:
+        return list(await asyncio.gather(*(self._execute(call) for call in tool_calls)))
+
+    async def _execute(self, tool_call) -> Dict[str, Any]:
+        name = tool_call.function.name
+        try:
+            arguments = json.loads(tool_call.function.arguments)
+            tool_function = self.registry.get_tool(name).func
+            if asyncio.iscoroutinefunction(tool_function):
+                result = await tool_function(**arguments)
+            else:
+                loop = asyncio.get_event_loop()
+                result = await loop.run_in_executor(None, lambda: tool_function(**arguments))
+        except Exception as e:
+            result = {"error": f"执行工具'{name}'时出错: {str(e)}"}
+        return {"role": "tool", "tool_call_id": tool_call.id, "content": result}
+
+
+class _MockServerLLM(BaseLLM):
+    """OpenAI compatible client of the mock server, not registered as an LLM type"""
+
+    def _initialize(self) -> None:
+        self.headers = {"Content-Type": "application/json"}
+        self.parallel_tool_calls = True
+        self.legacy_tools = False
+        self.round_trips = 0
+
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.round_trips += 1
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}/chat/completions", json=payload) as response:
+            return await response.json()
+
+    async def _chat_completion_impl(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                                    max_tokens: Optional[int] = None, **kwargs) -> LLMTokenResponse:
+        return self._format_chat_response(await self._post({"model": self.model, "messages": messages}))
+
+    async def _function_call_impl(self, messages, tools: ToolRegistry, model: str = None):
+        result = await self._post({"model": model or self.model, "messages": messages,
+                                   "tools": tools.get_all_tools(), "parallel_tool_calls": self.parallel_tool_calls})
+        message = result["choices"][0]["message"]
+        if not message.get("tool_calls"):
+            return message["content"], None, self._format_chat_response(result)
+        tool_calls = [SimpleNamespace(id=call["id"], type=call["type"], function=SimpleNamespace(**call["function"]))
+                      for call in message["tool_calls"]]
+        manager = _LegacyToolManager(tools) if self.legacy_tools else ToolManager(tools)
+        tool_results = await manager.handle_tool_calls_async(tool_calls)
+        return tool_results, message, self._format_chat_response(result)
+
+    async def _chat_completion_stream_impl(self, messages, temperature=0.7, max_tokens=None,
+                                           **kwargs) -> AsyncGenerator[LLMTokenResponse, None]:
+        yield await self._chat_completion_impl(messages, temperature, max_tokens)
+
+    def completion(self, prompt: str, temperature: float = 0.7, max_tokens: Optional[int] = None, **kwargs):
+        raise NotImplementedError
+
+    def embeddings(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def _format_chat_response(self, response: Dict[str, Any]) -> LLMTokenResponse:
+        usage = response.get("usage", {})
+        return LLMTokenResponse(
+            id=response.get("id"), model=response.get("model"),
+            content=response["choices"][0]["message"].get("content") or "",
+            input_tokens=usage.get("prompt_tokens", 0), output_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+        )
+
+    async def _log_token_stats(self, response, start_time=None, messages=None, application_scenario=None) -> float:
+        # No usage records for the mock provider
+        return 0.0
+
+
+def _tools(executions: Counter, args) -> ToolRegistry:
+    tools = ToolRegistry()
+    tool_seconds, hang_seconds = args.tool_ms / 1000, args.hang_ms / 1000
+
+    async def lookup_card(card_id: str) -> Dict[str, Any]:
+        executions["lookup_card"] += 1
+        await asyncio.sleep(tool_seconds)
+        return {"card_id": card_id, "rarity": "rare"}
+
+    def roll_dice(sides: int) -> int:
+        executions["roll_dice"] += 1
+        time.sleep(tool_seconds)
+        return sides
+
+    def archive(record: str) -> bool:
+        executions["archive"] += 1
+        time.sleep(hang_seconds)
+        return True
+
+    tools.register(lookup_card, description="Look up a card", pure=True)
+    tools.register(roll_dice, description="Roll a dice", max_concurrency=2)
+    tools.register(archive, description="Archive the step", timeout=args.timeout_ms / 1000)
+    return tools
+
+
+async def _turn(client: _MockServerLLM, tools: ToolRegistry, args) -> Dict[str, float]:
+    messages: List[Dict[str, Any]] = [{"role": "user", "content": "Prepare my cards."}]
+    start = time.perf_counter()
+    first: List[float] = []
+
+    def streamed(result: Dict[str, Any]) -> None:
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    with tool_turn(on_result=streamed):
+        for _ in range(args.steps * (args.lookups + 2) + 1):
+            tool_results, assistant, _ = await client.function_call(messages, tools, model="mock")
+            if assistant is None:
+                break
+            if not first:
+                # Without streaming the results reach the conversation with the whole step
+                first.append(time.perf_counter() - start)
+            messages.append(assistant)
+            messages.extend({"role": "tool", "tool_call_id": result["tool_call_id"],
+                             "content": json.dumps(result["content"], ensure_ascii=False)} for result in tool_results)
+    return {"latency": time.perf_counter() - start, "first": first[0]}
+
+
+async def _run(args) -> None:
+    runner = web.AppRunner(_mock_app(args.latency_ms / 1000, args))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    client = _MockServerLLM(api_key="mock", base_url=f"http://127.0.0.1:{port}", model="mock")
+    print(f"{args.steps} steps x {args.lookups + 2} tool calls, mock LLM latency {args.latency_ms:.0f} ms, "
+          f"tool {args.tool_ms:.0f} ms, archive hangs {args.hang_ms:.0f} ms (timeout {args.timeout_ms:.0f} ms)")
+    try:
+        for name, parallel, legacy in (("sequential", False, True), ("parallel", True, True),
+                                       ("runtime", True, False)):
+            client.parallel_tool_calls, client.legacy_tools = parallel, legacy
+            client.round_trips = 0
+            executions: Counter = Counter()
+            tools = _tools(executions, args)
+            results = [await _turn(client, tools, args) for _ in range(args.turns)]
+            latency = sum(result["latency"] for result in results) / len(results)
+            first = sum(result["first"] for result in results) / len(results)
+            print(f"{name:<11} turn {latency * 1000:8.1f} ms   first tool result {first * 1000:7.1f} ms   "
+                  f"{client.round_trips / args.turns:5.1f} LLM round trips   "
+                  f"{sum(executions.values()) / args.turns:5.1f} tool executions / turn")
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Tool runtime benchmark")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per mode")
+    parser.add_argument("--steps", type=int, default=3, help="Tool steps of a turn")
+    parser.add_argument("--lookups", type=int, default=4, help="Card lookups per step")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latency of every mock LLM call")
+    parser.add_argument("--tool-ms", type=float, default=100, help="Duration of a lookup and of a dice roll")
+    parser.add_argument("--hang-ms", type=float, default=1500, help="Duration of the archive call")
+    parser.add_argument("--timeout-ms", type=float, default=300, help="Declared timeout of the archive tool")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""TTS client and audio cache benchmark against a local fake TTS endpoint
+
+Starts a fake ByteDance TTS endpoint on 127.0.0.1 answering after --tts-ms (plus
+--connect-ms for the first request of a connection, standing in for the TLS handshake)
+and runs through ByteDanceTTS:
+
+- connections:  --requests distinct texts one after the other, a client per request
+                (as before) vs the shared keep-alive client
+- prologues:    --turns chat turns replaying one of --prologues prologues, without and
+                with the audio cache
+- single-flight: --burst concurrent requests of the same new text
+- eviction:     --requests distinct texts into a cache limited to a quarter of their size
+
+Usage:
+    python -m benchmarks.tts_cache_benchmark --requests 50 --turns 200
+"""
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+from aiohttp import web
+
+from knowledge_api.framework.tts.tts_cache import DiskAudioCache, set_audio_cache
+from knowledge_api.framework.tts.tts_service import ByteDanceTTS, close_http_client
+
+_AUDIO_BYTES = 24 * 1024
+
+
+class _FakeTTS:
+    """Fake TTS endpoint counting requests and connections"""
+
+    def __init__(self, latency: float, connect_latency: float):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.requests = 0
+        self._connections = set()
+
+    @property
+    def connections(self) -> int:
+        return len(self._connections)
+
+    def reset(self) -> None:
+        self.requests = 0
+        self._connections.clear()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.requests += 1
+        connection = request.transport.get_extra_info("peername")
+        if connection not in self._connections:
+            self._connections.add(connection)
+            await asyncio.sleep(self.connect_latency)
+        await asyncio.sleep(self.latency)
+        audio = payload["request"]["text"].encode("utf-8").ljust(_AUDIO_BYTES, b"\0")
+        return web.json_response({"code": 3000, "message": "Success", "data": base64.b64encode(audio).decode()})
+
+
+async def _legacy_request(tts: ByteDanceTTS, text: str) -> Dict:
+    """Request as before: a new client (and connection) per request"""
+    async with httpx.AsyncClient() as client:
+        resp = await client.post(tts.api_url, json={"request": {"text": text}}, headers=tts.header)
+        return resp.json()
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def _connections(tts: ByteDanceTTS, fake: _FakeTTS, args) -> None:
+    for name, call in (("client per request", lambda text: _legacy_request(tts, text)),
+                       ("shared client", lambda text: tts.text_to_speech(text, "voice", use_cache=False))):
+        fake.reset()
+        start = time.perf_counter()
+        for i in range(args.requests):
+            assert (await call(f"第{i}句旁白")).get("data")
+        elapsed = time.perf_counter() - start
+        print(f"connections   {name:<20} {elapsed / args.requests * 1000:7.1f} ms / request   "
+              f"connections {fake.connections:>4}   requests {fake.requests:>4}")
+
+
+async def _prologues(tts: ByteDanceTTS, fake: _FakeTTS, args) -> None:
+    rng = random.Random(7)
+    prologues = [f"（雷诺抬起头）你来了，今天想听第{i}个故事吗？" for i in range(args.prologues)]
+    for name, use_cache in (("no cache", False), ("audio cache", True)):
+        fake.reset()
+        latencies = []
+        for _ in range(args.turns):
+            start = time.perf_counter()
+            assert (await tts.text_to_speech(rng.choice(prologues), "voice", use_cache=use_cache)).get("data")
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"prologues     {name:<20} p50 {_percentile(latencies, 50):7.1f} ms   "
+              f"p99 {_percentile(latencies, 99):7.1f} ms   TTS requests {fake.requests:>4} / {args.turns}")
+
+
+async def _single_flight(tts: ByteDanceTTS, fake: _FakeTTS, args) -> None:
+    fake.reset()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(tts.text_to_speech("欢迎来到海龟汤，请听题。", "voice")
+                                     for _ in range(args.burst)))
+    elapsed = (time.perf_counter() - start) * 1000
+    same = len({result["data"] for result in results}) == 1
+    print(f"single-flight {args.burst} concurrent requests   {elapsed:7.1f} ms   TTS requests {fake.requests:>4}   "
+          f"same audio {same}")
+
+
+async def _eviction(tts: ByteDanceTTS, directory: str, args) -> None:
+    limit = args.requests * _AUDIO_BYTES // 4
+    cache = DiskAudioCache(os.path.join(directory, "small"), limit)
+    set_audio_cache(cache)
+    for i in range(args.requests):
+        await tts.text_to_speech(f"第{i}段旁白", "voice")
+    on_disk = sum(os.path.getsize(os.path.join(root, name))
+                  for root, _, files in os.walk(cache.directory) for name in files)
+    print(f"eviction      limit {limit // 1024} KB   on disk {on_disk // 1024} KB   "
+          f"writes {cache.stats['writes']}   evictions {cache.stats['evictions']}")
+
+
+async def _run(args, directory: str) -> None:
+    fake = _FakeTTS(args.tts_ms / 1000, args.connect_ms / 1000)
+    app = web.Application()
+    app.router.add_post("/api/v1/tts", fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    tts = ByteDanceTTS("appid", "token", "cluster", api_url=f"http://127.0.0.1:{port}/api/v1/tts")
+    set_audio_cache(DiskAudioCache(os.path.join(directory, "audio"), 512 * 1024 * 1024))
+    try:
+        await _connections(tts, fake, args)
+        await _prologues(tts, fake, args)
+        await _single_flight(tts, fake, args)
+        await _eviction(tts, directory, args)
+    finally:
+        set_audio_cache(None)
+        await close_http_client()
+        await runner.cleanup()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="TTS client and audio cache benchmark")
+    parser.add_argument("--requests", type=int, default=50, help="Distinct texts of the connection / eviction runs")
+    parser.add_argument("--prologues", type=int, default=5, help="Prologues of the role")
+    parser.add_argument("--turns", type=int, default=200, help="Prologue replays")
+    parser.add_argument("--burst", type=int, default=20, help="Concurrent identical requests")
+    parser.add_argument("--tts-ms", type=float, default=150, help="Latency of a TTS request")
+    parser.add_argument("--connect-ms", type=float, default=60, help="Extra latency of a new connection")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(_run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Streaming voice benchmark against a local fake TTS endpoint
+
+Starts a fake ByteDance TTS endpoint on 127.0.0.1 (answering after --tts-base-ms plus
+--tts-char-ms per character, at most --tts-capacity requests at a time) and streams an
+answer of a fake LLM (--chunk-chars characters every --chunk-ms) through ByteDanceTTS:
+
+- whole:     the answer is collected, then synthesized in one request (as before)
+- sentence:  sentences are synthesized while the answer is generated (SpeechPipeline)
+
+For each mode the time to the first audio, the time to the last audio, the TTS requests
+and the order of the audio segments are reported.
+
+Usage:
+    python -m benchmarks.tts_stream_benchmark --runs 5
+"""
+import argparse
+import asyncio
+import base64
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from aiohttp import web
+
+from knowledge_api.framework.tts.tts_service import ByteDanceTTS
+from knowledge_api.framework.tts.tts_stream import SentenceSegmenter, SpeechPipeline, audio_bytes
+from knowledge_api.utils.string_tool import speakable_text
+
+_ANSWER = ("（雷诺放下手中的酒杯，看了你一眼。）你终于来了，我等你很久了。"
+           "昨晚镇上又有人失踪了，这已经是这个月的第三个了！"
+           "守卫说他们什么都没看到，可是我不相信。"
+           "你去过北边的森林吗？那里的猎人说最近总能听到奇怪的声音，像是有人在哭。"
+           "如果你愿意帮我，我们今晚就出发，先去猎人的小屋，再沿着河往上走。"
+           "记住，不管听到什么，都不要离开火光。")
+
+
+class _FakeTTS:
+    """Fake TTS endpoint, the audio is the requested text"""
+
+    def __init__(self, base: float, per_char: float, capacity: int):
+        self.base = base
+        self.per_char = per_char
+        self.requests = 0
+        self._capacity = asyncio.Semaphore(capacity)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        text = payload["request"]["text"]
+        self.requests += 1
+        async with self._capacity:
+            await asyncio.sleep(self.base + self.per_char * len(text))
+        return web.json_response({"code": 3000, "message": "Success",
+                                  "data": base64.b64encode(text.encode("utf-8")).decode()})
+
+
+async def _llm_stream(chunk_chars: int, chunk_delay: float) -> AsyncIterator[str]:
+    for i in range(0, len(_ANSWER), chunk_chars):
+        await asyncio.sleep(chunk_delay)
+        yield _ANSWER[i:i + chunk_chars]
+
+
+async def _whole(tts: ByteDanceTTS, args) -> Dict[str, Any]:
+    start = time.perf_counter()
+    collected = []
+    async for chunk in _llm_stream(args.chunk_chars, args.chunk_ms / 1000):
+        collected.append(chunk)
+    result = await tts.text_to_speech(speakable_text("".join(collected)), "voice", use_cache=False)
+    return {"first": time.perf_counter() - start, "last": time.perf_counter() - start, "segments": 1,
+            "ordered": bool(result.get("data"))}
+
+
+async def _sentence(tts: ByteDanceTTS, args) -> Dict[str, Any]:
+    start = time.perf_counter()
+    # Every run synthesizes, the audio cache is measured by tts_cache_benchmark
+    speech = SpeechPipeline(tts, "voice", concurrency=args.concurrency, use_cache=False)
+
+    async def chunks():
+        async for chunk in _llm_stream(args.chunk_chars, args.chunk_ms / 1000):
+            speech.feed(chunk)
+            yield chunk
+
+    segments: List[Dict[str, Any]] = []
+    first = None
+    async for kind, item in speech.interleave(chunks()):
+        if kind == "audio":
+            first = first or time.perf_counter() - start
+            segments.append(item)
+    expected = SentenceSegmenter()
+    sentences = expected.feed(_ANSWER) + expected.flush()
+    ordered = [audio_bytes(segment).decode("utf-8") for segment in segments] == sentences
+    return {"first": first, "last": time.perf_counter() - start, "segments": len(segments), "ordered": ordered}
+
+
+async def _run(args) -> None:
+    fake = _FakeTTS(args.tts_base_ms / 1000, args.tts_char_ms / 1000, args.tts_capacity)
+    app = web.Application()
+    app.router.add_post("/api/v1/tts", fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    tts = ByteDanceTTS("appid", "token", "cluster", api_url=f"http://127.0.0.1:{port}/api/v1/tts")
+    generation = len(range(0, len(_ANSWER), args.chunk_chars)) * args.chunk_ms
+    print(f"answer {len(_ANSWER)} characters generated in {generation:.0f} ms, "
+          f"TTS {args.tts_base_ms:.0f} ms + {args.tts_char_ms:.0f} ms / character")
+    try:
+        for name, mode in (("whole", _whole), ("sentence", _sentence)):
+            fake.requests = 0
+            results = [await mode(tts, args) for _ in range(args.runs)]
+            first = sorted(result["first"] for result in results)[len(results) // 2]
+            last = sorted(result["last"] for result in results)[len(results) // 2]
+            print(f"{name:<9} first audio {first * 1000:7.0f} ms   last audio {last * 1000:7.0f} ms   "
+                  f"segments {results[0]['segments']:>3}   TTS requests / answer {fake.requests / args.runs:5.1f}   "
+                  f"in order {all(result['ordered'] for result in results)}")
+    finally:
+        await runner.cleanup()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Streaming voice benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Answers per mode")
+    parser.add_argument("--chunk-chars", type=int, default=2, help="Characters per LLM chunk")
+    parser.add_argument("--chunk-ms", type=float, default=25, help="Delay between LLM chunks")
+    parser.add_argument("--tts-base-ms", type=float, default=300, help="Fixed latency of a TTS request")
+    parser.add_argument("--tts-char-ms", type=float, default=8, help="Latency of a TTS request per character")
+    parser.add_argument("--tts-capacity", type=int, default=10, help="Requests the fake endpoint serves at a time")
+    parser.add_argument("--concurrency", type=int, default=3, help="TTS requests of one answer at a time")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
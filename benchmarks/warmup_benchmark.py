@@ -0,0 +1,169 @@
+"""Cold start model of the first chat request
+
+This is a simulation, not a measurement of the real lifespan: the startup components are stand-ins
+sleeping for the hard-coded load times of _LOAD_MS (estimates of the production cold start, multiplied
+by --scale and a random jitter of --jitter), only the WarmupOrchestrator scheduling them is the real one.
+The first chat request is sent --arrival-ms at most after the process started:
+
+- eager:   the lifespan loads the models and the caches one after the other before the app serves
+           requests, the RAG services and the first model inferences are paid by the first chat
+- warmup:  the app serves at once, WarmupOrchestrator loads the components in parallel in the
+           background and the first chat waits only for the RAG services it needs
+
+For each mode the latency of the first chat (from its arrival to its answer) and the time until the
+app is ready are reported over --runs cold starts.
+
+Usage:
+    python -m benchmarks.warmup_benchmark --runs 50
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from knowledge_api.framework.warmup.warmup import WarmupOrchestrator
+
+# Assumed load time of each component (milliseconds), estimates rather than measurements; the model
+# compares the two startup orders with these numbers, it does not load the real components
+_LOAD_MS = {
+    "redis": 50,
+    "system_config": 200,
+    "character_prompts": 300,
+    "llm_providers": 300,
+    "model_configs": 300,
+    "role_configs": 300,
+    "default_llm": 300,
+    "embedding_model": 6000,
+    "embedding_inference": 1500,
+    "ranking_model": 4000,
+    "ranking_inference": 800,
+    "rag_services": 1500,
+}
+_CACHES = ("character_prompts", "llm_providers", "model_configs", "role_configs")
+
+
+class _Process:
+    """One simulated cold start"""
+
+    def __init__(self, rng: random.Random, args):
+        self.load = {name: ms / 1000 * args.scale * (1 + rng.uniform(-args.jitter, args.jitter))
+                     for name, ms in _LOAD_MS.items()}
+        self.chat = args.chat_ms / 1000 * args.scale
+        self.loaded: Dict[str, bool] = {}
+
+    async def component(self, name: str) -> None:
+        await asyncio.sleep(self.load[name])
+        self.loaded[name] = True
+
+    def loader(self, name: str) -> Callable[[], Awaitable[None]]:
+        async def load() -> None:
+            await self.component(name)
+        return load
+
+    def blocking(self, *names: str) -> Callable[[], None]:
+        """Model loading holds a worker thread"""
+        def load() -> None:
+            for name in names:
+                time.sleep(self.load[name])
+                self.loaded[name] = True
+        return load
+
+
+async def _eager(process: _Process, arrival: float) -> Dict[str, float]:
+    start = time.perf_counter()
+    started = asyncio.Event()
+    ready: List[float] = []
+
+    async def lifespan() -> None:
+        # Models first, then the caches, on the event loop
+        process.blocking("embedding_model")()
+        process.blocking("ranking_model")()
+        for name in ("redis", "system_config", *_CACHES, "default_llm"):
+            await process.component(name)
+        ready.append(time.perf_counter() - start)
+        started.set()
+
+    async def first_chat() -> float:
+        await asyncio.sleep(arrival)
+        # The client sends at its arrival time even while the lifespan blocks the event loop
+        sent = start + arrival
+        # Connections wait until the app serves requests
+        await started.wait()
+        # RAG services and the first inferences are lazy
+        await process.component("rag_services")
+        await asyncio.to_thread(process.blocking("embedding_inference", "ranking_inference"))
+        await asyncio.sleep(process.chat)
+        return time.perf_counter() - sent
+
+    startup = asyncio.create_task(lifespan())
+    latency = await first_chat()
+    await startup
+    return {"first_chat": latency, "ready": ready[0]}
+
+
+async def _warmup(process: _Process, arrival: float) -> Dict[str, float]:
+    # Same components and dependencies as register_warmup_components
+    orchestrator = WarmupOrchestrator(concurrency=4)
+    orchestrator.register("redis", process.loader("redis"))
+    orchestrator.register("system_config", process.loader("system_config"), depends_on=["redis"])
+    for name in _CACHES:
+        orchestrator.register(name, process.loader(name), depends_on=["system_config"])
+    orchestrator.register("default_llm", process.loader("default_llm"),
+                          depends_on=["llm_providers", "model_configs"], critical=False)
+    orchestrator.register("embedding_model", process.blocking("embedding_model", "embedding_inference"))
+    orchestrator.register("ranking_model", process.blocking("ranking_model", "ranking_inference"), critical=False)
+    orchestrator.register("rag_services", process.loader("rag_services"),
+                          depends_on=["embedding_model", "system_config"])
+    start = time.perf_counter()
+    orchestrator.start()
+
+    await asyncio.sleep(arrival)
+    sent = start + arrival
+    # The readiness gate, then the chat; sorting is skipped until the sorting model is warmed
+    await orchestrator.wait_settled()
+    await orchestrator.ensure("rag_services")
+    await asyncio.sleep(process.chat)
+    latency = time.perf_counter() - sent
+
+    await orchestrator.wait_settled()
+    ready = orchestrator.report()["ready_after"]
+    await orchestrator.close()
+    return {"first_chat": latency, "ready": ready}
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def _run(args) -> None:
+    print("Simulated cold starts with the assumed component load times of _LOAD_MS")
+    for name, mode in (("eager", _eager), ("warmup", _warmup)):
+        rng = random.Random(7)
+        results = []
+        for _ in range(args.runs):
+            process = _Process(rng, args)
+            arrival = rng.uniform(0, args.arrival_ms / 1000 * args.scale)
+            results.append(await mode(process, arrival))
+        first_chat = [result["first_chat"] / args.scale for result in results]
+        ready = [result["ready"] / args.scale for result in results]
+        print(f"{name:<8} first chat p50 {_percentile(first_chat, 50):6.2f} s   p99 {_percentile(first_chat, 99):6.2f} s   "
+              f"max {max(first_chat):6.2f} s   ready after p50 {_percentile(ready, 50):6.2f} s")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Cold start model of the first chat request")
+    parser.add_argument("--runs", type=int, default=50, help="Cold starts per mode")
+    parser.add_argument("--arrival-ms", type=float, default=10000, help="Latest arrival of the first chat after start")
+    parser.add_argument("--chat-ms", type=float, default=800, help="Chat handling time once everything is loaded")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Random variation of the load times")
+    parser.add_argument("--scale", type=float, default=0.05, help="Time scale of the simulation (results are rescaled)")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
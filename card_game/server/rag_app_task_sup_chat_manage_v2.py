@@ -1,5 +1,6 @@
 """Card Game Chat Support Mission - Based on Redis Cached Edition
 Chat and challenge-related functions for handling card games"""
+import asyncio
 import json
 from typing import Dict, Any, Optional, List, Tuple, Union
 from datetime import datetime
@@ -33,7 +34,7 @@ tools = ToolRegistry()
 logger = get_logger()
 
 
-@tools.register_decorator(description="Decide whether to approach the goal based on the conversation progress score (storage)")
+@tools.register_decorator(description="Decide whether to approach the goal based on the conversation progress score (storage)", pure=True)
 def score_change(scoreChange: int, reason: str, isAchieved: int) -> Dict[str, Any]:
     """conversation scoring tool
 
@@ -734,66 +735,72 @@ response result"""
             )
 
             ai, messages = await self.get_ai(msg=input_data.message, prompt=prompt, session_id=input_data.session_id)
-            response = await ai.chat_completion(messages=messages, temperature=input_data.temperature,
-                                               application_scenario=self.llm_application)
-
-            tools.get_tool("score_change") \
-                .set_parameter_description("scoreChange",
-                                           f"分数变化，正数表示加分，负数表示减分，范围{sub.score_range}，0表示不变") \
-                .set_parameter_description("reason", "The reason for adding or subtracting points") \
-                .set_parameter_description("isAchieved",
-                                           f"是否已经实际达成了最终目标{sub.task_goal}，1达成，0未达成")
-
-            memory_manager = await self.get_memory_manager(input_data.session_id)
-            if memory_manager:
-                history = memory_manager.get_formatted_history()
-                memory = EnhancedChatMemoryManager(
-                    k=4,
-                    system_message=get_system_content(sub_task, history),
-                    memory_type='buffer_window',
-                )
-                memory.add_function_call_example("score_change", {
-                    "scoreChange": 1,
-                    "reason": "It doesn't really answer user questions.",
-                    "isAchieved": 0,
-                })
-
-                end_history = "\n".join(
-                    [item.get("role") + "：" + item.get("content") for item in history[-2:] if
-                     item.get("role") != "system"])
-                memory.add_user_message(f"帮我根据用户和NPC的交流记录对最后一轮对话进行评判：{end_history}")
-                tool_results, assistant_message,call= await ai.function_call(
-                    memory.get_formatted_history(), tools=tools, application_scenario=LLMApplication.BACKEND_CHAT_TASK
-                )
-
-                # Use the optimized update_chat_children method
-                await self.update_chat_children(response, input_data.message, tool_results, input_data.session_id)
-
-                # Check the session state again and clear the cache if complete
-                session_data = await self.get_session_data(input_data.session_id)
-                if session_data.get("session_completed", False):
-                    await self.clear_session_cache(input_data.session_id)
-
-                return {
-                    "message": response.content,
-                    "assistant_message": assistant_message,
-                    "tool_results": json.dumps(tool_results, ensure_ascii=False),
-                    "history": [item for item in history[-2:] if item.get("role") != "system"],
-                    "is_win": session_data.get("is_win", False),
-                    "is_failed": session_data.get("is_failed", False),
-                    "current_round": session_data.get("current_round", 1),
-                }
-            else:
-                logger.error(f"获取memory_manager失败, session_id={input_data.session_id}")
-                return {
-                    "message": response.content,
-                    "assistant_message": "",
-                    "tool_results": "[]",
-                    "history": [],
-                    "is_win": False,
-                    "is_failed": False,
-                    "current_round": 1,
-                }
+            # The score judges the previous exchange of the history, it does not wait for this reply
+            reply = asyncio.ensure_future(ai.chat_completion(messages=messages, temperature=input_data.temperature,
+                                                             application_scenario=self.llm_application))
+            try:
+                tools.get_tool("score_change") \
+                    .set_parameter_description("scoreChange",
+                                               f"分数变化，正数表示加分，负数表示减分，范围{sub.score_range}，0表示不变") \
+                    .set_parameter_description("reason", "The reason for adding or subtracting points") \
+                    .set_parameter_description("isAchieved",
+                                               f"是否已经实际达成了最终目标{sub.task_goal}，1达成，0未达成")
+
+                memory_manager = await self.get_memory_manager(input_data.session_id)
+                if memory_manager:
+                    history = memory_manager.get_formatted_history()
+                    memory = EnhancedChatMemoryManager(
+                        k=4,
+                        system_message=get_system_content(sub_task, history),
+                        memory_type='buffer_window',
+                    )
+                    memory.add_function_call_example("score_change", {
+                        "scoreChange": 1,
+                        "reason": "It doesn't really answer user questions.",
+                        "isAchieved": 0,
+                    })
+
+                    end_history = "\n".join(
+                        [item.get("role") + "：" + item.get("content") for item in history[-2:] if
+                         item.get("role") != "system"])
+                    memory.add_user_message(f"帮我根据用户和NPC的交流记录对最后一轮对话进行评判：{end_history}")
+                    tool_results, assistant_message,call= await ai.function_call(
+                        memory.get_formatted_history(), tools=tools, application_scenario=LLMApplication.BACKEND_CHAT_TASK
+                    )
+                    response = await reply
+
+                    # Use the optimized update_chat_children method
+                    await self.update_chat_children(response, input_data.message, tool_results, input_data.session_id)
+
+                    # Check the session state again and clear the cache if complete
+                    session_data = await self.get_session_data(input_data.session_id)
+                    if session_data.get("session_completed", False):
+                        await self.clear_session_cache(input_data.session_id)
+
+                    return {
+                        "message": response.content,
+                        "assistant_message": assistant_message,
+                        "tool_results": json.dumps(tool_results, ensure_ascii=False),
+                        "history": [item for item in history[-2:] if item.get("role") != "system"],
+                        "is_win": session_data.get("is_win", False),
+                        "is_failed": session_data.get("is_failed", False),
+                        "current_round": session_data.get("current_round", 1),
+                    }
+                else:
+                    logger.error(f"获取memory_manager失败, session_id={input_data.session_id}")
+                    response = await reply
+                    return {
+                        "message": response.content,
+                        "assistant_message": "",
+                        "tool_results": "[]",
+                        "history": [],
+                        "is_win": False,
+                        "is_failed": False,
+                        "current_round": 1,
+                    }
+            finally:
+                if not reply.done():
+                    reply.cancel()
         finally:
             # Make sure to close the thread local session after processing the request
             from knowledge_api.framework.database.database import close_thread_session
@@ -9,6 +9,14 @@ import wsClient, { WebSocketClient, WebSocketOptions } from "@/utils/websocket";
  * 游戏消息类型
  */
 export interface GameMessage {
+	/** 帧类型，断线重连补发的消息为 history */
+	type?: string;
+	/** 消息ID，重连时作为 last_msg_id 发送 */
+	msgId?: string;
+	/** history 帧中补发的消息 */
+	messages?: GameMessage[];
+	/** 是否还有后续 history 帧 */
+	hasMore?: boolean;
 	/** 消息角色 */
 	role?: string;
 	/** 角色名称 */
@@ -147,6 +155,7 @@ export function connectGameWebSocket(
  * @param sessionId 会话ID
  * @param userData 用户数据
  * @param roleIds 角色ID列表
+ * @param lastMsgId 已收到的最后一条消息ID，重连时服务端只补发其后的消息
  * @returns boolean 是否发送成功
  */
 export function initGameSession(
@@ -154,14 +163,18 @@ export function initGameSession(
 	sessionId: string,
 	userData: { name: string; background?: string },
 	roleIds: string[] = ["123"], // 默认角色ID
+	lastMsgId?: string,
 ): boolean {
 	// 构建初始化消息
-	const initMessage = {
+	const initMessage: Record<string, any> = {
 		type: "init_session",
 		session_id: sessionId,
 		user_data: userData,
 		roles: roleIds,
 	};
+	if (lastMsgId) {
+		initMessage.last_msg_id = lastMsgId;
+	}
 
 	// 发送初始化消息
 	return client.send(initMessage);
@@ -29,8 +29,12 @@ os.environ['GUNICORN_WORKER'] = 'true'
 # Get configuration from environment variables
 daemon = True  # Ensure running in background
 bind = f"{os.environ.get('APP_HOST', '0.0.0.0')}:{os.environ.get('APP_PORT', '8888')}"
-# Change to single process multi-threaded mode
-workers = 1  # Only use 1 worker process
+# Websocket sessions are routed between workers over Redis only with WS_ROUTING_ENABLED=true,
+# otherwise stay with a single worker process
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+if workers > 1 and os.environ.get('WS_ROUTING_ENABLED', 'false').lower() != 'true':
+    print("GUNICORN_WORKERS > 1 requires WS_ROUTING_ENABLED=true, falling back to 1 worker")
+    workers = 1
 threads = int(os.environ.get('GUNICORN_THREADS', '8'))  # Increase thread count to 8
 worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '2000'))
 loglevel = 'debug'  # Use debug level to log everything
@@ -1,24 +1,30 @@
+import copy
+import functools
 import json
 import random
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Dict, Any, Optional, List, Tuple, Union
+from typing import AsyncIterator, Callable, Dict, Any, Optional, List, Tuple, Union
 
 from app_rag_chat.model.chat_models import UserInfo
 from knowledge_api.chat.prompt_utils import find_closest_relationship_level
 from knowledge_api.mapper.chat_session.crud import SessionCRUD
 from knowledge_api.utils.constant import LLMApplication
 from knowledge_api.utils.log_config import get_logger
-from knowledge_api.utils.string_tool import remove_parentheses_content
+from knowledge_api.utils.string_tool import speakable_text
+from knowledge_api.framework.memory.conversation_summarizer import get_conversation_summarizer
 from knowledge_api.framework.memory.enhanced_chat_memory_manager import EnhancedChatMemoryManager
-from knowledge_api.framework.tts import ByteDanceTTS
+from knowledge_api.framework.tts import ByteDanceTTS, SpeechPipeline, audio_frame
 from knowledge_api.mapper.character_prompt_config.crud import CharacterPromptConfigCRUD
 from knowledge_api.mapper.conversations.crud import ConversationCRUD
 from knowledge_api.mapper.prompt_prologue.crud import PromptPrologueCRUD
 from knowledge_api.mapper.relationship_level.crud import RelationshipLevelCRUD
 from knowledge_api.framework.redis.cache_manager import CacheManager
 from knowledge_api.framework.database.database import get_thread_local_session
+from knowledge_api.framework.warmup.warmup import WARMUP_GATE_TIMEOUT, get_warmup_orchestrator
 from knowledge_api.utils import generate_id
-from knowledge_api.chat.session_manager import ChatSessionManager
+from knowledge_api.chat.session_manager import ChatSessionManager, SessionUnitOfWork
 from knowledge_api.chat.context_manager import ContextManager
 
 # Import a new RAGManager
@@ -28,6 +34,10 @@ from runtime import ExecutionTimer
 
 logger = get_logger()
 
+# Session unit of work of the chat turn running in the current task
+_current_turn: ContextVar[Optional[SessionUnitOfWork]] = ContextVar("chat_session_turn", default=None)
+
+
 class BaseChat:
     """RAG chat service base class"""
     
@@ -72,6 +82,8 @@ Checks if the context manager has been initialized, and if not, calls init_data
 This method can be called by all subclasses to ensure that the necessary initialization has been completed before using the service"""
         if not self.context_manager:
             logger.info(f"The service has not been initialized, and the initialization is performed...")
+            # During startup warmup wait for the caches and RAG services instead of loading them a second time
+            await get_warmup_orchestrator().wait_settled(WARMUP_GATE_TIMEOUT)
             await self.init_data()
             logger.info(f"service initialization is complete")
         
@@ -95,6 +107,71 @@ This method can be called by all subclasses to ensure that the necessary initial
         
         logger.info("RAG service and context manager initialization complete")
     
+    def _turn(self, session_id: Optional[str]) -> Optional[SessionUnitOfWork]:
+        """Unit of work of the running turn of this session, None outside of a turn"""
+        turn = _current_turn.get()
+        if turn is not None and session_id and turn.session_id == session_id \
+                and turn.manager is self.session_manager:
+            return turn
+        return None
+
+    @asynccontextmanager
+    async def session_turn(self, session_id: Optional[str]) -> AsyncIterator[Optional[SessionUnitOfWork]]:
+        """Scope of one chat turn: the session is loaded once, reads and updates stay in memory
+and the session is written once when the turn ends (compare-and-set on its version)
+
+Args:
+session_id: Session ID
+
+Yields:
+Unit of work of the turn, None without session ID"""
+        turn = self._turn(session_id)
+        if not session_id or turn is not None:
+            # Nested turn of the same session
+            yield turn
+            return
+        turn = await self.session_manager.begin_turn(session_id)
+        token = _current_turn.set(turn)
+        try:
+            yield turn
+        finally:
+            try:
+                _current_turn.reset(token)
+            except ValueError:
+                # Stream closed from another context, the variable goes away with it
+                pass
+            await turn.flush()
+
+    def ensure_session_id(self, input_data: Any) -> str:
+        """Generate a session ID for input data without one
+
+Args:
+input_data: Enter data
+
+Returns:
+Session ID"""
+        if not input_data.session_id:
+            input_data.session_id = f"{input_data.user_id}-{generate_id()}"
+            logger.info(f"If the session ID is not provided, a new session ID is generated: {input_data.session_id}")
+        return input_data.session_id
+
+    async def update_session(self, session_id: str, updates: Dict[str, Any],
+                             merge: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+                             ) -> Optional[Dict[str, Any]]:
+        """Update fields of a session, in the running turn if any
+
+Args:
+session_id: Session ID
+Updates: Fields to be updated
+Merge: computes the fields again from a session changed concurrently (turn only)
+
+Returns:
+Updated session data, None on failure"""
+        turn = self._turn(session_id)
+        if turn is not None:
+            return turn.update(updates, merge)
+        return await self.session_manager.update_session(session_id, updates)
+
     async def get_current_session(self, session_id: str) -> Dict[str, Any]:
         """Get current session data
 
@@ -105,7 +182,10 @@ Returns:
 session data dictionary"""
         if not session_id:
             return {}
-            
+
+        turn = self._turn(session_id)
+        if turn is not None:
+            return turn.get() or {}
         session_data = await self.session_manager.get_session(session_id)
         return session_data or {}
     
@@ -118,7 +198,8 @@ session_id: Session ID
 Returns:
 User information dictionary, including user relationship descriptions"""
         session_data = await self.get_current_session(session_id)
-        user_info = session_data.get("user_info", {})
+        # Copy: the relationship description is not stored in the session
+        user_info = dict(session_data.get("user_info") or {})
         
         # Important: Get a description of the relationship between the role and the user
         # If there is a relationship level, get the corresponding relationship description
@@ -177,16 +258,14 @@ Returns:
         ).model_dump()
         
         # Make sure the session ID exists
-        if not input_data.session_id:
-            input_data.session_id = f"{input_data.user_id}-{generate_id()}"
-            logger.info(f"If the session ID is not provided, a new session ID is generated: {input_data.session_id}")
+        self.ensure_session_id(input_data)
         
         # Initiate session
         await self.init_session(input_data.session_id)
         
         # Update user information in the session
         if input_data.session_id:
-            await self.session_manager.update_session(
+            await self.update_session(
                 input_data.session_id,
                 {"user_info": user_info}
             )
@@ -202,7 +281,7 @@ Returns:
         
         # Update the role information of the session
         if input_data.session_id:
-            await self.session_manager.update_session(
+            await self.update_session(
                 input_data.session_id,
                 {"role_info": role_info}
             )
@@ -217,59 +296,62 @@ input_data: Chat Input Data
 
 Returns:
 chat response"""
-        # Initialize chat
-        is_message, role_data, prologue = await self.init_chat(input_data)
-        
-        # prepare result
-        result = {
-            "message": "",
-            "session_id": input_data.session_id
-        }
-        
-        if is_message:
-            # If the user sends an empty message, randomly reply with the opening statement
-            result["message"] = prologue
-        else:
-            # Create a prompt word template
-            sources, contexts, prompt = await self.create_template(
-                query=input_data.message,
-                top_k=input_data.top_k,
-                role_data=role_data,
-            )
+        # One session load and one session write for the whole turn
+        self.ensure_session_id(input_data)
+        async with self.session_turn(input_data.session_id):
+            # Initialize chat
+            is_message, role_data, prologue = await self.init_chat(input_data)
+        
+            # prepare result
+            result = {
+                "message": "",
+                "session_id": input_data.session_id
+            }
+        
+            if is_message:
+                # If the user sends an empty message, randomly reply with the opening statement
+                result["message"] = prologue
+            else:
+                # Create a prompt word template
+                sources, contexts, prompt = await self.create_template(
+                    query=input_data.message,
+                    top_k=input_data.top_k,
+                    role_data=role_data,
+                )
             
-            # generate responses
-            response = await self._generate_answer(prompt, input_data.temperature, input_data.message)
+                # generate responses
+                response = await self._generate_answer(prompt, input_data.temperature, input_data.message)
             
-            # Update chat history
-            await self.update_chat(response, input_data.message, input_data.session_id)
+                # Update chat history
+                await self.update_chat(response, input_data.message, input_data.session_id)
             
-            result["message"] = response
+                result["message"] = response
             
-            # If necessary, include the source
-            if input_data.include_sources:
-                result["sources"] = sources
-                result["contexts"] = contexts
+                # If necessary, include the source
+                if input_data.include_sources:
+                    result["sources"] = sources
+                    result["contexts"] = contexts
                 
-                # Get session record
-                session_data = await self.get_current_session(input_data.session_id)
-                memory_manager = session_data.get("memory_manager")
-                if memory_manager:
-                    result["prompt"] = memory_manager.get_chat_history()
-        
-        # Processing Text To Speech
-        if role_data.get("timbre"):
-            timer3 = ExecutionTimer("Text To Speech Time:")
-            timer3.start()
-            tts_data = await self.bytedance_tts.text_to_speech(
-                remove_parentheses_content(result["message"]),
-                role_data.get("timbre")
-            )
-            result.update({
-                "tts_base64": tts_data.get("data")
-            })
-            timer3.stop()
-        
-        return result
+                    # Get session record
+                    session_data = await self.get_current_session(input_data.session_id)
+                    memory_manager = session_data.get("memory_manager")
+                    if memory_manager:
+                        result["prompt"] = memory_manager.get_chat_history()
+        
+            # Processing Text To Speech
+            if role_data.get("timbre"):
+                timer3 = ExecutionTimer("Text To Speech Time:")
+                timer3.start()
+                tts_data = await self.bytedance_tts.text_to_speech(
+                    speakable_text(result["message"]),
+                    role_data.get("timbre")
+                )
+                result.update({
+                    "tts_base64": tts_data.get("data")
+                })
+                timer3.stop()
+        
+            return result
     
     async def chat_stream(self, input_data: Any):
         """streaming chat feature
@@ -279,67 +361,95 @@ input_data: Chat Input Data
 
 Yields:
 generated text fragment"""
-        # Initialize chat
-        is_message, role_data, prologue = await self.init_chat(input_data)
-        
-        # For collecting complete responses
-        collected_response = ""
-        
-        if is_message:
-            # If the user sends an empty message, randomly reply with the opening statement
-            yield prologue
-        else:
-            # Create a prompt word template
-            sources, contexts, prompt = await self.create_template(
-                input_data.message,
-                input_data.top_k,
-                input_data.session_id,
-                role_data=role_data,
-            )
+        # One session load and one session write for the whole turn, flushed when the stream completes
+        self.ensure_session_id(input_data)
+        async with self.session_turn(input_data.session_id):
+            # Initialize chat
+            is_message, role_data, prologue = await self.init_chat(input_data)
+        
+            # For collecting complete responses
+            collected: List[str] = []
+        
+            if is_message:
+                # If the user sends an empty message, randomly reply with the opening statement
+                yield prologue
+            else:
+                # Create a prompt word template
+                sources, contexts, prompt = await self.create_template(
+                    input_data.message,
+                    input_data.top_k,
+                    input_data.session_id,
+                    role_data=role_data,
+                )
             
-            try:
-                # Acquire AI models
-                ai, messages = await self.get_ai(msg=input_data.message, prompt=prompt, session_id=input_data.session_id)
+                try:
+                    # Acquire AI models
+                    ai, messages = await self.get_ai(msg=input_data.message, prompt=prompt, session_id=input_data.session_id)
                 
-                # stream generated responses
-                if input_data.way == "half":
-                    # Half-stream output (batch output)
-                    half_tem = []
-                    async for chunk in ai.chat_completion_stream(messages, application_scenario=self.llm_application):
-                        if chunk.content:
-                            collected_response += chunk.content
-                            half_tem.append(chunk.content)
-                            if len(half_tem) > 10:
-                                tem = half_tem.copy()
-                                half_tem.clear()
-                                yield "".join(tem)
-                        else:
-                            yield "".join(half_tem)
-                else:
-                    # full streaming output
-                    async for chunk in ai.chat_completion_stream(messages, application_scenario=self.llm_application):
-                        if chunk.content:
-                            collected_response += chunk.content
-                            yield chunk.content
-                
-                # Processing Text To Speech
-                if role_data.get("timbre"):
-                    yield "<audio>"
-                    tts = await self.bytedance_tts.text_to_speech(
-                        remove_parentheses_content(collected_response),
-                        role_data.get("timbre")
-                    )
-                    yield json.dumps(tts.get("data"))
+                    # Streaming voice: sentences are synthesized while the answer is generated
+                    speech = None
+                    if role_data.get("timbre") and getattr(input_data, "voice_stream", False):
+                        speech = SpeechPipeline(self.bytedance_tts, role_data.get("timbre"))
+
+                    # stream generated responses
+                    chunks = self._stream_text(ai, messages, input_data.way, collected, speech)
+                    if speech is not None:
+                        async for kind, item in speech.interleave(chunks):
+                            yield item if kind == "text" else audio_frame(item)
+                    else:
+                        async for text in chunks:
+                            yield text
+
+                        # Processing Text To Speech
+                        if role_data.get("timbre"):
+                            yield "<audio>"
+                            tts = await self.bytedance_tts.text_to_speech(
+                                speakable_text("".join(collected)),
+                                role_data.get("timbre")
+                            )
+                            yield json.dumps(tts.get("data"))
             
-            except Exception as e:
-                error_msg = f"生成回答时出错: {str(e)}"
-                print(error_msg)
-                import traceback
-                traceback.print_exc()
-                yield error_msg
-        
-        # Update chat history
-        await self.update_chat(response=collected_response, msg=input_data.message, session_id=input_data.session_id)
+                except Exception as e:
+                    error_msg = f"生成回答时出错: {str(e)}"
+                    print(error_msg)
+                    import traceback
+                    traceback.print_exc()
+                    yield error_msg
+        
+            # Update chat history
+            await self.update_chat(response="".join(collected), msg=input_data.message, session_id=input_data.session_id)
+
+    async def _stream_text(self, ai, messages: List[Dict[str, str]], way: str, collected: List[str],
+                           speech: Optional[SpeechPipeline] = None):
+        """Stream the answer of the model
+
+Args:
+ai: AI model
+Messages: conversation history
+Way: half for batch output, full streaming output otherwise
+Collected: receives the content of the answer
+Speech: streaming voice pipeline fed with the answer
+
+Yields:
+generated text fragment"""
+        half_tem = []
+        async for chunk in ai.chat_completion_stream(messages, application_scenario=self.llm_application):
+            if chunk.content:
+                collected.append(chunk.content)
+                if speech is not None:
+                    speech.feed(chunk.content)
+                if way != "half":
+                    # full streaming output
+                    yield chunk.content
+                    continue
+                # Half-stream output (batch output)
+                half_tem.append(chunk.content)
+                if len(half_tem) > 10:
+                    tem = half_tem.copy()
+                    half_tem.clear()
+                    yield "".join(tem)
+            elif way == "half":
+                yield "".join(half_tem)
     
     async def init_session(self, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Initiate session
@@ -349,6 +459,10 @@ session_id: Session ID
 
 Returns:
 session data"""
+        turn = self._turn(session_id)
+        if turn is not None:
+            return await self._init_turn_session(turn)
+
         # Attempt to resume a session from the database
         memory_manager = await self.search_db_session(session_id)
         
@@ -382,6 +496,30 @@ session data"""
         
         return session_data
 
+    async def _init_turn_session(self, turn: SessionUnitOfWork) -> Dict[str, Any]:
+        """Initiate the session of a running turn: the session loaded at turn start is reused,
+the history is only restored from the database when Redis has no session
+
+Args:
+Turn: Unit of work of the turn
+
+Returns:
+session data"""
+        session_data = turn.get()
+        if session_data is not None:
+            logger.info(f"从Redis加载会话: {turn.session_id}")
+        else:
+            memory_manager = await self.search_db_session(turn.session_id)
+            if memory_manager is None:
+                memory_manager = EnhancedChatMemoryManager(
+                    k=20,
+                    system_message="",
+                    memory_type='buffer_window',
+                )
+            session_data = turn.create(self.session_manager.new_session_data(turn.session_id, memory_manager))
+        await self.save_session(turn.session_id)
+        return session_data
+
     async def get_session_data(self, session_id: str) -> Dict[str, Any]:
         """Helper method for getting session data - adapt to Redis cache
 
@@ -393,6 +531,10 @@ session data dictionary"""
         if not session_id:
             return {}
 
+        turn = self._turn(session_id)
+        if turn is not None:
+            return turn.get() or {}
+
         # Get session data from session manager
         session_data = await self.session_manager.get_session(session_id)
 
@@ -472,7 +614,7 @@ Returns:
             memory_manager.add_ai_message(prologue)
             
             # Updating a conversation in Redis
-            await self.session_manager.update_session(
+            await self.update_session(
                 session_id,
                 {"memory_manager": memory_manager}
             )
@@ -522,32 +664,75 @@ session_id: Session ID"""
         memory_manager = session_data.get("memory_manager")
         if not memory_manager:
             return
-        # Add user messages to history
-        memory_manager.add_user_message(msg)
-        # Add a message to history
         if isinstance(response, str):
-            memory_manager.add_ai_message(response)
+            response_content = response
         else:
-            try:
-                response_content = response.content
-                memory_manager.add_ai_message(response_content)
-            except AttributeError:
-                # Object has no content attribute, try using str
-                memory_manager.add_ai_message(str(response))
-        
-        # Update session message count
-        message_count = session_data.get("message_count", 0) + 1
-
-        # Save the updated session
-        await self.session_manager.update_session(
-            session_id,
-            {
-                "memory_manager": memory_manager,
-                "message_count": message_count,
+            # Object has no content attribute, try using str
+            response_content = getattr(response, "content", None)
+            if response_content is None:
+                response_content = str(response)
+
+        def add_turn(data: Dict[str, Any]) -> Dict[str, Any]:
+            """Add the turn to the history of the session data"""
+            history = data.get("memory_manager") or memory_manager
+            self.watch_summary(session_id, history)
+            # Add user messages to history
+            history.add_user_message(msg)
+            # Add a message to history
+            history.add_ai_message(response_content)
+            return {
+                "memory_manager": history,
+                # Update session message count
+                "message_count": data.get("message_count", 0) + 1,
                 "last_activity": datetime.now().isoformat()
             }
-        )
+
+        # Save the updated session, the turn is added again to a session changed concurrently
+        await self.update_session(session_id, add_turn(session_data), merge=add_turn)
     
+    def watch_summary(self, session_id: str, memory_manager: EnhancedChatMemoryManager) -> None:
+        """Summarize the session with the registered summarizer once its rounds reach the summary interval
+
+The memory manager is loaded from the session cache on every turn without its summary listener,
+so the listener is attached again before the messages of the turn are added
+
+Args:
+session_id: Session ID
+memory_manager: Memory manager of the session loaded for this turn"""
+        summarizer = get_conversation_summarizer()
+        if summarizer is None:
+            return
+        summarizer.watch(memory_manager, f"{self.session_manager.session_prefix}{session_id}",
+                         functools.partial(self.store_summary, session_id))
+
+    async def store_summary(self, session_id: str, memory_manager: EnhancedChatMemoryManager) -> None:
+        """Write the summary made by the summarizer into the cached session
+
+The summary is made after the turn that asked for it was written, so it is written with its own
+compare-and-set on the session, on top of the turns written in the meantime
+
+Args:
+session_id: Session ID
+memory_manager: Memory manager holding the new summary"""
+        summary = memory_manager.summary_message
+        summarized = memory_manager.summarized_exchange_count
+
+        def add_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+            history = data.get("memory_manager")
+            if history is None:
+                return {}
+            history.update_summary_message(summary)
+            history.summarized_exchange_count = max(history.summarized_exchange_count,
+                                                    min(summarized, history.exchange_count))
+            return {"memory_manager": history}
+
+        turn = await self.session_manager.begin_turn(session_id)
+        session_data = turn.get()
+        if session_data is None:
+            return
+        turn.update(add_summary(session_data), merge=add_summary)
+        await turn.flush()
+
     async def get_ai(self, msg: str, prompt: str, session_id: Optional[str] = None):
         """Acquire AI models and conversation history
 
@@ -571,6 +756,9 @@ Returns:
         else:
             # Using the in-session memory manager
             memory_manager = session_data.get("memory_manager")
+            if memory_manager and self._turn(session_id) is not None:
+                # The session of the turn is the one written back, update_chat adds the user message to it
+                memory_manager = copy.deepcopy(memory_manager)
             if memory_manager:
                 memory_manager.update_system_message(prompt)
                 memory_manager.add_user_message(msg)
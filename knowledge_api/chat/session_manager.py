@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Set
 import time
 import asyncio
 from datetime import datetime
@@ -10,6 +10,112 @@ from knowledge_api.utils.log_config import get_logger
 
 logger = get_logger()
 
+class SessionUnitOfWork:
+    """Session data of one chat turn, loaded once and written once
+
+The session and its version are read at the start of the turn. Reads and updates
+during the turn stay in memory and the updated fields are tracked. flush writes the
+session with one compare-and-set on the version; when another writer changed the
+session in the meantime, the updates are applied again on the fresh session and the
+write is retried. Updated fields overwrite the fresh ones, unless the update came
+with a merge function computing them from the fresh session (history, counters)."""
+
+    MAX_FLUSH_ATTEMPTS = 3
+
+    def __init__(self, manager: "ChatSessionManager", session_id: str):
+        """Initialize the unit of work
+
+Args:
+Manager: session manager of the chat type
+session_id: Session ID"""
+        self.manager = manager
+        self.session_id = session_id
+        self.data: Dict[str, Any] = {}
+        self.version = 0
+        self.exists = False
+        self._dirty: Set[str] = set()
+        self._merges: List[Callable[[Dict[str, Any]], Dict[str, Any]]] = []
+
+    async def load(self) -> "SessionUnitOfWork":
+        """Read the session and its version (one Redis round trip)"""
+        try:
+            data, self.version = await SessionCacheManager.load_session_versioned(
+                self.session_id, prefix=self.manager.session_prefix)
+        except Exception as e:
+            logger.error(f"从Redis加载会话出错: {str(e)}")
+            data = None
+        self.exists = data is not None
+        self.data = data or {}
+        return self
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """Session data of the turn, None if the session does not exist"""
+        return self.data if self.exists else None
+
+    def create(self, session_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create the session in the turn, written on flush"""
+        self.data = session_data
+        self.exists = True
+        self._dirty.update(session_data)
+        return self.data
+
+    def update(self, updates: Dict[str, Any],
+               merge: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """Update fields of the session
+
+Args:
+Updates: Fields to be updated
+Merge: computes the fields again from a session changed by another writer, called on conflict
+
+Returns:
+Updated session data, None if the session does not exist"""
+        if not self.exists:
+            logger.warning(f"更新会话失败: 会话不存在 {self.session_id}")
+            return None
+        self.data.update(updates)
+        self._dirty.update(updates)
+        if merge is not None:
+            self._merges.append(merge)
+        return self.data
+
+    def _rebase(self, fresh: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply the updates of the turn on the session written by another writer"""
+        merged = {}
+        for merge in self._merges:
+            merged.update(merge(fresh))
+            fresh.update(merged)
+        fresh.update({key: self.data[key] for key in self._dirty if key in self.data and key not in merged})
+        return fresh
+
+    async def flush(self) -> bool:
+        """Write the session with a compare-and-set on the version read by load
+
+Returns:
+Did you save successfully?"""
+        if not self.exists:
+            return True
+        self.data["last_activity"] = datetime.now().isoformat()
+        self._dirty.add("last_activity")
+        for _ in range(self.MAX_FLUSH_ATTEMPTS):
+            version = await SessionCacheManager.save_session_versioned(
+                self.session_id, self.data, self.version, prefix=self.manager.session_prefix)
+            if version is None:
+                return False
+            if version:
+                self.version = version
+                self._dirty.clear()
+                self._merges.clear()
+                return True
+            # Another writer changed the session during the turn: keep its fields, apply ours again
+            logger.warning(f"会话在本轮对话中被并发修改，合并后重新写入: {self.session_id}")
+            fresh, self.version = await SessionCacheManager.load_session_versioned(
+                self.session_id, prefix=self.manager.session_prefix)
+            if fresh is not None:
+                self.data = self._rebase(fresh)
+        logger.error(f"更新会话失败: 并发修改冲突 {self.session_id}")
+        return False
+
+
 class ChatSessionManager:
     """chat session manager
 
@@ -60,7 +166,7 @@ Session data dictionary, None if it doesn't exist"""
             return None
             
         # Loading a session from Redis
-        session_data = await SessionCacheManager.load_session(session_id)
+        session_data = await SessionCacheManager.load_session(session_id, prefix=self.session_prefix)
         
         # Update last active time
         if session_data:
@@ -69,23 +175,30 @@ Session data dictionary, None if it doesn't exist"""
             
         return session_data
     
-    async def create_session(self, session_id: Optional[str] = None, 
-                           memory_manager: Optional[EnhancedChatMemoryManager] = None,
-                           user_info: Optional[Dict[str, Any]] = None,
-                           additional_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Create a new session
+    async def begin_turn(self, session_id: str) -> SessionUnitOfWork:
+        """Load a session for one chat turn
 
 Args:
-session_id: Session ID, if empty, automatically generated
+session_id: Session ID
+
+Returns:
+Unit of work of the turn, flush it at the end of the turn"""
+        return await SessionUnitOfWork(self, session_id).load()
+
+    @staticmethod
+    def new_session_data(session_id: str, memory_manager: Optional[EnhancedChatMemoryManager] = None,
+                         user_info: Optional[Dict[str, Any]] = None,
+                         additional_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the data of a new session
+
+Args:
+session_id: Session ID
 memory_manager: Memory Manager
 user_info: User Information
 additional_data: Additional data
 
 Returns:
-Newly created session data"""
-        # Generate session ID
-        new_session_id = session_id or str(generate_id())
-        
+session data dictionary"""
         # If no memory manager is provided, create one
         if memory_manager is None:
             memory_manager = EnhancedChatMemoryManager(
@@ -93,23 +206,42 @@ Newly created session data"""
                 system_message="",
                 memory_type='buffer_window',
             )
-        
+
         # Create session data
         session_data = {
-            "id": new_session_id,
+            "id": session_id,
             "memory_manager": memory_manager,
             "created_at": datetime.now().isoformat(),
             "last_activity": datetime.now().isoformat(),
             "message_count": 0,
         }
-        
+
         # Add user information
         if user_info:
             session_data["user_info"] = user_info
-            
+
         # Add additional data
         if additional_data:
             session_data.update(additional_data)
+        return session_data
+
+    async def create_session(self, session_id: Optional[str] = None, 
+                           memory_manager: Optional[EnhancedChatMemoryManager] = None,
+                           user_info: Optional[Dict[str, Any]] = None,
+                           additional_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Create a new session
+
+Args:
+session_id: Session ID, if empty, automatically generated
+memory_manager: Memory Manager
+user_info: User Information
+additional_data: Additional data
+
+Returns:
+Newly created session data"""
+        # Generate session ID
+        new_session_id = session_id or str(generate_id())
+        session_data = self.new_session_data(new_session_id, memory_manager, user_info, additional_data)
         
         # Save to Redis
         await self.save_session(new_session_id, session_data)
@@ -136,7 +268,7 @@ Did you save successfully?"""
             session_data["last_activity"] = datetime.now().isoformat()
         
         # Save to Redis
-        return await SessionCacheManager.save_session(session_id, session_data)
+        return await SessionCacheManager.save_session(session_id, session_data, prefix=self.session_prefix)
     
     async def update_session(self, session_id: str, 
                            updates: Dict[str, Any], 
@@ -193,7 +325,7 @@ Whether the deletion was successful"""
         if not session_id:
             return False
             
-        return await SessionCacheManager.delete_session(session_id)
+        return await SessionCacheManager.delete_session(session_id, prefix=self.session_prefix)
     
     async def clear_session_data(self, session_id: str) -> bool:
         """Clear the session history, but keep the session itself
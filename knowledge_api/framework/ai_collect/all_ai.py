@@ -6,6 +6,7 @@ import json
 import time
 
 from knowledge_api.framework.ai_collect.base_llm import BaseLLM
+from knowledge_api.framework.ai_collect.function_call.tool_manager import ToolManager
 from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
 from knowledge_api.model.llm_token_model import LLMTokenResponse
 
@@ -283,7 +284,7 @@ Tuple: (tool_results, assistant_message, completion)"""
             model_to_use = model or self.model
             
             # Get tool definition
-            tool_configs = tools.get_openai_tools()
+            tool_configs = tools.get_all_tools()
             
             # Convert message
             langchain_messages = self._convert_to_langchain_messages(messages)
@@ -308,7 +309,7 @@ Tuple: (tool_results, assistant_message, completion)"""
             
             # If there is a tool call, handle the tool call
             if tool_calls:
-                tool_manager = ToolRegistry(tools)
+                tool_manager = ToolManager(tools)
                 tool_results = await tool_manager.handle_tool_calls_async(tool_calls)
                 
                 # Create assistant_message
@@ -26,7 +26,9 @@ format_response: Whether the response format is uniform, the default is True"""
         super().__init__(api_key, model=model, format_response=format_response, base_url=base_url)
         self.client = AsyncAnthropic(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            # Attempts are retried by the transport (BaseLLM._send) within its deadlines
+            max_retries=0
         )
         self.is_function_call = True
 
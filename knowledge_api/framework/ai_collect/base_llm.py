@@ -1,15 +1,65 @@
+import asyncio
+import os
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, List, AsyncGenerator, ClassVar, Type
+from typing import Optional, Dict, Any, List, AsyncGenerator, Awaitable, Callable, ClassVar, Tuple, Type
 import aiohttp
 from contextlib import asynccontextmanager
 import uuid
 import time
+import weakref
 from pydantic import BaseModel, Field, root_validator
 from decimal import Decimal
+from datetime import datetime
 
 from knowledge_api.framework.ai_collect.message import Message
+from knowledge_api.framework.ai_collect.function_call.tool_manager import ToolResultListener, tool_turn
 from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
+from knowledge_api.framework.ai_collect.transport import (
+    get_circuit_breaker, get_latency_tracker, get_transport_policy, is_retryable
+)
 from knowledge_api.model.llm_token_model import LLMTokenResponse
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+# Concurrent requests of this process to one provider when several agents generate at the same time
+LLM_PROVIDER_CONCURRENCY = int(os.environ.get("LLM_PROVIDER_CONCURRENCY", "8"))
+# Semaphores bind to the event loop they are first awaited on, so each loop has its own
+_provider_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def get_provider_semaphore(provider: Optional[str] = None) -> asyncio.Semaphore:
+    """Get the semaphore bounding the concurrent requests to a provider
+
+Args:
+Provider: llm_type of the client, None for clients of unknown type
+
+Returns:
+Asyncio. Semaphore: shared by all the callers of the provider on the running event loop"""
+    key = provider or "default"
+    semaphores = _provider_semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(key)
+    if semaphore is None:
+        semaphore = semaphores[key] = asyncio.Semaphore(LLM_PROVIDER_CONCURRENCY)
+    return semaphore
+
+
+async def _stream_until(first: Any, stream: AsyncGenerator[Any, None], deadline: float) -> AsyncGenerator[Any, None]:
+    """Yield the first chunk and the rest of a stream, raising asyncio.TimeoutError after the deadline"""
+    loop = asyncio.get_running_loop()
+    try:
+        if first is None:
+            return
+        yield first
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), max(0.0, deadline - loop.time()))
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        await stream.aclose()
 
 
 class BaseLLM(ABC):
@@ -20,6 +70,9 @@ class BaseLLM(ABC):
     # LLM type identifier (subclasses must override this attribute)
     llm_type: ClassVar[str] = None
 
+    # Whether _function_call_impl is implemented
+    supports_function_call: ClassVar[bool] = True
+
     # This method is automatically called when a subclass is created
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -40,9 +93,16 @@ format_response: Whether the response format is uniform, the default is True"""
         self.base_url = base_url
         self.format_response = format_response
         self._session = None
+        # Secondary provider for failover and hedged requests
+        self.fallback: Optional['BaseLLM'] = None
         self._initialize()
         self.is_function_call = False
 
+    @property
+    def provider_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore bounding the concurrent requests to the provider of this client"""
+        return get_provider_semaphore(self.llm_type)
+
     @abstractmethod
     def _initialize(self) -> None:
         """Initial model configuration"""
@@ -60,14 +120,163 @@ AioHTTPS. ClientSession: HTTP session object"""
                 use_dns_cache=True,
                 keepalive_timeout=60
             )
-            timeout = aiohttp.ClientTimeout(total=300)  # 5 minutes timeout
+            # Backstop only, the transport deadlines end the attempts earlier
+            timeout = aiohttp.ClientTimeout(total=get_transport_policy().total_timeout, sock_connect=10)
             self._session = aiohttp.ClientSession(
                 connector=connector,
                 timeout=timeout,
-                headers=self.headers
+                headers=self.headers,
+                # HTTP errors raise, so that 429/5xx are retried
+                raise_for_status=True
             )
         return self._session
 
+    async def _send(self, call: Callable[['BaseLLM'], Awaitable[Any]], deadline: float) -> Any:
+        """Send a request to this provider with per attempt deadline, jittered retries and circuit breaker
+
+The circuit breaker counts the outcome of the request after its retries, not every attempt.
+
+Args:
+Call: coroutine function doing one attempt with the given client
+Deadline: event loop time after which no attempt is started
+
+Returns:
+Result of the first successful attempt"""
+        loop = asyncio.get_running_loop()
+        policy = get_transport_policy()
+        breaker = get_circuit_breaker(self.llm_type)
+        trial = breaker.before_request()
+        attempt = 0
+        try:
+            while True:
+                started = loop.time()
+                try:
+                    result = await asyncio.wait_for(call(self), max(0.0, min(policy.attempt_timeout, deadline - started)))
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The provider answered, the request itself is wrong
+                        breaker.record_success(trial)
+                        raise
+                    attempt += 1
+                    delay = policy.backoff(attempt)
+                    if attempt > policy.max_retries or loop.time() + delay >= deadline:
+                        breaker.record_failure(trial)
+                        raise
+                    logger.warning(f"[{self.llm_type}] 请求失败 ({type(e).__name__}: {e})，{delay:.2f}秒后第 {attempt} 次重试")
+                    await asyncio.sleep(delay)
+                    continue
+                breaker.record_success(trial)
+                get_latency_tracker(self.llm_type).add(loop.time() - started)
+                return result
+        except asyncio.CancelledError:
+            breaker.release(trial)
+            raise
+
+    async def _send_with_failover(self, call: Callable[['BaseLLM'], Awaitable[Any]],
+                                  hedge: bool = False, failover: bool = True) -> Tuple['BaseLLM', Any]:
+        """Send a request, going to the secondary provider when this one keeps failing
+
+Args:
+Call: coroutine function doing one attempt with the given client
+Hedge: whether a slow request is also sent to the secondary provider (idempotent requests only)
+Failover: whether the secondary provider may answer the request
+
+Returns:
+Tuple: (client that answered, result)"""
+        policy = get_transport_policy()
+        deadline = asyncio.get_running_loop().time() + policy.total_timeout
+        if hedge and failover and self.fallback is not None and policy.hedge_percentile > 0:
+            threshold = get_latency_tracker(self.llm_type).percentile(policy.hedge_percentile, policy.hedge_min_samples)
+            if threshold is not None:
+                return await self._send_hedged(call, threshold, deadline)
+        try:
+            return self, await self._send(call, deadline)
+        except Exception as e:
+            if not failover or self.fallback is None or not is_retryable(e):
+                raise
+            logger.warning(f"[{self.llm_type}] 切换到备用供应商 {self.fallback.llm_type}: {type(e).__name__}: {e}")
+            return self.fallback, await self.fallback._send(call, deadline)
+
+    async def _send_hedged(self, call: Callable[['BaseLLM'], Awaitable[Any]], threshold: float,
+                           deadline: float) -> Tuple['BaseLLM', Any]:
+        """Send a request and, if it is still running after threshold seconds, the same request to the
+secondary provider. The first successful response wins, the other request is cancelled."""
+        tasks = {asyncio.ensure_future(self._send(call, deadline)): self}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done:
+                logger.info(f"[{self.llm_type}] {threshold:.2f}秒未响应，同时请求备用供应商 {self.fallback.llm_type}")
+                tasks[asyncio.ensure_future(self.fallback._send(call, deadline))] = self.fallback
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return tasks[task], task.result()
+                    error = task.exception()
+                    if len(tasks) == 1 and is_retryable(error):
+                        # This provider failed before the hedge, fail over
+                        logger.warning(f"[{self.llm_type}] 切换到备用供应商 {self.fallback.llm_type}: {type(error).__name__}: {error}")
+                        secondary = asyncio.ensure_future(self.fallback._send(call, deadline))
+                        tasks[secondary] = self.fallback
+                        pending.add(secondary)
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _open_stream(self, call: Callable[['BaseLLM'], AsyncGenerator[Any, None]], deadline: float,
+                           client: Optional['BaseLLM'] = None) -> Tuple['BaseLLM', Any, AsyncGenerator[Any, None]]:
+        """Start a stream whose first chunk arrives before the first token deadline
+
+Attempts are retried (and failed over) only until the first chunk, the content already sent to
+the caller cannot be taken back.
+
+Returns:
+Tuple: (client streaming, first chunk or None if the stream is empty, the stream)"""
+        client = client or self
+        loop = asyncio.get_running_loop()
+        policy = get_transport_policy()
+        breaker = get_circuit_breaker(client.llm_type)
+        attempt = 0
+        trial = False
+        try:
+            trial = breaker.before_request()
+            while True:
+                stream = call(client)
+                try:
+                    first = await asyncio.wait_for(
+                        stream.__anext__(), max(0.0, min(policy.first_token_timeout, deadline - loop.time())))
+                except StopAsyncIteration:
+                    first = None
+                except Exception as e:
+                    await stream.aclose()
+                    if not is_retryable(e):
+                        breaker.record_success(trial)
+                        raise
+                    attempt += 1
+                    delay = policy.backoff(attempt)
+                    if attempt > policy.max_retries or loop.time() + delay >= deadline:
+                        breaker.record_failure(trial)
+                        raise
+                    logger.warning(f"[{client.llm_type}] 流式请求失败 ({type(e).__name__}: {e})，{delay:.2f}秒后第 {attempt} 次重试")
+                    await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    await stream.aclose()
+                    raise
+                breaker.record_success(trial)
+                return client, first, stream
+        except asyncio.CancelledError:
+            breaker.release(trial)
+            raise
+        except Exception as e:
+            if client is self and self.fallback is not None and is_retryable(e):
+                logger.warning(f"[{self.llm_type}] 流式请求切换到备用供应商 {self.fallback.llm_type}: {type(e).__name__}: {e}")
+                return await self._open_stream(call, deadline, self.fallback)
+            raise
+
     @asynccontextmanager
     async def _get_streaming_response(self, url: str, payload: Dict) -> AsyncGenerator[str, None]:
         """Get a context manager for streaming responses
@@ -112,16 +321,19 @@ LLMTokenResponse: Standardized model response results"""
         # Record start time
         start_time = time.time()
         
-        # Call the actual API call of the subclass implementation
-        response_data = await self._chat_completion_impl(
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            **kwargs
+        # Call the actual API call of the subclass implementation (through the resilient transport)
+        client, response_data = await self._send_with_failover(
+            lambda llm: llm._chat_completion_impl(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            ),
+            hedge=True
         )
 
         # Log token statistics
-        price=await self._log_token_stats(response_data, start_time, messages, application_scenario)
+        price=await client._log_token_stats(response_data, start_time, messages, application_scenario)
         response_data.price = price
         return response_data
     
@@ -146,7 +358,7 @@ Dict [str, Any]: Raw model response result"""
         pass
 
     async def _log_token_stats(self, response: LLMTokenResponse, start_time=None, messages=None, application_scenario=None) -> float:
-        """Record token statistics and save to database
+        """Record token statistics and queue them for the background usage writer
 
 Args:
 Response: Standardized response results
@@ -160,19 +372,12 @@ application_scenario: Application Scenario Identification"""
         # Print basic information
         print(f"[{self.llm_type}] token statistics input={response.input_tokens}, output={response.output_tokens}, total={response.total_tokens}, take={elapsed:.2f}seconds")
         
-        # Attempt to save the record to the database
+        # Hand the record over to the background usage writer, no database I/O on the response path
         try:
             # Dynamic import to avoid circular dependencies
-            from knowledge_api.framework.database.database import get_session
-            from knowledge_api.mapper.llm_usage_records.crud import LLMUsageRecordCRUD
-            from knowledge_api.mapper.llm_usage_contexts.crud import LLMUsageContextCRUD
+            from knowledge_api.framework.ai_collect.usage_writer import get_usage_writer
             from knowledge_api.framework.redis.cache_manager import CacheManager
-            # Get database session
-            session = next(get_session())
-            
-            # Create master record
-            record_crud = LLMUsageRecordCRUD(session)
-            
+
             # Building responsive data
             response_data = {
                 "id": response.id,
@@ -197,33 +402,22 @@ application_scenario: Application Scenario Identification"""
             else:
                 # If no model configuration is found, set to 0.
                 response_data["total_price"] = 0.0
-            
-            # Create usage record
-            record = await record_crud.create_from_response(
-                response_data=response_data,
-                vendor_type=self.llm_type,
-                model_id=self.model,
-                application_scenario=application_scenario
-            )
-            
-            # If messages are provided, a context record is created
-            if messages and record:
-                context_crud = LLMUsageContextCRUD(session)
-                
-                # Prepare additional data
-                additional_data = {
+
+            get_usage_writer().submit({
+                "response_data": response_data,
+                "vendor_type": self.llm_type,
+                "model_id": self.model,
+                "application_scenario": application_scenario,
+                # Snapshot the messages, the caller keeps mutating its list after the call
+                "messages": [msg.to_dict() if isinstance(msg, Message) else dict(msg) for msg in messages] if messages else None,
+                "additional_data": {
                     "model_config": {
                         "model": self.model,
                         "vendor_type": self.llm_type
                     }
-                }
-                
-                # Create context record
-                await context_crud.create_from_messages(
-                    record_id=record.id,
-                    messages=messages,
-                    additional_data=additional_data
-                )
+                },
+                "created_at": datetime.utcnow().isoformat(),
+            })
             return response_data["total_price"]
                 
         except Exception as e:
@@ -238,28 +432,62 @@ application_scenario: Application Scenario Identification"""
         pass
 
     async def function_call(self, messages: List[Dict[str, str]], tools: ToolRegistry, model: str = "doubao-pro-32k-functioncall-241028"
-                            , application_scenario:str="base") -> (List[Dict[str, Any]], Dict[str, Any], LLMTokenResponse):
+                            , application_scenario:str="base",
+                            on_tool_result: Optional[ToolResultListener] = None) -> (List[Dict[str, Any]], Dict[str, Any], LLMTokenResponse):
         """function call interface
 
+The tool calls of the response run in parallel in the ToolManager of the provider. Inside an enclosing
+tool_turn the results of pure tools are reused across the function calls of the turn.
+Only the model request is retried (and failed over) within the transport deadlines: once the tool calls
+of the response were dispatched, the tools run to completion without deadline and are never sent again
+
 Args:
 Messages: conversation history
 Tools: tools regedit
 Model: model name
 application_scenario: application scenarios
+on_tool_result: Listener receiving each tool result as soon as its tool returns, the listener of the turn if None
 
 Returns:
 LLMTokenResponse: Standardized model response results"""
+        if not self.supports_function_call:
+            if self.fallback is None or not self.fallback.supports_function_call:
+                raise NotImplementedError(f"{self.llm_type} 不支持函数调用")
+            return await self.fallback.function_call(messages, tools, self.fallback.model, application_scenario,
+                                                     on_tool_result)
+
         # Record start time
         start_time = time.time()
-        # Call the actual API call of the subclass implementation
-        tool_results, assistant_message,completion = await self._function_call_impl(
-            messages=messages,
-            tools=tools,
-            model=model
-        )
+
+        async def request(llm: 'BaseLLM') -> asyncio.Future:
+            """One attempt, done when the response arrived or its tool calls were dispatched"""
+            with tool_turn(on_tool_result) as turn:
+                call = asyncio.ensure_future(llm._function_call_impl(
+                    messages=messages,
+                    tools=tools,
+                    # The model name belongs to this provider
+                    model=model if llm is self else llm.model
+                ))
+            dispatched = asyncio.ensure_future(turn.dispatched.wait())
+            try:
+                await asyncio.wait({call, dispatched}, return_when=asyncio.FIRST_COMPLETED)
+            except BaseException:
+                call.cancel()
+                raise
+            finally:
+                dispatched.cancel()
+            if call.done():
+                # Errors of the request itself are retried
+                call.result()
+            return call
+
+        # Not hedged, the tools run with the response
+        client, call = await self._send_with_failover(
+            request, failover=self.fallback is not None and self.fallback.supports_function_call)
+        tool_results, assistant_message, completion = await call
 
         # Log token statistics
-        price=await self._log_token_stats(completion, start_time, messages,f"{application_scenario}-function_call")
+        price=await client._log_token_stats(completion, start_time, messages,f"{application_scenario}-function_call")
         completion.price = price
         return tool_results, assistant_message,completion
 
@@ -289,14 +517,21 @@ LLMTokenResponse: Streaming response fragment"""
         last_chunk = None
         accumulated_content = ""
         
+        client = self
         # Call the streaming API call implemented by the subclass
         try:
-            async for chunk in self._chat_completion_stream_impl(
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                **kwargs
-            ):
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + get_transport_policy().total_timeout
+            client, first, stream = await self._open_stream(
+                lambda llm: llm._chat_completion_stream_impl(
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs
+                ),
+                deadline
+            )
+            async for chunk in _stream_until(first, stream, deadline):
 
                 # Set request time
                 current_time = time.time()
@@ -314,7 +549,7 @@ LLMTokenResponse: Streaming response fragment"""
             # Statistics after the end of the streaming response
             if last_chunk:
                 # Log token statistics
-                await self._log_token_stats(
+                await client._log_token_stats(
                     last_chunk,
                     start_time, 
                     messages, 
@@ -336,7 +571,7 @@ LLMTokenResponse: Streaming response fragment"""
             yield error_response
             
             # Log error statistics
-            await self._log_token_stats(error_response, start_time, messages, application_scenario)
+            await client._log_token_stats(error_response, start_time, messages, application_scenario)
 
 
     def _build_final_response_from_stream(self, last_chunk: Dict[str, Any], accumulated_content: str) -> Dict[str, Any]:
@@ -12,6 +12,8 @@ class DeepSeek(BaseLLM):
 
     # Set the LLM type identifier
     llm_type = "deepseek"
+    # _function_call_impl is not implemented, function calls never fail over to this provider
+    supports_function_call = False
 
 
     def __init__(self, api_key: str, model: str = "deepseek-chat", base_url: str = None, format_response: bool = True):
@@ -10,6 +10,8 @@ class ErnieBot(BaseLLM):
 
     # Set the LLM type identifier
     llm_type = "erniebot"
+    # _function_call_impl is not implemented, function calls never fail over to this provider
+    supports_function_call = False
     
 
     def __init__(self, api_key: str, model: str = "ernie-bot-8k", base_url: str = None, format_response: bool = True):
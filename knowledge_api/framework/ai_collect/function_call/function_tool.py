@@ -1,4 +1,5 @@
 from typing import Dict, List, Any, Callable, Optional, Union
+import asyncio
 import json
 import inspect
 from functools import wraps
@@ -10,18 +11,43 @@ class FunctionTool:
     def __init__(self,
                  func: Callable,
                  name: Optional[str] = None,
-                 description: Optional[str] = None):
+                 description: Optional[str] = None,
+                 pure: bool = False,
+                 idempotent: bool = False,
+                 timeout: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
         """Initialization Function Tool
 
 Args:
 Func: The function to encapsulate
 Name: function name, if not provided, use the original name of the function
-Description: Function description"""
+Description: Function description
+Pure: The result depends only on the arguments and the call has no side effect, results are reused within a turn
+Idempotent: Calling twice with the same arguments has the effect of calling once, identical calls of one step run once
+Timeout: Timeout (seconds) of one call, the default of the tool manager if None
+max_concurrency: Calls of this tool running at the same time, unlimited if None"""
         self.func = func
         self.name = name or func.__name__
         self.description = description or func.__doc__ or ""
+        self.pure = pure
+        self.idempotent = idempotent or pure
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
         self._parameters = self._extract_parameters()
 
+    @property
+    def is_async(self) -> bool:
+        """Whether the function is a coroutine function"""
+        return asyncio.iscoroutinefunction(self.func)
+
+    @property
+    def semaphore(self) -> Optional[asyncio.Semaphore]:
+        """Semaphore limiting the concurrent calls, None without limit"""
+        if self.max_concurrency and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
     def _extract_parameters(self) -> Dict[str, Any]:
         """Extracting parameter information from function signatures"""
         sig = inspect.signature(self.func)
@@ -81,6 +107,12 @@ Description: Function description"""
             self._parameters["properties"][param_name]["enum"] = enum_values
         return self
 
+    def set_parameter_items(self, param_name: str, items: Dict[str, Any]) -> 'FunctionTool':
+        """Set the JSON schema of the elements of an array parameter"""
+        if param_name in self._parameters["properties"]:
+            self._parameters["properties"][param_name]["items"] = items
+        return self
+
     def execute(self, **kwargs) -> Any:
         """execution function"""
         return self.func(**kwargs)
@@ -1,18 +1,113 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Awaitable, Callable, Iterator, Optional, Tuple, Union
 import json
+import os
+import copy
 import asyncio
+import inspect
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from knowledge_api.framework.ai_collect.function_call.function_tool import FunctionTool
 from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+# Default timeout (seconds) of one tool call, 0 without timeout
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "30"))
+# Tool calls of one tool manager running at the same time
+TOOL_MAX_CONCURRENCY = int(os.environ.get("TOOL_MAX_CONCURRENCY", "8"))
+
+# Receives each tool result message as soon as its tool returns
+ToolResultListener = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+class ToolTurn:
+    """Tool calls of one conversation turn
+
+Results of pure tools are reused by the identical calls of the following steps of the turn, and every tool
+result is passed to the listener as soon as its tool returns, before the other tools of the step finished"""
+
+    def __init__(self, on_result: Optional[ToolResultListener] = None, parent: Optional["ToolTurn"] = None):
+        """Initialize the turn
+
+Args:
+on_result: Listener of the tool results, synchronous or asynchronous, the listener of the parent if None
+Parent: Enclosing turn, whose results of pure tools are shared"""
+        self.on_result = on_result or (parent.on_result if parent else None)
+        self.results: Dict[Tuple[str, str], asyncio.Future] = parent.results if parent else {}
+        self.calls = 0
+        self.reused = 0
+        # Set when tool calls of this turn were dispatched, the model request can no longer be retried
+        self.dispatched = asyncio.Event()
+
+
+_current_tool_turn: ContextVar[Optional[ToolTurn]] = ContextVar("tool_turn", default=None)
+
+
+@contextmanager
+def tool_turn(on_result: Optional[ToolResultListener] = None) -> Iterator[ToolTurn]:
+    """Open a tool turn for the tool calls made inside the block (also by BaseLLM.function_call)
+A turn opened inside another one shares the results of its pure tools
+
+Args:
+on_result: Listener of the tool results, the listener of the enclosing turn if None
+
+Yields:
+ToolTurn: the turn"""
+    turn = ToolTurn(on_result, parent=_current_tool_turn.get())
+    token = _current_tool_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        _current_tool_turn.reset(token)
+
+
+def current_tool_turn() -> Optional[ToolTurn]:
+    """The tool turn of the current context, None outside tool_turn"""
+    return _current_tool_turn.get()
 
 
 class ToolManager:
-    """Tool manager to handle function calls for model requests"""
+    """Tool manager to handle function calls for model requests
+
+The tool calls of one model response run in parallel, each with the timeout and the concurrency limit
+declared on its tool. Identical calls of idempotent tools in one step run once, results of pure tools are
+reused within the turn"""
 
-    def __init__(self, registry: ToolRegistry):
+    def __init__(self, registry: ToolRegistry, timeout: float = TOOL_TIMEOUT,
+                 max_concurrency: int = TOOL_MAX_CONCURRENCY):
         """Initialization Tool Manager
 
 Args:
-Registry: tool regedit"""
+Registry: tool regedit
+Timeout: Default timeout (seconds) of one tool call, 0 without timeout
+max_concurrency: Tool calls running at the same time"""
         self.registry = registry
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    @staticmethod
+    def _parse_call(tool_call: Any) -> Optional[Tuple[str, str, Any]]:
+        """Read a tool call of the model (SDK object or dictionary)
+
+Returns:
+(tool_call_id, name, arguments), None if it is not a function call"""
+        if isinstance(tool_call, dict):
+            if tool_call.get("type", "function") != "function":
+                return None
+            function_call = tool_call.get("function") or {}
+            return tool_call.get("id"), function_call.get("name"), function_call.get("arguments")
+        if getattr(tool_call, "type", None) != "function":
+            return None
+        function_call = tool_call.function
+        return tool_call.id, function_call.name, function_call.arguments
+
+    @staticmethod
+    def _load_arguments(arguments: Any) -> Dict[str, Any]:
+        if isinstance(arguments, str):
+            return json.loads(arguments) if arguments.strip() else {}
+        return dict(arguments or {})
 
     def handle_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Processing tool calls returned by the model
@@ -23,116 +118,140 @@ tool_calls: List of tool calls returned by the model
 Returns:
 Tool call result list"""
         results = []
+        turn = _current_tool_turn.get()
+        if turn is not None:
+            turn.dispatched.set()
 
         for tool_call in tool_calls:
-            if tool_call.type == "function":
-                function_call = tool_call.function
-                tool_call_id = tool_call.id
-                name = function_call.name
-                arguments_str = function_call.arguments
-
-                try:
-                    # parsing parameters
-                    arguments = json.loads(arguments_str)
-
-                    # execution tool
-                    result = self.registry.execute_tool(name, **arguments)
-
-                    # Add result - return the original result directly without JSON serialization
-                    results.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call_id,
-                        "content": result
-                    })
-                except Exception as e:
-                    # Handle errors
-                    error_result = {"error": f"执行工具'{name}'时出错: {str(e)}"}
-                    results.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call_id,
-                        "content": error_result
-                    })
+            parsed = self._parse_call(tool_call)
+            if parsed is None:
+                continue
+            tool_call_id, name, arguments_str = parsed
+
+            try:
+                # parsing parameters
+                arguments = self._load_arguments(arguments_str)
+
+                # execution tool
+                result = self.registry.execute_tool(name, **arguments)
+
+                # Add result - return the original result directly without JSON serialization
+                results.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call_id,
+                    "content": result
+                })
+            except Exception as e:
+                # Handle errors
+                error_result = {"error": f"执行工具'{name}'时出错: {str(e)}"}
+                results.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call_id,
+                    "content": error_result
+                })
 
         return results
-        
-    async def handle_tool_calls_async(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Asynchronous processing of tool calls returned by the model
+
+    async def handle_tool_calls_async(self, tool_calls: List[Dict[str, Any]],
+                                      on_result: Optional[ToolResultListener] = None) -> List[Dict[str, Any]]:
+        """Asynchronous processing of tool calls returned by the model, the calls run in parallel
 
 Args:
 tool_calls: List of tool calls returned by the model
+on_result: Listener receiving each result as soon as its tool returns, the listener of the turn if None
 
 Returns:
-Tool call result list"""
-        results = []
-        tasks = []
+Tool call result list, in the order of the tool calls"""
+        # Outside tool_turn the results are only shared within this call
+        turn = _current_tool_turn.get() or ToolTurn()
+        turn.dispatched.set()
+        listener = on_result or turn.on_result
+        # Identical calls of idempotent tools in this step
+        step: Dict[Tuple[str, str], asyncio.Future] = {}
 
+        calls = []
         for tool_call in tool_calls:
-            if tool_call.type == "function":
-                function_call = tool_call.function
-                tool_call_id = tool_call.id
-                name = function_call.name
-                arguments_str = function_call.arguments
-
-                try:
-                    # parsing parameters
-                    arguments = json.loads(arguments_str)
-                    
-                    # Create asynchronous task
-                    task = self._execute_tool_async(name, tool_call_id, arguments)
-                    tasks.append(task)
-                except Exception as e:
-                    # Handle errors
-                    error_result = {"error": f"执行工具'{name}'时出错: {str(e)}"}
-                    results.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call_id,
-                        "content": error_result
-                    })
-
-        # Wait for all asynchronous tasks to complete
-        if tasks:
-            task_results = await asyncio.gather(*tasks, return_exceptions=True)
-            results.extend([r for r in task_results if r is not None])
+            parsed = self._parse_call(tool_call)
+            if parsed is not None:
+                calls.append(self._call(*parsed, turn=turn, step=step, listener=listener))
 
-        return results
-    
-    async def _execute_tool_async(self, name: str, tool_call_id: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a single tool call asynchronously
+        if not calls:
+            return []
+        return list(await asyncio.gather(*calls))
 
-Args:
-Name: tool name
-tool_call_id: Tool Call ID
-Arguments: tool parameters
+    async def _call(self, tool_call_id: str, name: str, arguments_str: Any, turn: ToolTurn,
+                    step: Dict[Tuple[str, str], asyncio.Future],
+                    listener: Optional[ToolResultListener]) -> Dict[str, Any]:
+        """Execute a single tool call and pass its result to the listener
 
 Returns:
 Tool call result"""
+        turn.calls += 1
         try:
-            # Check if the tool is an asynchronous function
             tool = self.registry.get_tool(name)
-            tool_function = tool.func
-            
-            # Execution tools (support synchronous and asynchronous)
-            if asyncio.iscoroutinefunction(tool_function):
-                # asynchronous execution
-                result = await tool_function(**arguments)
-            else:
-                # Synchronous execution (running in a thread pool to avoid blocking the event loop)
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(
-                    None, lambda: tool_function(**arguments)
-                )
-            
-            # Return the original result directly without JSON serialization
-            return {
-                "role": "tool",
-                "tool_call_id": tool_call_id,
-                "content": result
-            }
+            if not tool:
+                raise ValueError(f"未找到名为'{name}'的工具")
+            # parsing parameters
+            arguments = self._load_arguments(arguments_str)
+            content = await self._shared(tool, arguments, turn, step)
+        except asyncio.TimeoutError:
+            content = {"error": f"执行工具'{name}'超时"}
         except Exception as e:
             # Handle errors
-            error_result = {"error": f"执行工具'{name}'时出错: {str(e)}"}
-            return {
-                "role": "tool",
-                "tool_call_id": tool_call_id,
-                "content": error_result
-            }
\ No newline at end of file
+            content = {"error": f"执行工具'{name}'时出错: {str(e)}"}
+
+        # Return the original result directly without JSON serialization
+        result = {
+            "role": "tool",
+            "tool_call_id": tool_call_id,
+            "content": content
+        }
+        if listener is not None:
+            try:
+                notified = listener(result)
+                if inspect.isawaitable(notified):
+                    await notified
+            except Exception as e:
+                logger.error(f"推送工具结果出错 ({name}): {e}")
+        return result
+
+    async def _shared(self, tool: FunctionTool, arguments: Dict[str, Any], turn: ToolTurn,
+                      step: Dict[Tuple[str, str], asyncio.Future]) -> Any:
+        """Execute the call, or wait for the identical call of the step (idempotent tool) or of the turn (pure tool)"""
+        if not tool.idempotent:
+            return await self._execute(tool, arguments)
+
+        key = (tool.name, json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str))
+        shared = turn.results if tool.pure else step
+        future = shared.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._execute(tool, arguments))
+            shared[key] = future
+
+            def forget_failed(done: asyncio.Future) -> None:
+                # Failed calls are not reused
+                if done.cancelled() or done.exception() is not None:
+                    if shared.get(key) is done:
+                        del shared[key]
+
+            future.add_done_callback(forget_failed)
+        else:
+            turn.reused += 1
+        # The callers may modify their result, the shared result stays as the tool returned it
+        return copy.deepcopy(await asyncio.shield(future))
+
+    async def _execute(self, tool: FunctionTool, arguments: Dict[str, Any]) -> Any:
+        """Execute a single tool call asynchronously within the concurrency limits and the timeout
+
+A synchronous tool runs in a worker thread; when it times out its thread is left to finish in the background
+
+Returns:
+The original result of the tool"""
+        timeout = (tool.timeout or self.timeout) or None
+        async with self._semaphore:
+            async with tool.semaphore or nullcontext():
+                if tool.is_async:
+                    # asynchronous execution
+                    return await asyncio.wait_for(tool.func(**arguments), timeout)
+                # Synchronous execution (running in a thread pool to avoid blocking the event loop)
+                return await asyncio.wait_for(asyncio.to_thread(tool.func, **arguments), timeout)
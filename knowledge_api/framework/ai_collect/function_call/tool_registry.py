@@ -14,13 +14,15 @@ class ToolRegistry:
     def register(self,
                  func_or_tool: Union[Callable, FunctionTool],
                  name: Optional[str] = None,
-                 description: Optional[str] = None) -> FunctionTool:
+                 description: Optional[str] = None,
+                 **properties) -> FunctionTool:
         """Register a functional tool
 
 Args:
 func_or_tool: Function to register or existing FunctionTool instance
 Name: Function name (optional)
 Description: Function description (optional)
+**properties: Tool properties of a new FunctionTool (pure, idempotent, timeout, max_concurrency)
 
 Returns:
 Registered FunctionTool instance"""
@@ -31,21 +33,21 @@ Registered FunctionTool instance"""
             if description:
                 tool.description = description
         else:
-            tool = FunctionTool(func_or_tool, name, description)
+            tool = FunctionTool(func_or_tool, name, description, **properties)
 
         self.tools[tool.name] = tool
         return tool
 
-    def register_decorator(self, name: Optional[str] = None, description: Optional[str] = None):
+    def register_decorator(self, name: Optional[str] = None, description: Optional[str] = None, **properties):
         """Create a decorator to register function tools
 
 Usage:
-@tool_registry register_decorator (description = "Get weather info")
+@tool_registry register_decorator (description = "Get weather info", pure=True, timeout=5)
 Def get_weather (location: str, unit: str = "degrees celsius"):
 So..."""
 
         def decorator(func):
-            self.register(func, name, description)
+            self.register(func, name, description, **properties)
 
             @wraps(func)
             def wrapper(*args, **kwargs):
@@ -10,6 +10,8 @@ class Kimi(BaseLLM):
     
     # Set the LLM type identifier
     llm_type = "kimi"
+    # _function_call_impl is not implemented, function calls never fail over to this provider
+    supports_function_call = False
     
 
     def __init__(self, api_key: str, model: str = "kimi-v2", base_url: str = None, format_response: bool = True):
@@ -0,0 +1,208 @@
+"""Resilient transport of the LLM requests
+
+Every request of BaseLLM goes through this layer:
+
+- deadlines: a deadline per attempt (first token for streams) and a total deadline over all attempts
+- retries: retryable errors (timeouts, connection errors, HTTP 429/5xx) are retried with full jitter backoff
+- circuit breakers: per provider, a high rate of retryable failures opens the circuit and requests fail
+  fast (or go to the secondary provider) until a trial request succeeds
+- hedging: a non streaming request still running after the latency percentile of its provider is
+  also sent to the secondary provider, the first response wins
+
+All limits are read from environment variables, see .env.example."""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+# HTTP status codes worth another attempt
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker of a provider rejects a request"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"LLM供应商熔断中: {provider}, {retry_after:.1f}秒后重试")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class TransportPolicy:
+    """Deadlines, retries and hedging of the LLM requests"""
+    attempt_timeout: float = 60.0
+    first_token_timeout: float = 20.0
+    total_timeout: float = 120.0
+    max_retries: int = 2
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 8.0
+    breaker_failure_rate: float = 0.5
+    breaker_window: int = 50
+    breaker_min_requests: int = 20
+    breaker_reset: float = 30.0
+    hedge_percentile: float = 0.0
+    hedge_min_samples: int = 20
+
+    @classmethod
+    def from_env(cls) -> "TransportPolicy":
+        return cls(
+            attempt_timeout=float(os.environ.get("LLM_ATTEMPT_TIMEOUT", "60")),
+            first_token_timeout=float(os.environ.get("LLM_FIRST_TOKEN_TIMEOUT", "20")),
+            total_timeout=float(os.environ.get("LLM_TOTAL_TIMEOUT", "120")),
+            max_retries=int(os.environ.get("LLM_MAX_RETRIES", "2")),
+            retry_base_delay=float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5")),
+            retry_max_delay=float(os.environ.get("LLM_RETRY_MAX_DELAY", "8")),
+            breaker_failure_rate=float(os.environ.get("LLM_BREAKER_FAILURE_RATE", "0.5")),
+            breaker_window=int(os.environ.get("LLM_BREAKER_WINDOW", "50")),
+            breaker_min_requests=int(os.environ.get("LLM_BREAKER_MIN_REQUESTS", "20")),
+            breaker_reset=float(os.environ.get("LLM_BREAKER_RESET", "30")),
+            hedge_percentile=float(os.environ.get("LLM_HEDGE_PERCENTILE", "0")),
+            hedge_min_samples=int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20")),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter delay before the given retry (1 for the first retry)"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Circuit breaker of one provider (closed -> open -> half open -> closed)
+
+The circuit opens when the retryable failures reach failure_rate of the last window requests
+(at least min_requests of them), a single trial request is let through after reset_timeout."""
+
+    def __init__(self, provider: str, failure_rate: float, window: int, min_requests: int, reset_timeout: float):
+        self.provider = provider
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self.opened_at: Optional[float] = None
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_request(self) -> bool:
+        """Reserve a request, raises CircuitOpenError while the circuit is open
+
+Returns:
+bool: whether the request is the trial of the half open circuit, passed back with its outcome"""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(self.provider, retry_after)
+
+    def release(self, trial: bool = False) -> None:
+        """Give back a reserved request without outcome (cancelled)
+
+Only the request holding the trial frees it, other requests may still be running when it starts"""
+        if trial:
+            self._trial_running = False
+
+    def record_success(self, trial: bool = False) -> None:
+        if trial:
+            logger.info(f"LLM供应商熔断恢复: {self.provider}")
+            self.opened_at = None
+            self._outcomes.clear()
+            self._trial_running = False
+        self._outcomes.append(True)
+
+    def record_failure(self, trial: bool = False) -> None:
+        self._outcomes.append(False)
+        if trial:
+            self._trial_running = False
+            self.opened_at = time.monotonic()
+            return
+        if self.opened_at is None and len(self._outcomes) >= self.min_requests:
+            failures = self._outcomes.count(False)
+            if failures >= self.failure_rate * len(self._outcomes):
+                logger.warning(f"LLM供应商熔断开启: {self.provider}, 最近 {len(self._outcomes)} 次请求失败 {failures} 次")
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Latencies of the last successful requests of one provider"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int = 1) -> Optional[float]:
+        """Latency percentile, None while fewer than min_samples requests were measured"""
+        if len(self._samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed request is worth another attempt (or the secondary provider)"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, CircuitOpenError)):
+        return True
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    # aiohttp / SDK connection and timeout errors without a status code
+    name = type(error).__name__
+    return any(word in name for word in ("Timeout", "Connect", "Disconnected", "Payload", "RateLimit"))
+
+
+_policy: Optional[TransportPolicy] = None
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+
+
+def get_transport_policy() -> TransportPolicy:
+    """Get the transport policy, configured from environment variables"""
+    global _policy
+    if _policy is None:
+        _policy = TransportPolicy.from_env()
+    return _policy
+
+
+def set_transport_policy(policy: Optional[TransportPolicy]) -> None:
+    """Replace the transport policy and reset the breakers and latencies, None reads the environment variables again"""
+    global _policy
+    _policy = policy
+    _breakers.clear()
+    _latencies.clear()
+
+
+def get_circuit_breaker(provider: Optional[str]) -> CircuitBreaker:
+    """Get the circuit breaker shared by all clients of a provider"""
+    key = provider or "default"
+    breaker = _breakers.get(key)
+    if breaker is None:
+        policy = get_transport_policy()
+        breaker = _breakers[key] = CircuitBreaker(key, policy.breaker_failure_rate, policy.breaker_window,
+                                                  policy.breaker_min_requests, policy.breaker_reset)
+    return breaker
+
+
+def get_latency_tracker(provider: Optional[str]) -> LatencyTracker:
+    """Get the latency tracker shared by all clients of a provider"""
+    key = provider or "default"
+    tracker = _latencies.get(key)
+    if tracker is None:
+        tracker = _latencies[key] = LatencyTracker()
+    return tracker
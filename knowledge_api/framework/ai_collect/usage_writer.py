@@ -0,0 +1,364 @@
+"""LLM usage record writer
+
+Moves usage accounting off the response path: BaseLLM only enqueues a usage entry,
+a background thread drains the bounded queue and bulk-inserts LLMUsageRecord and
+LLMUsageContext rows every flush interval or batch size, together with their LLMUsageRollup
+increments in the same transaction. When the database is not available the batch is
+spilled to a local JSON lines file and replayed after the next successful flush. Entries that
+still fail after max_attempts replays are moved to a quarantine file next to the spill file."""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Whether a write failed because the database could not be reached rather than because of the data
+
+Args:
+error: exception raised by the write
+
+Returns:
+bool: True for connection, pool and server availability errors"""
+    if isinstance(error, (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError,
+                          ConnectionError, TimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and bool(error.connection_invalidated)
+
+
+class LLMUsageWriter:
+    """Bounded queue + background bulk writer for LLM usage records"""
+
+    def __init__(self,
+                 max_queue_size: int = 10000,
+                 batch_size: int = 200,
+                 flush_interval_ms: int = 500,
+                 spill_path: str = "./logs/llm_usage_spill.jsonl",
+                 max_attempts: int = 5):
+        """Initialize the writer
+
+Args:
+max_queue_size: Maximum number of pending entries, new entries are dropped when full
+batch_size: Maximum number of entries written in one transaction (M rows)
+flush_interval_ms: Maximum time an entry waits in the queue before a flush (N ms)
+spill_path: Local file used when the database is unavailable
+max_attempts: Failed replays of a spilled entry before it is quarantined"""
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.spill_path = spill_path
+        root, ext = os.path.splitext(spill_path)
+        self.quarantine_path = f"{root}.quarantine{ext or '.jsonl'}"
+        self.max_attempts = max(1, max_attempts)
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "enqueued": 0,
+            "dropped": 0,
+            "written_records": 0,
+            "written_contexts": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "quarantined": 0,
+            "last_flush_time": None,
+            "last_error": None,
+        }
+
+    def start(self) -> None:
+        """Start the background writer thread (idempotent)"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="llm-usage-writer", daemon=True)
+            self._thread.start()
+            logger.info("LLM usage writer started")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the writer, flushing every queued entry
+
+Args:
+timeout: Maximum time to wait for the final flush (seconds)"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Keep the reference, start() must not run a second writer next to this one
+            logger.warning(f"LLM使用记录写入线程未在{timeout}秒内退出，仍在后台写入")
+            return
+        self._thread = None
+        logger.info(f"LLM usage writer stopped, metrics: {self.get_metrics()}")
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """Enqueue a usage entry without blocking
+
+Args:
+entry: Usage entry, see BaseLLM._log_token_stats
+
+Returns:
+bool: False when the queue is full and the entry was dropped"""
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._incr("dropped")
+            return False
+        self._incr("enqueued")
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and counters"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["queue_depth"] = self._queue.qsize()
+        metrics["queue_capacity"] = self._queue.maxsize
+        metrics["spill_file_size"] = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+        metrics["quarantine_file_size"] = (os.path.getsize(self.quarantine_path)
+                                           if os.path.exists(self.quarantine_path) else 0)
+        metrics["running"] = self._thread is not None and self._thread.is_alive()
+        return metrics
+
+    def _incr(self, key: str, value: int = 1) -> None:
+        with self._metrics_lock:
+            self._metrics[key] += value
+
+    def _run(self) -> None:
+        """Writer loop: collect up to batch_size entries or until the flush interval expires"""
+        self._create_tables()
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+            if self._stop_event.is_set() and self._queue.empty():
+                break
+
+    @staticmethod
+    def _create_tables() -> None:
+        """Create the rollup table on first start, the raw tables already exist"""
+        try:
+            from knowledge_api.framework.database.database import get_engine
+            from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD
+            LLMUsageRollupCRUD.create_table(get_engine())
+        except Exception as e:
+            logger.error(f"创建LLM使用汇总表失败: {e}")
+
+    def _collect_batch(self) -> List[Dict[str, Any]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        """Write a batch, spilling it to the local file on failure"""
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            logger.error(f"写入LLM使用记录失败，已转存本地文件: {e}")
+            with self._metrics_lock:
+                self._metrics["failed_flushes"] += 1
+                self._metrics["last_error"] = str(e)
+            self._spill(batch)
+            return
+
+        with self._metrics_lock:
+            self._metrics["flushes"] += 1
+            self._metrics["last_flush_time"] = datetime.now().isoformat()
+        # The database is reachable again, replay what was spilled earlier
+        self._replay_spill()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Insert records, their contexts and their rollup increments in one transaction
+
+The rollup rebuild reads the raw rows and replaces the buckets, committing the increments with
+the rows means it never counts a row whose increment is added afterwards"""
+        # Dynamic import to avoid circular dependencies
+        from sqlmodel import Session
+        from knowledge_api.framework.database.database import get_engine
+        from knowledge_api.mapper.llm_usage_records.base import LLMUsageRecord
+        from knowledge_api.mapper.llm_usage_records.crud import LLMUsageRecordCRUD
+        from knowledge_api.mapper.llm_usage_contexts.base import LLMUsageContext
+        from knowledge_api.mapper.llm_usage_contexts.crud import LLMUsageContextCRUD
+        from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD
+
+        with Session(get_engine()) as session:
+            records = []
+            for entry in batch:
+                record_in = LLMUsageRecordCRUD.build_from_response(
+                    response_data=entry["response_data"],
+                    vendor_type=entry["vendor_type"],
+                    model_id=entry["model_id"],
+                    application_scenario=entry.get("application_scenario")
+                )
+                created_at = datetime.fromisoformat(entry["created_at"])
+                records.append(LLMUsageRecord(**record_in.model_dump(), created_at=created_at, updated_at=created_at))
+            session.add_all(records)
+            # Flush to obtain the generated record IDs for the contexts
+            session.flush()
+
+            contexts = []
+            for entry, record in zip(batch, records):
+                messages = entry.get("messages")
+                if not messages:
+                    continue
+                system_prompt, user_prompt = LLMUsageContextCRUD.extract_prompts(messages)
+                contexts.append(LLMUsageContext(
+                    record_id=record.id,
+                    messages=messages,
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    additional_data=entry.get("additional_data"),
+                    created_at=record.created_at,
+                    updated_at=record.created_at
+                ))
+            session.add_all(contexts)
+            # Keep the hourly/daily rollups in step with the raw records
+            LLMUsageRollupCRUD(session).upsert_records(records)
+            session.commit()
+
+        with self._metrics_lock:
+            self._metrics["written_records"] += len(records)
+            self._metrics["written_contexts"] += len(contexts)
+
+    def _spill(self, batch: List[Dict[str, Any]], count_spilled: bool = True) -> None:
+        if self._append(self.spill_path, batch) and count_spilled:
+            self._incr("spilled", len(batch))
+
+    def _quarantine(self, entries: List[Any]) -> None:
+        """Move entries that keep failing out of the spill file, they are kept for manual inspection"""
+        logger.error(f"{len(entries)}条LLM使用记录多次重放失败，已移至隔离文件 {self.quarantine_path}")
+        if self._append(self.quarantine_path, entries):
+            self._incr("quarantined", len(entries))
+
+    def _append(self, path: str, entries: List[Any]) -> bool:
+        if not entries:
+            return True
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            return True
+        except Exception as e:
+            logger.error(f"LLM使用记录转存失败，丢弃{len(entries)}条: {e}")
+            self._incr("dropped", len(entries))
+            return False
+
+    def _replay_spill(self) -> None:
+        """Re-insert spilled entries, keeping whatever still fails in the spill file
+
+When the database cannot be reached the replay stops and the remaining entries stay in the spill
+file as they are. A chunk rejected for its data is retried entry by entry, so that one bad entry
+does not hold back the others. Each entry rejected for its data counts an attempt, after
+max_attempts it is quarantined"""
+        if not os.path.exists(self.spill_path):
+            return
+        replay_path = f"{self.spill_path}.replay"
+        try:
+            os.replace(self.spill_path, replay_path)
+            with open(replay_path, "r", encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+            os.remove(replay_path)
+        except Exception as e:
+            logger.error(f"读取LLM使用记录转存文件失败: {e}")
+            return
+
+        entries, unreadable = [], []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                unreadable.append(line.strip())
+        if unreadable:
+            self._quarantine(unreadable)
+
+        replayed = 0
+        for i in range(0, len(entries), self.batch_size):
+            chunk = entries[i:i + self.batch_size]
+            try:
+                self._write_batch(chunk)
+                replayed += len(chunk)
+                continue
+            except Exception as e:
+                if _is_connection_error(e):
+                    logger.error(f"数据库不可用，停止重放LLM使用记录: {e}")
+                    self._spill(entries[i:], count_spilled=False)
+                    break
+                logger.error(f"重放LLM使用记录失败，逐条重试: {e}")
+
+            failed = []
+            for position, entry in enumerate(chunk):
+                try:
+                    self._write_batch([entry])
+                    replayed += 1
+                except Exception as e:
+                    if not _is_connection_error(e):
+                        failed.append(entry)
+                        continue
+                    logger.error(f"数据库不可用，停止重放LLM使用记录: {e}")
+                    self._retry_later(failed)
+                    self._spill(chunk[position:] + entries[i + self.batch_size:], count_spilled=False)
+                    break
+            else:
+                self._retry_later(failed)
+                continue
+            break
+
+        if replayed:
+            self._incr("replayed", replayed)
+            logger.info(f"已重放{replayed}条转存的LLM使用记录")
+
+    def _retry_later(self, entries: List[Dict[str, Any]]) -> None:
+        """Count a failed replay on the entries, spill them again or quarantine them after max_attempts"""
+        retry, quarantine = [], []
+        for entry in entries:
+            entry["_attempts"] = entry.get("_attempts", 0) + 1
+            (quarantine if entry["_attempts"] >= self.max_attempts else retry).append(entry)
+        if retry:
+            self._spill(retry, count_spilled=False)
+        if quarantine:
+            self._quarantine(quarantine)
+
+
+# global instance
+_usage_writer: Optional[LLMUsageWriter] = None
+_usage_writer_lock = threading.Lock()
+
+
+def get_usage_writer() -> LLMUsageWriter:
+    """Get the global usage writer, configured from environment variables"""
+    global _usage_writer
+    if _usage_writer is None:
+        with _usage_writer_lock:
+            if _usage_writer is None:
+                _usage_writer = LLMUsageWriter(
+                    max_queue_size=int(os.environ.get("LLM_USAGE_QUEUE_SIZE", "10000")),
+                    batch_size=int(os.environ.get("LLM_USAGE_BATCH_SIZE", "200")),
+                    flush_interval_ms=int(os.environ.get("LLM_USAGE_FLUSH_INTERVAL_MS", "500")),
+                    spill_path=os.environ.get("LLM_USAGE_SPILL_PATH", "./logs/llm_usage_spill.jsonl"),
+                    max_attempts=int(os.environ.get("LLM_USAGE_MAX_ATTEMPTS", "5")),
+                )
+    return _usage_writer
@@ -1,12 +1,14 @@
-from typing import Callable, List
-from fastapi import FastAPI, Request, Response
+from typing import List, Optional, Set
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+import os
 import re
 import asyncio
+import time
 
 from knowledge_api.framework.auth.jwt_utils import JWTUtils
-from knowledge_api.framework.auth.token_util import TokenUtil
+from knowledge_api.framework.auth.session_manager import get_session_manager, UserSession
 from knowledge_api.framework.exception.response_wrapper import StandardResponse
 from knowledge_api.utils.log_config import get_logger
 
@@ -21,142 +23,140 @@ AUTH_WHITELIST = [
     "/auth/register",
 ]
 
-class JWTAuthMiddleware(BaseHTTPMiddleware):
-    """JWT authentication middleware, intercept requests for JWT verification"""
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "*",
+    "Access-Control-Allow-Headers": "*",
+}
+
+
+class JWTAuthMiddleware:
+    """JWT authentication middleware, intercept requests for JWT verification (pure ASGI)
+
+The token is decoded once per request, the session is read through the short-TTL
+in-process cache of the session manager, and the session activity is written back
+to Redis at most once per activity_refresh_interval."""
 
     def __init__(
         self,
-        app: FastAPI,
-        exclude_paths: List[str] = None
+        app: ASGIApp,
+        exclude_paths: List[str] = None,
+        activity_refresh_interval: Optional[float] = None
     ):
-        super().__init__(app)
+        self.app = app
         self.exclude_paths = exclude_paths or AUTH_WHITELIST
         self._exclude_path_regexes = [re.compile(path) for path in self.exclude_paths]
+        self.activity_refresh_interval = activity_refresh_interval if activity_refresh_interval is not None \
+            else float(os.environ.get("AUTH_SESSION_ACTIVITY_INTERVAL", "60"))
+        # Running activity writes, referenced until they finish
+        self._refresh_tasks: Set[asyncio.Task] = set()
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Intercept processing requests
 
 Args:
-Request: request object
-call_next: subsequent processing functions
-
-Returns:
-Response: Response object"""
-        if request.method == "OPTIONS":
-            return await call_next(request)
-            
-        # Check if the request path is in the exclusion list
-        path = request.url.path
+Scope: ASGI connection scope
+Receive: ASGI receive channel
+Send: ASGI send channel"""
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
         # Check if the path matches the exclusion pattern
+        path = scope["path"]
         for pattern in self._exclude_path_regexes:
             if pattern.match(path):
-                return await call_next(request)
+                await self.app(scope, receive, send)
+                return
 
         # Check if the endpoint is skip_auth marked
-        endpoint = request.scope.get("endpoint", None)
-        if endpoint and hasattr(endpoint, "skip_auth") and endpoint.skip_auth:
-            return await call_next(request)
+        endpoint = scope.get("endpoint", None)
+        if endpoint and getattr(endpoint, "skip_auth", False):
+            await self.app(scope, receive, send)
+            return
 
         # Get JWT Token
-        auth_header = request.headers.get("Authorization")
+        auth_header = self._get_header(scope, b"authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            response = JSONResponse(
-                content=StandardResponse.error(
-                    message="unauthorized",
-                    code=401
-                ),
-                status_code=401
-            )
-            # Add CORS header
-            response.headers["Access-Control-Allow-Origin"] = "*"
-            response.headers["Access-Control-Allow-Methods"] = "*"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            return response
+            await self._reject(scope, receive, send, "unauthorized", 401)
+            return
 
         token = auth_header.replace("Bearer ", "")
 
-        # verification token
-        if not JWTUtils.verify_token(token):
-            response = JSONResponse(
-                content=StandardResponse.error(
-                    message="Invalid token",
-                    code=401
-                ),
-                status_code=401
-            )
-            # Add CORS header
-            response.headers["Access-Control-Allow-Origin"] = "*"
-            response.headers["Access-Control-Allow-Methods"] = "*"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            return response
-
-        # Parse the token to obtain basic user information
+        # Verify and parse the token in one pass
         try:
-            # Parsing JWT Token Data
             token_data = JWTUtils.decode_token(token)
-            
+        except HTTPException:
+            await self._reject(scope, receive, send, "Invalid token", 401)
+            return
+
+        state = scope.setdefault("state", {})
+        try:
             # Gets the session ID to verify that the session exists
             session_id = token_data.get("session_id")
-            
-            # Verify that session data exists
             if session_id:
-                # Use TokenUtil to get detailed session data
-                session = await TokenUtil.get_session(token)
-                
+                session = await get_session_manager().get_cached_session(session_id)
                 if not session:
                     # The session does not exist and may have expired or been deleted
-                    response = JSONResponse(
-                        content=StandardResponse.error(
-                            message="The session has expired or does not exist. Please log in again",
-                            code=50014
-                        ),
-                        status_code=401
+                    await self._reject(
+                        scope, receive, send,
+                        "The session has expired or does not exist. Please log in again", 50014
                     )
-                    response.headers["Access-Control-Allow-Origin"] = "*"
-                    response.headers["Access-Control-Allow-Methods"] = "*"
-                    response.headers["Access-Control-Allow-Headers"] = "*"
-                    return response
-                    
+                    return
+
                 # The session data is stored in the request state
-                request.state.session = session
-            
+                state["session"] = session
+                self._refresh_session_activity(session)
+
             # Store basic token data in the request state
-            request.state.token_data = token_data
-            request.state.token = token
-            
-            # Asynchronous refresh session active time (without waiting to complete to avoid blocking requests)
-            if session_id:
-                asyncio.create_task(self._refresh_session_activity(token))
-                
+            state["token_data"] = token_data
+            state["token"] = token
         except Exception as e:
             logger.error(f"token validation error: {str(e)}")
-            response = JSONResponse(
-                content=StandardResponse.error(
-                    message=f"token parsing error: {str(e)}",
-                    code=401
-                ),
-                status_code=401
-            )
-            # Add CORS header
-            response.headers["Access-Control-Allow-Origin"] = "*"
-            response.headers["Access-Control-Allow-Methods"] = "*"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            return response
+            await self._reject(scope, receive, send, f"token parsing error: {str(e)}", 401)
+            return
 
         # Proceed with the request
-        return await call_next(request)
-        
-    async def _refresh_session_activity(self, token: str):
-        """Refresh session active time
+        await self.app(scope, receive, send)
+
+    def _refresh_session_activity(self, session: UserSession) -> None:
+        """Refresh the session active time in the background, at most once per interval
 
 Args:
-Token: JWT token"""
+Session: session object"""
+        if time.time() - session.last_active_at < self.activity_refresh_interval:
+            return
+        # Mark the cached session now so concurrent requests do not schedule the same write
+        session.update_activity()
+        get_session_manager().mark_session_active(session.session_id, session.last_active_at)
+        task = asyncio.create_task(self._write_session_activity(session.copy()))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    @staticmethod
+    async def _write_session_activity(session: UserSession) -> None:
         try:
-            async with TokenUtil.refresh_session_context(token) as _:
-                pass  # Only update active time, no additional processing required
+            await get_session_manager().update_session(session, extend_ttl=True)
         except Exception as e:
             logger.warning(f"failed to refresh session active time: {str(e)}")
 
+    @staticmethod
+    def _get_header(scope: Scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", []):
+            if key.lower() == name:
+                return value.decode("latin-1")
+        return None
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, message: str, code: int) -> None:
+        """Send a 401 response in the standard format"""
+        response = JSONResponse(
+            content=StandardResponse.error(message=message, code=code),
+            status_code=401,
+            headers=CORS_HEADERS
+        )
+        await response(scope, receive, send)
+
 
 def setup_auth_middleware(app: FastAPI, exclude_paths: List[str] = None):
     """Set up authentication middleware to FastAPI application
@@ -168,4 +168,4 @@ exclude_paths: List of excluded paths (no authentication required)"""
     app.add_middleware(
         JWTAuthMiddleware,
         exclude_paths=exclude_paths
-    ) 
\ No newline at end of file
+    )
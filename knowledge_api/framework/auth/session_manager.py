@@ -1,7 +1,10 @@
 """Redis-based session management system
 Used to store user session information, used with the slimmed-down version of JWT"""
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+import copy
 import json
+import os
 import time
 from datetime import datetime, timedelta
 
@@ -91,6 +94,13 @@ UserSession: session object"""
             metadata=data.get("metadata", {})
         )
         
+    def copy(self) -> 'UserSession':
+        """Create an independent copy of the session
+
+Returns:
+UserSession: session object sharing no mutable data with this one"""
+        return UserSession.from_dict(copy.deepcopy(self.to_dict()))
+
     def update_activity(self):
         """Update last active time"""
         self.last_active_at = time.time()
@@ -108,14 +118,19 @@ Bool: Has it expired?"""
 class SessionManager:
     """Session manager for managing user sessions"""
     
-    def __init__(self, ttl: int = 14400):  # Default 4 hours
+    def __init__(self, ttl: int = 14400, local_cache_ttl: float = 5.0, local_cache_size: int = 10000):  # Default 4 hours
         """Initialize Session Manager
 
 Args:
-TTL: Session valid period (seconds)"""
+TTL: Session valid period (seconds)
+local_cache_ttl: How long a session read from Redis is reused in this process (seconds), 0 disables
+local_cache_size: Maximum number of sessions kept in the in-process cache"""
         self.prefix = "session"
         self.ttl = ttl
         self.cache = RedisCache(prefix=self.prefix, default_ttl=ttl)
+        self.local_cache_ttl = local_cache_ttl
+        self.local_cache_size = local_cache_size
+        self._local_cache: "OrderedDict[str, Tuple[float, UserSession]]" = OrderedDict()
         
     def _get_session_key(self, session_id: str) -> str:
         """Get session cache key
@@ -215,6 +230,48 @@ Optional [UserSession]: Session object, returns None if it does not exist"""
             logger.error(f"解析会话数据失败: {e}")
             return None
     
+    async def get_cached_session(self, session_id: str) -> Optional[UserSession]:
+        """Get session, served from the short-TTL in-process cache when possible
+
+Used on the authentication path: a deleted session stays visible to other worker
+processes for at most local_cache_ttl seconds.
+
+Args:
+session_id: Session ID
+
+Returns:
+Optional [UserSession]: Copy of the session object, returns None if it does not exist"""
+        entry = self._local_cache.get(session_id)
+        if entry is not None:
+            valid_until, session = entry
+            if valid_until > time.monotonic() and not session.is_expired():
+                return session.copy()
+            self._local_cache.pop(session_id, None)
+
+        session = await self.get_session(session_id)
+        if session:
+            self._cache_local(session)
+        return session
+
+    def mark_session_active(self, session_id: str, last_active_at: float) -> None:
+        """Set the last active time of the session in the in-process cache
+
+Args:
+session_id: Session ID
+last_active_at: Last active timestamp"""
+        entry = self._local_cache.get(session_id)
+        if entry is not None:
+            entry[1].last_active_at = last_active_at
+
+    def _cache_local(self, session: UserSession) -> None:
+        """Store a copy of a session in the in-process cache, evicting the oldest entries"""
+        if self.local_cache_ttl <= 0:
+            return
+        self._local_cache[session.session_id] = (time.monotonic() + self.local_cache_ttl, session.copy())
+        self._local_cache.move_to_end(session.session_id)
+        while len(self._local_cache) > self.local_cache_size:
+            self._local_cache.popitem(last=False)
+
     async def update_session(self, session: UserSession, extend_ttl: bool = True) -> bool:
         """Update session
 
@@ -233,6 +290,8 @@ Bool: whether the operation was successful"""
         # Save Session
         session_key = self._get_session_key(session.session_id)
         ttl = int(session.expire_at - time.time()) if session.expire_at else self.ttl
+        if session.session_id in self._local_cache:
+            self._cache_local(session)
         
         return await self.cache.set(
             session_key, 
@@ -256,6 +315,7 @@ Bool: whether the operation was successful"""
             await redis.srem(user_sessions_key, session_id)
         
         # Delete session
+        self._local_cache.pop(session_id, None)
         session_key = self._get_session_key(session_id)
         return await self.cache.delete(session_key)
     
@@ -352,6 +412,9 @@ SessionManager: Session Manager"""
     global _session_manager
     
     if _session_manager is None:
-        _session_manager = SessionManager()
+        _session_manager = SessionManager(
+            local_cache_ttl=float(os.environ.get("AUTH_SESSION_CACHE_TTL", "5")),
+            local_cache_size=int(os.environ.get("AUTH_SESSION_CACHE_SIZE", "10000")),
+        )
         
     return _session_manager 
\ No newline at end of file
@@ -65,7 +65,7 @@ Returns:
         # 4. If the guarantee is triggered, filter the cards corresponding to the rarity
         if is_guaranteed:
             print(f"[DEBUG] 触发保底，保底稀有度: {guaranteed_rarity}")
-            eligible_cards = [card for card in available_cards if card.rarity >= guaranteed_rarity]
+            eligible_cards = self._guarantee_candidates(available_cards, guaranteed_rarity)
             if not eligible_cards:
                 print(f"[DEBUG] 没有稀有度>={guaranteed_rarity}的卡牌，使用所有可用卡牌")
                 eligible_cards = available_cards  # If there is no card corresponding to rarity, choose from the available cards
@@ -162,9 +162,8 @@ Guaranteed logic:
                                               guarantee_status: Dict[str, Any]) -> Tuple[bool, int]:
         """Guaranteed inspection based on detailed status"""
         
-        rules = guarantee_rule.get('rules', [])
         # Dynamic sorting rules by rarity (from high to low), priority is given to checking high rarity guarantees
-        rules_sorted = sorted(rules, key=lambda x: x['guarantee_rarity'], reverse=True)
+        rules_sorted = self._sorted_guarantee_rules(guarantee_rule.get('rules', []))
         
         print(f"[DEBUG] 检查保底状态: {guarantee_status}")
         print(f"[DEBUG] 保底规则排序（按稀有度从高到低）: {[(r['guarantee_rarity'], r['count']) for r in rules_sorted]}")
@@ -180,13 +179,37 @@ Guaranteed logic:
             print(f"[DEBUG] 稀有度{rarity}: 总抽取{total_count}次, 间隔{interval}")
             
             # Check if the guarantee conditions are met: the upcoming extraction happens to be the guarantee point
-            if (total_count + 1) % interval == 0:
+            if self._is_guarantee_point(total_count, interval):
                 print(f"[DEBUG] 触发保底! 稀有度{rarity}, 原因: (total_count + 1) % interval == 0, {total_count + 1} % {interval} == 0")
                 return True, rarity
         
         print(f"[DEBUG] 未触发保底")
         return False, 0
 
+    @staticmethod
+    def _is_guarantee_point(total_count, interval):
+        """Whether the upcoming draw (after total_count draws) is a guarantee point
+
+Works on plain integers as well as NumPy arrays, so the offline simulator
+shares the exact same guarantee condition."""
+        return (total_count + 1) % interval == 0
+
+    @staticmethod
+    def _sorted_guarantee_rules(rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Guarantee rules sorted by rarity (from high to low)"""
+        return sorted(rules, key=lambda x: x['guarantee_rarity'], reverse=True)
+
+    @staticmethod
+    def _guarantee_candidates(available_cards: List[CardAlg], guarantee_rarity: int) -> List[CardAlg]:
+        """Cards eligible for a guarantee of the given rarity (this rarity and above)"""
+        return [card for card in available_cards if card.rarity >= guarantee_rarity]
+
+    @staticmethod
+    def _card_weights(cards: List[CardAlg], probability_rules: Dict[str, Any]) -> List[float]:
+        """Actual weight of each card: base weight × rarity multiplier (default 1.0)"""
+        rarity_multiplier = probability_rules.get('weight_calculation', {}).get('rarity_multiplier', {})
+        return [card.weight * rarity_multiplier.get(str(card.rarity), 1.0) for card in cards]
+
     def get_next_guarantee_info(self,
                                 draw_records: List[Dict[str, Any]],
                                 probability_rules: Dict[str, Any]) -> Dict[str, Any]:
@@ -245,10 +268,9 @@ A dictionary containing information on the next guarantee for each rarity"""
         print(f"[DEBUG] 可用卡牌稀有度: {sorted(available_rarities)}")
         print(f"[DEBUG] 配置的稀有度倍率: {rarity_multiplier}")
 
-        for card in cards:
+        for card, actual_weight in zip(cards, self._card_weights(cards, probability_rules)):
             # Get the rarity magnification dynamically, use the default value of 1.0 if not configured
             multiplier = rarity_multiplier.get(str(card.rarity), 1.0)
-            actual_weight = card.weight * multiplier
 
             weighted_cards.append((card, actual_weight))
             total_weight += actual_weight
@@ -276,12 +298,9 @@ A dictionary containing information on the next guarantee for each rarity"""
 
         total_weight = 0
         card_weights = {}
-        rarity_multiplier = probability_rules.get('weight_calculation', {}).get('rarity_multiplier', {})
 
         # Calculate the total weight
-        for card in cards:
-            multiplier = rarity_multiplier.get(str(card.rarity), 1.0)
-            actual_weight = card.weight * multiplier
+        for card, actual_weight in zip(cards, self._card_weights(cards, probability_rules)):
             card_weights[card.id] = actual_weight
             total_weight += actual_weight
 
@@ -504,7 +523,7 @@ Returns:
 
         # Stage 4: Card Pool Screening
         if is_guaranteed:
-            candidate_cards = [card for card in available_cards if card.rarity >= guarantee_rarity]
+            candidate_cards = self._guarantee_candidates(available_cards, guarantee_rarity)
             if not candidate_cards:
                 candidate_cards = available_cards
                 is_guaranteed = False
@@ -0,0 +1,259 @@
+"""Blind Box Monte-Carlo Simulator
+
+Offline verification of a blind box configuration: runs a large number of draws
+through the guarantee and weight logic of BlindBoxEngine without touching the
+database, and reports the empirical rarity distribution, the guarantee trigger
+rate and the simulation throughput.
+
+Usage:
+    python -m knowledge_api.framework.blind_box.blind_box_simulator \\
+        --cards cards.json --rules rules.json --users 10000 --draws 200
+
+    python -m pytest benchmarks/test_blind_box_simulator_benchmark.py --benchmark-only
+"""
+import argparse
+import json
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from knowledge_api.framework.blind_box.blind_box_algorithm import BlindBoxEngine
+from knowledge_api.mapper.card.base import CardAlg
+
+
+class BlindBoxSimulator:
+    """Vectorized blind box draw simulator"""
+
+    def __init__(self,
+                 cards: List[CardAlg],
+                 probability_rules: Dict[str, Any],
+                 sold_out_card_ids: Optional[List[int]] = None,
+                 history_limit: Optional[int] = None,
+                 random_seed: Optional[int] = None):
+        """Initialize the simulator
+
+Args:
+cards: List of all cards under the blind box
+probability_rules: Probability Rules
+sold_out_card_ids: List of sold out card IDs
+history_limit: Cap the number of draw records seen by the guarantee check
+(draw_card_with_sql_optimization reads at most 120 records), None means unlimited
+random_seed: Random seeds, used for reproducible simulations"""
+        self.engine = BlindBoxEngine(random_seed)
+        self.probability_rules = probability_rules
+        self.history_limit = history_limit
+        self.rng = np.random.default_rng(random_seed)
+
+        self.available_cards = self.engine._filter_available_cards(cards, sold_out_card_ids or [])
+        if not self.available_cards:
+            raise ValueError("No cards to draw")
+
+        self.card_ids = np.array([card.id for card in self.available_cards], dtype=np.int64)
+        self.card_rarities = np.array([card.rarity for card in self.available_cards], dtype=np.int64)
+        self.guarantee_rules = self.engine._sorted_guarantee_rules(
+            probability_rules.get('guarantee_rule', {}).get('rules', [])
+        ) if probability_rules.get('guarantee_rule', {}).get('enabled', False) else []
+
+        # Pre-compute the candidate pool (indices into available_cards + cumulative weights) per guarantee rarity
+        self._pools = {0: self._build_pool(self.available_cards)}
+        # Guarantee rarities with at least one eligible card, the others never trigger
+        self._guaranteed_rarities = set()
+        for rule in self.guarantee_rules:
+            rarity = rule['guarantee_rarity']
+            candidates = self.engine._guarantee_candidates(self.available_cards, rarity)
+            # Same fallback as the engine: no matching card means the whole pool is used, not guaranteed
+            self._pools[rarity] = self._build_pool(candidates or self.available_cards)
+            if candidates:
+                self._guaranteed_rarities.add(rarity)
+
+    def _build_pool(self, cards: List[CardAlg]) -> Dict[str, np.ndarray]:
+        """Candidate indices and cumulative weights for a card pool"""
+        index_by_id = {card.id: i for i, card in enumerate(self.available_cards)}
+        weights = np.asarray(self.engine._card_weights(cards, self.probability_rules), dtype=np.float64)
+        return {
+            'indices': np.array([index_by_id[card.id] for card in cards], dtype=np.int64),
+            'cumulative': np.cumsum(weights),
+        }
+
+    def guarantee_schedule(self, draws_per_user: int) -> np.ndarray:
+        """Guaranteed rarity of each draw position (0 = no guarantee) for a fresh user
+
+Args:
+draws_per_user: Number of consecutive draws of one user
+
+Returns:
+Array of length draws_per_user"""
+        total_counts = np.arange(draws_per_user, dtype=np.int64)
+        if self.history_limit is not None:
+            total_counts = np.minimum(total_counts, self.history_limit)
+
+        schedule = np.zeros(draws_per_user, dtype=np.int64)
+        # Rules are sorted from high to low rarity, the first matching rule wins
+        for rule in self.guarantee_rules:
+            hit = (schedule == 0) & self.engine._is_guarantee_point(total_counts, rule['count'])
+            schedule[hit] = rule['guarantee_rarity']
+        return schedule
+
+    def _select(self, rarity: int, count: int) -> np.ndarray:
+        """Weighted selection of `count` cards from the pool of the given guarantee rarity"""
+        pool = self._pools[rarity]
+        cumulative = pool['cumulative']
+        random_values = self.rng.random(count) * cumulative[-1]
+        # Same rule as _weighted_random_select: first card whose cumulative weight >= random value
+        positions = np.searchsorted(cumulative, random_values, side='left')
+        np.minimum(positions, len(cumulative) - 1, out=positions)
+        return pool['indices'][positions]
+
+    def run(self, users: int, draws_per_user: int, batch_users: int = 10000) -> Dict[str, Any]:
+        """Run the simulation
+
+Args:
+users: Number of simulated users
+draws_per_user: Number of draws of each user
+batch_users: Users simulated per vectorized batch (bounds memory usage)
+
+Returns:
+Simulation report"""
+        schedule = self.guarantee_schedule(draws_per_user)
+        guaranteed_positions = {
+            rarity: np.flatnonzero(schedule == rarity) for rarity in self._pools
+        }
+
+        card_counts = np.zeros(len(self.available_cards), dtype=np.int64)
+        start = time.perf_counter()
+
+        remaining = users
+        while remaining > 0:
+            batch = min(batch_users, remaining)
+            remaining -= batch
+            drawn = np.empty((batch, draws_per_user), dtype=np.int64)
+            for rarity, positions in guaranteed_positions.items():
+                if positions.size == 0:
+                    continue
+                drawn[:, positions] = self._select(rarity, batch * positions.size).reshape(batch, positions.size)
+            card_counts += np.bincount(drawn.ravel(), minlength=len(self.available_cards))
+
+        elapsed = time.perf_counter() - start
+        total_draws = users * draws_per_user
+        return self._build_report(card_counts, schedule, users, total_draws, elapsed)
+
+    def _build_report(self,
+                      card_counts: np.ndarray,
+                      schedule: np.ndarray,
+                      users: int,
+                      total_draws: int,
+                      elapsed: float) -> Dict[str, Any]:
+        """Assemble the simulation report"""
+        expected = self.engine.calculate_probability_display(self.available_cards, self.probability_rules)
+
+        rarity_distribution = {}
+        for rarity in sorted(set(self.card_rarities.tolist())):
+            count = int(card_counts[self.card_rarities == rarity].sum())
+            rarity_distribution[rarity] = {
+                'count': count,
+                'rate': count / total_draws * 100 if total_draws else 0.0,
+            }
+
+        card_distribution = {
+            int(card_id): {
+                'count': int(count),
+                'rate': count / total_draws * 100 if total_draws else 0.0,
+                'base_rate': expected.get(int(card_id), 0.0),
+            }
+            for card_id, count in zip(self.card_ids, card_counts)
+        }
+
+        guarantee_triggers = {
+            rule['guarantee_rarity']: int((schedule == rule['guarantee_rarity']).sum()) * users
+            if rule['guarantee_rarity'] in self._guaranteed_rarities else 0
+            for rule in self.guarantee_rules
+        }
+        guaranteed_draws = sum(guarantee_triggers.values())
+
+        return {
+            'users': users,
+            'total_draws': total_draws,
+            'elapsed_seconds': elapsed,
+            'draws_per_second': total_draws / elapsed if elapsed > 0 else float('inf'),
+            'rarity_distribution': rarity_distribution,
+            'card_distribution': card_distribution,
+            'guarantee_triggers': guarantee_triggers,
+            'guarantee_trigger_rate': guaranteed_draws / total_draws * 100 if total_draws else 0.0,
+        }
+
+
+def simulate(cards: List[CardAlg],
+             probability_rules: Dict[str, Any],
+             users: int = 10000,
+             draws_per_user: int = 100,
+             history_limit: Optional[int] = None,
+             random_seed: Optional[int] = None) -> Dict[str, Any]:
+    """Convenience wrapper: validate the rules and run one simulation
+
+Returns:
+Simulation report, including the validate_probability_rules result"""
+    simulator = BlindBoxSimulator(cards, probability_rules, history_limit=history_limit, random_seed=random_seed)
+    report = simulator.run(users, draws_per_user)
+    report['validation'] = simulator.engine.validate_probability_rules(probability_rules, cards)
+    return report
+
+
+def _load_cards(path: str) -> List[CardAlg]:
+    """Load cards from a JSON list of {id, name, rarity, weight, ...}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    return [
+        CardAlg(**{'series_id': 0, 'name': f"card_{item['id']}", **item})
+        for item in items
+    ]
+
+
+def _format_report(report: Dict[str, Any]) -> str:
+    """Human readable report for the CLI"""
+    lines = [
+        f"Users: {report['users']}, draws: {report['total_draws']}",
+        f"Elapsed: {report['elapsed_seconds']:.3f}s ({report['draws_per_second']:,.0f} draws/sec)",
+        f"Guarantee trigger rate: {report['guarantee_trigger_rate']:.4f}%",
+        "Rarity distribution:",
+    ]
+    for rarity, item in report['rarity_distribution'].items():
+        lines.append(f"  rarity {rarity}: {item['count']} ({item['rate']:.4f}%)")
+    for rarity, count in report['guarantee_triggers'].items():
+        lines.append(f"  guarantee rarity {rarity}: {count} triggers")
+    validation = report.get('validation')
+    if validation:
+        for key in ('errors', 'warnings', 'suggestions'):
+            for message in validation[key]:
+                lines.append(f"[{key}] {message}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Blind box Monte-Carlo simulator")
+    parser.add_argument('--cards', required=True, help="JSON file with the card list")
+    parser.add_argument('--rules', help="JSON file with probability rules (generated from the cards if omitted)")
+    parser.add_argument('--users', type=int, default=10000, help="Number of simulated users")
+    parser.add_argument('--draws', type=int, default=100, help="Draws per user")
+    parser.add_argument('--history-limit', type=int, default=None,
+                        help="Records visible to the guarantee check (120 mirrors the SQL draw path)")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    parser.add_argument('--json', action='store_true', help="Print the raw JSON report")
+    args = parser.parse_args(argv)
+
+    cards = _load_cards(args.cards)
+    if args.rules:
+        with open(args.rules, 'r', encoding='utf-8') as f:
+            probability_rules = json.load(f)
+    else:
+        probability_rules = BlindBoxEngine().generate_dynamic_probability_rules(cards)
+
+    report = simulate(cards, probability_rules, args.users, args.draws, args.history_limit, args.seed)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        print(_format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from typing import AsyncGenerator, Generator
 from functools import lru_cache
 import threading
 import uuid
 import logging
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 from knowledge_api.framework.database.db_config import get_db_settings
 
@@ -45,6 +47,29 @@ SQLAlchemy engine instance"""
     return engine
 
 
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    """Create and return the async database engine (aiomysql / asyncpg), cached like get_engine
+
+Queries issued through this engine do not block the event loop, so a slow query
+only delays the request that issued it.
+
+Returns:
+SQLAlchemy async engine instance"""
+    return create_async_engine(
+        db_settings.ASYNC_DATABASE_URL,
+        echo=db_settings.DB_ECHO,
+        echo_pool=db_settings.DB_ECHO_POOL,
+        # connection pool configuration
+        pool_size=db_settings.DB_POOL_SIZE,
+        max_overflow=db_settings.DB_MAX_OVERFLOW,
+        pool_recycle=db_settings.DB_POOL_RECYCLE,
+        pool_pre_ping=db_settings.DB_POOL_PRE_PING,
+        pool_timeout=db_settings.DB_POOL_TIMEOUT,
+        connect_args=db_settings.CONNECT_ARGS
+    )
+
+
 def create_db_and_tables():
     """* Create data databases & tables for all models
 */"""
@@ -62,6 +87,42 @@ def get_session() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Async session dependency, for FastAPI dependency injection, each request gets an independent session
+
+Objects are not expired on commit so that returned models can still be serialized
+after the CRUD method committed.
+
+Yields:
+Async database session object"""
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+@asynccontextmanager
+async def async_session_scope() -> AsyncGenerator[AsyncSession, None]:
+    """Async session context manager for code outside of a request (tasks, websockets)
+
+Commits on success, rolls back on any exception and always closes the session.
+
+Yields:
+Async database session object"""
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def dispose_async_engine():
+    """Close every connection of the async engine pool (called at shutdown)"""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+        get_async_engine.cache_clear()
+
+
 def get_thread_local_session():
     """Get the session object of the current thread and create a new one if it doesn't exist
 Warning: To use this method, you need to close the session manually
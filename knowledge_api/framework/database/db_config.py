@@ -39,6 +39,16 @@ class DatabaseSettings(BaseSettings):
         else:
             raise ValueError(f"不支持的数据库引擎: {self.DB_ENGINE}")
     
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """Build the connection URL of the async engine (aiomysql / asyncpg drivers)"""
+        if self.DB_ENGINE == "mysql":
+            return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        elif self.DB_ENGINE == "postgresql":
+            return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        else:
+            raise ValueError(f"不支持的数据库引擎: {self.DB_ENGINE}")
+
     @property
     def CONNECT_ARGS(self) -> dict:
         """Get connection parameters"""
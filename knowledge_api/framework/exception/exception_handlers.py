@@ -8,7 +8,7 @@ import logging
 
 from .error_codes import get_error_message
 from .custom_exceptions import BusinessException
-from knowledge_api.framework.exception.response_wrapper import StandardResponse
+from knowledge_api.framework.exception.response_wrapper import StandardResponse, StandardJSONResponse
 
 # configuration log
 logger = logging.getLogger(__name__)
@@ -35,7 +35,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException)
     logger.error(f"HTTP异常: {exc.status_code} - {message}")
     
     # Return response
-    response = JSONResponse(
+    response = StandardJSONResponse(
         status_code=exc.status_code,
         content=response_data
     )
@@ -72,7 +72,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     logger.error(f"参数验证异常: {details}")
     
     # Return response
-    response = JSONResponse(
+    response = StandardJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=response_data
     )
@@ -99,7 +99,7 @@ async def business_exception_handler(request: Request, exc: BusinessException) -
     logger.error(f"业务异常: {exc.business_code} - {exc.detail}")
     
     # Return response
-    response = JSONResponse(
+    response = StandardJSONResponse(
         status_code=exc.status_code,
         content=response_data
     )
@@ -130,7 +130,7 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
     logger.error(f"未处理异常: {str(exc)}")
     logger.error(traceback.format_exc())
     
-    # Return response
+    # Return response (sent by the outermost error middleware, so no route level marker)
     response = JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content=response_data
@@ -1,8 +1,7 @@
-from fastapi import FastAPI, Response
+from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from typing import Any, Dict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, Dict, List, Optional
 import logging
 import json
 
@@ -11,6 +10,9 @@ from knowledge_api.framework.exception.error_codes import get_error_message
 # configuration log
 logger = logging.getLogger(__name__)
 
+# Internal marker set by StandardJSONResponse, stripped by the middleware before the response leaves the app
+WRAPPED_HEADER = b"x-standard-response"
+
 
 class StandardResponse:
     """standard response format encapsulation"""
@@ -26,7 +28,7 @@ class StandardResponse:
             "message": message,
             "data": data
         }
-    
+
     @staticmethod
     def error(message: str = "Operation failed", code: int = 500, data: Any = None) -> Dict:
         """error response
@@ -40,112 +42,140 @@ class StandardResponse:
             "data": data
         }
 
+    @staticmethod
+    def is_standard(content: Any) -> bool:
+        """Whether the content already is in the standard format
+: param content: response content
+: return: True if it has code and message"""
+        return isinstance(content, dict) and "code" in content and "message" in content
+
+    @staticmethod
+    def wrap(content: Any, status_code: int) -> Any:
+        """Package response content in the standard format
+: param content: response content (already JSON compatible)
+: param status_code: HTTP status code
+: return: standard response format"""
+        # Check if it is already in standard format
+        if StandardResponse.is_standard(content):
+            return content
+
+        # successful response
+        if status_code == 200:
+            return StandardResponse.success(data=content)
+
+        # Error response, if there is an error message in the JSON body, use it first
+        message = get_error_message(status_code)
+        has_detail = isinstance(content, dict) and "detail" in content
+        if has_detail:
+            message = content.get("detail", message)
+        return StandardResponse.error(
+            message=message,
+            code=status_code,
+            data=None if has_detail else content
+        )
+
+
+class StandardJSONResponse(JSONResponse):
+    """JSON response that builds the standard envelope while rendering
+
+Used as the default response class of the app, so the route result is wrapped
+before it is serialized once, and the middleware never has to parse the body."""
+
+    def init_headers(self, headers=None) -> None:
+        super().init_headers(headers)
+        self.raw_headers.append((WRAPPED_HEADER, b"1"))
+
+    def render(self, content: Any) -> bytes:
+        # Starlette sets status_code before calling render()
+        return super().render(StandardResponse.wrap(content, self.status_code))
+
+
+class ResponseWrapperMiddleware:
+    """Response Format Unified Processing Middleware (pure ASGI)
+
+Responses rendered by StandardJSONResponse are passed through untouched. Only JSON
+responses built elsewhere (an endpoint returning its own JSONResponse, the router's
+404/405) are buffered and packaged here."""
+
+    skip_paths = ("/docs", "/redoc", "/openapi.json", "/static")
 
-class ResponseWrapperMiddleware(BaseHTTPMiddleware):
-    """Response Format Unified Processing Middleware"""
-    
-    async def dispatch(self, request: Request, call_next) -> Response:
-        """request distribution
-: param request: request object
-: Param call_next: next middleware
-: return: response object"""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Skip paths that do not require processing
-        if self._should_skip_by_path(request):
-            return await call_next(request)
-        
-        # execution request
-        response = await call_next(request)
-        
-        # Skip responses that do not require processing
-        if self._should_skip_by_response(response):
-            return response
-        
-        # Try packaging response
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_paths):
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                if any(key == WRAPPED_HEADER for key, _ in headers):
+                    # Already packaged at route level, only drop the internal marker
+                    message["headers"] = [(k, v) for k, v in headers if k != WRAPPED_HEADER]
+                    passthrough = True
+                    await send(message)
+                elif not self._is_json(headers):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                await self._send_wrapped(start_message, b"".join(chunks), send)
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _is_json(headers) -> bool:
+        """Only JSON responses are packaged"""
+        for key, value in headers:
+            if key.lower() == b"content-type":
+                return b"application/json" in value.lower()
+        return False
+
+    @staticmethod
+    async def _send_wrapped(start_message: Message, body: bytes, send: Send) -> None:
+        """Package a buffered JSON body and send it"""
+        status_code = start_message["status"]
         try:
-            # Read response content
-            body = b""
-            async for chunk in response.body_iterator:
-                body += chunk
-            
-            # Parsing JSON
             json_body = json.loads(body)
-            
-            # Check if it is already in standard format
-            if isinstance(json_body, dict) and "code" in json_body and "message" in json_body:
-                # It already conforms to the standard format, recreate the response
-                return Response(
-                    content=body,
-                    status_code=response.status_code,
-                    headers=dict(response.headers),
-                    media_type=response.media_type
-                )
-            
-            # Packaged in standard format
-            if response.status_code == 200:
-                # successful response
-                standard_body = StandardResponse.success(data=json_body)
-            else:
-                # Error response, get error message
-                message = get_error_message(response.status_code)
-                
-                # If there is an error message in the JSON body, use it first
-                if isinstance(json_body, dict) and "detail" in json_body:
-                    message = json_body.get("detail", message)
-                
-                # Create an error response body
-                standard_body = StandardResponse.error(
-                    message=message,
-                    code=response.status_code,
-                    data=json_body if not isinstance(json_body, dict) or "detail" not in json_body else None
-                )
-            
-            # Create a new response
-            return JSONResponse(
-                content=standard_body,
-                status_code=response.status_code,
-                headers={
-                    k: v for k, v in response.headers.items()
-                    if k.lower() != "content-length"
-                }
-            )
-            
+            if not StandardResponse.is_standard(json_body):
+                body = json.dumps(
+                    StandardResponse.wrap(json_body, status_code),
+                    ensure_ascii=False,
+                    allow_nan=False,
+                    separators=(",", ":"),
+                ).encode("utf-8")
         except Exception as e:
             # Log errors when processing fails and return the original response
             logger.error(f"响应封装失败: {str(e)}")
-            
-            # The response must be rebuilt because it has consumed body_iterator
-            return Response(
-                content=body if 'body' in locals() else b"",
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type
-            )
-    
-    def _should_skip_by_path(self, request: Request) -> bool:
-        """Determine whether to skip processing according to the path"""
-        skip_paths = ["/docs", "/redoc", "/openapi.json", "/static"]
-        
-        for path in skip_paths:
-            if request.url.path.startswith(path):
-                return True
-                
-        return False
-    
-    def _should_skip_by_response(self, response: Response) -> bool:
-        """Determine whether to skip processing based on the response"""
-        # No more skipping non-200 responses, all status codes need to be formatted
-        # if response.status_code != 200:
-        #     return True
-            
-        # Skip only non-JSON responses
-        content_type = response.headers.get("content-type", "")
-        if "application/json" not in content_type.lower():
-            return True
-            
-        return False
+
+        headers = [(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"]
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
 
 
 def setup_response_wrapper(app: FastAPI) -> None:
     """Setup Response Uniform Format Middleware
 : param app: FastAPI app"""
-    app.add_middleware(ResponseWrapperMiddleware) 
\ No newline at end of file
+    app.add_middleware(ResponseWrapperMiddleware)
@@ -1,20 +1,28 @@
 import asyncio
 import logging
+import os
 import traceback
-from typing import  Any, List, Optional
+from typing import  Any, Dict, List, Optional
 from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.messages import HumanMessage as CoreHumanMessage
 
 from knowledge_api.framework.ai_collect.all_ai import AllAI
+from knowledge_api.framework.ai_collect.base_llm import BaseLLM
 from knowledge_api.framework.memory.enhanced_chat_memory_manager import EnhancedChatMemoryManager
+from knowledge_api.framework.memory.summary_scheduler import SummaryListener, SummaryScheduler, get_summary_scheduler
 
 # configuration log
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("ConversationSummarizer")
 
+# Conversation rounds between two summaries of a chat session
+SUMMARY_INTERVAL = int(os.environ.get("SUMMARY_INTERVAL", "5"))
+
 class ConversationSummarizer:
     """dialogue summary service
-Monitor conversation rounds in the background, regularly summarize conversation content and update to memory manager
+Summarize conversation content every summary_interval rounds and update it to the memory manager.
+Memory managers report the crossed threshold to the summary scheduler, which summarizes
+them with a bounded worker pool, there is no background task per conversation.
 Support for summarizing with project-defined AllAI"""
 
     def __init__(
@@ -25,7 +33,8 @@ Support for summarizing with project-defined AllAI"""
         summary_interval: int = 5,
         summary_prompt_template: str = None,
         sleep_interval: float = 1.0,
-        max_retry_attempts: int = 3
+        max_retry_attempts: int = 3,
+        scheduler: Optional[SummaryScheduler] = None
     ):
         """Initialize the conversation summary service
 
@@ -34,23 +43,25 @@ Support for summarizing with project-defined AllAI"""
 @Param model_name: model name, default is gpt-3.5-turbo
 @Param summary_interval: Interval of conversation rounds that trigger summary
 @Param summary_prompt_template: summary prompt template (optional)
-@Param sleep_interval: Check summary sleep intervals (seconds)
-@Param max_retry_attempts: Maximum number of retries when summarizing failures"""
+@Param sleep_interval: not used anymore, summaries are triggered by the memory manager
+@Param max_retry_attempts: Maximum number of retries when summarizing failures
+@Param scheduler: summary scheduler, the process wide one by default"""
         # Initialize LLM
         if llm is None and api_key is None:
             raise ValueError("You must provide LLM or api_key one of them")
 
         self.summary_interval = summary_interval
         self.summary_prompt_template = summary_prompt_template or self._default_summary_prompt_template()
-        self.running_tasks = {}  # Track background tasks for each conversation
+        self.conversations: Dict[str, EnhancedChatMemoryManager] = {}  # Conversations registered with the scheduler
         self.sleep_interval = sleep_interval
         self.max_retry_attempts = max_retry_attempts
+        self.scheduler = scheduler or get_summary_scheduler()
 
         # Setting up LLM
         if llm is not None:
             # If llm is provided, use it directly
             self.llm = llm
-            self.using_project_ai = isinstance(llm, AllAI)
+            self.using_project_ai = isinstance(llm, BaseLLM)
         else:
             # If api_key is provided, use the project's AllAI
             self.llm = AllAI(
@@ -73,12 +84,13 @@ Dialogue history:
 
 Summarize:"""
 
-    def _format_messages_for_summary(self, messages: List[BaseMessage]) -> str:
+    def _format_messages_for_summary(self, messages: List[BaseMessage], previous_summary: Optional[str] = None) -> str:
         """Format the message as text to generate a summary
 
 @param messages: list of messages
+@Param previous_summary: summary of the earlier rounds no longer in the messages, carried into the new summary
 @Return: formatted dialogue text"""
-        formatted_conversation = ""
+        formatted_conversation = f"此前总结: {previous_summary}\n" if previous_summary else ""
         for msg in messages:
             if isinstance(msg, SystemMessage):
                 # Skip system messages, do not count in summary
@@ -90,18 +102,24 @@ Summarize:"""
                     formatted_conversation += f"AI: {msg.content}\n"
         return formatted_conversation
 
-    async def _retry_generate_summary(self, messages: List[BaseMessage], max_attempts: int = 3) -> str:
+    async def _retry_generate_summary(self, messages: List[BaseMessage], max_attempts: int = 3,
+                                      usage: Optional[Dict[str, float]] = None,
+                                      previous_summary: Optional[str] = None,
+                                      raise_errors: bool = False) -> str:
         """Summary generation with retry mechanism
 
 @Param messages: List of messages to summarize
 @Param max_attempts: Maximum number of retries
+@Param usage: LLM spend counters to add to (calls, prompt_chars, summary_chars, tokens)
+@Param previous_summary: summary of the earlier rounds no longer in the messages
+@Param raise_errors: raise the last error instead of returning an error summary
 @Return: Generated summary text"""
         attempt = 0
         last_error = None
 
         while attempt < max_attempts:
             try:
-                summary = await self.generate_summary(messages)
+                summary = await self.generate_summary(messages, usage, previous_summary)
                 return summary
             except Exception as e:
                 attempt += 1
@@ -113,21 +131,28 @@ Summarize:"""
 
         # All retries failed, errors were logged
         logger.error(f"总结生成在 {max_attempts} 次尝试后失败: {last_error}")
+        if raise_errors:
+            raise last_error
         return f"对话总结：生成总结时发生错误，请稍后再试。错误: {str(last_error)}"
 
-    async def generate_summary(self, messages: List[BaseMessage]) -> str:
+    async def generate_summary(self, messages: List[BaseMessage], usage: Optional[Dict[str, float]] = None,
+                               previous_summary: Optional[str] = None) -> str:
         """Generate conversation summaries
 
 @Param messages: List of messages to summarize
-@Return: Generated summary text"""
+@Param usage: LLM spend counters to add to (calls, prompt_chars, summary_chars, tokens)
+@Param previous_summary: summary of the earlier rounds no longer in the messages
+@Return: Generated summary text
+@Raises: the error of the model call, retried by _retry_generate_summary"""
         try:
             # Format dialogue
-            conversation_text = self._format_messages_for_summary(messages)
+            conversation_text = self._format_messages_for_summary(messages, previous_summary)
             if not conversation_text:
                 return "Dialogue summary: There is no effective dialogue content yet"
 
             # Create summary prompt
             summary_prompt = self.summary_prompt_template.format(conversation=conversation_text)
+            tokens = 0
 
             # Invoke different methods depending on the type of AI used
             if self.using_project_ai:
@@ -136,7 +161,11 @@ Summarize:"""
                     messages=[{"role": "user", "content": summary_prompt}],
                     temperature=0.3
                 )
-                summary = response.get("content", "Conversation summary generation failed")
+                if isinstance(response, dict):
+                    summary = response.get("content", "Conversation summary generation failed")
+                else:
+                    summary = getattr(response, "content", None) or "Conversation summary generation failed"
+                    tokens = max(0, getattr(response, "total_tokens", 0) or 0)
             else:
                 # Using the LangChain model
                 if hasattr(self.llm, 'agenerate'):
@@ -148,15 +177,21 @@ Summarize:"""
                     # synchronous call
                     summary = self.llm(summary_prompt).strip()
 
+            if usage is not None:
+                usage["calls"] += 1
+                usage["prompt_chars"] += len(summary_prompt)
+                usage["summary_chars"] += len(summary)
+                usage["tokens"] += tokens
+
             # Make sure the summary has a standard prefix
-            if not summary.startswith("Dialogue summary:"):
+            if not summary.startswith(("Dialogue summary:", "对话总结：")):
                 summary = f"对话总结：{summary}"
 
             return summary
         except Exception as e:
             logger.error(f"生成总结时出错: {e}")
             traceback.print_exc()  # Print detailed error information
-            return "Dialogue summary: An error occurred while generating the summary"
+            raise
 
     async def summarize_if_needed(self, memory_manager: EnhancedChatMemoryManager) -> bool:
         """Check if a summary is required and generate a summary
@@ -185,60 +220,73 @@ Summarize:"""
                                          conversation_id: str = "default") -> None:
         """Start the background summary service
 
+The memory manager reports every summary_interval rounds to the summary scheduler
+
 @Param memory_manager: Conversation Memory Manager
 @Param conversation_id: Conversation ID to identify different conversations"""
-        # If a task with the same ID is already running, stop it first
-        if conversation_id in self.running_tasks and not self.running_tasks[conversation_id].done():
-            self.running_tasks[conversation_id].cancel()
-
-        # Create and start a new background task
-        task = asyncio.create_task(
-            self._background_summary_loop(memory_manager, conversation_id)
+        # If the conversation is already registered, replace its memory manager
+        previous = self.conversations.get(conversation_id)
+        if previous is not None and previous is not memory_manager:
+            previous.set_summary_listener(None)
+
+        self.conversations[conversation_id] = memory_manager
+        memory_manager.set_summary_listener(
+            lambda manager: self.scheduler.notify(conversation_id, manager, self),
+            self.summary_interval
         )
-        self.running_tasks[conversation_id] = task
         logger.info(f"已启动总结服务，对话ID: {conversation_id}")
 
-    async def _background_summary_loop(self, memory_manager: EnhancedChatMemoryManager,
-                                      conversation_id: str) -> None:
-        """background summary loop
+    def watch(self, memory_manager: EnhancedChatMemoryManager, conversation_id: str,
+              on_summary: Optional[SummaryListener] = None) -> None:
+        """Report the summary threshold of a memory manager loaded for one chat turn to the scheduler
+
+Chat sessions are loaded from the session cache on every turn and the listener is not stored with
+them, so the listener is attached again to every loaded memory manager. Unlike
+start_background_summary_service the memory manager is not kept by the summarizer.
 
 @Param memory_manager: Conversation Memory Manager
-@Param conversation_id: Conversation ID"""
-        logger.info(f"总结服务循环开始，对话ID: {conversation_id}")
-        try:
-            while True:
-                # Check if a summary is required
-                try:
-                    await self.summarize_if_needed(memory_manager)
-                except Exception as e:
-                    logger.error(f"总结过程出错: {e}")
-                    traceback.print_exc()
-
-                # Wait a while before checking.
-                await asyncio.sleep(self.sleep_interval)
-        except asyncio.CancelledError:
-            logger.info(f"总结服务被取消，对话ID: {conversation_id}")
-        except Exception as e:
-            logger.error(f"总结服务异常: {e}")
-            traceback.print_exc()
+@Param conversation_id: Conversation ID
+@Param on_summary: called with the memory manager once its summary is set, stores the summary"""
+        memory_manager.set_summary_listener(
+            lambda manager: self.scheduler.notify(conversation_id, manager, self, on_summary),
+            self.summary_interval
+        )
+
+    async def summarize_now(self, memory_manager: EnhancedChatMemoryManager,
+                            usage: Optional[Dict[str, float]] = None) -> str:
+        """Summarize a conversation for the summary scheduler
+
+@Param memory_manager: Conversation Memory Manager
+@Param usage: LLM spend counters to add to
+@Return: Generated summary"""
+        logger.info(f"触发总结，当前对话轮次: {memory_manager.get_exchange_count()}")
+
+        # Messages added while the summary is generated are summarized next time
+        messages = list(memory_manager.get_all_messages())
+        # Rounds dropped from the memory window are only known through the previous summary,
+        # a failed summary keeps it instead of storing an error text in its place
+        previous_summary = memory_manager.summary_message if memory_manager.summarized_exchange_count else None
+        summary = await self._retry_generate_summary(messages, self.max_retry_attempts, usage,
+                                                     previous_summary=previous_summary, raise_errors=True)
+        memory_manager.update_summary_message(summary)
+
+        logger.info(f"总结已更新: {summary}")
+        return summary
 
     def stop_summary_service(self, conversation_id: str = "default") -> None:
         """Stop the background summary service
 
 @Param conversation_id: Conversation ID"""
-        if conversation_id in self.running_tasks:
-            task = self.running_tasks[conversation_id]
-            if not task.done():
-                task.cancel()
-            del self.running_tasks[conversation_id]
+        if conversation_id in self.conversations:
+            self.conversations.pop(conversation_id).set_summary_listener(None)
+            self.scheduler.cancel(conversation_id)
             logger.info(f"已停止总结服务，对话ID: {conversation_id}")
 
     def stop_all_services(self) -> None:
         """Stop all background summary services"""
-        for conversation_id, task in list(self.running_tasks.items()):
-            if not task.done():
-                task.cancel()
-        self.running_tasks.clear()
+        for conversation_id in list(self.conversations):
+            self.conversations.pop(conversation_id).set_summary_listener(None)
+            self.scheduler.cancel(conversation_id)
         logger.info("All summary services have been stopped")
 
     async def manually_summarize(self, memory_manager: EnhancedChatMemoryManager) -> str:
@@ -263,7 +311,7 @@ Used to generate summaries immediately when needed, without waiting for automati
 
     async def close(self):
         """Close summary services and related resources"""
-        # Stop all background tasks
+        # Unregister all conversations, the shared scheduler keeps running
         self.stop_all_services()
 
         # If using AllAI, close its session
@@ -272,6 +320,20 @@ Used to generate summaries immediately when needed, without waiting for automati
 
         logger.info("The summary service has been completely shut down")
 
+_conversation_summarizer: Optional[ConversationSummarizer] = None
+
+
+def get_conversation_summarizer() -> Optional[ConversationSummarizer]:
+    """Get the summarizer of the chat sessions, None until it is registered at startup"""
+    return _conversation_summarizer
+
+
+def set_conversation_summarizer(summarizer: Optional[ConversationSummarizer]) -> None:
+    """Register the summarizer of the chat sessions, None turns the summaries off"""
+    global _conversation_summarizer
+    _conversation_summarizer = summarizer
+
+
 # Usage example
 """#Using the project's AllAI
 From knowledge_api ai_collect import AllAI all_ai
@@ -297,5 +359,8 @@ K = 20
 #Start the background summary service
 Summarizer start_background_summary_service (memory_manager)
 
+#Summary scheduler metrics (backlog, LLM spend, lag)
+Summarizer.scheduler.stats ()
+
 Stop the service at the end of the application
 Summarizer stop_all_services ()""" 
\ No newline at end of file
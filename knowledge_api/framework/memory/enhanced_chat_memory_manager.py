@@ -1,5 +1,5 @@
 import json
-from typing import Optional, Dict, Any, List, Union
+from typing import Callable, Optional, Dict, Any, List, Union
 from langchain.memory import (
     ConversationBufferWindowMemory,
     ConversationSummaryMemory,
@@ -33,8 +33,27 @@ A memory management system customized for AI conversation scenarios to ensure th
         self.system_message = system_message
         self.summary_message = summary_message
         self.exchange_count = 0  # Record conversation rounds to trigger automatic summaries
+        self.summarized_exchange_count = 0  # Conversation rounds covered by the summary message
+        self._summary_listener: Optional[Callable[["EnhancedChatMemoryManager"], bool]] = None
+        self._summary_interval = 5
+        self._summary_pending = False
         self._initialize_memory()
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # The summary listener belongs to the running process, it is not stored with the session
+        state = self.__dict__.copy()
+        state["_summary_listener"] = None
+        state["_summary_pending"] = False
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # Sessions stored before the summary scheduler have no summary state
+        self.summarized_exchange_count = 0
+        self._summary_listener = None
+        self._summary_interval = 5
+        self._summary_pending = False
+        self.__dict__.update(state)
+
     def _initialize_memory(self) -> None:
         """Initialize Memory Manager"""
         if self.memory_type == 'buffer_window':
@@ -144,7 +163,7 @@ The system message should be in the first place, and the summary message should
 
 @Param new_summary: New summary content"""
         # Make sure the summary content has a standard prefix
-        if not new_summary.startswith("Dialogue summary:"):
+        if not new_summary.startswith(("Dialogue summary:", "对话总结：")):
             new_summary = f"对话总结：{new_summary}"
             
         self.summary_message = new_summary
@@ -167,7 +186,7 @@ The system message should be in the first place, and the summary message should
         
         # Increase interaction count
         self.exchange_count += 0.5
-        # Note: The summary is not automatically triggered here, and the external summary service is responsible for it.
+        self._notify_if_due()
 
     def add_ai_message(self, message: str) -> None:
         """Add AI reply to memory
@@ -178,7 +197,7 @@ The system message should be in the first place, and the summary message should
         
         # Increase interaction count
         self.exchange_count += 0.5
-        # Note: The summary is not automatically triggered here, and the external summary service is responsible for it.
+        self._notify_if_due()
 
     def add_ai_tool_call(self, tool_call: Dict[str, Any]) -> None:
         """Add AI tool calls to memory
@@ -430,6 +449,7 @@ For debugging or special scenarios only
         
         # Reset interaction count
         self.exchange_count = 0
+        self.summarized_exchange_count = 0
         
         # Re-add system messages and summary messages
         self.system_message = system_msg
@@ -511,4 +531,46 @@ This helps train AI to always use specific function calls to answer questions
 
 @Param trigger_interval: Interval of conversation rounds that trigger summary
 @Return: Should a summary be made?"""
-        return self.exchange_count > 0 and self.exchange_count % trigger_interval < 0.5
\ No newline at end of file
+        return self.exchange_count > 0 and self.exchange_count % trigger_interval < 0.5
+
+    def set_summary_listener(self, listener: Optional[Callable[["EnhancedChatMemoryManager"], bool]],
+                             trigger_interval: int = 5) -> None:
+        """Register the listener of the summary threshold
+
+The listener is called once when the conversation rounds not covered by the summary reach
+trigger_interval, and not again until mark_summarized() is called. It returns whether the
+summary was accepted, a refused summary is requested again on the next message.
+
+@Param listener: callable receiving the memory manager, None removes the listener
+@Param trigger_interval: Interval of conversation rounds that trigger summary"""
+        self._summary_listener = listener
+        self._summary_interval = trigger_interval
+        self._summary_pending = False
+        self._notify_if_due()
+
+    def get_summary_backlog(self) -> float:
+        """Get the conversation rounds not covered by the summary message
+
+@Return: Number of conversation rounds since the last summary"""
+        return self.exchange_count - self.summarized_exchange_count
+
+    def mark_summarized(self, exchange_count: Optional[float]) -> None:
+        """End of a summary requested by the listener
+
+@Param exchange_count: conversation rounds covered by the new summary, None when the summary failed"""
+        self._summary_pending = False
+        if exchange_count is None:
+            # Requested again on the next message
+            return
+        # The memory may have been cleared while summarizing
+        self.summarized_exchange_count = max(self.summarized_exchange_count, min(exchange_count, self.exchange_count))
+        # Messages added while summarizing may already be due
+        self._notify_if_due()
+
+    def _notify_if_due(self) -> None:
+        """Call the summary listener when the summary threshold is crossed"""
+        if self._summary_listener is None or self._summary_pending:
+            return
+        if self.get_summary_backlog() >= self._summary_interval:
+            self._summary_pending = True
+            self._summary_pending = bool(self._summary_listener(self))
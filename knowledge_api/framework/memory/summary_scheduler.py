@@ -0,0 +1,255 @@
+"""Central conversation summary scheduler
+
+Memory managers report when their unsummarized exchanges cross the summary interval,
+the scheduler keeps one queued job per conversation (later events of a queued or running
+conversation are merged into it) and a bounded pool of workers summarizes the queued
+conversations by priority: the longest waiting first ("oldest") or the largest backlog
+first ("backlog"). Idle conversations cost nothing, there is no timer per conversation."""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+import traceback
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Summary workers, i.e. summary LLM requests running at the same time
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", "4"))
+# Conversations waiting for a summary, events of further conversations are dropped until there is room
+SUMMARY_MAX_QUEUED = int(os.environ.get("SUMMARY_MAX_QUEUED", "10000"))
+# Order of the waiting conversations: oldest (longest waiting first) or backlog (most unsummarized exchanges first)
+SUMMARY_PRIORITY = os.environ.get("SUMMARY_PRIORITY", "oldest").lower()
+
+logger = logging.getLogger("ConversationSummarizer")
+
+# Called with the memory manager once its new summary is set, stores the summary with the conversation
+SummaryListener = Callable[[Any], Awaitable[None]]
+
+_LAG_SAMPLES = 1000
+
+
+class _SummaryJob:
+    """A conversation waiting for (or being) summarized"""
+
+    __slots__ = ("conversation_id", "memory_manager", "summarizer", "on_summary", "first_event_at", "events",
+                 "version")
+
+    def __init__(self, conversation_id: str, memory_manager, summarizer, first_event_at: float,
+                 on_summary: Optional[SummaryListener] = None):
+        self.conversation_id = conversation_id
+        self.memory_manager = memory_manager
+        self.summarizer = summarizer
+        self.on_summary = on_summary
+        self.first_event_at = first_event_at
+        self.events = 1
+        self.version = 0
+
+
+class SummaryScheduler:
+    """Bounded worker pool summarizing conversations on threshold events"""
+
+    def __init__(self, workers: int = SUMMARY_WORKERS, max_queued: int = SUMMARY_MAX_QUEUED,
+                 priority: str = SUMMARY_PRIORITY):
+        """Initialize the scheduler
+
+@Param workers: summaries running at the same time
+@Param max_queued: maximum conversations waiting for a summary
+@Param priority: "oldest" or "backlog\""""
+        if priority not in ("oldest", "backlog"):
+            raise ValueError(f"不支持的总结调度优先级: {priority}")
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.priority = priority
+        self._jobs: Dict[str, _SummaryJob] = {}
+        self._running: Dict[str, _SummaryJob] = {}
+        self._deferred: Dict[str, _SummaryJob] = {}
+        self._heap: List[Tuple[Tuple, int, int, str]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._lags: Deque[float] = deque(maxlen=_LAG_SAMPLES)
+        self.counters: Dict[str, int] = {"events": 0, "coalesced": 0, "dropped": 0, "completed": 0, "failed": 0}
+        self.llm_usage: Dict[str, float] = {"calls": 0, "prompt_chars": 0, "summary_chars": 0, "tokens": 0,
+                                            "seconds": 0.0}
+
+    def notify(self, conversation_id: str, memory_manager, summarizer,
+               on_summary: Optional[SummaryListener] = None) -> bool:
+        """Threshold crossed event of a conversation
+
+@Param conversation_id: Conversation ID
+@Param memory_manager: Conversation Memory Manager
+@Param summarizer: ConversationSummarizer generating the summary
+@Param on_summary: called with the memory manager once the summary is set, e.g. to store it with the session
+@Return: whether the event was accepted (False when the queue is full or there is no event loop)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"没有运行中的事件循环，忽略总结事件，对话ID: {conversation_id}")
+            return False
+        self._ensure_workers(loop)
+        self.counters["events"] += 1
+        now = time.monotonic()
+
+        if conversation_id in self._running:
+            # Summarized again once the running summary is done
+            deferred = self._deferred.get(conversation_id)
+            if deferred is None:
+                self._deferred[conversation_id] = _SummaryJob(conversation_id, memory_manager, summarizer, now,
+                                                              on_summary)
+            else:
+                deferred.memory_manager, deferred.summarizer = memory_manager, summarizer
+                deferred.on_summary = on_summary
+                deferred.events += 1
+                self.counters["coalesced"] += 1
+            return True
+
+        job = self._jobs.get(conversation_id)
+        if job is not None:
+            job.memory_manager, job.summarizer = memory_manager, summarizer
+            job.on_summary = on_summary
+            job.events += 1
+            self.counters["coalesced"] += 1
+            if self.priority == "backlog":
+                self._push(job)
+            return True
+
+        if len(self._jobs) >= self.max_queued:
+            self.counters["dropped"] += 1
+            logger.warning(f"总结队列已满({self.max_queued})，丢弃总结事件，对话ID: {conversation_id}")
+            return False
+        job = _SummaryJob(conversation_id, memory_manager, summarizer, now, on_summary)
+        self._jobs[conversation_id] = job
+        self._push(job)
+        return True
+
+    def cancel(self, conversation_id: str) -> None:
+        """Forget the queued summary of a conversation (a running one is finished)
+
+@Param conversation_id: Conversation ID"""
+        self._jobs.pop(conversation_id, None)
+        self._deferred.pop(conversation_id, None)
+
+    def _push(self, job: _SummaryJob) -> None:
+        job.version += 1
+        if self.priority == "backlog":
+            key = (-job.memory_manager.get_summary_backlog(), job.first_event_at)
+        else:
+            key = (job.first_event_at,)
+        heapq.heappush(self._heap, (key, next(self._seq), job.version, job.conversation_id))
+        self._wakeup.set()
+
+    def _ensure_workers(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._tasks = [task for task in self._tasks if not task.done()]
+        if self._tasks and self._tasks[0].get_loop() is not loop:
+            # Previous event loop closed, its workers are gone
+            self._tasks = []
+        if not self._tasks:
+            self._wakeup = asyncio.Event()
+            if self._heap:
+                self._wakeup.set()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _next_job(self) -> _SummaryJob:
+        while True:
+            while self._heap:
+                _, _, version, conversation_id = heapq.heappop(self._heap)
+                job = self._jobs.get(conversation_id)
+                if job is not None and job.version == version:
+                    del self._jobs[conversation_id]
+                    return job
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next_job()
+            self._running[job.conversation_id] = job
+            try:
+                await self._run(job)
+            finally:
+                del self._running[job.conversation_id]
+                deferred = self._deferred.pop(job.conversation_id, None)
+                if deferred is not None:
+                    self._jobs[deferred.conversation_id] = deferred
+                    self._push(deferred)
+
+    async def _run(self, job: _SummaryJob) -> None:
+        memory_manager = job.memory_manager
+        exchange_count = memory_manager.get_exchange_count()
+        start = time.monotonic()
+        try:
+            await job.summarizer.summarize_now(memory_manager, usage=self.llm_usage)
+        except asyncio.CancelledError:
+            memory_manager.mark_summarized(None)
+            raise
+        except Exception as e:
+            self.counters["failed"] += 1
+            logger.error(f"总结过程出错，对话ID: {job.conversation_id}: {e}")
+            traceback.print_exc()
+            memory_manager.mark_summarized(None)
+            return
+        finally:
+            self.llm_usage["seconds"] += time.monotonic() - start
+        self.counters["completed"] += 1
+        self._lags.append(time.monotonic() - job.first_event_at)
+        memory_manager.mark_summarized(exchange_count)
+        if job.on_summary is not None:
+            try:
+                await job.on_summary(memory_manager)
+            except Exception as e:
+                logger.error(f"保存对话总结出错，对话ID: {job.conversation_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Scheduler metrics
+
+@Return: queued and running conversations, unsummarized exchanges of the queued ones, wait of
+the oldest queued one, event counters, LLM spend and lag (threshold crossed to summary updated)"""
+        now = time.monotonic()
+        queued = list(self._jobs.values())
+        lags = sorted(self._lags)
+
+        def percentile(percent: float) -> float:
+            return lags[min(len(lags) - 1, int(len(lags) * percent / 100))] if lags else 0.0
+
+        return {
+            "queued": len(queued),
+            "running": len(self._running),
+            "backlog_exchanges": sum(job.memory_manager.get_summary_backlog() for job in queued),
+            "oldest_wait": max((now - job.first_event_at for job in queued), default=0.0),
+            **self.counters,
+            "llm": dict(self.llm_usage),
+            "lag_p50": percentile(50),
+            "lag_p95": percentile(95),
+            "lag_max": lags[-1] if lags else 0.0,
+        }
+
+    async def close(self) -> None:
+        """Stop the workers, queued summaries are dropped"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in list(self._jobs.values()):
+            job.memory_manager.mark_summarized(None)
+        self._jobs.clear()
+        self._deferred.clear()
+        self._heap.clear()
+
+
+_summary_scheduler: Optional[SummaryScheduler] = None
+
+
+def get_summary_scheduler() -> SummaryScheduler:
+    """Get the process wide summary scheduler"""
+    global _summary_scheduler
+    if _summary_scheduler is None:
+        _summary_scheduler = SummaryScheduler()
+    return _summary_scheduler
+
+
+def set_summary_scheduler(scheduler: Optional[SummaryScheduler]) -> None:
+    """Replace the summary scheduler, None builds it again from the environment variables"""
+    global _summary_scheduler
+    _summary_scheduler = scheduler
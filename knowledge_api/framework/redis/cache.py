@@ -13,7 +13,7 @@ from redis.exceptions import RedisError
 from pydantic import BaseModel
 
 from knowledge_api.framework.redis.config import get_redis_config
-from knowledge_api.framework.redis.connection import get_async_redis
+from knowledge_api.framework.redis.connection import get_async_redis, get_redis_connection_manager
 from knowledge_api.utils.log_config import get_logger
 
 logger = get_logger()
@@ -93,9 +93,34 @@ Optional [T]: Cached value, returns None if none exists"""
 
             return self._deserialize(data)
         except RedisError as e:
+            get_redis_connection_manager().report_error(e)
             logger.error(f"Redis获取缓存出错 (key={key}): {e}")
             return None
 
+    @functools.wraps(asyncio.iscoroutinefunction)
+    async def get_many(self, keys: List[str]) -> Dict[str, T]:
+        """Get several cached values in one round trip (MGET)
+
+Args:
+Keys: list of cache keys
+
+Returns:
+Dict [str, T]: key-value dictionary of the keys that exist"""
+        if not keys:
+            return {}
+
+        try:
+            # Make sure there is a Redis connection.
+            if not self.redis:
+                self.redis = await get_async_redis()
+
+            values = await self.redis.mget([self._get_key(key) for key in keys])
+            return {key: self._deserialize(value) for key, value in zip(keys, values) if value is not None}
+        except RedisError as e:
+            get_redis_connection_manager().report_error(e)
+            logger.error(f"Redis批量获取缓存出错: {e}")
+            return {}
+
     @functools.wraps(asyncio.iscoroutinefunction)
     async def set(
         self,
@@ -141,6 +166,7 @@ Bool: whether the operation was successful"""
                     self.redis = None
                     continue
                 else:
+                    get_redis_connection_manager().report_error(e)
                     logger.error(f"there is an error in setting the redis cache (key={key}): {e}")
                     return False
             except Exception as e:
@@ -312,6 +338,7 @@ Int: Number of keys successfully set"""
                     self.redis = None
                     continue
                 else:
+                    get_redis_connection_manager().report_error(e)
                     logger.error(f"Redis批量设置缓存出错: {e}")
                     return 0
             except Exception as e:
@@ -1,6 +1,7 @@
 """LLM Provider Caching Service
 Handling caching operations configured by LLM providers"""
 import asyncio
+import os
 from typing import Dict, Optional, Tuple
 
 from knowledge_api.framework.ai_collect import BaseLLM, LLMFactory
@@ -15,6 +16,9 @@ from knowledge_api.utils.log_config import get_logger
 
 logger = get_logger()
 
+# Model of the secondary provider used for failover and hedged requests, empty to disable
+LLM_FALLBACK_MODEL_ID = os.environ.get("LLM_FALLBACK_MODEL_ID", "")
+
 class LLMProviderCache:
     """LLM Provider Caching Service
 Manage cache operations and LLM instance creation for LLM provider configurations"""
@@ -233,6 +237,8 @@ Optional [BaseLLM]: AI instance, return None if creation fails"""
         # Add to local cache
         if llm:
             self.llm_instances[model_id] = llm
+            if LLM_FALLBACK_MODEL_ID and model_id != LLM_FALLBACK_MODEL_ID:
+                llm.fallback = await self.get_ai_by_model_id(LLM_FALLBACK_MODEL_ID, model_config_cache)
                 
         return llm
     
@@ -1,7 +1,7 @@
 import pickle
 import base64
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 
 from knowledge_api.framework.redis.connection import get_async_redis
@@ -16,17 +16,46 @@ class SessionCacheManager:
 
     # Redis key prefix
     KEY_PREFIX = "chat:session:"
+    # Suffix of the key holding the version of a session, bumped by every write
+    VERSION_SUFFIX = ":version"
     # Default expiration time (7 days)
     DEFAULT_EXPIRY = 86400 * 7
 
+    # Write the session only if its version is still the expected one, returns the new version or 0
+    _CAS_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[2]) or '0')
+if current ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('SET', KEYS[2], current + 1, 'EX', ARGV[3])
+return current + 1
+"""
+    _cas_script = None
+
+    @staticmethod
+    def get_keys(session_id: str, prefix: Optional[str] = None) -> Tuple[str, str]:
+        """Key of the session data and key of its version
+
+Args:
+session_id: Session ID
+Prefix: key prefix, KEY_PREFIX if None
+
+Returns:
+Tuple [str, str]: session data key, version key"""
+        key = f"{prefix or SessionCacheManager.KEY_PREFIX}{session_id}"
+        return key, f"{key}{SessionCacheManager.VERSION_SUFFIX}"
+
     @staticmethod
-    async def save_session(session_id: str, session_data: Dict[str, Any], expiry: int = None) -> bool:
+    async def save_session(session_id: str, session_data: Dict[str, Any], expiry: int = None,
+                           prefix: Optional[str] = None) -> bool:
         """Save session data to Redis
 
 Args:
 session_id: Session ID
 session_data: Session Data Dictionary
 Expiry: expiration time (seconds), default is 7 days
+Prefix: key prefix, KEY_PREFIX if None
 
 Returns:
 Did you save successfully?"""
@@ -40,11 +69,16 @@ Did you save successfully?"""
 
             # Save to Redis
             redis = await get_async_redis()
-            key = f"{SessionCacheManager.KEY_PREFIX}{session_id}"
+            key, version_key = SessionCacheManager.get_keys(session_id, prefix)
 
             # Set expiration time
             expiry_time = expiry if expiry is not None else SessionCacheManager.DEFAULT_EXPIRY
-            await redis.set(key, serialized, ex=expiry_time)
+            # Bump the version in the same round trip so that unit of work writes detect this one
+            pipe = redis.pipeline(transaction=False)
+            pipe.set(key, serialized, ex=expiry_time)
+            pipe.incr(version_key)
+            pipe.expire(version_key, expiry_time)
+            await pipe.execute()
 
             logger.debug(f"会话已保存到Redis: {session_id}")
             return True
@@ -55,11 +89,12 @@ Did you save successfully?"""
             return False
 
     @staticmethod
-    async def load_session(session_id: str) -> Optional[Dict[str, Any]]:
+    async def load_session(session_id: str, prefix: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Loading session data from Redis
 
 Args:
 session_id: Session ID
+Prefix: key prefix, KEY_PREFIX if None
 
 Returns:
 Session data dictionary, return None if none exists"""
@@ -69,7 +104,7 @@ Session data dictionary, return None if none exists"""
 
         try:
             redis = await get_async_redis()
-            key = f"{SessionCacheManager.KEY_PREFIX}{session_id}"
+            key, _ = SessionCacheManager.get_keys(session_id, prefix)
 
             # Get serialized session data
             serialized = await redis.get(key)
@@ -86,11 +121,61 @@ Session data dictionary, return None if none exists"""
             return None
 
     @staticmethod
-    async def delete_session(session_id: str) -> bool:
+    async def load_session_versioned(session_id: str,
+                                     prefix: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Load session data and its version in one round trip
+
+Args:
+session_id: Session ID
+Prefix: key prefix, KEY_PREFIX if None
+
+Returns:
+(session data dictionary or None if none exists, version)"""
+        if not session_id:
+            logger.warning("Loading session failed: Session ID is empty")
+            return None, 0
+
+        redis = await get_async_redis()
+        serialized, version = await redis.mget(SessionCacheManager.get_keys(session_id, prefix))
+        session_data = SessionCacheManager.deserialize_session(serialized) if serialized else None
+        return session_data, int(version or 0)
+
+    @staticmethod
+    async def save_session_versioned(session_id: str, session_data: Dict[str, Any], expected_version: int,
+                                     expiry: int = None, prefix: Optional[str] = None) -> Optional[int]:
+        """Save session data if its version is still expected_version (compare and set in one round trip)
+
+Args:
+session_id: Session ID
+session_data: Session Data Dictionary
+expected_version: version read with the session, 0 for a session that did not exist
+Expiry: expiration time (seconds), default is 7 days
+Prefix: key prefix, KEY_PREFIX if None
+
+Returns:
+new version, 0 if another writer changed the session, None on error"""
+        try:
+            serialized = SessionCacheManager.serialize_session(session_data)
+            redis = await get_async_redis()
+            if SessionCacheManager._cas_script is None:
+                SessionCacheManager._cas_script = redis.register_script(SessionCacheManager._CAS_SCRIPT)
+            expiry_time = expiry if expiry is not None else SessionCacheManager.DEFAULT_EXPIRY
+            return int(await SessionCacheManager._cas_script(
+                keys=list(SessionCacheManager.get_keys(session_id, prefix)),
+                args=[expected_version, serialized, expiry_time],
+                client=redis,
+            ))
+        except Exception as e:
+            logger.error(f"保存会话到Redis出错: {str(e)}")
+            return None
+
+    @staticmethod
+    async def delete_session(session_id: str, prefix: Optional[str] = None) -> bool:
         """Delete session data from Redis
 
 Args:
 session_id: Session ID
+Prefix: key prefix, KEY_PREFIX if None
 
 Returns:
 Whether the deletion was successful"""
@@ -99,10 +184,10 @@ Whether the deletion was successful"""
 
         try:
             redis = await get_async_redis()
-            key = f"{SessionCacheManager.KEY_PREFIX}{session_id}"
+            key, version_key = SessionCacheManager.get_keys(session_id, prefix)
 
             # Delete session
-            await redis.delete(key)
+            await redis.delete(key, version_key)
             logger.debug(f"已从Redis删除会话: {session_id}")
             return True
         except Exception as e:
@@ -160,15 +245,22 @@ Session ID to Session Data Mapping"""
             # Get all matching keys
             keys = await redis.keys(pattern)
 
+            # Version keys belong to the session next to them
+            keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+            keys = [key for key in keys if not key.endswith(SessionCacheManager.VERSION_SUFFIX)]
+
             # session data
             sessions = {}
+            if not keys:
+                return sessions
 
-            for key in keys:
+            # Get all session data in one round trip
+            values = await redis.mget(keys)
+
+            for key, serialized in zip(keys, values):
                 # Extract session ID
                 session_id = key.replace(SessionCacheManager.KEY_PREFIX, "")
 
-                # Get session data
-                serialized = await redis.get(key)
                 if serialized:
                     session_data = SessionCacheManager.deserialize_session(serialized)
                     sessions[session_id] = session_data
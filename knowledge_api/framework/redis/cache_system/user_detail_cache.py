@@ -223,12 +223,13 @@ Manage cache operations for user details data"""
         try:
             async with get_db_session() as db:
                 crud = UserDetailCRUD(db)
-                
+
+                # Check which users are cached already in one round trip
+                cached = await self.cache.get_many([f"user:{user_id}" for user_id in user_ids])
+
                 for user_id in user_ids:
                     cache_key = f"user:{user_id}"
-                    
-                    # Check if the cache already exists
-                    if not await self.cache.exists(cache_key):
+                    if cache_key not in cached:
                         user_detail = await crud.get_by_user_id(user_id=user_id)
                         if user_detail:
                             await self.cache.set(cache_key, user_detail)
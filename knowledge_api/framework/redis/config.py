@@ -23,8 +23,13 @@ class RedisConfig(BaseModel):
     PASSWORD: Optional[str] = None
     
     # connection pool configuration
-    MAX_CONNECTIONS: int = 10
+    MAX_CONNECTIONS: int = 50
     SOCKET_TIMEOUT: int = 5
+    CONNECT_TIMEOUT: int = 5
+    # Time (seconds) a command waits for a free connection when all of them are in use
+    POOL_TIMEOUT: float = 5
+    # Interval (seconds) of the background health check
+    HEALTH_CHECK_INTERVAL: int = 30
     
     # cache configuration
     DEFAULT_TIMEOUT: Optional[int] = 86400  # Default cache for 24 hours
@@ -64,8 +69,10 @@ DICT: Redis connection parameters"""
             "db": self.DB,
             "max_connections": self.MAX_CONNECTIONS,
             "socket_timeout": self.SOCKET_TIMEOUT,
+            "socket_connect_timeout": self.CONNECT_TIMEOUT,
+            "pool_timeout": self.POOL_TIMEOUT,
             "retry_on_timeout": True,
-            "health_check_interval": 30
+            "health_check_interval": self.HEALTH_CHECK_INTERVAL
         }
         
         # Add username and password
@@ -120,8 +127,11 @@ RedisConfig: Redis configuration"""
             "DB": int(os.environ.get("REDIS_DB", 0)),
             "USERNAME": os.environ.get("REDIS_USERNAME", ""),
             "PASSWORD": os.environ.get("REDIS_PASSWORD", None),
-            "MAX_CONNECTIONS": int(os.environ.get("REDIS_MAX_CONNECTIONS", 10)),
+            "MAX_CONNECTIONS": int(os.environ.get("REDIS_MAX_CONNECTIONS", 50)),
             "SOCKET_TIMEOUT": int(os.environ.get("REDIS_SOCKET_TIMEOUT", 5)),
+            "CONNECT_TIMEOUT": int(os.environ.get("REDIS_CONNECT_TIMEOUT", 5)),
+            "POOL_TIMEOUT": float(os.environ.get("REDIS_POOL_TIMEOUT", 5)),
+            "HEALTH_CHECK_INTERVAL": int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", 30)),
         }
         
         # Create configuration object
@@ -1,11 +1,13 @@
 """Redis Connection Management Module
 Tool classes that provide Redis connection management"""
 import asyncio
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 import time
 
-from redis.asyncio import Redis, ConnectionPool
-from redis.exceptions import RedisError
+from redis.asyncio import Redis, BlockingConnectionPool
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import RedisError, ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from contextlib import asynccontextmanager
 
 from knowledge_api.framework.redis.config import get_redis_config
@@ -13,48 +15,105 @@ from knowledge_api.utils.log_config import get_logger
 
 logger = get_logger()
 
+class MeteredConnectionPool(BlockingConnectionPool):
+    """Connection pool that waits for a free connection (up to its timeout) instead of failing when all
+connections are in use, and counts acquisitions and the time spent waiting for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+        self.wait_timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except RedisConnectionError:
+            self.wait_timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        self.acquired += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return connection
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrics
+
+Returns:
+Pool size, open / in use / idle connections, acquisitions, wait timeouts and the average / max wait for a connection"""
+        idle = sum(1 for connection in self._available_connections if connection is not None)
+        in_use = len(self._in_use_connections)
+        return {
+            "max_connections": self.max_connections,
+            "open": idle + in_use,
+            "in_use": in_use,
+            "idle": idle,
+            "acquired": self.acquired,
+            "wait_timeouts": self.wait_timeouts,
+            "avg_wait_ms": self.wait_seconds / self.acquired * 1000 if self.acquired else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+        }
+
+
 class RedisConnectionManager:
-    """Redis Connection Manager"""
+    """Redis Connection Manager
+One connection pool and one shared client per event loop. Commands check a connection out of the pool,
+so the client is handed out without a round trip; connection health is checked by a background task
+every health check interval, or right away after a command failed"""
     
     def __init__(self):
         """Initialize the connection manager"""
         self.config = None  # Do not get configuration at initialization
-        self.pool: Optional[ConnectionPool] = None
-        self.clients: Dict[int, Redis] = {}
-        self.last_health_check = 0
-        self.health_check_interval = 30  # Check connection health every 30 seconds
+        self.pool: Optional[MeteredConnectionPool] = None
+        self.client: Optional[Redis] = None
+        self._pool_info: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Health state, updated by the background check
+        self.healthy = True
+        self.last_health_check = 0.0
+        self.last_ping_ms: Optional[float] = None
+        self.health_checks = 0
+        self.health_check_failures = 0
+        self.errors_reported = 0
+        self._health_task: Optional[asyncio.Task] = None
+        self._check_now: Optional[asyncio.Event] = None
         
-    def get_connection_pool(self) -> ConnectionPool:
+    def get_connection_pool(self) -> MeteredConnectionPool:
         """Get connection pool
 
 Returns:
-ConnectionPool: Redis connection pool"""
-        # Reload the configuration each time the connection pool is acquired to ensure the latest environment variables are used
-        self.config = get_redis_config()
-        
-        # If the configuration changes, you need to recreate the connection pool
-        if self.pool is not None:
-            pool_info = f"{self.config.HOST}:{self.config.PORT}/db{self.config.DB}"
-            if hasattr(self, '_pool_info') and self._pool_info != pool_info:
-                logger.info(f"Redis配置已变更，重新创建连接池: {pool_info}")
-                self.close_all_connections()  # Close all connections
-                self.pool = None  # Clear the old connection pool
-            
+MeteredConnectionPool: Redis connection pool"""
+        config = get_redis_config()
+        pool_info = f"{config.HOST}:{config.PORT}/db{config.DB}"
+
+        # If the configuration changes (reset_redis_config after loading the environment), recreate the connection pool
+        if self.pool is not None and self._pool_info != pool_info:
+            logger.info(f"Redis配置已变更，重新创建连接池: {pool_info}")
+            self.close_all_connections()
+
         if self.pool is None:
+            self.config = config
             # Get connection parameters
-            connection_params = self.config.get_connection_params()
-            
-            # Adjust connection pool parameters
+            connection_params = config.get_connection_params()
+
             pool_kwargs = {
                 "host": connection_params.pop("host"),
                 "port": connection_params.pop("port"),
                 "db": connection_params.pop("db", 0),
-                "max_connections": connection_params.pop("max_connections", 10),  # Use the value in the configuration
+                "max_connections": connection_params.pop("max_connections"),
+                "timeout": connection_params.pop("pool_timeout"),
                 "decode_responses": False,  # The byte string is reserved and decoded by the cache layer
-                "socket_timeout": connection_params.pop("socket_timeout", 5),  # Use the value in the configuration
-                "socket_connect_timeout": 5,  # Set connection establishment timeout
-                "retry_on_timeout": True,  # retry after timeout
-                "health_check_interval": 15  # Check connection health more frequently
+                "socket_timeout": connection_params.pop("socket_timeout"),
+                "socket_connect_timeout": connection_params.pop("socket_connect_timeout"),
+                # Reconnect and retry once when a pooled connection was closed by the server
+                "retry": Retry(ExponentialBackoff(cap=0.5, base=0.05), 1),
+                "retry_on_error": [RedisConnectionError, RedisTimeoutError],
+                # Connections idle for longer than the interval are pinged before their next command
+                "health_check_interval": connection_params.pop("health_check_interval"),
             }
             
             # Add authentication parameters
@@ -65,120 +124,129 @@ ConnectionPool: Redis connection pool"""
                 pool_kwargs["password"] = connection_params.pop("password")
             
             # Create a connection pool
-            self.pool = ConnectionPool(**pool_kwargs)
-            self._pool_info = f"{self.config.HOST}:{self.config.PORT}/db{self.config.DB}"
-            logger.info(f"Redis连接池已创建: {self._pool_info}, 最大连接数: {pool_kwargs['max_connections']}")
+            self.pool = MeteredConnectionPool(**pool_kwargs)
+            self._pool_info = pool_info
+            logger.info(f"Redis连接池已创建: {pool_info}, 最大连接数: {pool_kwargs['max_connections']}")
             
         return self.pool
         
-    def create_client(self) -> Redis:
-        """Creating a Redis client side
-
-Returns:
-Redis: Redis client side"""
-        # Get connection pool
-        pool = self.get_connection_pool()
-        
-        # Create client side
-        client = Redis(connection_pool=pool)
-        
-        # Record client side information
-        client_id = id(client)
-        self.clients[client_id] = client
-        
-        # If there are more than 5 connections, log a warning
-        if len(self.clients) > 5:
-            logger.warning(f"当前活跃Redis连接数: {len(self.clients)}, 请注意资源使用")
-        
-        return client
-        
     async def get_client(self) -> Redis:
-        """Get the Redis client side
+        """Get the shared Redis client side, without a round trip to the server
 
 Returns:
 Redis: Redis client side"""
-        # Clean up before acquiring the new client side, closing unwanted connections
-        if len(self.clients) >= 8:  # If the number of connections is close to the maximum, actively conduct a health check
-            await self.health_check()
-            
-        # Reuse existing client side (if available)
-        for client_id, client in list(self.clients.items()):
+        loop = asyncio.get_running_loop()
+        if self.client is not None and self._loop is not loop:
+            # Connections belong to the event loop that opened them
+            self._drop_pool()
+
+        if self.client is None:
+            self.client = Redis(connection_pool=self.get_connection_pool())
+            self._loop = loop
+
+        if self._health_task is None or self._health_task.done():
+            self._check_now = asyncio.Event()
+            self._health_task = loop.create_task(self._health_loop())
+
+        return self.client
+
+    def report_error(self, error: Exception) -> None:
+        """Report a failed command, the background task checks the connection right away
+
+Args:
+Error: The error of the command"""
+        self.errors_reported += 1
+        if self._check_now is not None and isinstance(error, (RedisConnectionError, RedisTimeoutError)):
+            self._check_now.set()
+
+    async def _health_loop(self) -> None:
+        """Check the connection every health check interval, or right away after a reported error"""
+        while True:
+            interval = max(1, self.config.HEALTH_CHECK_INTERVAL) if self.healthy else 1
             try:
-                # Test if the connection is available
-                await client.ping()
-                return client  # Return to the first available client side
-            except RedisError:
-                # Connection unavailable, remove from list
-                self.clients.pop(client_id, None)
-                try:
-                    await client.close()
-                except:
-                    pass
-        
-        # If no client side is available, create a new client side
-        client = self.create_client()
-        
-        # Check client side connections
+                await asyncio.wait_for(self._check_now.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._check_now.clear()
+            await self.health_check()
+
+    async def health_check(self) -> bool:
+        """Ping the server; when it fails, drop the idle connections so that commands open new ones
+
+Returns:
+bool: Whether the server answered"""
+        if self.client is None:
+            return False
+        self.health_checks += 1
+        self.last_health_check = time.time()
+        started = time.perf_counter()
         try:
-            # Execute the PING command to test the connection
-            await client.ping()
-        except RedisError as e:
-            logger.error(f"Redis连接测试失败: {e}")
-            raise
-        
-        # Perform regular health checkups
-        current_time = time.time()
-        if current_time - self.last_health_check > self.health_check_interval:
-            asyncio.create_task(self.health_check())  # Perform health checks asynchronously without blocking the current request
-            self.last_health_check = current_time
-            
-        return client
-        
-    async def health_check(self):
-        """Check the health of all client side connections and close unavailable connections"""
-        logger.debug(f"执行Redis连接健康检查，当前连接数: {len(self.clients)}")
-        closed_count = 0
-        
-        for client_id, client in list(self.clients.items()):
+            await asyncio.wait_for(self.client.ping(), timeout=2.0)
+        except (RedisError, asyncio.TimeoutError, OSError) as e:
+            self.health_check_failures += 1
+            if self.healthy:
+                logger.error(f"Redis健康检查失败: {e}")
+            self.healthy = False
             try:
-                # Try ping to test if the connection is available.
-                await asyncio.wait_for(client.ping(), timeout=2.0)
-            except (RedisError, asyncio.TimeoutError):
-                # Connection unavailable, remove from list
-                client = self.clients.pop(client_id, None)
-                if client:
-                    try:
-                        await client.close()
-                        closed_count += 1
-                    except Exception as e:
-                        logger.error(f"关闭Redis连接时出错 (id: {client_id}): {e}")
-        
-        if closed_count > 0:
-            logger.info(f"Redis健康检查已关闭 {closed_count} 个不可用连接，剩余 {len(self.clients)} 个连接")
-        
+                await self.pool.disconnect(inuse_connections=False)
+            except Exception as disconnect_error:
+                logger.error(f"关闭Redis空闲连接时出错: {disconnect_error}")
+            return False
+
+        self.last_ping_ms = (time.perf_counter() - started) * 1000
+        if not self.healthy:
+            logger.info("Redis connection recovered")
+        self.healthy = True
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection metrics
+
+Returns:
+Health state, health check counters, reported errors and the pool metrics"""
+        return {
+            "healthy": self.healthy,
+            "last_health_check": self.last_health_check,
+            "last_ping_ms": self.last_ping_ms,
+            "health_checks": self.health_checks,
+            "health_check_failures": self.health_check_failures,
+            "errors_reported": self.errors_reported,
+            "pool": self.pool.stats() if self.pool is not None else None,
+        }
+
+    def _drop_pool(self) -> None:
+        """Forget the client and the pool without touching their connections (used when the event loop changed)"""
+        if self._health_task is not None and not self._health_task.done():
+            self._health_task.cancel()
+        self._health_task = None
+        self._check_now = None
+        self.client = None
+        self.pool = None
+        self._loop = None
+
     def close_all_connections(self):
         """Close all Redis connections"""
-        # Close all client sides
-        for client_id, client in list(self.clients.items()):
+        pool, health_task = self.pool, self._health_task
+        if health_task is not None and not health_task.done():
+            health_task.cancel()
+        self._health_task = None
+        self._check_now = None
+        self.client = None
+        self.pool = None
+        self._loop = None
+
+        # Empty the connection pool
+        if pool is not None:
             try:
-                # Run with an event loop
                 loop = asyncio.get_event_loop()
                 if loop.is_running():
                     # If the event loop is already running, create a task
-                    asyncio.create_task(client.close())
+                    loop.create_task(pool.disconnect())
                 else:
                     # Otherwise run synchronously
-                    loop.run_until_complete(client.close())
-                    
-                # Delete from the dictionary
-                self.clients.pop(client_id, None)
+                    loop.run_until_complete(pool.disconnect())
             except Exception as e:
-                logger.error(f"关闭Redis连接时出错 (id: {client_id}): {e}")
-        
-        # Empty the connection pool
-        if self.pool:
-            self.pool.disconnect()
-            self.pool = None
+                logger.error(f"关闭Redis连接池时出错: {e}")
             
         logger.info("All Redis connections have been closed")
 
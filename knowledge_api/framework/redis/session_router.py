@@ -0,0 +1,279 @@
+"""WebSocket session routing between worker processes
+
+Every websocket session has a Redis pub/sub channel keyed by its session_id. A worker
+publishes the events of a session (messages to deliver, user input for the workflow,
+state changes) on that channel, and every worker holding sockets or state of the
+session subscribes to it and handles the events locally. A worker can therefore own
+a socket while another one runs the workflow / AI step of the same session, which is
+what allows more than one gunicorn worker.
+
+Routing is off unless WS_ROUTING_ENABLED=true, then publishing is a no-op and
+everything stays in process as before."""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from knowledge_api.framework.redis.connection import get_async_redis
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+# Renew / delete the owner key only while it still belongs to this worker
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# handler(session_id, event)
+EventHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class SessionRouter:
+    """Redis pub/sub router for websocket session events"""
+
+    CHANNEL_PREFIX = "ws:session"
+    OWNER_PREFIX = "ws:owner"
+
+    def __init__(self, enabled: bool = False, owner_ttl: int = 30):
+        """Initialize the router
+
+Args:
+Enabled: whether events are published to Redis
+owner_ttl: Expiration time (seconds) of a session ownership claim, renewed by a heartbeat every third of it
+           while the worker runs the session, so the sessions of a dead worker can be claimed again"""
+        self.enabled = enabled
+        self.owner_ttl = max(3, owner_ttl)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # session_id -> {subscriber: handler}
+        self._handlers: Dict[str, Dict[str, EventHandler]] = {}
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        # Sessions owned by this worker, kept alive by the heartbeat
+        self._owned: Set[str] = set()
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def channel(self, session_id: str) -> str:
+        """Get the channel of a session"""
+        return f"{self.CHANNEL_PREFIX}:{session_id}"
+
+    async def subscribe(self, session_id: str, subscriber: str, handler: EventHandler) -> None:
+        """Receive the events of a session published by other subscribers
+
+Args:
+session_id: Session ID
+Subscriber: key of the subscriber, its own events are not delivered back to it
+Handler: coroutine called with (session_id, event)"""
+        if not self.enabled:
+            return
+        handlers = self._handlers.setdefault(session_id, {})
+        first = not handlers
+        handlers[subscriber] = handler
+        if first:
+            try:
+                pubsub = await self._get_pubsub()
+                await pubsub.subscribe(self.channel(session_id))
+            except Exception as e:
+                logger.error(f"订阅会话频道失败: {session_id}, 错误: {e}")
+
+    async def unsubscribe(self, session_id: str, subscriber: str) -> None:
+        """Stop receiving the events of a session
+
+Args:
+session_id: Session ID
+Subscriber: key used when subscribing"""
+        handlers = self._handlers.get(session_id)
+        if not handlers or subscriber not in handlers:
+            return
+        del handlers[subscriber]
+        if not handlers:
+            del self._handlers[session_id]
+            try:
+                if self._pubsub is not None:
+                    await self._pubsub.unsubscribe(self.channel(session_id))
+            except Exception as e:
+                logger.error(f"取消订阅会话频道失败: {session_id}, 错误: {e}")
+
+    async def publish(self, session_id: str, event: Dict[str, Any], subscriber: Optional[str] = None) -> int:
+        """Publish an event of a session to the other subscribers, on every worker
+
+Args:
+session_id: Session ID
+Event: JSON serializable event, its "type" selects the handling
+Subscriber: key of the publishing subscriber, skipped on this worker
+
+Returns:
+Int: number of workers subscribed to the session"""
+        if not self.enabled:
+            return 0
+        payload = json.dumps({
+            "origin": self.worker_id,
+            "subscriber": subscriber,
+            "event": event
+        }, ensure_ascii=False, separators=(",", ":"))
+        try:
+            redis = await get_async_redis()
+            return await redis.publish(self.channel(session_id), payload)
+        except Exception as e:
+            logger.error(f"发布会话事件失败: {session_id}, 错误: {e}")
+            return 0
+
+    def owner_key(self, session_id: str) -> str:
+        """Get the ownership key of a session"""
+        return f"{self.OWNER_PREFIX}:{session_id}"
+
+    async def claim_session(self, session_id: str) -> bool:
+        """Claim the ownership of a session (the worker running its workflow)
+
+The claim is renewed by the heartbeat until release_session
+
+Returns:
+Bool: whether this worker owns the session"""
+        if not self.enabled:
+            return True
+        try:
+            redis = await get_async_redis()
+            key = self.owner_key(session_id)
+            owned = bool(await redis.set(key, self.worker_id, nx=True, ex=self.owner_ttl))
+            if not owned:
+                owned = bool(await redis.eval(_RENEW_SCRIPT, 1, key, self.worker_id, self.owner_ttl))
+        except Exception as e:
+            logger.error(f"声明会话所有权失败: {session_id}, 错误: {e}")
+            return False
+        if owned:
+            self._owned.add(session_id)
+            if self._heartbeat is None or self._heartbeat.done():
+                self._heartbeat = asyncio.create_task(self._renew_owned())
+        return owned
+
+    async def get_owner(self, session_id: str) -> Optional[str]:
+        """Get the worker owning a session, None if no worker claimed it"""
+        if not self.enabled:
+            return None
+        try:
+            redis = await get_async_redis()
+            owner = await redis.get(self.owner_key(session_id))
+            return owner.decode("utf-8") if owner else None
+        except Exception as e:
+            logger.error(f"获取会话所有者失败: {session_id}, 错误: {e}")
+            return None
+
+    async def release_session(self, session_id: str) -> None:
+        """Give up the ownership of a session"""
+        if not self.enabled:
+            return
+        self._owned.discard(session_id)
+        try:
+            redis = await get_async_redis()
+            await redis.eval(_RELEASE_SCRIPT, 1, self.owner_key(session_id), self.worker_id)
+        except Exception as e:
+            logger.error(f"释放会话所有权失败: {session_id}, 错误: {e}")
+
+    def owns(self, session_id: str) -> bool:
+        """Whether this worker still holds the ownership of a session"""
+        return not self.enabled or session_id in self._owned
+
+    async def _renew_owned(self) -> None:
+        """Heartbeat renewing the ownership of the sessions of this worker"""
+        while self._owned:
+            await asyncio.sleep(self.owner_ttl / 3)
+            owned = list(self._owned)
+            try:
+                redis = await get_async_redis()
+                pipe = redis.pipeline(transaction=False)
+                for session_id in owned:
+                    pipe.eval(_RENEW_SCRIPT, 1, self.owner_key(session_id), self.worker_id, self.owner_ttl)
+                renewed = await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"续期会话所有权失败: {e}")
+                continue
+            for session_id, ok in zip(owned, renewed):
+                if not ok and session_id in self._owned:
+                    self._owned.discard(session_id)
+                    logger.warning(f"会话所有权已失效: {session_id}")
+
+    async def close(self) -> None:
+        """Stop listening, release the owned sessions and close the pub/sub connection"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for session_id in list(self._owned):
+            await self.release_session(session_id)
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.reset()
+            except Exception as e:
+                logger.error(f"关闭会话路由连接失败: {e}")
+            self._pubsub = None
+        self._handlers.clear()
+
+    async def _get_pubsub(self):
+        """Create the pub/sub connection and its listener on first use"""
+        if self._pubsub is None:
+            redis = await get_async_redis()
+            self._pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return self._pubsub
+
+    async def _listen(self) -> None:
+        """Dispatch the events received on the subscribed channels"""
+        prefix_length = len(self.CHANNEL_PREFIX) + 1
+        while True:
+            try:
+                if not self._handlers:
+                    await asyncio.sleep(0.5)
+                    continue
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not message or message.get("type") != "message":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                session_id = channel[prefix_length:]
+                data = json.loads(message["data"])
+                await self._dispatch(session_id, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"会话路由监听出错: {e}")
+                await asyncio.sleep(1)
+
+    async def _dispatch(self, session_id: str, data: Dict[str, Any]) -> None:
+        local = data.get("origin") == self.worker_id
+        for subscriber, handler in list(self._handlers.get(session_id, {}).items()):
+            if local and subscriber == data.get("subscriber"):
+                continue
+            try:
+                await handler(session_id, data["event"])
+            except Exception as e:
+                logger.error(f"处理会话事件失败: {session_id}, 错误: {e}")
+
+
+_session_router: Optional[SessionRouter] = None
+
+
+def get_session_router() -> SessionRouter:
+    """Get the global session router, configured from environment variables"""
+    global _session_router
+    if _session_router is None:
+        _session_router = SessionRouter(
+            enabled=os.environ.get("WS_ROUTING_ENABLED", "false").lower() == "true",
+            owner_ttl=int(os.environ.get("WS_ROUTING_OWNER_TTL", "30")),
+        )
+    return _session_router
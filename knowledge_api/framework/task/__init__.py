@@ -21,6 +21,13 @@ from knowledge_api.framework.task.task_manager import (
     get_task_manager
 )
 
+# Export task lane module
+from knowledge_api.framework.task.task_lanes import (
+    TaskLane,
+    TaskRejectedError,
+    LatencyHistogram
+)
+
 # Export task decorator module
 from knowledge_api.framework.task.task_decorator import (
     background_task,
@@ -89,9 +96,9 @@ graceful_shutdown_timeout: Timeout (seconds) to wait for a task to complete when
         if active_count > 0:
             logging.info(f"应用关闭，等待 {active_count} 个活跃任务完成...")
 
-            # Get all active tasks
+            # Get all active tasks, including the ones still queued in their lane
             active_tasks = [task._task for task in task_manager.tasks.values()
-                            if task.status == TaskStatus.RUNNING and task._task is not None]
+                            if task.status in (TaskStatus.PENDING, TaskStatus.RUNNING) and task._task is not None]
 
             if active_tasks:
                 # Wait for all tasks to complete, but set a timeout
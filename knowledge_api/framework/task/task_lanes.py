@@ -0,0 +1,148 @@
+"""Task lanes module
+Named priority lanes of the task manager: per-lane concurrency, queue depth limit with an
+overflow policy (reject, shed or block) and rolling wait / run latency histograms"""
+import asyncio
+import bisect
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+# Background tasks running at the same time over all lanes
+TASK_MAX_CONCURRENCY = int(os.environ.get("TASK_MAX_CONCURRENCY", "16"))
+# Lanes by priority (first is the highest): name=concurrency/max_queued/overflow, overflow is reject, shed or block,
+# max_queued 0 does not limit the queue. Tasks submitted without lane keep the unlimited queue and the full concurrency
+# of the task manager, callers opt in to the stricter lanes
+TASK_LANES = os.environ.get("TASK_LANES", f"chat=8/2000/block,default={TASK_MAX_CONCURRENCY}/0/block,bulk=2/200/shed")
+# Finished task records kept for status queries: at most TASK_HISTORY_SIZE, for at most TASK_HISTORY_TTL seconds
+TASK_HISTORY_SIZE = int(os.environ.get("TASK_HISTORY_SIZE", "1000"))
+TASK_HISTORY_TTL = float(os.environ.get("TASK_HISTORY_TTL", "3600"))
+
+DEFAULT_LANE = "default"
+OVERFLOW_POLICIES = ("reject", "shed", "block")
+
+# Histogram bucket upper bounds (milliseconds)
+_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+_LATENCY_SAMPLES = 1024
+
+
+class TaskRejectedError(RuntimeError):
+    """The lane queue is full and its overflow policy is reject"""
+
+
+class LatencyHistogram:
+    """Latency histogram over the last samples"""
+
+    def __init__(self, samples: int = _LATENCY_SAMPLES):
+        self._samples: Deque[float] = deque(maxlen=samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(max(0.0, seconds))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Histogram of the retained samples
+
+Returns:
+Sample count, count per bucket (upper bound in milliseconds) and p50 / p95 / p99 / max in seconds"""
+        ordered = sorted(self._samples)
+        counts = [0] * (len(_BUCKETS_MS) + 1)
+        for seconds in ordered:
+            counts[bisect.bisect_left(_BUCKETS_MS, seconds * 1000)] += 1
+        buckets = {f"<={bound}ms": count for bound, count in zip(_BUCKETS_MS, counts)}
+        buckets[f">{_BUCKETS_MS[-1]}ms"] = counts[-1]
+
+        def percentile(percent: float) -> float:
+            return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] if ordered else 0.0
+
+        return {
+            "count": len(ordered),
+            "buckets": buckets,
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+            "max": ordered[-1] if ordered else 0.0,
+        }
+
+
+class TaskLane:
+    """A named lane of the task manager"""
+
+    def __init__(self, name: str, priority: int, concurrency: int, max_queued: int, overflow: str = "block"):
+        """Initialize the lane
+
+Args:
+Name: Lane name
+Priority: Dispatch priority, lower runs first
+Concurrency: Tasks of the lane running at the same time
+max_queued: Tasks of the lane waiting for a slot, 0 for no limit
+Overflow: What a submission does when the queue is full: reject, shed (drop the oldest queued task) or block"""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy {overflow} of lane {name}")
+        self.name = name
+        self.priority = priority
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max(0, max_queued)
+        self.overflow = overflow
+        self.running = 0
+        # (task ID, future resolved when the task gets a slot)
+        self.queue: Deque[Tuple[str, asyncio.Future]] = deque()
+        # Submissions blocked on a full queue
+        self.space_waiters: Deque[asyncio.Future] = deque()
+        self.wait_latency = LatencyHistogram()
+        self.run_latency = LatencyHistogram()
+        self.counters: Dict[str, int] = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0,
+                                         "rejected": 0, "shed": 0, "blocked": 0}
+
+    @property
+    def full(self) -> bool:
+        return 0 < self.max_queued <= len(self.queue)
+
+    def wake_space_waiter(self) -> None:
+        """Let one blocked submission in after a queued task left the queue"""
+        while self.space_waiters:
+            waiter = self.space_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """Lane metrics
+
+Returns:
+Configuration, running / queued / blocked tasks, counters and wait / run latency histograms"""
+        return {
+            "priority": self.priority,
+            "concurrency": self.concurrency,
+            "max_queued": self.max_queued,
+            "overflow": self.overflow,
+            "running": self.running,
+            "queued": len(self.queue),
+            "blocked": sum(1 for waiter in self.space_waiters if not waiter.done()),
+            **self.counters,
+            "wait_latency": self.wait_latency.snapshot(),
+            "run_latency": self.run_latency.snapshot(),
+        }
+
+
+def parse_lanes(spec: str = TASK_LANES) -> List[TaskLane]:
+    """Parse the lane configuration
+
+Args:
+Spec: name=concurrency/max_queued/overflow separated by commas, in priority order,
+a missing max_queued does not limit the queue
+
+Returns:
+Lanes in priority order, with a default lane appended if the configuration has none"""
+    lanes: List[TaskLane] = []
+    for priority, item in enumerate(part.strip() for part in spec.split(",") if part.strip()):
+        name, _, config = item.partition("=")
+        values = (config.split("/") + ["", "", ""])[:3]
+        lanes.append(TaskLane(
+            name=name.strip(),
+            priority=priority,
+            concurrency=int(values[0] or 4),
+            max_queued=int(values[1] or 0),
+            overflow=values[2].strip() or "block",
+        ))
+    if not any(lane.name == DEFAULT_LANE for lane in lanes):
+        lanes.append(TaskLane(DEFAULT_LANE, len(lanes), TASK_MAX_CONCURRENCY, 0, "block"))
+    return lanes
@@ -6,11 +6,15 @@ import time
 import uuid
 import signal
 import sys
+from collections import OrderedDict
 from enum import Enum
 from typing import Any, Callable, Dict, List, Optional, Union, TypeVar, Generic, Awaitable, cast, Set
 from datetime import datetime
 
 from .thread_pool import get_thread_pool, ThreadPoolExecutorEnhanced
+from .task_lanes import (
+    DEFAULT_LANE, TASK_HISTORY_SIZE, TASK_HISTORY_TTL, TASK_MAX_CONCURRENCY, TaskLane, TaskRejectedError, parse_lanes
+)
 
 # Type variable definition
 T = TypeVar('T')
@@ -69,6 +73,11 @@ on_error: Callback function in case of task error"""
         # underlying asynchronous task
         self._task: Optional[asyncio.Task] = None
 
+        # Lane the task runs in, set by the task manager
+        self.lane = DEFAULT_LANE
+        self.submit_time = time.time()
+        self._holds_slot = False
+
     async def execute(self) -> T:
         """Execute tasks and return results
 
@@ -313,6 +322,7 @@ Dictionary of tasks"""
             "task_id": self.task_id,
             "description": self.description,
             "status": self.status.value,
+            "lane": self.lane,
             "start_time": self.start_time,
             "end_time": self.end_time,
             "duration": self.duration,
@@ -324,17 +334,40 @@ Dictionary of tasks"""
 class TaskManager:
     """Task Manager to manage the creation, execution, and monitoring of asynchronous tasks"""
 
-    def __init__(self, graceful_shutdown_timeout: float = 30.0):
+    def __init__(self,
+                 graceful_shutdown_timeout: float = 30.0,
+                 max_concurrency: int = TASK_MAX_CONCURRENCY,
+                 lanes: Optional[List[TaskLane]] = None,
+                 history_size: int = TASK_HISTORY_SIZE,
+                 history_ttl: float = TASK_HISTORY_TTL):
         """Initialize Task Manager
 
 Args:
-graceful_shutdown_timeout: Timeout (seconds) to wait for a task to complete when the app exits"""
+graceful_shutdown_timeout: Timeout (seconds) to wait for a task to complete when the app exits
+max_concurrency: Tasks running at the same time over all lanes
+Lanes: Priority lanes, parsed from TASK_LANES if None
+history_size: Finished task records kept for status queries
+history_ttl: Time (seconds) a finished task record is kept"""
         self.tasks: Dict[str, Task] = {}
         self.logger = logging.getLogger("task_manager")
         self._active_tasks: Set[str] = set()  # Track active tasks
         self.graceful_shutdown_timeout = graceful_shutdown_timeout
         self._shutdown_handler_installed = False
 
+        # Lanes in priority order and slots in use over all lanes
+        self.max_concurrency = max(1, max_concurrency)
+        self.lanes: Dict[str, TaskLane] = {
+            lane.name: lane for lane in sorted(lanes or parse_lanes(), key=lambda lane: lane.priority)
+        }
+        if DEFAULT_LANE not in self.lanes:
+            self.lanes[DEFAULT_LANE] = TaskLane(DEFAULT_LANE, len(self.lanes), 4, 1000, "block")
+        self._running = 0
+
+        # Finished task ID -> end time, oldest first
+        self.history_size = max(0, history_size)
+        self.history_ttl = history_ttl
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+
     def _install_signal_handlers(self):
         """Install a signal handler to gracefully close when the app exits"""
         if self._shutdown_handler_installed:
@@ -366,7 +399,7 @@ graceful_shutdown_timeout: Timeout (seconds) to wait for a task to complete when
 
         try:
             start_time = time.time()
-            pending_tasks = [self.tasks[task_id]._task for task_id in self._active_tasks
+            pending_tasks = [self.tasks[task_id]._task for task_id in list(self._active_tasks)
                              if task_id in self.tasks and self.tasks[task_id]._task is not None]
 
             if not pending_tasks:
@@ -423,6 +456,160 @@ graceful_shutdown_timeout: Timeout (seconds) to wait for a task to complete when
             import os
             os._exit(0)
 
+    def _get_lane(self, name: str) -> TaskLane:
+        """Get a lane by name, falling back to the default lane"""
+        lane = self.lanes.get(name)
+        if lane is None:
+            self.logger.warning(f"Unknown task lane {name}, using {DEFAULT_LANE}")
+            lane = self.lanes[DEFAULT_LANE]
+        return lane
+
+    def _can_start(self, lane: TaskLane) -> bool:
+        """Whether a new task of the lane can start right away without overtaking queued tasks"""
+        return not lane.queue and lane.running < lane.concurrency and self._running < self.max_concurrency
+
+    async def _admit(self, lane: TaskLane) -> None:
+        """Make room in the lane queue for a new task according to the lane overflow policy
+
+Args:
+Lane: Lane of the new task
+
+Raises:
+TaskRejectedError: if the queue is full and the policy is reject"""
+        while lane.full and not self._can_start(lane):
+            if lane.overflow == "shed" and lane.queue:
+                # Drop the oldest queued task, the newest work is the most relevant
+                task_id, _ = lane.queue.popleft()
+                lane.counters["shed"] += 1
+                shed = self.tasks.get(task_id)
+                if shed is not None:
+                    shed.cancel()
+                self.logger.warning(f"Task lane {lane.name} is full, shed queued task {task_id}")
+                continue
+
+            if lane.overflow != "block":
+                lane.counters["rejected"] += 1
+                raise TaskRejectedError(f"Task lane {lane.name} is full ({lane.max_queued} queued)")
+
+            # Wait until a queued task leaves the queue
+            lane.counters["blocked"] += 1
+            waiter = asyncio.get_running_loop().create_future()
+            lane.space_waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Pass the free place on to the next blocked submission
+                    lane.wake_space_waiter()
+                raise
+
+    async def _schedule(self, task: Task, lane_name: str) -> None:
+        """Register the task and start it in its lane, queueing it while the lane or the manager is busy
+
+Args:
+Task: Task to run
+lane_name: Lane of the task
+
+Raises:
+TaskRejectedError: if the lane queue is full and its overflow policy is reject"""
+        lane = self._get_lane(lane_name)
+        await self._admit(lane)
+
+        task.lane = lane.name
+        task.submit_time = time.time()
+        lane.counters["submitted"] += 1
+
+        # Take a slot or a queue place before yielding, so a burst of submissions sees the real queue depth
+        slot: Optional[asyncio.Future] = None
+        if self._can_start(lane):
+            self._take_slot(lane, task)
+        else:
+            slot = asyncio.get_running_loop().create_future()
+            lane.queue.append((task.task_id, slot))
+
+        # storage task
+        self.tasks[task.task_id] = task
+        self._active_tasks.add(task.task_id)
+
+        task._task = asyncio.create_task(self._run(lane, task, slot))
+        task._task.add_done_callback(lambda _: self._on_task_done(lane, task))
+
+    async def _run(self, lane: TaskLane, task: Task, slot: Optional[asyncio.Future]) -> Any:
+        """Wait for a slot of the lane, then execute the task"""
+        if slot is not None:
+            await slot
+        lane.wait_latency.record(time.time() - task.submit_time)
+        return await task.execute()
+
+    def _take_slot(self, lane: TaskLane, task: Task) -> None:
+        lane.running += 1
+        self._running += 1
+        task._holds_slot = True
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued tasks, highest priority lane first"""
+        while self._running < self.max_concurrency:
+            lane = next((lane for lane in self.lanes.values()
+                         if lane.queue and lane.running < lane.concurrency), None)
+            if lane is None:
+                break
+            task_id, slot = lane.queue.popleft()
+            lane.wake_space_waiter()
+            task = self.tasks.get(task_id)
+            if task is None or slot.done():
+                continue
+            self._take_slot(lane, task)
+            slot.set_result(None)
+
+        # Submissions blocked on a lane without queue room can now start right away
+        for lane in self.lanes.values():
+            if lane.space_waiters and self._can_start(lane):
+                lane.wake_space_waiter()
+
+    def _on_task_done(self, lane: TaskLane, task: Task) -> None:
+        """Release the slot of a finished task, record its outcome and evict old task records"""
+        if task._holds_slot:
+            task._holds_slot = False
+            lane.running -= 1
+            self._running -= 1
+        else:
+            # Cancelled while queued
+            for index, (task_id, _) in enumerate(lane.queue):
+                if task_id == task.task_id:
+                    del lane.queue[index]
+                    lane.wake_space_waiter()
+                    break
+        self._dispatch()
+
+        if task._task.cancelled():
+            lane.counters["cancelled"] += 1
+            if task.status in (TaskStatus.PENDING, TaskStatus.RUNNING):
+                task.status = TaskStatus.CANCELLED
+        elif task._task.exception() is not None:
+            lane.counters["failed"] += 1
+            self.logger.warning(f"Task {task.task_id} ({task.description}) failed: {task._task.exception()}")
+        else:
+            lane.counters["completed"] += 1
+        if task.start_time is not None:
+            lane.run_latency.record(task.duration or 0.0)
+        task.end_time = task.end_time or time.time()
+
+        self._active_tasks.discard(task.task_id)
+        self._finished[task.task_id] = task.end_time
+        self._evict_finished()
+
+    def _evict_finished(self) -> None:
+        """Drop the records of finished tasks beyond the history size or older than the history TTL"""
+        expire_before = time.time() - self.history_ttl
+        while self._finished:
+            task_id, end_time = next(iter(self._finished.items()))
+            if len(self._finished) <= self.history_size and end_time >= expire_before:
+                break
+            self._finished.popitem(last=False)
+            task = self.tasks.get(task_id)
+            if task is not None and task_id not in self._active_tasks:
+                del self.tasks[task_id]
+
     async def submit(self,
                      func: Callable[..., T],
                      *args,
@@ -432,6 +619,7 @@ graceful_shutdown_timeout: Timeout (seconds) to wait for a task to complete when
                      wait: bool = False,
                      on_complete: Optional[Callable[[str, Any], None]] = None,
                      on_error: Optional[Callable[[str, Exception], None]] = None,
+                     lane: str = DEFAULT_LANE,
                      **kwargs) -> Union[str, T]:
         """submit task
 
@@ -444,12 +632,14 @@ Description: Mission description
 Wait: Whether to wait for the task to complete
 on_complete: Callback function on task completion
 on_error: Callback function in case of task error
+Lane: Priority lane of the task, unknown lanes fall back to the default lane
 ** kwargs: keyword arguments
 
 Returns:
 If wait is True, the task result is returned; otherwise, the task ID is returned.
 
 Raises:
+TaskRejectedError: if the lane queue is full and its overflow policy is reject
 Exception: Thrown if wait is True and task execution fails"""
         # Make sure the signal processor is installed
         self._install_signal_handlers()
@@ -466,19 +656,8 @@ Exception: Thrown if wait is True and task execution fails"""
             on_error=on_error
         )
 
-        # storage task
-        self.tasks[task.task_id] = task
-        self._active_tasks.add(task.task_id)
-
-        # Create asynchronous tasks and add completion callbacks
-        async def task_wrapper():
-            try:
-                return await task.execute()
-            finally:
-                # Remove from active collection when task is completed
-                self._active_tasks.discard(task.task_id)
-
-        task._task = asyncio.create_task(task_wrapper())
+        # Queue the task in its lane and start it when it gets a slot
+        await self._schedule(task, lane)
 
         # If you don't wait, return the task ID directly.
         if not wait:
@@ -608,6 +787,7 @@ Number of tasks cleared"""
 
         for task_id in to_remove:
             del self.tasks[task_id]
+            self._finished.pop(task_id, None)
 
         return len(to_remove)
 
@@ -618,6 +798,19 @@ Returns:
 number of active tasks"""
         return len(self._active_tasks)
 
+    def get_lane_stats(self) -> Dict[str, Any]:
+        """Get the executor metrics
+
+Returns:
+Slots in use, retained task records and the metrics of each lane in priority order"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "active": len(self._active_tasks),
+            "records": len(self.tasks),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
     async def submit_time_consuming_tasks(self,
                                           func: Callable[..., T],
                                           *args,
@@ -625,7 +818,8 @@ number of active tasks"""
                                           task_id: Optional[str] = None,
                                           timeout: Optional[float] = None,
                                           description: str = "ad hoc time-consuming task",
-                                          wait: bool = False) -> str:
+                                          wait: bool = False,
+                                          lane: str = DEFAULT_LANE) -> str:
         """Submit temporary time-consuming tasks and persist them to the database
 
 Args:
@@ -636,6 +830,7 @@ task_id: Task ID, automatically generated if None
 Timeout: Timeout (seconds)
 Description: Mission description
 Wait: Whether to wait for the task to complete
+Lane: Priority lane of the task
 
 Returns:
 Task ID
@@ -688,19 +883,8 @@ Exception: Thrown if wait is True and task execution fails"""
                 description=description
             )
 
-            # storage task
-            self.tasks[task.task_id] = task
-            self._active_tasks.add(task.task_id)
-
-            # Create asynchronous tasks and add completion callbacks
-            async def task_wrapper():
-                try:
-                    return await task.execute()
-                finally:
-                    # Remove from active collection when task is completed
-                    self._active_tasks.discard(task.task_id)
-
-            task._task = asyncio.create_task(task_wrapper())
+            # Queue the task in its lane and start it when it gets a slot
+            await self._schedule(task, lane)
 
             # If you need to wait, wait for the task to complete
             if wait:
@@ -4,7 +4,9 @@ import asyncio
 import concurrent.futures
 import logging
 import functools
+import itertools
 import time
+from collections import deque
 from typing import Any, Callable, Dict, List, Optional, TypeVar, Union, Generic, Awaitable
 
 from contextlib import asynccontextmanager
@@ -13,6 +15,9 @@ from contextlib import asynccontextmanager
 T = TypeVar('T')
 R = TypeVar('R')
 
+# Execution times kept for the average / min / max statistics
+_TASK_TIME_SAMPLES = 1024
+
 class ThreadPoolExecutorEnhanced(concurrent.futures.ThreadPoolExecutor):
     """Enhanced thread pool executor
 Extends the standard ThreadPoolExecutor to include task statistics, monitoring, and asynchronous support"""
@@ -40,10 +45,11 @@ task_timeout: Default task timeout (seconds)"""
         self._active_tasks = 0
         self._completed_tasks = 0
         self._failed_tasks = 0
-        self._task_times: List[float] = []
+        self._task_times = deque(maxlen=_TASK_TIME_SAMPLES)
         
-        # active task tracking
+        # active task tracking, entries are removed when the task finishes
         self._task_registry: Dict[str, Dict[str, Any]] = {}
+        self._task_ids = itertools.count()
         
     async def submit_async(self, fn: Callable[..., T], *args, **kwargs) -> T:
         """Submit tasks asynchronously to the thread pool
@@ -59,7 +65,7 @@ The execution result of the function
 Raises:
 Concurrent.futures.TimeoutError: if the task execution times out
 Exception: if the task fails to execute"""
-        task_id = f"task_{int(time.time() * 1000)}_{self._active_tasks}"
+        task_id = f"task_{int(time.time() * 1000)}_{next(self._task_ids)}"
         task_info = {
             "name": getattr(fn, "__name__", "unknown_task"),
             "start_time": time.time(),
@@ -102,6 +108,7 @@ Exception: if the task fails to execute"""
             
         finally:
             self._active_tasks -= 1
+            self._task_registry.pop(task_id, None)
             
     async def submit_async_with_timeout(self, timeout: Optional[float], 
                                        fn: Callable[..., T], *args, **kwargs) -> T:
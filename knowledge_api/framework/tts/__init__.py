@@ -1,5 +1,6 @@
 # TTS service module
 from .tts_utils import TTSManager
 from .tts_service import ByteDanceTTS, VolcanoTTS
+from .tts_stream import SentenceSegmenter, SpeechPipeline, audio_frame
 
-__all__ = ["TTSManager", "ByteDanceTTS", "VolcanoTTS"] 
\ No newline at end of file
+__all__ = ["TTSManager", "ByteDanceTTS", "VolcanoTTS", "SentenceSegmenter", "SpeechPipeline", "audio_frame"] 
\ No newline at end of file
@@ -1,4 +1,5 @@
 """TTS service configuration"""
+import os
 from typing import Dict, Any
 
 TIMBRE_STATUS = {
@@ -13,4 +14,18 @@ DEFAULT_SPEECH_PARAMS: Dict[str, Any] = {
     "speed_ratio": 1.0,
     "volume_ratio": 1.0,
     "pitch_ratio": 1.0
-} 
\ No newline at end of file
+}
+
+# Streaming voice: TTS requests of one answer running at the same time
+TTS_STREAM_CONCURRENCY = int(os.environ.get("TTS_STREAM_CONCURRENCY", "3"))
+# Streaming voice: shorter sentences are joined with the next one, longer ones are cut at a comma
+TTS_SEGMENT_MIN_CHARS = int(os.environ.get("TTS_SEGMENT_MIN_CHARS", "6"))
+TTS_SEGMENT_MAX_CHARS = int(os.environ.get("TTS_SEGMENT_MAX_CHARS", "80"))
+
+# TTS HTTP client shared by all requests (keep-alive connections)
+TTS_MAX_CONNECTIONS = int(os.environ.get("TTS_MAX_CONNECTIONS", "20"))
+TTS_REQUEST_TIMEOUT = float(os.environ.get("TTS_REQUEST_TIMEOUT", "30"))
+# Audio cache keyed by text, voice and speech parameters, least recently used files are evicted
+TTS_CACHE_ENABLED = os.environ.get("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "cache/tts")
+TTS_CACHE_MAX_MB = float(os.environ.get("TTS_CACHE_MAX_MB", "512"))
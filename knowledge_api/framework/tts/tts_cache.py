@@ -0,0 +1,182 @@
+"""Content addressed TTS audio cache
+
+Synthesized audio is stored under the hash of everything that determines it (text, voice,
+speed, volume, pitch, encoding), so prologues, fixed system lines and repeated narration
+are synthesized once. The disk cache keeps the total size under a limit by evicting the
+least recently used files, the last access is kept in the file modification time so that
+the order survives restarts. Several workers may share the directory, each one evicts
+from what it has seen."""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from knowledge_api.framework.tts.config import TTS_CACHE_DIR, TTS_CACHE_ENABLED, TTS_CACHE_MAX_MB
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+
+def audio_cache_key(text: str, voice_type: str, speed_ratio: float = 1.0, volume_ratio: float = 1.0,
+                    pitch_ratio: float = 1.0, encoding: str = "mp3") -> str:
+    """Cache key of a synthesis
+
+@Param text: text to convert
+@Param voice_type: Tone Type
+@Param speed_ratio: Speech rate ratio
+@Param volume_ratio: volume ratio
+@Param pitch_ratio: pitch ratio
+@param encoding: encoding format
+@Return: sha256 hex digest"""
+    payload = json.dumps([text, voice_type, float(speed_ratio), float(volume_ratio), float(pitch_ratio), encoding],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskAudioCache:
+    """Audio files on local disk with LRU eviction"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        """Initialize the disk cache
+
+@Param directory: cache directory
+@Param max_bytes: maximum total size of the audio files"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # key -> (path, size), least recently used first
+        self._index: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _path(self, key: str, encoding: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{encoding}")
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                entries = await asyncio.to_thread(self._scan)
+                for key, path, size in entries:
+                    self._index[key] = (path, size)
+                    self._size += size
+                self._loaded = True
+                logger.info(f"TTS音频缓存: {len(entries)} 个文件, {self._size / 1024 / 1024:.1f}MB")
+                await self._evict()
+
+    def _scan(self):
+        """Files of the directory, least recently used first"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name.split(".", 1)[0], path, stat.st_size))
+        entries.sort()
+        return [(key, path, size) for _, key, path, size in entries]
+
+    async def get(self, key: str, encoding: str = "mp3") -> Optional[bytes]:
+        """Cached audio, None on miss"""
+        await self._ensure_loaded()
+        path = self._path(key, encoding)
+        data = await asyncio.to_thread(self._read, path)
+        if data is None:
+            self.stats["misses"] += 1
+            if key in self._index:
+                # Evicted by another worker
+                self._size -= self._index.pop(key)[1]
+            return None
+        self.stats["hits"] += 1
+        if key not in self._index:
+            # Written by another worker
+            self._index[key] = (path, len(data))
+            self._size += len(data)
+        self._index.move_to_end(key)
+        return data
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            now = time.time()
+            os.utime(path, (now, now))
+            return data
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    async def put(self, key: str, data: bytes, encoding: str = "mp3") -> None:
+        """Store audio and evict the least recently used files over the size limit"""
+        if not data or len(data) > self.max_bytes:
+            return
+        await self._ensure_loaded()
+        path = self._path(key, encoding)
+        await asyncio.to_thread(self._write, path, data)
+        if key in self._index:
+            self._size -= self._index.pop(key)[1]
+        self._index[key] = (path, len(data))
+        self._size += len(data)
+        self.stats["writes"] += 1
+        await self._evict()
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    async def _evict(self) -> None:
+        paths = []
+        while self._size > self.max_bytes and self._index:
+            _, (path, size) = self._index.popitem(last=False)
+            self._size -= size
+            paths.append(path)
+        if paths:
+            self.stats["evictions"] += len(paths)
+            await asyncio.to_thread(self._remove, paths)
+
+    @staticmethod
+    def _remove(paths) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @property
+    def size(self) -> int:
+        """Total size of the audio files known to this process"""
+        return self._size
+
+
+_audio_cache: Optional[DiskAudioCache] = None
+
+
+def get_audio_cache() -> Optional[DiskAudioCache]:
+    """Get the TTS audio cache, None when disabled with TTS_CACHE_ENABLED=false"""
+    global _audio_cache
+    if not TTS_CACHE_ENABLED:
+        return None
+    if _audio_cache is None:
+        _audio_cache = DiskAudioCache(TTS_CACHE_DIR, int(TTS_CACHE_MAX_MB * 1024 * 1024))
+    return _audio_cache
+
+
+def set_audio_cache(cache: Optional[DiskAudioCache]) -> None:
+    """Replace the TTS audio cache, None builds it again from the environment variables"""
+    global _audio_cache
+    _audio_cache = cache
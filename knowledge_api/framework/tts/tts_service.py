@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import json
 import uuid
@@ -8,20 +9,59 @@ from urllib.parse import quote
 from typing import Optional, Dict, Any
 import httpx
 
+from knowledge_api.framework.tts.config import TTS_MAX_CONNECTIONS, TTS_REQUEST_TIMEOUT
+from knowledge_api.framework.tts.tts_cache import audio_cache_key, get_audio_cache
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+# HTTP client shared by the TTS requests of the event loop
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# Running syntheses by cache key, concurrent identical requests share one
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the keep-alive HTTP client of the TTS services
+
+@Return: client shared by all requests of the running event loop"""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            timeout=TTS_REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=TTS_MAX_CONNECTIONS,
+                                max_keepalive_connections=TTS_MAX_CONNECTIONS,
+                                keepalive_expiry=60),
+        )
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (application shutdown)"""
+    global _http_client, _http_client_loop
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
 
 class ByteDanceTTS:
     """ByteDance TTS Service"""
-    def __init__(self, appid: str, access_token: str, cluster: str):
+    def __init__(self, appid: str, access_token: str, cluster: str, api_url: Optional[str] = None):
         """Initialize ByteDance TTS
 
 @Param appid: app id
 @Param access_token: access token
-@param cluster: cluster"""
+@param cluster: cluster
+@Param api_url: TTS endpoint, the ByteDance service if empty"""
         self.appid = appid
         self.access_token = access_token
         self.cluster = cluster
         self.host = "openspeech.bytedance.com"
-        self.api_url = f"https://{self.host}/api/v1/tts"
+        self.api_url = api_url or f"https://{self.host}/api/v1/tts"
         self.header = {"Authorization": f"Bearer;{self.access_token}"}
 
     async def text_to_speech(self, 
@@ -30,16 +70,57 @@ class ByteDanceTTS:
                      speed_ratio: float = 1.0,
                      volume_ratio: float = 1.0,
                      pitch_ratio: float = 1.0,
-                     encoding: str = "mp3") -> Dict[str, Any]:
+                     encoding: str = "mp3",
+                     use_cache: bool = True) -> Dict[str, Any]:
         """Text to Speech
 
+The audio is looked up in the audio cache first, concurrent identical requests share
+one synthesis and successful results are stored in the cache.
+
 @Param text: text to convert
 @Param voice_type: Tone Type
 @Param speed_ratio: Speech rate ratio
 @Param volume_ratio: volume ratio
 @Param pitch_ratio: pitch ratio
 @param encoding: encoding format
+@Param use_cache: read and write the audio cache
 @Return: response dictionary containing audio data"""
+        cache = get_audio_cache() if use_cache else None
+        if cache is None:
+            return await self._synthesize(text, voice_type, speed_ratio, volume_ratio, pitch_ratio, encoding)
+
+        key = audio_cache_key(text, voice_type, speed_ratio, volume_ratio, pitch_ratio, encoding)
+        try:
+            audio = await cache.get(key, encoding)
+        except Exception as e:
+            logger.warning(f"读取TTS音频缓存失败: {e}")
+            audio = None
+        if audio is not None:
+            return {"code": 3000, "message": "Success", "data": base64.b64encode(audio).decode("utf-8"),
+                    "cached": True}
+
+        task = _inflight.get(key)
+        if task is None:
+            # Owned by no caller: a cancelled caller does not cancel the others
+            task = asyncio.ensure_future(self._synthesize_and_cache(key, text, voice_type, speed_ratio,
+                                                                    volume_ratio, pitch_ratio, encoding))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        return dict(await asyncio.shield(task))
+
+    async def _synthesize_and_cache(self, key: str, text: str, voice_type: str, speed_ratio: float,
+                                    volume_ratio: float, pitch_ratio: float, encoding: str) -> Dict[str, Any]:
+        result = await self._synthesize(text, voice_type, speed_ratio, volume_ratio, pitch_ratio, encoding)
+        if result.get("data"):
+            try:
+                await get_audio_cache().put(key, base64.b64decode(result["data"]), encoding)
+            except Exception as e:
+                logger.warning(f"写入TTS音频缓存失败: {e}")
+        return result
+
+    async def _synthesize(self, text: str, voice_type: str, speed_ratio: float, volume_ratio: float,
+                          pitch_ratio: float, encoding: str) -> Dict[str, Any]:
+        """Request the ByteDance TTS service"""
         request_json = {
             "app": {
                 "appid": self.appid,
@@ -67,13 +148,12 @@ class ByteDanceTTS:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    self.api_url, 
-                    json=request_json, 
-                    headers=self.header
-                )
-                return resp.json()
+            resp = await get_http_client().post(
+                self.api_url,
+                json=request_json,
+                headers=self.header
+            )
+            return resp.json()
         except Exception as e:
             return {"error": str(e)}
 
@@ -213,16 +293,15 @@ class VolcanoTTS:
         header = {**header, **sign_result}
         
         # Send HTTP request
-        async with httpx.AsyncClient() as client:
-            r = await client.request(
-                method=method,
-                url="https://{}{}".format(request_param["host"], request_param["path"]),
-                headers=header,
-                params=request_param["query"],
-                data=request_param["body"],
-            )
-            
-            return r.json()
+        r = await get_http_client().request(
+            method=method,
+            url="https://{}{}".format(request_param["host"], request_param["path"]),
+            headers=header,
+            params=request_param["query"],
+            content=request_param["body"],
+        )
+
+        return r.json()
     
     async def list_mega_tts_train_status(self, app_id: str, speaker_ids: Optional[list] = None) -> Dict:
         """Get a list of training states
@@ -0,0 +1,235 @@
+"""Sentence level streaming TTS
+
+The LLM token stream is cut into sentences as it arrives, each sentence is synthesized
+as soon as it is complete (a bounded number of TTS requests at a time) and the audio
+segments are handed back in sentence order, so that the first sentence can be played
+while the rest of the answer is still being generated."""
+import asyncio
+import base64
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from knowledge_api.framework.tts.config import TTS_SEGMENT_MAX_CHARS, TTS_SEGMENT_MIN_CHARS, TTS_STREAM_CONCURRENCY
+from knowledge_api.utils.log_config import get_logger
+from knowledge_api.utils.string_tool import speakable_text
+
+logger = get_logger()
+
+# Characters ending a sentence
+SENTENCE_ENDINGS = set("。！？!?；;…\n")
+# Characters where a sentence that is too long can be cut
+CLAUSE_ENDINGS = set("，,、：:")
+_OPENING = set("(（")
+_CLOSING = set(")）")
+# Closing quotes and brackets kept with the sentence they end
+_TRAILING = set("\"'”’」』）)")
+
+
+class SentenceSegmenter:
+    """Cut streamed text into sentences
+
+Text inside parentheses (actions, expressions) is never cut, it is removed from the
+sentence before synthesis. Sentences shorter than min_chars are joined with the next
+one, sentences longer than max_chars are cut at the last clause separator."""
+
+    def __init__(self, min_chars: int = TTS_SEGMENT_MIN_CHARS, max_chars: int = TTS_SEGMENT_MAX_CHARS):
+        """Initialize the segmenter
+
+@Param min_chars: minimum characters of a segment
+@Param max_chars: maximum characters of a segment"""
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._depth = 0
+        self._scanned = 0
+        self._last_clause = -1
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text
+
+@Param text: text chunk
+@Return: the sentences completed by the chunk"""
+        self._buffer += text
+        segments = []
+        i = self._scanned
+        while i < len(self._buffer):
+            char = self._buffer[i]
+            i += 1
+            if char in _OPENING:
+                self._depth += 1
+                continue
+            if char in _CLOSING:
+                self._depth = max(0, self._depth - 1)
+                continue
+            if self._depth:
+                continue
+            if char in CLAUSE_ENDINGS:
+                self._last_clause = i
+            if char in SENTENCE_ENDINGS:
+                ending = i - 1
+                # Keep repeated punctuation and closing quotes with the sentence
+                while i < len(self._buffer) and (self._buffer[i] in SENTENCE_ENDINGS or self._buffer[i] in _TRAILING):
+                    i += 1
+                if i == len(self._buffer) and char != "\n":
+                    # More punctuation may follow in the next chunk, scan the ending again
+                    i = ending
+                    break
+                i = self._cut(i, segments, self.min_chars)
+            elif i >= self.max_chars and self._last_clause > 0:
+                i = self._cut(self._last_clause, segments, 1)
+        self._scanned = i
+        return segments
+
+    def flush(self) -> List[str]:
+        """End of the stream
+
+@Return: the remaining text as a last segment"""
+        rest = speakable_text(self._buffer)
+        self._buffer = ""
+        self._depth = 0
+        self._scanned = 0
+        self._last_clause = -1
+        return [rest] if rest else []
+
+    def _cut(self, end: int, segments: List[str], min_chars: int) -> int:
+        """Cut the buffer at end when the segment is long enough, returns the next scan position"""
+        sentence = speakable_text(self._buffer[:end])
+        if len(sentence) < min_chars:
+            return end
+        segments.append(sentence)
+        # Cuts are outside of parentheses, the rest of the buffer is scanned again from depth 0
+        self._buffer = self._buffer[end:]
+        self._depth = 0
+        self._last_clause = -1
+        return 0
+
+
+class SpeechPipeline:
+    """Synthesize sentences concurrently and return the audio in sentence order
+
+Sentences are submitted as they complete, at most concurrency TTS requests run at a
+time. ready() returns the audio segments that are done and next in order without
+waiting, drain() waits for the remaining ones. Each audio segment is a dictionary
+{"seq", "text", "data"}, data is the base64 audio (None when the synthesis failed)."""
+
+    def __init__(self, tts, voice_type: str, concurrency: int = TTS_STREAM_CONCURRENCY,
+                 segmenter: Optional[SentenceSegmenter] = None, **tts_params):
+        """Initialize the pipeline
+
+@Param tts: TTS client with an async text_to_speech(text, voice_type, ...) method
+@Param voice_type: Tone Type
+@Param concurrency: TTS requests running at the same time
+@Param segmenter: sentence segmenter
+@Param tts_params: other parameters of text_to_speech"""
+        self.tts = tts
+        self.voice_type = voice_type
+        self.tts_params = tts_params
+        self.segmenter = segmenter or SentenceSegmenter()
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._pending: Deque[asyncio.Task] = deque()
+        self._seq = 0
+        self.started_at = time.perf_counter()
+        self.first_audio_at: Optional[float] = None
+
+    @property
+    def time_to_first_audio(self) -> Optional[float]:
+        """Seconds from the start of the pipeline to the first audio segment returned"""
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.started_at
+
+    def feed(self, text: str) -> None:
+        """Add streamed text, completed sentences are submitted for synthesis"""
+        for sentence in self.segmenter.feed(text):
+            self._submit(sentence)
+
+    def ready(self) -> List[Dict[str, Any]]:
+        """Audio segments done and next in order, without waiting"""
+        segments = []
+        while self._pending and self._pending[0].done():
+            segments.append(self._take(self._pending.popleft().result()))
+        return segments
+
+    async def drain(self) -> AsyncIterator[Dict[str, Any]]:
+        """End of the text: synthesize the rest and wait for the audio segments in order"""
+        for sentence in self.segmenter.flush():
+            self._submit(sentence)
+        try:
+            while self._pending:
+                segment = await self._pending[0]
+                self._pending.popleft()
+                yield self._take(segment)
+        finally:
+            self.cancel()
+
+    async def interleave(self, chunks: AsyncIterator[Any]) -> AsyncIterator[Tuple[str, Any]]:
+        """Merge a text stream with the audio segments as soon as either is available
+
+The caller feeds the text of the stream to the pipeline, the remaining audio
+segments are returned when the stream ends.
+
+@Param chunks: text stream
+@Return: ("text", chunk) and ("audio", segment) items"""
+        iterator = chunks.__aiter__()
+        next_chunk: Optional[asyncio.Future] = asyncio.ensure_future(iterator.__anext__())
+        try:
+            while True:
+                waiters = {next_chunk}
+                if self._pending:
+                    waiters.add(self._pending[0])
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                for segment in self.ready():
+                    yield "audio", segment
+                if not next_chunk.done():
+                    continue
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    next_chunk = None
+                    break
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+                yield "text", chunk
+            async for segment in self.drain():
+                yield "audio", segment
+        finally:
+            if next_chunk is not None:
+                next_chunk.cancel()
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Cancel the running syntheses (client gone)"""
+        while self._pending:
+            self._pending.popleft().cancel()
+
+    def _submit(self, sentence: str) -> None:
+        self._pending.append(asyncio.create_task(self._synthesize(self._seq, sentence)))
+        self._seq += 1
+
+    def _take(self, segment: Dict[str, Any]) -> Dict[str, Any]:
+        if self.first_audio_at is None and segment.get("data"):
+            self.first_audio_at = time.perf_counter()
+            logger.info(f"首段语音耗时: {self.time_to_first_audio * 1000:.0f}ms")
+        return segment
+
+    async def _synthesize(self, seq: int, sentence: str) -> Dict[str, Any]:
+        async with self._semaphore:
+            try:
+                result = await self.tts.text_to_speech(sentence, self.voice_type, **self.tts_params)
+            except Exception as e:
+                result = {"error": str(e)}
+        data = result.get("data") if isinstance(result, dict) else None
+        if not data:
+            logger.warning(f"分句语音合成失败: 第{seq}段 {result.get('error') or result.get('message')}")
+        return {"seq": seq, "text": sentence, "data": data}
+
+
+def audio_frame(segment: Dict[str, Any]) -> str:
+    """Stream frame of an audio segment, interleaved with the text chunks"""
+    return f"<audio>{json.dumps(segment, ensure_ascii=False)}</audio>"
+
+
+def audio_bytes(segment: Dict[str, Any]) -> bytes:
+    """Decoded audio of a segment"""
+    return base64.b64decode(segment["data"]) if segment.get("data") else b""
@@ -1,13 +1,14 @@
+import asyncio
 import base64
 import json
 import os
 from typing import Dict, Any, Optional, List, Tuple
 import logging
 from datetime import datetime
-import aiohttp
 
-from .tts_service import ByteDanceTTS, VolcanoTTS
-from .config import (DEFAULT_SPEECH_PARAMS)
+from .tts_service import ByteDanceTTS, VolcanoTTS, get_http_client
+from .config import (DEFAULT_SPEECH_PARAMS, TTS_STREAM_CONCURRENCY)
+from knowledge_api.utils.string_tool import speakable_text
 from knowledge_api.mapper.audio_timbre.crud import AudioTimbreCRUD
 from knowledge_api.mapper.audio_timbre.base import AudioTimbreCreate, AudioTimbreUpdate
 from ..redis.cache_manager import CacheManager
@@ -62,7 +63,7 @@ class TTSManager:
         
         try:
             # Invoke the ByteDance TTS service
-            result = self.bytedance_tts.text_to_speech(
+            result = await self.bytedance_tts.text_to_speech(
                 text=text,
                 voice_type=speaker_id,
                 speed_ratio=params.get("speed_ratio", 1.0),
@@ -83,6 +84,29 @@ class TTSManager:
             logger.exception(f"TTS转换异常: {str(e)}")
             return False, {"error": f"TTS转换异常: {str(e)}"}
     
+    async def prewarm(self, texts: List[str], speaker_id: str,
+                      params: Optional[Dict[str, Any]] = None) -> int:
+        """Synthesize texts into the audio cache ahead of time
+
+@Param texts: texts to convert
+@Param speaker_id: Tone ID
+@Param params: conversion parameters
+@Return: number of texts with audio"""
+        texts = [text for text in dict.fromkeys(texts or []) if text]
+        if not texts or not speaker_id:
+            return 0
+        params = {**DEFAULT_SPEECH_PARAMS, **(params or {})}
+        semaphore = asyncio.Semaphore(TTS_STREAM_CONCURRENCY)
+
+        async def synthesize(text: str) -> bool:
+            async with semaphore:
+                result = await self.bytedance_tts.text_to_speech(text=text, voice_type=speaker_id, **params)
+            return bool(result.get("data"))
+
+        done = sum(await asyncio.gather(*(synthesize(text) for text in texts)))
+        logger.info(f"TTS音频预热完成: 音色 {speaker_id}, {done}/{len(texts)} 条")
+        return done
+
     async def get_voice_list(self) -> Tuple[bool, Dict[str, Any]]:
         """Get a list of available sounds
 
@@ -197,11 +221,9 @@ class TTSManager:
             demo_audio_url = voice_data.get("DemoAudio")
             if demo_audio_url:
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(demo_audio_url) as response:
-                            if response.status == 200:
-                                audio_data = await response.read()
-                                audition = base64.b64encode(audio_data).decode('utf-8')
+                    response = await get_http_client().get(demo_audio_url)
+                    if response.status_code == 200:
+                        audition = base64.b64encode(response.content).decode('utf-8')
                 except Exception as e:
                     logger.error(f"获取音频数据失败: {str(e)}")
             
@@ -249,4 +271,23 @@ class TTSManager:
             return base64.b64encode(audio_data).decode("utf-8")
         except Exception as e:
             logger.exception(f"获取音频Base64编码失败: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+
+async def prewarm_prologue_audio(speaker_id: str, prologues: List[str]) -> int:
+    """Synthesize the prologues of a role into the audio cache
+
+The prologue is spoken without its parenthesized actions, as in the chat.
+
+@Param speaker_id: Tone ID of the role
+@Param prologues: prologues of the role
+@Return: number of prologues with audio"""
+    if not speaker_id or not prologues:
+        return 0
+    try:
+        tts_manager = TTSManager()
+        await tts_manager.init_data()
+        return await tts_manager.prewarm([speakable_text(p) for p in prologues], speaker_id)
+    except Exception as e:
+        logger.error(f"TTS音频预热失败: {str(e)}")
+        return 0
@@ -0,0 +1,4 @@
+# Startup warmup module
+from .warmup import WarmupComponent, WarmupOrchestrator, WarmupStatus, get_warmup_orchestrator, set_warmup_orchestrator
+
+__all__ = ["WarmupComponent", "WarmupOrchestrator", "WarmupStatus", "get_warmup_orchestrator", "set_warmup_orchestrator"]
@@ -0,0 +1,288 @@
+"""Startup warmup module
+Components declare their loader and the components they depend on. At startup they are warmed in the
+background while the app already serves /health: independent components load in parallel, critical
+components gate readiness and the rest is warmed after them"""
+import asyncio
+import os
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+# Components loading at the same time
+WARMUP_CONCURRENCY = int(os.environ.get("WARMUP_CONCURRENCY", "4"))
+# Timeout (seconds) of one component
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", "300"))
+# Time (seconds) a request arriving during warmup waits for the critical components, 0 disables the gate
+WARMUP_GATE_TIMEOUT = float(os.environ.get("WARMUP_GATE_TIMEOUT", "30"))
+
+Loader = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class WarmupStatus(str, Enum):
+    """Warmup state of a component"""
+    PENDING = "pending"
+    RUNNING = "running"
+    READY = "ready"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+
+class WarmupComponent:
+    """A component warmed at startup"""
+
+    def __init__(self, name: str, loader: Loader, depends_on: Iterable[str] = (),
+                 critical: bool = True, timeout: Optional[float] = None):
+        """Initialize the component
+
+Args:
+Name: Component name
+Loader: Function without arguments loading the component, synchronous loaders run in a worker thread
+depends_on: Components that must be ready before this one loads
+Critical: Whether the app is ready only once this component is ready
+Timeout: Timeout (seconds) of the loader, WARMUP_TIMEOUT if None"""
+        self.name = name
+        self.loader = loader
+        self.depends_on = tuple(depends_on)
+        self.critical = critical
+        self.timeout = timeout
+
+        self.status = WarmupStatus.PENDING
+        self.start_time: Optional[float] = None
+        self.warm_time: Optional[float] = None
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def settled(self) -> bool:
+        return self.status in (WarmupStatus.READY, WarmupStatus.FAILED, WarmupStatus.SKIPPED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status.value,
+            "critical": self.critical,
+            "depends_on": list(self.depends_on),
+            "start_time": self.start_time,
+            "warm_time": self.warm_time,
+            "error": self.error,
+        }
+
+
+class WarmupOrchestrator:
+    """Warms registered components in dependency order"""
+
+    def __init__(self, concurrency: int = WARMUP_CONCURRENCY, timeout: float = WARMUP_TIMEOUT):
+        """Initialize the orchestrator
+
+Args:
+Concurrency: Components loading at the same time
+Timeout: Default timeout (seconds) of one component"""
+        self.components: Dict[str, WarmupComponent] = {}
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._started_at: Optional[float] = None
+        self._ready_after: Optional[float] = None
+        self._critical_done: Optional[asyncio.Event] = None
+        self._background: Optional[asyncio.Task] = None
+
+    def register(self, name: str, loader: Loader, depends_on: Iterable[str] = (),
+                 critical: bool = True, timeout: Optional[float] = None) -> WarmupComponent:
+        """Register a component
+
+Args:
+Name: Component name
+Loader: Function without arguments loading the component
+depends_on: Components that must be ready before this one loads
+Critical: Whether readiness waits for this component
+Timeout: Timeout (seconds) of the loader
+
+Returns:
+The registered component"""
+        if name in self.components:
+            raise ValueError(f"Warmup component {name} is already registered")
+        component = WarmupComponent(name, loader, depends_on, critical, timeout)
+        self.components[name] = component
+        return component
+
+    def _validate(self) -> None:
+        """Check that dependencies exist and have no cycle
+
+Raises:
+ValueError: on an unknown dependency or a dependency cycle"""
+        visiting, visited = set(), set()
+
+        def visit(name: str, path: List[str]) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Warmup dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.components[name].depends_on:
+                if dependency not in self.components:
+                    raise ValueError(f"Warmup component {name} depends on unknown component {dependency}")
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.components:
+            visit(name, [])
+
+    def start(self) -> None:
+        """Start warming in the background: critical components (with their dependencies) first, the others after them
+
+Raises:
+ValueError: on an unknown dependency or a dependency cycle"""
+        if self._background is not None:
+            return
+        self._validate()
+        self._started_at = time.perf_counter()
+        self._critical_done = asyncio.Event()
+        self._background = asyncio.create_task(self._warm_all())
+
+    async def _warm_all(self) -> None:
+        critical = [self._launch(component) for component in self.components.values() if component.critical]
+        await asyncio.gather(*critical)
+        self._critical_done.set()
+        if self.ready:
+            self._ready_after = time.perf_counter() - self._started_at
+            logger.info(f"Critical components warmed in {self._ready_after:.2f}s")
+        else:
+            failed = [name for name, component in self.components.items()
+                      if component.critical and component.status != WarmupStatus.READY]
+            logger.error(f"Critical components not ready after warmup: {failed}")
+
+        await asyncio.gather(*(self._launch(component) for component in self.components.values()))
+        logger.info("Warmup finished: " + ", ".join(
+            f"{name} {component.status.value} {component.warm_time or 0:.2f}s"
+            for name, component in self.components.items()))
+
+    def _launch(self, component: WarmupComponent) -> asyncio.Task:
+        """Task warming the component, created on first use"""
+        if component._task is None:
+            component._task = asyncio.create_task(self._warm(component))
+        return component._task
+
+    async def _warm(self, component: WarmupComponent) -> bool:
+        """Warm the dependencies, then the component
+
+Returns:
+Whether the component is ready"""
+        if component.depends_on:
+            await asyncio.gather(*(self._launch(self.components[name]) for name in component.depends_on))
+            missing = [name for name in component.depends_on
+                       if self.components[name].status != WarmupStatus.READY]
+            if missing:
+                component.status = WarmupStatus.SKIPPED
+                component.error = f"Dependencies not ready: {', '.join(missing)}"
+                logger.warning(f"Skip warming {component.name}: {component.error}")
+                return False
+
+        async with self._semaphore:
+            component.status = WarmupStatus.RUNNING
+            component.start_time = time.time()
+            started = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(component.loader):
+                    loading = component.loader()
+                else:
+                    # Model loading blocks, keep it off the event loop
+                    loading = asyncio.to_thread(component.loader)
+                await asyncio.wait_for(loading, timeout=component.timeout or self.timeout)
+                component.status = WarmupStatus.READY
+                return True
+            except Exception as e:
+                component.status = WarmupStatus.FAILED
+                component.error = str(e) or type(e).__name__
+                logger.error(f"预热组件 {component.name} 失败: {component.error}")
+                return False
+            finally:
+                component.warm_time = time.perf_counter() - started
+
+    async def ensure(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Warm a component now if it has not started yet (also before start) and wait for it
+
+Args:
+Name: Component name
+Timeout: Time (seconds) to wait, without limit if None
+
+Returns:
+Whether the component is ready, True for components that are not registered"""
+        component = self.components.get(name)
+        if component is None:
+            return True
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._launch(component)), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait_settled(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every critical component is ready, failed or skipped
+
+Args:
+Timeout: Time (seconds) to wait, without limit if None
+
+Returns:
+Whether the critical components settled in time, True if warmup was not started"""
+        if self._critical_done is None or self._critical_done.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._critical_done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    @property
+    def settled(self) -> bool:
+        return self._critical_done is None or self._critical_done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether every critical component is ready"""
+        return all(component.status == WarmupStatus.READY
+                   for component in self.components.values() if component.critical)
+
+    def report(self) -> Dict[str, Any]:
+        """Warmup report
+
+Returns:
+Readiness, seconds since start, seconds until the critical components were ready and the state and warm time of each component"""
+        return {
+            "ready": self._started_at is not None and self.ready,
+            "uptime": time.perf_counter() - self._started_at if self._started_at is not None else None,
+            "ready_after": self._ready_after,
+            "components": {name: component.to_dict() for name, component in self.components.items()},
+        }
+
+    async def close(self) -> None:
+        """Stop warming at shutdown"""
+        tasks = [component._task for component in self.components.values()
+                 if component._task is not None and not component._task.done()]
+        if self._background is not None and not self._background.done():
+            tasks.append(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# global orchestrator instance
+_warmup_orchestrator: Optional[WarmupOrchestrator] = None
+
+
+def get_warmup_orchestrator() -> WarmupOrchestrator:
+    """Get the global warmup orchestrator (singleton mode)
+
+Returns:
+Warmup orchestrator instance"""
+    global _warmup_orchestrator
+    if _warmup_orchestrator is None:
+        _warmup_orchestrator = WarmupOrchestrator()
+    return _warmup_orchestrator
+
+
+def set_warmup_orchestrator(orchestrator: Optional[WarmupOrchestrator]) -> None:
+    """Replace the global warmup orchestrator"""
+    global _warmup_orchestrator
+    _warmup_orchestrator = orchestrator
@@ -9,6 +9,7 @@ from knowledge_api.framework.workflow.types import (
     WorkflowContext, WorkflowExecutionResult
 )
 from knowledge_api.framework.workflow.engine import WorkflowEngine
+from knowledge_api.framework.workflow.compiler import WorkflowPlan, get_workflow_plan, get_template_plan
 from knowledge_api.framework.workflow.template_loader import load_template, list_templates
 from knowledge_api.utils.log_config import get_logger
 from knowledge_api.framework.workflow.model.node import Node
@@ -21,6 +22,7 @@ __all__ = [
     "NodeInput", "NodeOutput", "NodeConnection", "NodePosition",
     "NodeDefinition", "WorkflowDefinition", "NodeExecutionResult",
     "WorkflowContext", "WorkflowExecutionResult", "NodeStatus",
+    "WorkflowPlan", "get_workflow_plan", "get_template_plan",
     "load_templates", "get_workflow_engine"
 ]
 
@@ -0,0 +1,366 @@
+"""Workflow Compiler
+
+Turns a workflow template into an immutable WorkflowPlan: the nodes in topological order
+with their node class and constructor form resolved, the adjacency of normal and
+conditional edges, the start nodes and the template variables of every node.
+
+Plans are cached by the hash of the template, so the sessions of a game type share one
+plan and per session only the node instances and the context are created."""
+import hashlib
+import inspect
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Type
+
+from knowledge_api.framework.workflow.model.node import Node, parse_template_vars
+from knowledge_api.framework.workflow.nodes.node_registry import node_registry
+from knowledge_api.utils.log_config import get_logger
+
+logger = get_logger()
+
+# Nodes of one session executed at the same time by parallel branches
+BRANCH_CONCURRENCY = int(os.environ.get("WORKFLOW_BRANCH_CONCURRENCY", "4"))
+
+# Compiled plans by template hash, and template file -> (mtime, size, plan)
+_plans: Dict[str, "WorkflowPlan"] = {}
+_template_files: Dict[str, Tuple[int, int, "WorkflowPlan"]] = {}
+
+
+def _copy_value(value: Any) -> Any:
+    """Copy the dicts and lists of a template value, much cheaper than copy.deepcopy for JSON data"""
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class NodeSpec:
+    """Compiled node of a plan, creates the node instances of a session"""
+    id: str
+    name: str
+    component_type: str
+    node_class: Type[Node]
+    # Constructor is __init__(self, id, name, component_type, config) instead of (self, id, name, config)
+    with_component_type: bool
+    config: Mapping[str, Any]
+    inputs: Tuple[Dict[str, Any], ...]
+    outputs: Tuple[Dict[str, Any], ...]
+    template_vars: Tuple[str, ...]
+    edge_conditions: Tuple[Dict[str, Any], ...] = ()
+    internal_plan: Optional["WorkflowPlan"] = None
+
+    def instantiate(self) -> Node:
+        """Create a node instance with its own copy of the configuration"""
+        config = _copy_value(dict(self.config))
+        if self.with_component_type:
+            node = self.node_class(self.id, self.name, self.component_type, config)
+        else:
+            node = self.node_class(self.id, self.name, config)
+        node.inputs = _copy_value(list(self.inputs))
+        node.outputs = _copy_value(list(self.outputs))
+        if self.internal_plan is not None:
+            node.internal_plan = self.internal_plan
+        if self.edge_conditions and hasattr(node, "set_edge_conditions"):
+            node.set_edge_conditions([dict(edge) for edge in self.edge_conditions])
+        return node
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    """Immutable compiled workflow, shared by every session of the template"""
+    template_hash: str
+    workflow_id: str
+    name: str
+    start_node: Optional[str]
+    # Node specs in topological order
+    nodes: Mapping[str, NodeSpec]
+    # source -> targets of every edge, in edge order
+    successors: Mapping[str, Tuple[str, ...]]
+    # source -> targets of the edges without condition
+    connections: Mapping[str, Tuple[str, ...]]
+    # source -> conditions {target, key, value, operator} of a conditional node
+    conditional_edges: Mapping[str, Tuple[Dict[str, Any], ...]]
+    # Nodes no edge points to, in definition order
+    start_nodes: Tuple[str, ...]
+    # Number of edges pointing to each node, above 1 the node joins parallel branches
+    in_degree: Mapping[str, int]
+    definition: Mapping[str, Any]
+
+    def is_join(self, node_id: str) -> bool:
+        """Whether several edges point to the node"""
+        return self.in_degree.get(node_id, 0) > 1
+
+    @property
+    def order(self) -> Tuple[str, ...]:
+        """Node IDs in topological order"""
+        return tuple(self.nodes)
+
+    def instantiate_nodes(self) -> Dict[str, Node]:
+        """Create the node instances of one session
+
+Returns:
+Node ID to node instance mapping, in topological order"""
+        instances = {}
+        for node_id, spec in self.nodes.items():
+            try:
+                instances[node_id] = spec.instantiate()
+            except Exception as e:
+                logger.error(f"创建节点失败: {node_id} ({spec.component_type}), 错误: {e}")
+        return instances
+
+
+def template_hash(workflow_definition: Dict[str, Any]) -> str:
+    """Hash of a workflow definition, independent of the key order"""
+    canonical = json.dumps(workflow_definition, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_workflow_plan(workflow_definition: Dict[str, Any]) -> "WorkflowPlan":
+    """Get the compiled plan of a workflow definition, compiled once per template hash
+
+Args:
+workflow_definition: Workflow Definition (Dictionary Format)
+
+Returns:
+Compiled workflow plan"""
+    key = template_hash(workflow_definition)
+    plan = _plans.get(key)
+    if plan is None:
+        plan = compile_workflow(workflow_definition, key)
+        _plans[key] = plan
+    return plan
+
+
+def get_template_plan(template_path: str) -> "WorkflowPlan":
+    """Get the compiled plan of a template file, the file is only read again when it changes
+
+Args:
+template_path: Template file path
+
+Returns:
+Compiled workflow plan"""
+    path = os.path.abspath(template_path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        logger.error(f"工作流模板不存在: {template_path}")
+        raise
+
+    cached = _template_files.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(path, "r", encoding="utf-8") as f:
+        workflow_definition = json.load(f)
+    plan = get_workflow_plan(workflow_definition)
+    _template_files[path] = (stat.st_mtime_ns, stat.st_size, plan)
+    logger.info(f"成功加载工作流模板: {template_path}, 模板哈希={plan.template_hash[:12]}")
+    return plan
+
+
+def clear_plan_cache() -> None:
+    """Drop every compiled plan, the next load compiles the templates again"""
+    _plans.clear()
+    _template_files.clear()
+
+
+@lru_cache(maxsize=None)
+def _takes_component_type(node_class: Type[Node]) -> Optional[bool]:
+    """Constructor form of a node class
+
+Returns:
+False for __init__(self, id, name, config), True for __init__(self, id, name, component_type, config),
+None if the signature matches neither"""
+    init_params = list(inspect.signature(node_class.__init__).parameters.keys())
+    if len(init_params) == 4 and "config" in init_params:
+        return False
+    if len(init_params) == 5 and "component_type" in init_params and "config" in init_params:
+        return True
+    return None
+
+
+def _resolve_constructor(node_class: Type[Node], node_id: str, node_name: str,
+                         component_type: str, config: Dict[str, Any]) -> bool:
+    """Find the constructor form of a node and check that the node can be created
+
+Raises:
+Exception: the node cannot be created with this configuration"""
+    with_component_type = _takes_component_type(node_class)
+    if with_component_type is not None:
+        args = (node_id, node_name, component_type) if with_component_type else (node_id, node_name)
+        node_class(*args, _copy_value(config))
+        return with_component_type
+
+    logger.warning(f"节点 {component_type} 的构造函数参数不匹配，尝试通用实例化")
+    try:
+        node_class(node_id, node_name, _copy_value(config))
+        return False
+    except TypeError:
+        node_class(node_id, node_name, component_type, _copy_value(config))
+        return True
+
+
+def _config_template_vars(config: Any) -> Tuple[str, ...]:
+    """Variables of every template string in a node configuration"""
+    found: List[str] = []
+    if isinstance(config, str):
+        found.extend(parse_template_vars(config))
+    elif isinstance(config, dict):
+        for key, value in config.items():
+            # The internal nodes of a loop have their own plan
+            if key not in ("internal_nodes", "internal_edges"):
+                found.extend(_config_template_vars(value))
+    elif isinstance(config, list):
+        for value in config:
+            found.extend(_config_template_vars(value))
+    return tuple(dict.fromkeys(found))
+
+
+def _topological_order(node_ids: List[str], successors: Dict[str, List[str]]) -> List[str]:
+    """Kahn ordering in definition order, the nodes of a cycle keep their definition order"""
+    in_degree = {node_id: 0 for node_id in node_ids}
+    for source, targets in successors.items():
+        if source not in in_degree:
+            continue
+        for target in targets:
+            if target in in_degree:
+                in_degree[target] += 1
+
+    ready = [node_id for node_id in node_ids if in_degree[node_id] == 0]
+    order = []
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for target in successors.get(node_id, []):
+            if target in in_degree:
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    ready.append(target)
+
+    placed = set(order)
+    order.extend(node_id for node_id in node_ids if node_id not in placed)
+    return order
+
+
+def compile_workflow(workflow_definition: Dict[str, Any], key: Optional[str] = None) -> "WorkflowPlan":
+    """Compile a workflow definition, use get_workflow_plan to share the result
+
+Args:
+workflow_definition: Workflow Definition (Dictionary Format)
+Key: template hash, computed when empty
+
+Returns:
+Compiled workflow plan"""
+    key = key or template_hash(workflow_definition)
+    workflow_id = workflow_definition.get("id", "")
+
+    # Resolve the node classes and constructors
+    node_fields: Dict[str, Dict[str, Any]] = {}
+    for node_config in workflow_definition.get("nodes", []):
+        node_id = node_config.get("id")
+        node_name = node_config.get("name", "unnamed")
+        component_type = node_config.get("component_type")
+        config = node_config.get("config", {})
+
+        if not node_id or not component_type:
+            logger.warning(f"节点配置缺少必要字段：{node_config}")
+            continue
+        if component_type not in node_registry:
+            logger.warning(f"未知的节点类型: {component_type}，跳过")
+            continue
+
+        node_class = node_registry[component_type]
+        try:
+            with_component_type = _resolve_constructor(node_class, node_id, node_name, component_type, config)
+        except Exception as e:
+            logger.error(f"无法实例化节点 {node_id} ({component_type}): {e}")
+            continue
+
+        internal_plan = None
+        if component_type == "loop" and config.get("internal_nodes"):
+            internal_plan = get_workflow_plan({
+                "id": f"{node_id}_internal",
+                "nodes": config.get("internal_nodes", []),
+                "edges": config.get("internal_edges", []),
+            })
+
+        node_fields[node_id] = {
+            "id": node_id,
+            "name": node_name,
+            "component_type": component_type,
+            "node_class": node_class,
+            "with_component_type": with_component_type,
+            "config": MappingProxyType(config),
+            "inputs": tuple(node_config.get("inputs", [])),
+            "outputs": tuple(node_config.get("outputs", [])),
+            "template_vars": _config_template_vars(config),
+            "internal_plan": internal_plan,
+        }
+
+    # Split the edges into normal connections and conditional edges
+    successors: Dict[str, List[str]] = {}
+    connections: Dict[str, List[str]] = {}
+    conditional_edges: Dict[str, List[Dict[str, Any]]] = {}
+    all_targets = set()
+    in_degree: Dict[str, int] = {}
+    for edge in workflow_definition.get("edges", []):
+        source_node_id = edge.get("source")
+        target_node_id = edge.get("target")
+        if not source_node_id or not target_node_id:
+            logger.warning(f"边缺少源或目标节点: {edge}")
+            continue
+        all_targets.add(target_node_id)
+        in_degree[target_node_id] = in_degree.get(target_node_id, 0) + 1
+        successors.setdefault(source_node_id, []).append(target_node_id)
+
+        source = node_fields.get(source_node_id)
+        if not source:
+            logger.warning(f"未找到源节点: {source_node_id}")
+            continue
+        is_conditional = source["component_type"] == "conditional" or source["node_class"].node_type == "conditional"
+        condition = edge.get("condition")
+        if condition and is_conditional:
+            conditional_edges.setdefault(source_node_id, []).append({
+                "target": target_node_id,
+                "key": condition.get("key", ""),
+                "value": condition.get("value", ""),
+                "operator": condition.get("operator", "==")
+            })
+        else:
+            if is_conditional:
+                logger.warning(f"条件节点 {source_node_id} 缺少条件定义，但有边缘连接到 {target_node_id}")
+            connections.setdefault(source_node_id, []).append(target_node_id)
+
+    order = _topological_order(list(node_fields), successors)
+    nodes = {}
+    for node_id in order:
+        fields = node_fields[node_id]
+        fields["edge_conditions"] = tuple(conditional_edges.get(node_id, ()))
+        nodes[node_id] = NodeSpec(**fields)
+
+    start_nodes = tuple(node_id for node_id in node_fields if node_id not in all_targets)
+    if not start_nodes and node_fields:
+        start_nodes = (next(iter(node_fields)),)
+
+    plan = WorkflowPlan(
+        template_hash=key,
+        workflow_id=workflow_id,
+        name=workflow_definition.get("name", ""),
+        start_node=workflow_definition.get("start_node"),
+        nodes=MappingProxyType(nodes),
+        successors=MappingProxyType({k: tuple(v) for k, v in successors.items()}),
+        connections=MappingProxyType({k: tuple(v) for k, v in connections.items()}),
+        conditional_edges=MappingProxyType({k: tuple(v) for k, v in conditional_edges.items()}),
+        start_nodes=start_nodes,
+        in_degree=MappingProxyType(in_degree),
+        definition=MappingProxyType(workflow_definition),
+    )
+    logger.info(f"工作流编译完成: ID={workflow_id or '未知'}, 节点={len(nodes)}, "
+                f"普通连接={sum(len(v) for v in connections.values())}, "
+                f"条件连接={sum(len(v) for v in conditional_edges.values())}, 哈希={key[:12]}")
+    return plan
@@ -2,19 +2,19 @@
 
 Provides core functionality for workflow loading, execution, and management"""
 
+import asyncio
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-import inspect
+from typing import Dict, List, Any, Mapping, Optional, Sequence, Tuple
 
+from knowledge_api.framework.workflow.compiler import BRANCH_CONCURRENCY, WorkflowPlan, get_workflow_plan
 from knowledge_api.framework.workflow.model.node import Node
 from knowledge_api.framework.workflow.model.node_factory import NodeFactory
 from knowledge_api.framework.workflow.model.node_status import NodeStatus
-from knowledge_api.framework.workflow.nodes.node_registry import node_registry
 from knowledge_api.framework.workflow.types import (
     WorkflowDefinition,
     WorkflowContext
 )
-from knowledge_api.framework.workflow.template_loader import load_template
+from knowledge_api.framework.workflow.template_loader import load_template_plan
 from knowledge_api.utils.log_config import get_logger
 
 logger = get_logger()
@@ -39,11 +39,14 @@ node_factory: Node factory for creating node instances"""
         # Node instance mapping
         self.nodes: Dict[str, Node] = {}
         
-        # Connection mapping (source_node_id, source_output_id ) -> [( target_node_id, target_input_id) ]
-        self.connections: Dict[str, List[str]] = {}
+        # Compiled plan of the loaded workflow
+        self.plan: Optional[WorkflowPlan] = None
         
-        # Conditional Edge Map source_node_id - > [ (target_node_id, condition) ]
-        self.conditional_edges: Dict[str, List[Dict[str, Any]]] = {}
+        # Connection mapping source_node_id -> (target_node_id, ...)
+        self.connections: Mapping[str, Sequence[str]] = {}
+        
+        # Conditional Edge Map source_node_id - > ({target, key, value, operator}, ...)
+        self.conditional_edges: Mapping[str, Sequence[Dict[str, Any]]] = {}
         
         # Start node (node without input connection)
         self.start_nodes: List[str] = []
@@ -55,169 +58,51 @@ node_factory: Node factory for creating node instances"""
         
         # Save node execution result
         self.node_results: Dict[str, Dict[str, Any]] = {}
+        
+        # Limit of nodes executed at the same time by the parallel branches of this engine (one session)
+        self._branch_semaphore = asyncio.Semaphore(BRANCH_CONCURRENCY)
+
+    @classmethod
+    def from_plan(cls, plan: WorkflowPlan, node_factory: Optional[NodeFactory] = None) -> "WorkflowEngine":
+        """Create an engine running a compiled workflow plan
+
+Args:
+Plan: compiled workflow plan, shared with the other engines of the template
+node_factory: Node factory for creating node instances
+
+Returns:
+workflow engine instance"""
+        engine = cls(node_factory=node_factory)
+        engine.load_plan(plan)
+        return engine
 
     def load_workflow(self, workflow_definition: Dict[str, Any]) -> None:
         """Load workflow definition
 
+The definition is compiled once per template hash, see compiler.get_workflow_plan
+
 Args:
 workflow_definition: Workflow Definition (Dictionary Format)"""
-        logger.info(f"开始加载工作流: {workflow_definition.get('id', '未知')}")
-        
-        # Reset current state
-        self.nodes = {}
-        self.connections = {}
-        self.conditional_edges = {}
-        self.start_nodes = []
+        self.load_plan(get_workflow_plan(workflow_definition))
+
+    def load_plan(self, plan: WorkflowPlan) -> None:
+        """Load a compiled workflow plan, only the node instances are created
+
+Args:
+Plan: compiled workflow plan"""
+        self.plan = plan
+        self.nodes = plan.instantiate_nodes()
+        # The adjacency is read-only and shared with the plan
+        self.connections = plan.connections
+        self.conditional_edges = plan.conditional_edges
         self.node_results = {}
-        
-        # Set the starting node
-        self.start_node = workflow_definition.get("start_node")
-        logger.info(f"工作流起始节点: {self.start_node}")
-        
-        # Create node instance
-        for node_config in workflow_definition.get("nodes", []):
-            try:
-                node_id = node_config.get("id")
-                node_name = node_config.get("name", "unnamed")
-                component_type = node_config.get("component_type")
-                
-                if not node_id or not component_type:
-                    logger.warning(f"节点配置缺少必要字段：{node_config}")
-                    continue
-                
-                logger.info(f"正在处理节点: ID={node_id}, 类型={component_type}")
-                
-                # Copy node configuration and adjust field names
-                node_def = {}
-                node_def["id"] = node_id
-                node_def["name"] = node_name
-                node_def["type"] = component_type
-                
-                # replication configuration
-                config = node_config.get("config", {})
-                node_def["properties"] = config
-                
-                # Processing input and output
-                node_def["inputs"] = node_config.get("inputs", [])
-                node_def["outputs"] = node_config.get("outputs", [])
-                
-                # Create a node directly using node regedit
-                if component_type in node_registry:
-                    node_class = node_registry[component_type]
-                    # Decide how to instantiate based on the __init__ parameters of the node class
-                    init_params = list(inspect.signature(node_class.__init__).parameters.keys())
-                    
-                    if len(init_params) == 4 and 'config' in init_params:
-                        # Suppose the constructor is __init__ (self, id, name, config)
-                        node = node_class(node_id, node_name, config)
-                    elif len(init_params) == 5 and 'component_type' in init_params and 'config' in init_params:
-                        # Suppose the constructor is __init__ (self, id, name, component_type, config)
-                        node = node_class(node_id, node_name, component_type, config)
-                    else:
-                        # Attempt for generic instantiation may fail
-                        logger.warning(f"节点 {component_type} 的构造函数参数不匹配，尝试通用实例化")
-                        try:
-                           # Try (id, name, config) - works with MessageNode, PlayerTurnNode, etc
-                           node = node_class(node_id, node_name, config)
-                        except TypeError:
-                            try:
-                                # Try (id, name, component_type, config) - works with LoopNode, GameStateNode, etc
-                                node = node_class(node_id, node_name, component_type, config)
-                            except Exception as init_e:
-                                logger.error(f"无法使用已知参数组合实例化节点 {node_id} ({component_type}): {init_e}")
-                                continue 
-
-                    # Node = node_class (node_id, node_name, config) #old BigInt
-                else:
-                    logger.warning(f"未知的节点类型: {component_type}，跳过")
-                    continue
-                
-                # Save input and output configuration
-                node.inputs = node_config.get("inputs", [])
-                node.outputs = node_config.get("outputs", [])
-                
-                # Add to Node Map
-                self.nodes[node_id] = node
-                
-                logger.info(f"已成功创建节点: {node_id}")
-            except Exception as e:
-                logger.error(f"创建节点失败: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
-        
-        # Handling connections and conditional edges
-        edges = workflow_definition.get("edges", [])
-        
-        # Record all edge definitions to assist with debugging
-        logger.info(f"工作流共有 {len(edges)} 条边缘")
-        for i, edge in enumerate(edges):
-            logger.info(f"边缘 {i+1}: {edge}")
-        
-        # First collect the edges of all conditional nodes
-        for edge in edges:
-            source_node_id = edge.get("source")
-            target_node_id = edge.get("target")
-            condition = edge.get("condition")
-            
-            if not source_node_id or not target_node_id:
-                logger.warning(f"边缺少源或目标节点: {edge}")
-                continue
-            
-            # Get source node
-            source_node = self.nodes.get(source_node_id)
-            if not source_node:
-                logger.warning(f"未找到源节点: {source_node_id}")
-                continue
-            
-            # Check if the source node is a conditional node
-            if condition and (source_node.node_type == "conditional" or getattr(source_node, "component_type", "") == "conditional"):
-                # Add Conditional Edge
-                if source_node_id not in self.conditional_edges:
-                    self.conditional_edges[source_node_id] = []
-                
-                # Building Conditional Edge Data
-                edge_data = {
-                    "target": target_node_id,
-                    "key": condition.get("key", ""),
-                    "value": condition.get("value", ""),
-                    "operator": condition.get("operator", "==")
-                }
-                
-                self.conditional_edges[source_node_id].append(edge_data)
-                logger.info(f"已添加条件边缘: {source_node_id} -> {target_node_id}, 条件: {condition}")
-            else:
-                # Check if the node is a conditional node but no condition
-                if source_node.node_type == "conditional" or getattr(source_node, "component_type", "") == "conditional":
-                    logger.warning(f"条件节点 {source_node_id} 缺少条件定义，但有边缘连接到 {target_node_id}")
-                
-                # Add a normal connection
-                if source_node_id not in self.connections:
-                    self.connections[source_node_id] = []
-                
-                self.connections[source_node_id].append(target_node_id)
-                logger.info(f"已添加连接: {source_node_id} -> {target_node_id}")
-        
-        # Set edge conditions for conditional nodes
-        for node_id, edge_conditions in self.conditional_edges.items():
-            node = self.nodes.get(node_id)
-            if node and hasattr(node, "set_edge_conditions"):
-                node.set_edge_conditions(edge_conditions)
-                logger.info(f"为条件节点 {node_id} 设置了 {len(edge_conditions)} 个边缘条件")
-            else:
-                logger.warning(f"节点 {node_id} 不支持设置边缘条件或不存在")
-        
-        # Determine the starting node
-        if not self.start_nodes and self.start_node and self.start_node in self.nodes:
-            self.start_nodes = [self.start_node]
-        
-        # Save workflow definition
-        self.workflow_definition = workflow_definition
-        
-        logger.info(f"工作流加载完成: ID={workflow_definition.get('id', '未知')}, 名称={workflow_definition.get('name', '未知')}")
-        logger.info(f"工作流节点数量: {len(self.nodes)}")
-        logger.info(f"工作流普通连接数量: {sum(len(targets) for targets in self.connections.values())}")
-        logger.info(f"工作流条件连接数量: {sum(len(targets) for targets in self.conditional_edges.values())}")
-        logger.info(f"工作流起始节点: {self.start_nodes}")
+        self.current_context = None
+
+        self.start_node = plan.start_node
+        self.start_nodes = [self.start_node] if self.start_node in self.nodes else []
+        self.workflow_definition = plan.definition
+
+        logger.info(f"工作流加载完成: ID={plan.workflow_id or '未知'}, 节点数量={len(self.nodes)}, 起始节点={self.start_nodes}")
     
     async def execute_workflow(self, context_data: Dict[str, Any] = None) -> Dict[str, Any]:
         """execution workflow
@@ -293,6 +178,8 @@ Final context data"""
         
         # Get the current node ID
         current_node_id = self.current_context.data.get("current_node_id")
+        # Parallel branches waiting at the same time are all resumed
+        waiting_node_ids = self.current_context.data.pop("_waiting_node_ids", None) or []
         
         # Check if there is a loop state
         loop_state = self.current_context.data.get("_loop_state")
@@ -308,14 +195,19 @@ Final context data"""
             if "user_message" in context_data:
                 logger.info(f"确保用户消息能被传递到循环节点: {context_data.get('user_message')}")
         
-        if not current_node_id or current_node_id not in self.nodes:
-            logger.warning(f"无效的当前节点ID：{current_node_id}，从起始节点重新开始")
-            current_node_id = self.start_node
+        waiting_node_ids = [node_id for node_id in waiting_node_ids if node_id in self.nodes]
+        if not (loop_state and "node_id" in loop_state) and len(waiting_node_ids) > 1:
+            logger.info(f"恢复 {len(waiting_node_ids)} 个等待中的并行分支: {waiting_node_ids}")
+            result = await self._resume_branches(waiting_node_ids)
         else:
-            logger.info(f"从节点 {current_node_id} 恢复工作流执行")
-        
-        # Continue execution from the current node
-        result = await self._execute_from_node(current_node_id)
+            if not current_node_id or current_node_id not in self.nodes:
+                logger.warning(f"无效的当前节点ID：{current_node_id}，从起始节点重新开始")
+                current_node_id = self.start_node
+            else:
+                logger.info(f"从节点 {current_node_id} 恢复工作流执行")
+            
+            # Continue execution from the current node
+            result = await self._execute_from_node(current_node_id)
         
         # Clear the flag that a new message is being processed
         if "processing_new_message" in result:
@@ -331,13 +223,53 @@ start_node_id: Start Node ID
 
 Returns:
 workflow context data"""
+        logger.info(f"从节点 {start_node_id} 开始执行工作流")
+        
         # Prevent infinite loops
         visited_nodes = set()
-        current_node_id = start_node_id
+        await self._execute_chain(start_node_id, self.current_context, visited_nodes)
         
-        logger.info(f"从节点 {start_node_id} 开始执行工作流")
+        logger.info("Workflow execution complete")
+        return self.current_context.data
+
+    async def _resume_branches(self, node_ids: List[str]) -> Dict[str, Any]:
+        """Resume the parallel branches waiting at the given nodes, then continue from their join node
+
+Args:
+node_ids: waiting node of each branch
+
+Returns:
+workflow context data"""
+        visited_nodes = set()
+        status, next_node_id = await self._fork(node_ids, self.current_context, visited_nodes, from_joins=True)
+        if status == "join":
+            logger.info(f"并行分支在节点 {next_node_id} 汇合")
+            await self._execute_chain(next_node_id, self.current_context, visited_nodes)
+        
+        logger.info("Workflow execution complete")
+        return self.current_context.data
+
+    async def _execute_chain(self, start_node_id: str, context: WorkflowContext, visited_nodes: set,
+                             in_branch: bool = False, entry_join: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """Execute nodes following the connections, a node with several successors forks parallel branches
+
+Args:
+start_node_id: Start Node ID
+Context: context of the chain, a forked context in a parallel branch
+visited_nodes: nodes already executed
+in_branch: whether the chain is a parallel branch, a branch stops in front of a join node
+entry_join: join node the chain starts from (it is executed instead of stopping)
+
+Returns:
+("waiting", node_id) when a node waits, ("join", node_id) when a branch reached a join node,
+("done", None) otherwise"""
+        current_node_id = start_node_id
         
         while current_node_id and current_node_id not in visited_nodes:
+            # A branch stops at the node joining it with other branches, it runs once all are done
+            if in_branch and current_node_id != entry_join and self.plan and self.plan.is_join(current_node_id):
+                return "join", current_node_id
+            
             # Mark a node as visited
             visited_nodes.add(current_node_id)
             
@@ -348,22 +280,14 @@ workflow context data"""
                 break
             
             logger.info(f"执行节点：{current_node.name}({current_node.id})")
-            
-            # Prepare node input
-            await self._prepare_node_inputs(current_node)
-            
-            # execution node
-            result = await current_node.execute(self.current_context)
-            
-            # Save node execution result
-            self.node_results[current_node.id] = result
+            result = await self._run_node(current_node, context, in_branch)
             
             # If the node state is waiting, the workflow execution is suspended
             if current_node.status == NodeStatus.WAITING:
                 logger.info(f"节点 {current_node.name} 正在等待，暂停工作流执行")
                 # Update the current node ID in the context
-                self.current_context.data["current_node_id"] = current_node_id
-                return self.current_context.data
+                context.data["current_node_id"] = current_node_id
+                return "waiting", current_node_id
             
             # Check if it is a conditional node
             if current_node.node_type == "conditional" or current_node.__class__.__name__ == "ConditionalNode":
@@ -371,6 +295,7 @@ workflow context data"""
                 
                 # Get the selected path
                 selected_path = result.get("selected_path")
+                next_nodes = ()
                 
                 if selected_path:
                     logger.info(f"条件节点选择路径: {selected_path}")
@@ -379,74 +304,132 @@ workflow context data"""
                     
                     if next_node:
                         logger.info(f"执行条件选择的节点: {next_node.name}({next_node.id})")
-                        
-                        # Prepare node input
-                        await self._prepare_node_inputs(next_node)
-                        
-                        # execution node
-                        next_result = await next_node.execute(self.current_context)
-                        
-                        # Save node execution result
-                        self.node_results[selected_path] = next_result
+                        await self._run_node(next_node, context, in_branch)
                         
                         # If the node state is waiting, the workflow execution is suspended
                         if next_node.status == NodeStatus.WAITING:
                             logger.info(f"节点 {next_node.name} 正在等待，暂停工作流执行")
                             # Update the current node ID in the context
-                            self.current_context.data["current_node_id"] = selected_path
-                            return self.current_context.data
+                            context.data["current_node_id"] = selected_path
+                            return "waiting", selected_path
                             
                         # Check if there are any follow-up nodes
-                        next_next_nodes = self.connections.get(selected_path, [])
-                        if next_next_nodes:
-                            current_node_id = next_next_nodes[0]
-                            logger.info(f"从节点 {selected_path} 转到下一个节点 {current_node_id}")
-                            continue
-                        else:
+                        next_nodes = self.connections.get(selected_path, ())
+                        if not next_nodes:
                             logger.info(f"节点 {next_node.name} 没有后续节点，工作流执行完成")
                     else:
                         logger.warning(f"未找到条件选择的节点: {selected_path}")
                 else:
                     logger.warning(f"条件节点没有选择路径，尝试使用普通连接")
                     # If no path is selected, try using a normal connection
-                    next_nodes = self.connections.get(current_node_id, [])
-                    if next_nodes:
-                        current_node_id = next_nodes[0]
-                        logger.info(f"使用普通连接: {current_node_id} -> {next_nodes[0]}")
-                        continue
+                    next_nodes = self.connections.get(current_node_id, ())
+            else:
+                # Check if it is a circular node
+                loop_state = result.get("loop_state")
+                if loop_state and result.get("loop_waiting"):
+                    # This is the case where the loop node completes one iteration and waits
+                    logger.info(f"循环节点 {current_node.id} 完成一次迭代，等待下一次迭代")
+                    # Mark this iteration as complete
+                    context.data["_iteration_completed"] = True
                 
-                # Condition node executed, no more nodes to execute
-                break
-            
-            # Check if it is a circular node
-            loop_state = result.get("loop_state")
-            if loop_state and result.get("loop_waiting"):
-                # This is the case where the loop node completes one iteration and waits
-                logger.info(f"循环节点 {current_node.id} 完成一次迭代，等待下一次迭代")
-                # Mark this iteration as complete
-                self.current_context.data["_iteration_completed"] = True
+                # Get the next node
+                next_nodes = self.connections.get(current_node_id, ())
+                if not next_nodes:
+                    logger.info(f"节点 {current_node.name} 没有后续节点，工作流执行完成")
             
-            # Get the next node
-            next_nodes = self.connections.get(current_node_id, [])
             if not next_nodes:
-                logger.info(f"节点 {current_node.name} 没有后续节点，工作流执行完成")
                 break
             
-            # Select the first subsequent node as the next node to execute
-            next_node_id = next_nodes[0]
-            logger.info(f"从节点 {current_node_id} 转到下一个节点 {next_node_id}")
-            current_node_id = next_node_id
+            if len(next_nodes) == 1:
+                logger.info(f"从节点 {current_node_id} 转到下一个节点 {next_nodes[0]}")
+                current_node_id = next_nodes[0]
+                continue
+            
+            # Several successors: run them as parallel branches, then continue from the join node
+            status, next_node_id = await self._fork(list(next_nodes), context, visited_nodes)
+            if status != "join":
+                return status, next_node_id
+            logger.info(f"并行分支在节点 {next_node_id} 汇合")
+            current_node_id = entry_join = next_node_id
         
-        logger.info("Workflow execution complete")
-        return self.current_context.data
+        return "done", None
+
+    async def _fork(self, node_ids: List[str], context: WorkflowContext, visited_nodes: set,
+                    from_joins: bool = False) -> Tuple[str, Optional[str]]:
+        """Run branches concurrently and merge their contexts
+
+Args:
+node_ids: first node of each branch
+Context: context the branches are forked from, receives their changes
+visited_nodes: nodes already executed
+from_joins: whether the branches start at join nodes reached by earlier branches
+
+Returns:
+("waiting", node_id) if a branch waits, ("join", node_id) for the join node to continue from,
+("done", None) if every branch ended"""
+        logger.info(f"并行执行 {len(node_ids)} 个分支: {node_ids}")
+        branches = [context.fork() for _ in node_ids]
+        outcomes = await asyncio.gather(
+            *(self._execute_chain(node_id, branch, visited_nodes, in_branch=True,
+                                  entry_join=node_id if from_joins else None)
+              for node_id, branch in zip(node_ids, branches)),
+            return_exceptions=True
+        )
+        context.join(branches)
+        
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        
+        waiting = []
+        for (status, node_id), branch in zip(outcomes, branches):
+            if status == "waiting":
+                # A branch forking again may wait at several nodes
+                waiting.extend(branch.data.get("_waiting_node_ids") or [node_id])
+        if waiting:
+            waiting = list(dict.fromkeys(waiting))
+            # The next input resumes every waiting branch
+            context.data["current_node_id"] = waiting[0]
+            context.data["_waiting_node_ids"] = waiting
+            return "waiting", waiting[0]
+        
+        joins = list(dict.fromkeys(node_id for status, node_id in outcomes if status == "join"))
+        if not joins:
+            return "done", None
+        if len(joins) == 1:
+            return "join", joins[0]
+        
+        # Branches reaching different join nodes: continue from each of them in parallel
+        return await self._fork(joins, context, visited_nodes, from_joins=True)
+
+    async def _run_node(self, node: Node, context: WorkflowContext, in_branch: bool = False) -> Dict[str, Any]:
+        """Prepare the inputs of a node, execute it and save its result
+
+Args:
+Node: node to execute
+Context: context the node runs with
+in_branch: whether the node runs in a parallel branch, limited by the session concurrency
+
+Returns:
+Node execution result"""
+        await self._prepare_node_inputs(node, context)
+        if in_branch:
+            async with self._branch_semaphore:
+                result = await node.execute(context)
+        else:
+            result = await node.execute(context)
+        self.node_results[node.id] = result
+        return result
 
-    async def _prepare_node_inputs(self, node: Node) -> None:
+    async def _prepare_node_inputs(self, node: Node, context: Optional[WorkflowContext] = None) -> None:
         """Prepare node input
 
 Process the input configuration of the node and obtain data from the output of the upstream node
 
 Args:
-Node: current node"""
+Node: current node
+Context: context of the node, the workflow context by default"""
+        context = context or self.current_context
         # If the node has no input configuration, return directly
         if not node.inputs:
             return
@@ -479,7 +462,7 @@ Node: current node"""
             input_data[input_key] = output_value
 
         # Add input data to context
-        self.current_context.data["current_node_inputs"] = input_data
+        context.data["current_node_inputs"] = input_data
 
         # Add all existing node results at the same time, allowing nodes to access all variables
         if node.component_type in ["message", "ai_player_speak"]:
@@ -492,14 +475,14 @@ Node: current node"""
                             input_data[key] = value
 
             # Add values from the global data to the input as well
-            if "global" in self.current_context.data and isinstance(self.current_context.data["global"], dict):
-                global_data = self.current_context.data["global"]
+            if "global" in context.data and isinstance(context.data["global"], dict):
+                global_data = context.data["global"]
                 for key, value in global_data.items():
                     if key not in input_data:
                         input_data[key] = value
 
             # Update input data in context
-            self.current_context.data["current_node_inputs"] = input_data
+            context.data["current_node_inputs"] = input_data
             logger.info(f"为节点 {node.id} 准备的输入变量: {list(input_data.keys())}")
 
 
@@ -582,10 +565,10 @@ Workflow Definition Dictionary"""
 
 Args:
 template_id: Template ID"""
-        template = load_template(template_id)
-        if not template:
+        plan = load_template_plan(template_id)
+        if not plan:
             raise ValueError(f"未找到模板：{template_id}")
         
-        self.load_workflow(template)
+        self.load_plan(plan)
     
 
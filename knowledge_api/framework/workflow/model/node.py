@@ -1,5 +1,6 @@
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, List, Set, Tuple
 from abc import ABC
+from functools import lru_cache
 import re
 
 from knowledge_api.framework.workflow.model.node_status import NodeStatus
@@ -17,6 +18,32 @@ from knowledge_api.utils.log_config import get_logger
 
 logger = get_logger()
 
+# Template variable placeholder {{ name }}
+TEMPLATE_VAR_PATTERN = re.compile(r"{{(.*?)}}")
+
+
+@lru_cache(maxsize=1024)
+def parse_template_vars(template: str) -> Tuple[str, ...]:
+    """Extract the variable names of a template string, parsed once per template
+
+Args:
+Template: template string
+
+Returns:
+Variable names in order of appearance"""
+    if not template:
+        return ()
+    return tuple(v.strip() for v in TEMPLATE_VAR_PATTERN.findall(template))
+
+
+if HAS_JINJA2:
+    _jinja_env = jinja2.Environment(undefined=jinja2.Undefined)
+
+
+@lru_cache(maxsize=1024)
+def compile_jinja_template(template: str):
+    """Compile a Jinja2 template once per template string"""
+    return _jinja_env.from_string(template)
 
 
 class Node(ABC):
@@ -48,6 +75,10 @@ Config: Node configuration"""
         self.config = config
         self._status = NodeStatus.PENDING
 
+        # Set by the workflow author ("parallel": true) when the node only depends on its inputs and connections:
+        # it may run concurrently with the other independent nodes of a loop level
+        self.parallel = bool(config.get("parallel", False))
+
         # Input and output configuration
         self.inputs: List[Dict[str, Any]] = []
         self.outputs: List[Dict[str, Any]] = []
@@ -384,15 +415,14 @@ Rendered string"""
         if HAS_JINJA2:
             try:
                 # Using loose mode, undefined variables are replaced with empty strings instead of throwing exceptions
-                env = jinja2.Environment(undefined=jinja2.Undefined)
-                template_obj = env.from_string(template)
+                template_obj = compile_jinja_template(template)
                 return template_obj.render(**render_data)
             except Exception as e:
                 logger.warning(f"Jinja2模板渲染失败，将使用基础模板渲染: {str(e)}")
                 # If Jinja2 rendering fails, fallback to base template processing
 
         # Basic template processing (using regular expressions)
-        pattern = r"{{(.*?)}}"
+        pattern = TEMPLATE_VAR_PATTERN
 
         def replace_var(match):
             var_path = match.group(1).strip()
@@ -1,9 +1,11 @@
 """AI player speaking node"""
 import random
+import traceback
 from typing import Dict, Any
 
-from knowledge_api.framework.workflow.model.node import Node
+from knowledge_api.framework.workflow.model.node import Node, parse_template_vars
 from knowledge_api.framework.workflow.model.node_status import NodeStatus
+from knowledge_api.model.agent.game_agent import gather_agent_calls
 from knowledge_api.utils.log_config import get_logger
 
 # Initialize the logger
@@ -18,6 +20,8 @@ Configuration parameters:
 - speaker_id: Speaker ID ("random", "none" or specific character ID)
 - character_setting: Character Template
 - system_message: System Message Template
+- speak_mode: "sequential" (default, one speaker after the other) or "simultaneous"
+  (all speakers generate at the same time, bounded by the provider semaphore)
 
 Input:
 - Supports arbitrary names and numbers of input parameters that will be used to replace variables in the template
@@ -46,6 +50,7 @@ Args: Variable argument, may be config or (component_type, config)"""
         self.speaker_id = config.get("speaker_id", "random")
         self.character_setting = config.get("character_setting", "")
         self.system_message = config.get("system_message", "")
+        self.speak_mode = config.get("speak_mode", "sequential")
     
     async def process(self, context):
         """Processing AI player speaking nodes
@@ -87,23 +92,14 @@ processing result"""
         # Log all input variables for debugging
         logger.info(f"AI玩家发言节点 {self.id} 收到的输入变量键: {list(input_data.keys())}")
         
-        # Analyze template variables in all configurations
-        def extract_template_vars(template):
-            """Extract all variable names from template string"""
-            if not template:
-                return []
-            import re
-            vars = re.findall(r'{{(.*?)}}', template)
-            return [v.strip() for v in vars]
-        
-        # Collect variables used in all templates
+        # Collect variables used in all templates (parsed once per template)
         all_template_vars = set()
         for template_name, template_content in [
             ('character_setting', self.character_setting),
             ('system_message', self.system_message),
             ('speech_template', self.speech_template)
         ]:
-            vars = extract_template_vars(template_content)
+            vars = parse_template_vars(template_content)
             if vars:
                 all_template_vars.update(vars)
                 logger.info(f"{template_name}模板需要的变量: {vars}")
@@ -256,27 +252,40 @@ processing result"""
         # Save all speeches
         all_messages = []
         
-        # Handle each speaker
-        for player in speaking_players:
-            # Update system settings
-            if rendered_system_message or rendered_character_setting:
-                system_setting = f"{rendered_system_message} {rendered_character_setting}".strip()
+        # Update system settings
+        if rendered_system_message or rendered_character_setting:
+            system_setting = f"{rendered_system_message} {rendered_character_setting}".strip()
+            for player in speaking_players:
                 if hasattr(player, "memory") and hasattr(player.memory, "update_system_message"):
                     player.memory.update_system_message(system_setting)
                     logger.info(f"更新玩家系统设定: {system_setting}")
-            
-            # Send message
+
+        chat_players = []
+        for player in speaking_players:
             if hasattr(player, "chat") and callable(player.chat):
-                try:
-                    response = await player.chat(message_content)
-                    all_messages.append(response)
-                    logger.info(f"玩家 {getattr(player, 'name', '未知')} 发言: {response}")
-                except Exception as e:
-                    logger.error(f"玩家发言失败: {str(e)}")
-                    import traceback
-                    logger.error(traceback.format_exc())
+                chat_players.append(player)
             else:
                 logger.warning(f"玩家对象没有chat方法")
+
+        # Handle each speaker
+        if self.speak_mode == "simultaneous" and len(chat_players) > 1:
+            # All players generate at the same time, the speeches are emitted in the order of the players
+            responses = await gather_agent_calls(chat_players, lambda player: player.chat(message_content))
+        else:
+            responses = []
+            for player in chat_players:
+                try:
+                    responses.append(await player.chat(message_content))
+                except Exception as e:
+                    responses.append(e)
+
+        for player, response in zip(chat_players, responses):
+            if isinstance(response, Exception):
+                logger.error(f"玩家发言失败: {str(response)}")
+                logger.error("".join(traceback.format_exception(type(response), response, response.__traceback__)))
+                continue
+            all_messages.append(response)
+            logger.info(f"玩家 {getattr(player, 'name', '未知')} 发言: {response}")
         
         # Update the memories of other characters
         updated_memory_roles = []
@@ -4,8 +4,8 @@ Supports three modes:
 2. Fixed number of cycles (fixed)
 3. Iterator loop (iterator)"""
 
+import asyncio
 from typing import Dict, Any, List
-import inspect
 
 
 from knowledge_api.framework.workflow.model.node import Node
@@ -52,6 +52,12 @@ Config: Node configuration"""
         self.internal_nodes = config.get("internal_nodes", [])
         self.internal_edges = config.get("internal_edges", [])
         
+        # Compiled plan of the internal nodes (set by the workflow compiler) and their instances,
+        # created on first use and reused by every iteration
+        self.internal_plan = None
+        self._internal_node_instances: Dict[str, Node] = None
+        self._branch_semaphore: asyncio.Semaphore = None
+        
         # Initialize output port
         self._initialize_outputs()
     
@@ -738,127 +744,11 @@ internal node execution result"""
             logger.warning(f"循环节点 {self.id} 没有内部节点")
             return {"iteration": iteration, "item": item}
         
-        # Create a map of internal node instances
-        internal_node_instances = {}
-        node_type_registry = {}
-        
-        # Import the required node type from node regedit
-        try:
-            from knowledge_api.framework.workflow.nodes.node_registry import node_registry
-            node_type_registry = node_registry
-        except ImportError:
-            logger.error("Unable to import node regedit")
-            return {"error": "Unable to import node regedit"}
-        
-        # Create an internal node instance
-        for node_def in self.internal_nodes:
-            node_id = node_def.get("id")
-            node_name = node_def.get("name", "unnamed node")
-            component_type = node_def.get("component_type")
-            node_config = node_def.get("config", {})
-            
-            if not node_id or not component_type:
-                logger.warning(f"内部节点定义缺失必要字段: {node_def}")
-                continue
-            
-            # Check if the node type is registered
-            if component_type not in node_type_registry:
-                logger.warning(f"未知的节点类型: {component_type}")
-                continue
-            
-            # Create node instance
-            try:
-                node_class = node_type_registry[component_type]
-                
-                # Decide how to instantiate based on the __init__ parameters of the node class
-                init_params = list(inspect.signature(node_class.__init__).parameters.keys())
-                
-                if len(init_params) == 4 and 'config' in init_params:
-                    # Suppose the constructor is __init__ (self, id, name, config)
-                    node = node_class(node_id, node_name, node_config)
-                elif len(init_params) == 5 and 'component_type' in init_params and 'config' in init_params:
-                    # Suppose the constructor is __init__ (self, id, name, component_type, config)
-                    node = node_class(node_id, node_name, component_type, node_config)
-                else:
-                    # Attempt for generic instantiation may fail
-                    logger.warning(f"节点 {component_type} 的构造函数参数不匹配，尝试通用实例化")
-                    try:
-                        # Try (id, name, config) - works with MessageNode, PlayerTurnNode, etc
-                        node = node_class(node_id, node_name, node_config)
-                    except TypeError:
-                        try:
-                            # Try (id, name, component_type, config) - works with LoopNode, GameStateNode, etc
-                            node = node_class(node_id, node_name, component_type, node_config)
-                        except Exception as init_e:
-                            logger.error(f"无法使用已知参数组合实例化节点 {node_id} ({component_type}): {init_e}")
-                            continue 
-                
-                # Set input and output configuration
-                node.inputs = node_def.get("inputs", [])
-                node.outputs = node_def.get("outputs", [])
-                
-                # Add to Node Map
-                internal_node_instances[node_id] = node
-                logger.info(f"创建内部节点实例: {node_id}, 类型: {component_type}")
-            except Exception as e:
-                logger.error(f"创建内部节点 {node_id} 实例失败: {str(e)}")
-                import traceback
-                logger.error(f"详细错误信息: {traceback.format_exc()}")
-                continue
-        
-        # Create a node connection diagram (simplified version)
-        node_connections = {}
-        node_inputs_map = {}  # Record Node Input Configuration
-        
-        # Build a node connection graph
-        for edge in self.internal_edges:
-            source = edge.get("source")
-            target = edge.get("target")
-            
-            if not source or not target:
-                continue
-            
-            if source not in node_connections:
-                node_connections[source] = []
-            
-            node_connections[source].append(target)
-            logger.info(f"内部边缘: {source} -> {target}")
-        
-        # Build Node Input Mapping
-        for node_id, node in internal_node_instances.items():
-            if hasattr(node, "inputs") and node.inputs:
-                node_inputs_map[node_id] = []
-                for input_config in node.inputs:
-                    input_key = input_config.get("key")
-                    source_node = input_config.get("sourceNode")
-                    source_output = input_config.get("sourceOutput")
-                    
-                    if input_key and source_node and source_output:
-                        node_inputs_map[node_id].append({
-                            "key": input_key,
-                            "sourceNode": source_node,
-                            "sourceOutput": source_output
-                        })
-                        logger.info(f"节点 {node_id} 输入 {input_key} 来自 {source_node}.{source_output}")
-        
-        # Find the starting node (node without edge)
-        start_nodes = []
-        all_targets = set()
-        
-        # Collect all nodes as targets
-        for targets in node_connections.values():
-            all_targets.update(targets)
-        
-        # Find the node that is not targeted, i.e. the starting node
-        for node_id in internal_node_instances.keys():
-            if node_id not in all_targets:
-                start_nodes.append(node_id)
-                logger.info(f"发现起始节点: {node_id}")
-        
-        # If there is no clear starting node, use the first node
-        if not start_nodes and internal_node_instances:
-            start_nodes = [list(internal_node_instances.keys())[0]]
-            logger.info(f"没有明确的起始节点，使用第一个节点: {start_nodes[0]}")
+        # Internal node instances and graph from the compiled plan, built once per loop node
+        internal_node_instances = self._get_internal_node_instances()
+        node_connections = self.internal_plan.successors
+        start_nodes = [node_id for node_id in self.internal_plan.start_nodes if node_id in internal_node_instances]
+        logger.info(f"内部节点起始节点: {start_nodes}")
         
         # execution node
         visited_nodes = set()
@@ -901,42 +791,34 @@ internal node execution result"""
                     current_nodes = [waiting_node_id]
                     logger.info(f"从等待节点 {waiting_node_id} 开始恢复执行")
         
-        # BFS executes all nodes
+        # BFS executes all nodes, the independent nodes of a level run in parallel
         while current_nodes:
-            next_nodes = []
-            
-            for node_id in current_nodes:
+            level = []
+            for node_id in dict.fromkeys(current_nodes):
                 if node_id in visited_nodes:
                     continue
-                
                 visited_nodes.add(node_id)
-                node = internal_node_instances.get(node_id)
-                
-                if not node:
-                    continue
+                if node_id in internal_node_instances:
+                    level.append(node_id)
+            
+            next_nodes = []
+            for wave in self._independent_waves(level, internal_node_instances, node_connections):
+                if len(wave) == 1:
+                    outcomes = [await self._run_internal_node(
+                        wave[0], internal_node_instances[wave[0]], internal_node_results,
+                        workflow_context, iteration_context, execution_order)]
+                else:
+                    logger.info(f"并行执行内部节点: {wave}")
+                    branches = [workflow_context.fork() for _ in wave]
+                    outcomes = await asyncio.gather(*(
+                        self._run_internal_node(node_id, internal_node_instances[node_id], internal_node_results,
+                                                branch, iteration_context, execution_order, parallel=True)
+                        for node_id, branch in zip(wave, branches)
+                    ))
+                    workflow_context.join(branches)
                 
-                try:
-                    # pre-execution node recording
-                    execution_order.append(node_id)
-                    logger.info(f"开始执行节点: {node_id} (序号: {len(execution_order)})")
-                    
-                    # Prepare node inputs before executing nodes
-                    await self._prepare_internal_node_inputs(node, internal_node_results, workflow_context)
-                    
-                    # Execution Node - Use WorkflowContext object instead of dictionary
-                    logger.info(f"执行内部节点: {node_id}")
-                    result = await node.execute(workflow_context)
-                    
-                    # Record details of execution results
-                    logger.info(f"节点 {node_id} 执行完成，状态: {node.status}")
-                    logger.info(f"节点 {node_id} 结果类型: {type(result)}")
-                    # Check if the node is in a waiting state
-                    if node.status == NodeStatus.WAITING:
-                        logger.info(f"节点 {node_id} 处于等待状态，暂停内部循环执行")
-                        
-                        # Save partial results
-                        internal_node_results[node_id] = result
-                        
+                for node_id, status in zip(wave, outcomes):
+                    if status == "waiting":
                         # Log user message information
                         if "user_message" in workflow_context.data:
                             logger.info(f"等待时的用户消息: {workflow_context.data.get('user_message', '')}")
@@ -949,46 +831,14 @@ internal node execution result"""
                             "item": item,
                             "partial_results": internal_node_results
                         }
-                    
-                    if isinstance(result, dict):
-                        # Record all keys of the result dictionary
-                        logger.info(f"节点 {node_id} 结果键: {list(result.keys())}")
-                        
-                        # Record the details of some key values
-                        important_keys = ["message", "content", "player", "memory_roles"]
-                        for key in important_keys:
-                            if key in result:
-                                value = result[key]
-                                value_type = type(value).__name__
-                                value_str = str(value)[:100] + "..." if len(str(value)) > 100 else str(value)
-                                logger.info(f"节点 {node_id} 结果 {key}: ({value_type}) {value_str}")
-                    
-                    # Save the result
-                    internal_node_results[node_id] = result
-                    
-                    # Update context, add output
-                    for output_def in node.outputs:
-                        output_key = output_def.get("key")
-                        if output_key and output_key in result:
-                            workflow_context.data[output_key] = result[output_key]
-                            # Update iteration_context at the same time to stay in sync
-                            iteration_context[output_key] = result[output_key]
-                            logger.info(f"更新上下文: {output_key} = {str(result[output_key])[:50]}")
-                    
-                    # Get the next node
-                    next_node_ids = node_connections.get(node_id, [])
-                    if next_node_ids:
-                        logger.info(f"节点 {node_id} 的下一个节点: {next_node_ids}")
-                    else:
-                        logger.info(f"节点 {node_id} 没有下一个节点")
-                    
-                    next_nodes.extend(next_node_ids)
-                
-                except Exception as e:
-                    logger.error(f"执行内部节点 {node_id} 失败: {str(e)}")
-                    import traceback
-                    logger.error(f"详细错误信息: {traceback.format_exc()}")
-                    continue
+                    if status == "completed":
+                        # Get the next node
+                        next_node_ids = node_connections.get(node_id, ())
+                        if next_node_ids:
+                            logger.info(f"节点 {node_id} 的下一个节点: {list(next_node_ids)}")
+                        else:
+                            logger.info(f"节点 {node_id} 没有下一个节点")
+                        next_nodes.extend(next_node_ids)
             
             # Update the current node list
             current_nodes = next_nodes
@@ -1003,6 +853,168 @@ internal node execution result"""
             "internal_results": internal_node_results
         }
     
+    def _independent_waves(self, level: List[str], instances: Dict[str, Node],
+                           connections: Dict[str, Any]) -> List[List[str]]:
+        """Split the nodes of a BFS level into waves of nodes that can run concurrently
+
+Nodes may depend on each other through the shared context (players, memories, broadcast order), which the
+graph does not show: only nodes marked parallel run concurrently, every other node runs alone in level order
+
+Args:
+Level: node IDs of the level, in execution order
+Instances: internal node instances
+Connections: successors of each internal node
+
+Returns:
+Waves of node IDs, the nodes of a wave can run concurrently"""
+        waves: List[List[str]] = []
+        segment: List[str] = []
+        for node_id in level:
+            if instances[node_id].parallel:
+                segment.append(node_id)
+                continue
+            waves.extend(self._dependency_waves(segment, instances, connections))
+            segment = []
+            waves.append([node_id])
+        waves.extend(self._dependency_waves(segment, instances, connections))
+        return waves
+
+    @staticmethod
+    def _dependency_waves(nodes: List[str], instances: Dict[str, Node],
+                          connections: Dict[str, Any]) -> List[List[str]]:
+        """Split parallel nodes into waves, a node reading the output (sourceNode) of another node or connected
+from it runs in a later wave
+
+Args:
+Nodes: node IDs, in execution order
+Instances: internal node instances
+Connections: successors of each internal node
+
+Returns:
+Waves of node IDs"""
+        waves = []
+        pending = list(nodes)
+        while pending:
+            pending_set = set(pending)
+
+            def depends(node_id: str) -> bool:
+                others = pending_set - {node_id}
+                return (any(input_config.get("sourceNode") in others for input_config in instances[node_id].inputs)
+                        or any(node_id in connections.get(other, ()) for other in others))
+
+            wave = [node_id for node_id in pending if not depends(node_id)]
+            if not wave:
+                # Circular references inside the level: keep the sequential order
+                wave = pending[:1]
+            waves.append(wave)
+            pending = [node_id for node_id in pending if node_id not in wave]
+        return waves
+
+    async def _run_internal_node(self, node_id: str, node: Node, internal_node_results: Dict[str, Any],
+                                 workflow_context, iteration_context: Dict[str, Any], execution_order: List[str],
+                                 parallel: bool = False) -> str:
+        """Execute one internal node and publish its outputs to the context
+
+Args:
+node_id: Node ID
+Node: internal node instance
+internal_node_results: results of the executed internal nodes
+workflow_context: context of the node, a forked context when running in parallel
+iteration_context: context of the iteration
+execution_order: executed node IDs
+Parallel: whether the node runs in parallel with others, limited by the session concurrency
+
+Returns:
+Status of the node: completed, waiting or failed"""
+        try:
+            # pre-execution node recording
+            execution_order.append(node_id)
+            logger.info(f"开始执行节点: {node_id} (序号: {len(execution_order)})")
+            
+            # Prepare node inputs before executing nodes
+            await self._prepare_internal_node_inputs(node, internal_node_results, workflow_context)
+            
+            # Execution Node - Use WorkflowContext object instead of dictionary
+            logger.info(f"执行内部节点: {node_id}")
+            if parallel:
+                async with self._get_branch_semaphore():
+                    result = await node.execute(workflow_context)
+            else:
+                result = await node.execute(workflow_context)
+            
+            # Record details of execution results
+            logger.info(f"节点 {node_id} 执行完成，状态: {node.status}")
+            logger.info(f"节点 {node_id} 结果类型: {type(result)}")
+            # Check if the node is in a waiting state
+            if node.status == NodeStatus.WAITING:
+                logger.info(f"节点 {node_id} 处于等待状态，暂停内部循环执行")
+                
+                # Save partial results
+                internal_node_results[node_id] = result
+                return "waiting"
+            
+            if isinstance(result, dict):
+                # Record all keys of the result dictionary
+                logger.info(f"节点 {node_id} 结果键: {list(result.keys())}")
+                
+                # Record the details of some key values
+                important_keys = ["message", "content", "player", "memory_roles"]
+                for key in important_keys:
+                    if key in result:
+                        value = result[key]
+                        value_type = type(value).__name__
+                        value_str = str(value)[:100] + "..." if len(str(value)) > 100 else str(value)
+                        logger.info(f"节点 {node_id} 结果 {key}: ({value_type}) {value_str}")
+            
+            # Save the result
+            internal_node_results[node_id] = result
+            
+            # Update context, add output
+            for output_def in node.outputs:
+                output_key = output_def.get("key")
+                if output_key and output_key in result:
+                    workflow_context.data[output_key] = result[output_key]
+                    # Update iteration_context at the same time to stay in sync
+                    iteration_context[output_key] = result[output_key]
+                    logger.info(f"更新上下文: {output_key} = {str(result[output_key])[:50]}")
+            return "completed"
+        
+        except Exception as e:
+            logger.error(f"执行内部节点 {node_id} 失败: {str(e)}")
+            import traceback
+            logger.error(f"详细错误信息: {traceback.format_exc()}")
+            return "failed"
+
+    def _get_branch_semaphore(self) -> asyncio.Semaphore:
+        """Limit of internal nodes of this loop (one session) executed at the same time"""
+        if self._branch_semaphore is None:
+            from knowledge_api.framework.workflow.compiler import BRANCH_CONCURRENCY
+            self._branch_semaphore = asyncio.Semaphore(BRANCH_CONCURRENCY)
+        return self._branch_semaphore
+
+    def _get_internal_node_instances(self) -> Dict[str, Node]:
+        """Get the internal node instances, reset for a new iteration
+
+The internal nodes are compiled once (see compiler.get_workflow_plan) and instantiated
+on the first iteration, later iterations only reset their state
+
+Returns:
+Node ID to internal node instance mapping"""
+        if self._internal_node_instances is None:
+            if self.internal_plan is None:
+                from knowledge_api.framework.workflow.compiler import get_workflow_plan
+                self.internal_plan = get_workflow_plan({
+                    "id": f"{self.id}_internal",
+                    "nodes": self.internal_nodes,
+                    "edges": self.internal_edges
+                })
+            self._internal_node_instances = self.internal_plan.instantiate_nodes()
+            logger.info(f"创建内部节点实例: {list(self._internal_node_instances.keys())}")
+        else:
+            for node in self._internal_node_instances.values():
+                node.reset()
+        return self._internal_node_instances
+    
     async def _prepare_internal_node_inputs(self, node: Node, node_results: Dict[str, Dict[str, Any]], workflow_context):
         """Prepare input data for internal nodes
 _prepare_node_inputs Method Implementation in Reference engine.py
@@ -1,7 +1,7 @@
 """message node"""
 import logging
 from typing import Dict, Any, Optional
-from knowledge_api.framework.workflow.model.node import Node
+from knowledge_api.framework.workflow.model.node import Node, parse_template_vars
 from knowledge_api.framework.workflow.model.node_status import NodeStatus
 from knowledge_api.utils.log_config import get_logger
 
@@ -85,12 +85,10 @@ processing result"""
             if isinstance(value, dict):
                 logger.debug(f"字典字段 '{key}' 包含子字段: {list(value.keys())}")
         
-        # Extract all variable placeholders from the template
-        import re
-        template_vars = re.findall(r'{{(.*?)}}', self.content_template)
+        # Extract all variable placeholders from the template (parsed once per template)
+        template_vars = parse_template_vars(self.content_template)
         if template_vars:
-            # Remove spaces and check if these variables are in the input data
-            template_vars = [v.strip() for v in template_vars]
+            # Check if these variables are in the input data
             logger.info(f"模板需要的变量: {template_vars}")
             
             # Check if template variables are accessible
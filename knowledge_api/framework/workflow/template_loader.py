@@ -4,6 +4,7 @@ import json
 import logging
 from typing import Dict, Any, Optional
 
+from knowledge_api.framework.workflow.compiler import WorkflowPlan, get_template_plan
 from knowledge_api.utils.log_config import get_logger
 
 # Initialize the logger
@@ -15,14 +16,14 @@ TEMPLATE_DIR = os.path.join(
     "templates"
 )
 
-def load_template(template_id: str) -> Optional[Dict[str, Any]]:
-    """Load workflow template
+def get_template_path(template_id: str) -> str:
+    """Get the file path of a workflow template
 
 Args:
-template_id: Template ID
+template_id: Template ID or template file path
 
 Returns:
-Loaded template, return None if loading fails"""
+Template file path"""
     # If the template ID is a file name (without a path), look in the template directory
     if not os.path.isabs(template_id) and not template_id.endswith(".json"):
         template_path = os.path.join(TEMPLATE_DIR, f"{template_id}.json")
@@ -32,6 +33,33 @@ Loaded template, return None if loading fails"""
     # If no extension exists, add the .json extension
     if not os.path.splitext(template_path)[1]:
         template_path += ".json"
+    return template_path
+
+def load_template_plan(template_id: str) -> Optional[WorkflowPlan]:
+    """Load the compiled plan of a workflow template, cached until the file changes
+
+Args:
+template_id: Template ID
+
+Returns:
+Compiled workflow plan, return None if loading fails"""
+    try:
+        return get_template_plan(get_template_path(template_id))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"加载模板失败：{str(e)}")
+        return None
+
+def load_template(template_id: str) -> Optional[Dict[str, Any]]:
+    """Load workflow template
+
+Args:
+template_id: Template ID
+
+Returns:
+Loaded template, return None if loading fails"""
+    template_path = get_template_path(template_id)
     
     try:
         # Check if the file exists
@@ -100,6 +100,33 @@ Used to store data and status during workflow execution"""
 Args:
 Data: initial data"""
         self.data = data or {}
+        # Top-level values when the context was forked, to find what a branch changed
+        self._origin: Optional[Dict[str, Any]] = None
+
+    def fork(self) -> "WorkflowContext":
+        """Create the context of a parallel branch
+
+Top-level keys written by the branch stay in the branch until join, nested values are shared
+
+Returns:
+Branch context"""
+        branch = WorkflowContext(data=dict(self.data))
+        branch._origin = dict(self.data)
+        return branch
+
+    def join(self, branches: List["WorkflowContext"], exclude: Set[str] = frozenset({"current_node_inputs"})) -> None:
+        """Merge the top-level keys written by parallel branches, later branches win on conflicts
+
+Args:
+Branches: contexts created by fork
+Exclude: keys that are not merged"""
+        for branch in branches:
+            origin = branch._origin or {}
+            for key, value in branch.data.items():
+                if key in exclude:
+                    continue
+                if key not in origin or origin[key] is not value:
+                    self.data[key] = value
 
 
 class WorkflowExecutionResult(BaseModel):
@@ -1,17 +1,17 @@
 import json
 import uuid
-from typing import List, Any, Dict, Type, ClassVar, Optional, Set
+from typing import List, Any, ContextManager, Dict, Type, ClassVar, Optional, Set
 import asyncio
 import time
-from datetime import datetime
 from fastapi import WebSocket, WebSocketDisconnect
 
 from sqlmodel import Session
 
 from knowledge_api.model.agent.game_agent import GameMessage, BaseGameAgent, GameBaseInfo
-from knowledge_api.framework.ai_collect.function_call.tool_manager import ToolManager
+from knowledge_api.framework.ai_collect.function_call.tool_manager import ToolManager, ToolTurn, tool_turn
 from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
 from knowledge_api.framework.redis.cache_manager import CacheManager
+from knowledge_api.framework.redis.session_router import get_session_router
 from knowledge_api.game_play.game_session_manager import GameSessionManager
 from knowledge_api.mapper.game_character_relations import GameCharacterRelationCRUD
 from knowledge_api.mapper.game_play_type.crud import GamePlayTypeCRUD
@@ -86,22 +86,31 @@ taskInput: task input data"""
         """The registration tool is initialized and needs to be implemented by subclasses. It is not mandatory here, so it is an empty function. If the subclass is implemented, self.is_register_tool is automatically True."""
         pass
 
-    async def function_call(self, agent: BaseGameAgent, messages, model=None):
+    def tool_turn(self) -> ContextManager[ToolTurn]:
+        """Open the tool turn of one game step
+
+The function calls of the step reuse the results of pure tools"""
+        return tool_turn()
+
+    async def function_call(self, agent: BaseGameAgent, messages, model=None,
+                            tools: Optional[ToolRegistry] = None):
         """Execute function call
 
 Args:
 Agent: Game Agent
 Messages: Message List
 Model: model name
+Tools: tools offered to the model, the tools of the game if None
 
 Returns:
 function call result"""
         try:
             agent = agent.client
-            if not agent.is_function_call and len(self.tools.get_all_tools()) == 0:
+            tools = tools or self.tools
+            if not agent.is_function_call and len(tools.get_all_tools()) == 0:
                 logger.error("Unregistered tools or agents do not support Function Call and cannot use Function Call")
                 return None
-            return await agent.function_call(messages, self.tools, model=model, application_scenario=f"{self.function_call_scenario}-{self.game_type}")
+            return await agent.function_call(messages, tools, model=model, application_scenario=f"{self.function_call_scenario}-{self.game_type}")
         except Exception as e:
             logger.error(f"函数调用处理失败: {e}")
             return None
@@ -216,12 +225,13 @@ Str: generated cue word"""
         """Get game type regedit"""
         return self._registry
 
-    async def register_websocket(self, session_id: str, websocket: WebSocket) -> None:
+    async def register_websocket(self, session_id: str, websocket: WebSocket, last_msg_id: Optional[str] = None) -> None:
         """Register a WebSocket to connect to a specific session
 
 Args:
 session_id: Session ID
-WebSocket: WebSocket connection instance"""
+WebSocket: WebSocket connection instance
+last_msg_id: msgId of the last message the client has seen, only the messages after it are replayed"""
         # Generate a unique websocket ID
         websocket_id = str(uuid.uuid4())
         # Add the ID attribute to the WebSocket object
@@ -230,36 +240,100 @@ WebSocket: WebSocket connection instance"""
         # Initialize the local websocket collection (if it doesn't exist)
         if session_id not in self._local_websockets:
             self._local_websockets[session_id] = set()
-            self._local_message_queue[session_id] = []
+            # Messages queued while the session had no connection are flushed after the replay
+            self._local_message_queue.setdefault(session_id, [])
 
         # Add a new websocket connection to local management
         self._local_websockets[session_id].add(websocket)
         
         # Register with Redis
         await GameSessionManager.save_websocket_info(session_id, websocket_id, self.game_type)
+        
+        # Receive the messages of the session sent by other game instances, on any worker
+        await get_session_router().subscribe(session_id, self._route_key, self._handle_routed_event)
 
-        # Load session data from Redis and send chat history
-        session_data = await GameSessionManager.load_game_session(session_id, self.game_type)
-        if session_data and "game_record" in session_data:
-            game_record = session_data["game_record"]
-            for message in game_record:
-                try:
-                    await websocket.send_json(message)
-                    await asyncio.sleep(0.05)
-                except Exception as e:
-                    logger.error(f"发送历史消息出错: {str(e)}")
+        # Send the chat history the client has missed
+        replayed: Set[str] = set()
+        await self.replay_history(websocket, session_id, last_msg_id, replayed)
 
-        # Backlog of messages in the sending queue
-        if session_id in self._local_message_queue:
-            for message in self._local_message_queue[session_id]:
-                try:
-                    await websocket.send_json(message)
-                    await asyncio.sleep(0.05)
-                except Exception as e:
-                    logger.error(f"发送队列消息出错: {str(e)}")
+        # Queued messages are in the record log unless their append failed, those are only in the queue
+        await self._flush_local_queue(websocket, session_id, replayed)
+
+    async def replay_history(self, websocket: WebSocket, session_id: str, last_msg_id: Optional[str] = None,
+                             sent_ids: Optional[Set[str]] = None) -> int:
+        """Send the messages recorded after last_msg_id in batched history frames
 
-            # Clear the sent message queue
-            self._local_message_queue[session_id] = []
+Each frame carries up to GameSessionManager.REPLAY_CHUNK_SIZE messages:
+{"type": "history", "sessionId": ..., "messages": [...], "hasMore": bool}
+
+Args:
+WebSocket: WebSocket connection instance
+session_id: Session ID
+last_msg_id: msgId of the last message the client has seen, None for the whole history
+sent_ids: filled with the msgIds of the messages sent
+
+Returns:
+Int: number of messages sent"""
+        chunk_size = GameSessionManager.REPLAY_CHUNK_SIZE
+        sent = 0
+        while True:
+            # Read one extra record to know whether another frame follows
+            records = await GameSessionManager.get_game_records_after(
+                session_id, last_msg_id, self.game_type, limit=chunk_size + 1
+            )
+            has_more = len(records) > chunk_size
+            records = records[:chunk_size]
+            if not records:
+                break
+            try:
+                await websocket.send_json({
+                    "type": "history",
+                    "sessionId": session_id,
+                    "messages": records,
+                    "hasMore": has_more
+                })
+            except Exception as e:
+                logger.error(f"发送历史消息出错: {str(e)}")
+                break
+            sent += len(records)
+            if sent_ids is not None:
+                sent_ids.update(record.get("msgId") for record in records)
+            if not has_more:
+                break
+            last_msg_id = records[-1].get("msgId")
+        return sent
+
+    async def _flush_local_queue(self, websocket: WebSocket, session_id: str, replayed: Set[str]) -> int:
+        """Send the queued messages of a session that are not in its record log to a new connection
+
+Args:
+WebSocket: WebSocket connection instance
+session_id: Session ID
+replayed: msgIds already sent by the history replay
+
+Returns:
+Int: number of messages sent"""
+        queued = self._local_message_queue.get(session_id) or []
+        self._local_message_queue[session_id] = []
+        if not queued:
+            return 0
+        recorded = await GameSessionManager.get_recorded_msg_ids(
+            session_id, [message.get("msgId") for message in queued], self.game_type
+        )
+        sent = 0
+        for position, message in enumerate(queued):
+            msg_id = message.get("msgId")
+            if msg_id in replayed or msg_id in recorded:
+                continue
+            try:
+                await websocket.send_json(message)
+            except Exception as e:
+                logger.error(f"发送消息出错: {str(e)}")
+                # The unsent messages wait for the next connection
+                self._local_message_queue[session_id] = queued[position:] + self._local_message_queue[session_id]
+                break
+            sent += 1
+        return sent
 
     async def unregister_websocket(self, session_id: str, websocket: WebSocket) -> None:
         """Unregister WebSocket Connection
@@ -277,6 +351,7 @@ WebSocket: WebSocket connection instance"""
             # If there are no more connections, consider cleaning up resources
             if not self._local_websockets[session_id]:
                 del self._local_websockets[session_id]
+                await get_session_router().unsubscribe(session_id, self._route_key)
                 # But keep the message queue until the end of the session
         
         # Remove from Redis
@@ -301,28 +376,8 @@ Message: The message to be sent"""
             logger.error("Unable to send message: No session ID specified and message does not contain sessionId field")
             return
 
-        # Load current session data
-        session_data = await GameSessionManager.load_game_session(session_id, self.game_type)
-        if not session_data:
-            session_data = {
-                "game_type": self.game_type,
-                "session_id": session_id,
-                "created_at": datetime.now().isoformat(),
-                "last_activity": datetime.now().isoformat(),
-                "game_record": []
-            }
-            
-        # Update session history
-        game_record = session_data.get("game_record", [])
-        
-        # Avoid adding the same message repeatedly
-        if not any(msg.get("msgId") == validated_message.get("msgId") for msg in game_record):
-            game_record.append(validated_message)
-            session_data["game_record"] = game_record
-            session_data["last_activity"] = datetime.now().isoformat()
-            
-            # Save updated session data
-            await GameSessionManager.save_game_session(session_id, session_data, self.game_type)
+        # Append to the session's game record log, repeated msgIds are ignored
+        await GameSessionManager.append_game_record(session_id, validated_message, self.game_type)
 
         # If there is a local WebSocket connection, send a message to all connections
         if session_id in self._local_websockets and self._local_websockets[session_id]:
@@ -352,9 +407,33 @@ Message: The message to be sent"""
                 self._local_message_queue[session_id] = []
             self._local_message_queue[session_id].append(validated_message)
 
+        # Connections of the session held by other game instances
+        await get_session_router().publish(
+            session_id, {"type": "game_message", "message": validated_message}, self._route_key
+        )
+
         # Print to the console at the same time (for debugging)
         logger.debug(f"消息[{session_id}]: {json.dumps(validated_message, ensure_ascii=False)}")
 
+    @property
+    def _route_key(self) -> str:
+        """Subscriber key of this game instance on the session router"""
+        return f"game:{id(self)}"
+
+    async def _handle_routed_event(self, session_id: str, event: Dict[str, Any]) -> None:
+        """Forward a message sent by another game instance of the session to the local connections
+
+Args:
+session_id: Session ID
+Event: routed event"""
+        if event.get("type") != "game_message":
+            return
+        for ws in list(self._local_websockets.get(session_id, ())):
+            try:
+                await ws.send_json(event["message"])
+            except Exception as e:
+                logger.error(f"发送消息出错: {str(e)}")
+
     async def initialize_game(self, customize_parameters: Optional[Dict[str, Any]] = None) -> None:
         """Initialize game configuration
 
@@ -387,14 +466,15 @@ WebSocket: WebSocket connection
 customize_parameters: Custom Parameters"""
         # Check if a session exists
         session_data = await GameSessionManager.load_game_session(self.session_id, self.game_type)
-        if not session_data or "game_record" not in session_data:
+        record_count = await GameSessionManager.count_game_records(self.session_id, self.game_type)
+        if not record_count:
             logger.info(f"创建新游戏会话: {self.session_id}")
             # Initialize game
             await self.initialize_game(customize_parameters)
             logger.info(f"游戏初始化成功: 会话ID={self.session_id}")
         else:
             logger.info(f"恢复已有游戏会话: {self.session_id}")
-            is_game_over = session_data.get("is_game_over", False)
+            is_game_over = (session_data or {}).get("is_game_over", False)
             if not is_game_over:
                 # Notify the front-end user that they can enter
                 await websocket.send_json({
@@ -1,7 +1,7 @@
 """Game session management system
 
 Redis-based distributed game session management, supporting multiple game types and cross-instance session sharing"""
-from typing import Dict, Any, Optional, List, Type, Union
+from typing import Dict, Any, Optional, List, Set, Tuple, Type, Union
 import json
 import time
 import asyncio
@@ -9,6 +9,8 @@ from datetime import datetime
 import base64
 import pickle
 import traceback
+import os
+from collections import OrderedDict
 
 from knowledge_api.framework.redis.cache_system.session_cache import SessionCacheManager
 from knowledge_api.framework.redis.connection import get_async_redis
@@ -25,12 +27,35 @@ class GameSessionManager:
     # WebSocket Connection Mapping Prefix
     WS_PREFIX = "websockets"
     
-    # Local cache - session data
-    _local_session_cache: Dict[str, Dict[str, Any]] = {}
+    # Game record log prefix (Redis list) and its msgId -> position index prefix (Redis hash)
+    RECORD_PREFIX = "records"
+    RECORD_INDEX_PREFIX = "record_index"
+    
+    # Number of records sent per frame when a client resyncs
+    REPLAY_CHUNK_SIZE = int(os.environ.get("GAME_REPLAY_CHUNK_SIZE", "200"))
+    
+    # Append a record only if its msgId is new and index its position. The record keys and the session data
+    # (with its version key) share the session expiry, which every record extends like a session save did
+    _APPEND_RECORD_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+    return 0
+end
+local length = redis.call('RPUSH', KEYS[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], length - 1)
+for i = 1, #KEYS do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+return 1
+"""
     
     # Local cache - Agent object
     _local_agent_cache: Dict[str, Any] = {}
     
+    # Sessions whose legacy embedded game_record has been checked by this process, least recently used dropped
+    # first (a dropped session is only loaded and checked again)
+    MIGRATED_SESSIONS_MAX = int(os.environ.get("GAME_MIGRATED_SESSIONS_MAX", "10000"))
+    _migrated_sessions: "OrderedDict[str, None]" = OrderedDict()
+    
     # Last cache cleaning time
     _last_cleanup_time = time.time()
     
@@ -63,6 +88,197 @@ STR: WebSocket key prefix"""
             return f"{cls.BASE_PREFIX}:{game_type}:{cls.WS_PREFIX}"
         return f"{cls.BASE_PREFIX}:{cls.WS_PREFIX}"
     
+    @classmethod
+    def get_record_keys(cls, session_id: str, game_type: Optional[str] = None) -> Tuple[str, str]:
+        """Get the game record log key and the msgId index key of a session
+
+Args:
+session_id: Session ID
+game_type: Optional game types
+
+Returns:
+Tuple [str, str]: record list key, msgId index key"""
+        prefix = f"{cls.BASE_PREFIX}:{game_type}" if game_type else cls.BASE_PREFIX
+        return (
+            f"{prefix}:{cls.RECORD_PREFIX}:{session_id}",
+            f"{prefix}:{cls.RECORD_INDEX_PREFIX}:{session_id}",
+        )
+    
+    @classmethod
+    async def append_game_record(cls, session_id: str, message: Dict[str, Any],
+                                 game_type: Optional[str] = None) -> bool:
+        """Append a message to the game record log of a session
+
+The records live in their own Redis list next to the session data, so the cost
+does not depend on the length of the game. Messages whose msgId was already
+recorded are ignored.
+
+Args:
+session_id: Session ID
+Message: The message to be recorded
+game_type: Optional game types
+
+Returns:
+Bool: whether the message was appended"""
+        if not session_id:
+            return False
+            
+        record_key, index_key = cls.get_record_keys(session_id, game_type)
+        session_key, version_key = SessionCacheManager.get_keys(session_id, cls.get_session_key_prefix(game_type))
+        msg_id = message.get("msgId") or ""
+        try:
+            redis = await get_async_redis()
+            result = await redis.eval(
+                cls._APPEND_RECORD_SCRIPT, 4, record_key, index_key, session_key, version_key,
+                msg_id, json.dumps(message, ensure_ascii=False), SessionCacheManager.DEFAULT_EXPIRY
+            )
+            return int(result) == 1
+        except Exception as e:
+            logger.error(f"追加游戏记录失败: {e}")
+            return False
+    
+    @classmethod
+    async def get_game_records(cls, session_id: str, game_type: Optional[str] = None,
+                               start: int = 0, end: int = -1) -> List[Dict[str, Any]]:
+        """Read the game record log of a session
+
+Args:
+session_id: Session ID
+game_type: Optional game types
+Start: index of the first record
+End: index of the last record (inclusive), -1 for the end of the log
+
+Returns:
+List [Dict [str, Any]]: records in sending order"""
+        if not session_id:
+            return []
+            
+        record_key, _ = cls.get_record_keys(session_id, game_type)
+        try:
+            redis = await get_async_redis()
+            await cls._migrate_legacy_records(session_id, game_type)
+            items = await redis.lrange(record_key, start, end)
+            return [json.loads(item) for item in items]
+        except Exception as e:
+            logger.error(f"读取游戏记录失败: {e}")
+            return []
+    
+    @classmethod
+    async def get_game_records_after(cls, session_id: str, last_msg_id: Optional[str] = None,
+                                     game_type: Optional[str] = None,
+                                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Read the records sent after a given message, for resyncing a reconnecting client
+
+Args:
+session_id: Session ID
+last_msg_id: msgId of the last record the client has seen, None (or unknown) for the whole log
+game_type: Optional game types
+Limit: maximum number of records, None for all of them
+
+Returns:
+List [Dict [str, Any]]: records in sending order"""
+        if not session_id:
+            return []
+            
+        start = 0
+        if last_msg_id:
+            _, index_key = cls.get_record_keys(session_id, game_type)
+            try:
+                redis = await get_async_redis()
+                await cls._migrate_legacy_records(session_id, game_type)
+                index = await redis.hget(index_key, last_msg_id)
+                if index is not None:
+                    start = int(index) + 1
+            except Exception as e:
+                logger.error(f"读取游戏记录失败: {e}")
+                return []
+        end = start + limit - 1 if limit else -1
+        return await cls.get_game_records(session_id, game_type, start, end)
+    
+    @classmethod
+    async def get_recorded_msg_ids(cls, session_id: str, msg_ids: List[str],
+                                   game_type: Optional[str] = None) -> Set[str]:
+        """Get which of the given messages are in the game record log of a session
+
+Args:
+session_id: Session ID
+msg_ids: msgIds to look up
+game_type: Optional game types
+
+Returns:
+Set [str]: msgIds that were recorded, empty if the log could not be read"""
+        msg_ids = [msg_id for msg_id in msg_ids if msg_id]
+        if not session_id or not msg_ids:
+            return set()
+        _, index_key = cls.get_record_keys(session_id, game_type)
+        try:
+            redis = await get_async_redis()
+            positions = await redis.hmget(index_key, msg_ids)
+        except Exception as e:
+            logger.error(f"读取游戏记录失败: {e}")
+            return set()
+        return {msg_id for msg_id, position in zip(msg_ids, positions) if position is not None}
+
+    @classmethod
+    async def count_game_records(cls, session_id: str, game_type: Optional[str] = None) -> int:
+        """Get the number of records in the game record log of a session
+
+Args:
+session_id: Session ID
+game_type: Optional game types
+
+Returns:
+Int: number of records"""
+        if not session_id:
+            return 0
+            
+        record_key, _ = cls.get_record_keys(session_id, game_type)
+        try:
+            redis = await get_async_redis()
+            await cls._migrate_legacy_records(session_id, game_type)
+            return await redis.llen(record_key)
+        except Exception as e:
+            logger.error(f"读取游戏记录失败: {e}")
+            return 0
+    
+    @classmethod
+    async def clear_game_records(cls, session_id: str, game_type: Optional[str] = None) -> bool:
+        """Delete the game record log of a session
+
+Args:
+session_id: Session ID
+game_type: Optional game types
+
+Returns:
+Bool: successfully deleted"""
+        try:
+            redis = await get_async_redis()
+            await redis.delete(*cls.get_record_keys(session_id, game_type))
+            return True
+        except Exception as e:
+            logger.error(f"删除游戏记录失败: {e}")
+            return False
+    
+    @classmethod
+    async def _migrate_legacy_records(cls, session_id: str, game_type: Optional[str] = None) -> None:
+        """Move a game_record list still embedded in the session data into the record log, once per session
+
+Args:
+session_id: Session ID
+game_type: Optional game types"""
+        cache_key = f"{session_id}:{game_type}" if game_type else session_id
+        if cache_key in cls._migrated_sessions:
+            cls._migrated_sessions.move_to_end(cache_key)
+            return
+        session_data = await cls.load_game_session(session_id, game_type)
+        if session_data and "game_record" in session_data:
+            for message in session_data.pop("game_record") or []:
+                await cls.append_game_record(session_id, message, game_type)
+            await cls.save_game_session(session_id, session_data, game_type)
+        cls._migrated_sessions[cache_key] = None
+        while len(cls._migrated_sessions) > cls.MIGRATED_SESSIONS_MAX:
+            cls._migrated_sessions.popitem(last=False)
+    
     @classmethod
     async def save_game_session(cls, session_id: str, session_data: Dict[str, Any], 
                               game_type: Optional[str] = None) -> bool:
@@ -92,10 +308,6 @@ Bool: successfully saved"""
                 session_data["created_at"] = datetime.now().isoformat()
             session_data["last_activity"] = datetime.now().isoformat()
             
-            # Update local cache
-            cache_key = f"{session_id}:{_game_type}" if _game_type else session_id
-            cls._local_session_cache[cache_key] = session_data.copy()
-            
             # Save session data
             result = await SessionCacheManager.save_session(session_id, session_data)
             
@@ -115,7 +327,9 @@ Bool: successfully saved"""
     
     @classmethod
     async def load_game_session(cls, session_id: str, game_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
-        """Loading game session data from Redis using a secondary caching system
+        """Loading game session data from Redis
+
+Sessions are not cached in process, another worker may have changed the session since the last load
 
 Args:
 session_id: Session ID
@@ -126,19 +340,11 @@ Optional [Dict [str, Any]]: Session data, return None if it doesn't exist"""
         if not session_id:
             return None
             
-        # Check the local cache first
-        cache_key = f"{session_id}:{game_type}" if game_type else session_id
-        if cache_key in cls._local_session_cache:
-            logger.debug(f"从本地缓存加载会话: {cache_key}")
-            return cls._local_session_cache[cache_key]
-        
         # If no game_type is specified, try loading from all possible game types
         if not game_type:
             # First try loading from the generic prefix
             session_data = await cls._load_from_prefix(session_id, None)
             if session_data:
-                # Update local cache
-                cls._local_session_cache[cache_key] = session_data
                 return session_data
                 
             # If the generic prefix is not found, try loading from a specific game type
@@ -147,17 +353,11 @@ Optional [Dict [str, Any]]: Session data, return None if it doesn't exist"""
             for gt in game_types:
                 session_data = await cls._load_from_prefix(session_id, gt)
                 if session_data:
-                    # Update local cache
-                    cls._local_session_cache[f"{session_id}:{gt}"] = session_data
                     return session_data
             return None
         else:
             # Load directly from the specified game type
-            session_data = await cls._load_from_prefix(session_id, game_type)
-            if session_data:
-                # Update local cache
-                cls._local_session_cache[cache_key] = session_data
-            return session_data
+            return await cls._load_from_prefix(session_id, game_type)
     
     @classmethod
     async def get_session(cls, session_id: str, game_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
@@ -306,13 +506,13 @@ Bool: successfully deleted"""
         try:
             # Delete session data
             success = await SessionCacheManager.delete_session(session_id)
-            # Simultaneous cleaning of WebSocket records
+            # Simultaneous cleaning of WebSocket records and the game record log
             await cls.clear_websocket_info(session_id, game_type)
+            await cls.clear_game_records(session_id, game_type)
             
             # Clear local cache
             cache_key = f"{session_id}:{game_type}" if game_type else session_id
-            if cache_key in cls._local_session_cache:
-                del cls._local_session_cache[cache_key]
+            cls._migrated_sessions.pop(cache_key, None)
                 
             # Clean proxy cache
             agent_key = f"{session_id}:{game_type}" if game_type else session_id
@@ -340,14 +540,7 @@ Dict [str, Dict [str, Any]]: Mapping session ID to session data"""
         try:
             # Get all sessions
             pattern = f"{SessionCacheManager.KEY_PREFIX}*"
-            sessions = await SessionCacheManager.get_all_sessions(pattern)
-            
-            # Update local cache
-            for session_id, session_data in sessions.items():
-                cache_key = f"{session_id}:{game_type}" if game_type else session_id
-                cls._local_session_cache[cache_key] = session_data
-                
-            return sessions
+            return await SessionCacheManager.get_all_sessions(pattern)
         finally:
             # Restore original prefix
             SessionCacheManager.KEY_PREFIX = original_prefix
@@ -699,18 +892,16 @@ game_type: Optional game types"""
         if session_id:
             # Only clear the cache for a specific session
             cache_key = f"{session_id}:{game_type}" if game_type else session_id
-            if cache_key in cls._local_session_cache:
-                del cls._local_session_cache[cache_key]
             if cache_key in cls._local_agent_cache:
                 del cls._local_agent_cache[cache_key]
                 logger.debug(f"已清理会话缓存: {cache_key}")
+            cls._migrated_sessions.pop(cache_key, None)
         else:
             # Clear all caches
-            session_count = len(cls._local_session_cache)
             agent_count = len(cls._local_agent_cache)
-            cls._local_session_cache.clear()
             cls._local_agent_cache.clear()
-            logger.debug(f"已清理所有本地缓存: {session_count}个会话, {agent_count}个Agent对象")
+            cls._migrated_sessions.clear()
+            logger.debug(f"已清理所有本地缓存: {agent_count}个Agent对象")
     
     @classmethod
     async def clear_session_data(cls, session_id: str, game_type: Optional[str] = None) -> bool:
@@ -736,8 +927,9 @@ Is the clearance successful?"""
             "last_activity": datetime.now().isoformat(),
         }
         
-        # Clear local cache
+        # Clear local cache and the game record log
         cls.clear_local_cache(session_id, game_type)
+        await cls.clear_game_records(session_id, game_type)
         
         # Save Session
         return await cls.save_game_session(session_id, new_session, game_type) 
\ No newline at end of file
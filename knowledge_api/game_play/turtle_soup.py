@@ -1,4 +1,5 @@
 import json
+import os
 import random
 import uuid
 from typing import List, Dict, Optional, Tuple, Any
@@ -6,7 +7,8 @@ from datetime import datetime
 
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
-from knowledge_api.model.agent.game_agent import TurtleSoupGameAgent, GameRole
+from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
+from knowledge_api.model.agent.game_agent import TurtleSoupGameAgent, GameRole, gather_agent_calls
 from knowledge_api.game_play.base_game import BaseGame
 from knowledge_api.game_play.game_session_manager import GameSessionManager
 from knowledge_api.mapper.chat_session.base import Session
@@ -16,6 +18,9 @@ from knowledge_api.utils.log_config import get_logger
 
 logger = get_logger()
 
+# Default way the AI players ask their questions, overridden by the speak_mode of the game configuration
+GAME_SPEAK_MODE = os.environ.get("GAME_SPEAK_MODE", "sequential")
+
 
 class TurtleSoup(BaseGame):
     """The Turtle Soup game implementation class supports serialization and recovery of distributed sessions and Agent objects"""
@@ -153,21 +158,22 @@ Noodles of soup, soup base, and records containing complete information about th
             }
         else:
             tool_results = []
-            for retries in range(3):
-                tool_results, assistant, usage = await self.function_call(setter, [
-                    {"role": "system", "content":
-                        "Help me create a turtle soup puzzle according to the rules of turtle soup. You must call the create_soup function of tools to help me store the turtle soup puzzle. Don't reply directly to me." +
-                        await self.create_prompt("game_turtle_soup_set_question", {
-                            "description": self.game_info.description,
-                            "setting": self.game_info.setting,
-                            "question_type": self.taskInput.user_info.get("question_type", "simple")
-                        })
-                     }
-                ], model=self.game_config.get("create_question"))
-
-                if assistant and len(tool_results) > 0:
-                    break
-                logger.info(f"Function call 返回空结果，正在进行第 {retries + 1} 次重试...")
+            with self.tool_turn():
+                for retries in range(3):
+                    tool_results, assistant, usage = await self.function_call(setter, [
+                        {"role": "system", "content":
+                            "Help me create a turtle soup puzzle according to the rules of turtle soup. You must call the create_soup function of tools to help me store the turtle soup puzzle. Don't reply directly to me." +
+                            await self.create_prompt("game_turtle_soup_set_question", {
+                                "description": self.game_info.description,
+                                "setting": self.game_info.setting,
+                                "question_type": self.taskInput.user_info.get("question_type", "simple")
+                            })
+                         }
+                    ], model=self.game_config.get("create_question"))
+
+                    if assistant and len(tool_results) > 0:
+                        break
+                    logger.info(f"Function call 返回空结果，正在进行第 {retries + 1} 次重试...")
             usage = usage
             content_json = tool_results[0].get('content')
             soup_surface = content_json.get("soup")
@@ -282,13 +288,18 @@ Is the update successful?"""
         return result is not None
 
     async def play_round(self, message: Optional[str] = None) -> Dict:
-        """Execute a round of the game
+        """Execute a round of the game, its judge calls and their retries share one tool turn
 
 Args:
 Message: User message (optional)
 
 Returns:
 Game status information, including hints for next steps"""
+        with self.tool_turn():
+            return await self._play_round(message)
+
+    async def _play_round(self, message: Optional[str] = None) -> Dict:
+        """Execute a round of the game"""
         # Get session data
         session_data = await self.get_current_session()
         if not session_data:
@@ -363,33 +374,23 @@ Game status information, including hints for next steps"""
             "current_round": current_round
         })
 
-        # Traverse the AI Player Q & A
-        for player in players:
-            question_response = await player.client.chat_completion(
-                messages=player.memory.get_formatted_history(),
-                temperature=0.7,
-                application_scenario=f"{self.function_call_scenario}-{self.game_type}"
-            )
-            question = question_response.content
-            player.memory.add_ai_message(question)
-
-            # Send questions to AI players
-            await self.send_message_answer(player, question, "player", usage=question_response)
-
-            user_name = player.role.role_info.get('name')
-            # Add the AI player's question to the questioner's memory
-            setter.memory.add_user_message(f"{user_name}: {question}")
-
-            # The questioner answers the question
-            end_request = await self.is_judge_answer(question, current_round)
-            if end_request.get("status") == "game_over":
+        if self.speak_mode == "simultaneous" and len(players) > 1:
+            end_request = await self._play_ai_round_simultaneous(setter, players, current_round)
+            if end_request:
                 return end_request
+        else:
+            # Traverse the AI Player Q & A
+            for player in players:
+                question_response = await self._ask_question(player)
+                question = question_response.content
+                player.memory.add_ai_message(question)
+
+                # Send questions to AI players
+                await self.send_message_answer(player, question, "player", usage=question_response)
 
-            if end_request.get("ask", ""):
-                # Setter.memory.add_user_message ("author pair")
-                self.add_message_agents(f"{user_name}：{question},汤主回答了{user_name}：{end_request.get('ask')}",
-                                        player)
-                player.memory.add_user_message("The soup owner replied:" + end_request.get('ask'))
+                end_request = await self._judge_player_question(setter, player, question, current_round)
+                if end_request:
+                    return end_request
 
         # Save updated agent status
         await GameSessionManager.save_agent_objects(self.session_id, self.agents, self.game_type)
@@ -401,6 +402,138 @@ Game status information, including hints for next steps"""
             "current_round": current_round
         }
 
+    @property
+    def speak_mode(self) -> str:
+        """How the AI players ask their questions, sequential or simultaneous"""
+        return (self.game_config or {}).get("speak_mode") or GAME_SPEAK_MODE
+
+    async def _ask_question(self, player: TurtleSoupGameAgent) -> LLMTokenResponse:
+        """Generate the question of an AI player from its memory"""
+        return await player.client.chat_completion(
+            messages=player.memory.get_formatted_history(),
+            temperature=0.7,
+            application_scenario=f"{self.function_call_scenario}-{self.game_type}"
+        )
+
+    async def _judge_player_question(self, setter: TurtleSoupGameAgent, player: TurtleSoupGameAgent,
+                                     question: str, current_round: int) -> Optional[Dict]:
+        """Let the questioner answer the question of an AI player and share the answer with the players
+
+Returns:
+Game over state if the puzzle was solved, otherwise None"""
+        user_name = player.role.role_info.get('name')
+        # Add the AI player's question to the questioner's memory
+        setter.memory.add_user_message(f"{user_name}: {question}")
+
+        # The questioner answers the question
+        end_request = await self.is_judge_answer(question, current_round)
+        if end_request.get("status") == "game_over":
+            return end_request
+
+        if end_request.get("ask", ""):
+            # Setter.memory.add_user_message ("author pair")
+            self.add_message_agents(f"{user_name}：{question},汤主回答了{user_name}：{end_request.get('ask')}",
+                                    player)
+            player.memory.add_user_message("The soup owner replied:" + end_request.get('ask'))
+        return None
+
+    async def _play_ai_round_simultaneous(self, setter: TurtleSoupGameAgent, players: List[TurtleSoupGameAgent],
+                                          current_round: int) -> Optional[Dict]:
+        """AI round where all players ask at the same time and one call of the questioner judges all questions
+
+The questions are generated concurrently (bounded by the provider semaphore) and sent in the
+order of the players. Players do not see the answers to the other questions of the same round.
+
+Returns:
+Game over state if the puzzle was solved, otherwise None"""
+        responses = await gather_agent_calls(players, self._ask_question)
+        questions = []
+        for player, response in zip(players, responses):
+            if isinstance(response, Exception):
+                logger.error(f"AI玩家提问失败: {player.agent_id}, 错误: {str(response)}")
+                continue
+            player.memory.add_ai_message(response.content)
+            await self.send_message_answer(player, response.content, "player", usage=response)
+            questions.append((player, response.content))
+
+        judgements = await self.batch_judge_answers(
+            [(player.role.role_info.get('name'), question) for player, question in questions]
+        ) if questions else None
+        if judgements is None:
+            # The questioner did not judge the batch, answer the questions one by one
+            for player, question in questions:
+                end_request = await self._judge_player_question(setter, player, question, current_round)
+                if end_request:
+                    return end_request
+            return None
+
+        judgements, usage = judgements
+        for (player, question), judgement in zip(questions, judgements):
+            if judgement.get("is_solved") == 1:
+                await self.send_message_setter(f"恭喜玩家解谜成功！", usage)
+                return await self.end_game()
+            answer = judgement.get("answer") or "I need more information to make a judgment."
+            await self.send_message_setter(answer, usage)
+            # The token usage of the single judge call is reported once
+            usage = None
+            user_name = player.role.role_info.get('name')
+            self.add_message_agents(f"{user_name}：{question},汤主回答了{user_name}：{answer}", player)
+            player.memory.add_user_message("The soup owner replied:" + answer)
+        return None
+
+    async def batch_judge_answers(self, questions: List[Tuple[str, str]]) -> Optional[Tuple[List[Dict], LLMTokenResponse]]:
+        """Judge all questions of a round with a single function call of the questioner
+
+Args:
+Questions: (player name, question) of each question
+
+Returns:
+The judgements ({"is_solved", "answer"}) in the order of the questions and the token usage,
+None if the questioner did not judge every question"""
+        setter = next((agent for agent in self.agents if agent.identity == "setter"), None)
+        if not setter:
+            logger.error("Can't find the questioner")
+            return None
+
+        numbered = "\n".join(f"{index}. {name}: {question}" for index, (name, question) in enumerate(questions, 1))
+        history = setter.memory.get_formatted_history()
+        history.append({
+            "role": "user",
+            "content": f'根据海龟汤 汤底逐一分析以下{len(questions)}个用户提问，然后调用一次function_judge_answers，'
+                       f'按编号存储每个提问分析后的结果，不要直接回复我。用户提问：\n{numbered}'
+        })
+        result = await self.function_call(setter, history, model=self.game_config.get("decision_making"),
+                                          tools=self.batch_tools)
+        if not result:
+            return None
+        tool_results, assistant, usage = result
+        if assistant is None or not tool_results or isinstance(tool_results, str):
+            return None
+
+        by_index = {}
+        contents = [item.get("content") for item in tool_results if isinstance(item.get("content"), dict)]
+        for content in contents:
+            for judgement in content.get("judgements") or []:
+                if not isinstance(judgement, dict):
+                    continue
+                try:
+                    by_index[int(judgement.get("index"))] = judgement
+                except (TypeError, ValueError):
+                    logger.info(f"跳过编号无效的判定结果: {judgement}")
+        if any(index not in by_index for index in range(1, len(questions) + 1)):
+            logger.info(f"批量判定结果不完整: 提问数 {len(questions)}, 判定数 {len(by_index)}")
+            return None
+
+        judgements = [by_index[index] for index in range(1, len(questions) + 1)]
+        setter.memory.add_user_message("\n".join(f"{name}: {question}" for name, question in questions))
+        setter.memory.add_function_call_exchange(assistant, "; ".join(
+            f"{index}: is_solved={judgement.get('is_solved')}answer={judgement.get('answer')}"
+            for index, judgement in enumerate(judgements, 1)
+        ))
+        # Save Agent State
+        await GameSessionManager.save_agent_objects(self.session_id, self.agents, self.game_type)
+        return judgements, usage
+
     async def end_game(self) -> Dict:
         """End Game
 
@@ -665,7 +798,12 @@ judgment result"""
                 "answer": answer
             }
 
-        self.tools.register(create_soup, name="create_soup", description="Store Turtle Soup Puzzles")
+        async def function_judge_answers(judgements: list):
+            return {
+                "judgements": judgements
+            }
+
+        self.tools.register(create_soup, name="create_soup", description="Store Turtle Soup Puzzles", pure=True)
         self.tools.get_tool("create_soup") \
             .set_parameter_description("soup", "Noodle soup (initial puzzle description for the player)") \
             .set_parameter_description("answer", "Soup bottom, complete puzzle answer")
@@ -673,10 +811,31 @@ judgment result"""
         # Register class methods
         self.tools.register(function_judge_answer,
                             name="function_judge_answer",
-                            description="Analyze whether the user's question meets the turtle soup base, as well as the set content, store and process, and reply to the user")
+                            description="Analyze whether the user's question meets the turtle soup base, as well as the set content, store and process, and reply to the user",
+                            pure=True)
 
         self.tools.get_tool("function_judge_answer") \
             .set_parameter_description("is_solved",
                                        "Nothing to do with noodle soup or is_solved answer is set to 0, only the real answer can be set to 1") \
             .set_parameter_description("answer", self.game_config.get("reply_setting",
                                                                       "Reply yes, no, or don't know according to the settings. And the content allowed by the owner of Turtle Soup, do not write other irrelevant text."))
+
+        # Only offered to the batch judge call, the sequential and human paths keep their single judge tool
+        self.batch_tools = ToolRegistry()
+        self.batch_tools.register(function_judge_answers,
+                                  name="function_judge_answers",
+                                  description="Analyze several numbered user questions against the turtle soup base at once, store and process one result per question",
+                                  pure=True)
+        self.batch_tools.get_tool("function_judge_answers") \
+            .set_parameter_description("judgements", "One result per question, in the order of the question numbers") \
+            .set_parameter_items("judgements", {
+                "type": "object",
+                "properties": {
+                    "index": {"type": "integer", "description": "Number of the question"},
+                    "is_solved": {"type": "integer",
+                                  "description": "Nothing to do with noodle soup or is_solved answer is set to 0, only the real answer can be set to 1"},
+                    "answer": {"type": "string", "description": self.game_config.get("reply_setting",
+                                                                                     "Reply yes, no, or don't know according to the settings. And the content allowed by the owner of Turtle Soup, do not write other irrelevant text.")}
+                },
+                "required": ["index", "is_solved", "answer"]
+            })
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
-from knowledge_api.framework.database.database import get_session
+from knowledge_api.framework.database.database import get_async_session
 from knowledge_api.mapper.audio_timbre.base import AudioTimbreResponse, AudioTimbreCreate, AudioTimbre, AudioTimbreUpdate
 from knowledge_api.mapper.audio_timbre.crud import AudioTimbreCRUD
 
@@ -12,7 +12,7 @@ router_audio_timbre = APIRouter(prefix="/audio-timbre", tags=["timbre management
 @router_audio_timbre.post("/", response_model=AudioTimbreResponse)
 async def create_audio_timbre(
         timbre: AudioTimbreCreate,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> AudioTimbre:
     """Create timbre"""
     crud = AudioTimbreCRUD(db)
@@ -22,7 +22,7 @@ async def create_audio_timbre(
 @router_audio_timbre.get("/{timbre_id}", response_model=AudioTimbreResponse)
 async def get_audio_timbre(
         timbre_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> AudioTimbre:
     """Get a single tone"""
     crud = AudioTimbreCRUD(db)
@@ -35,7 +35,7 @@ async def get_audio_timbre(
 @router_audio_timbre.get("/speaker/{speaker_id}", response_model=AudioTimbreResponse)
 async def get_audio_timbre_by_speaker_id(
         speaker_id: str,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> AudioTimbre:
     """Get timbre according to sound ID"""
     crud = AudioTimbreCRUD(db)
@@ -50,7 +50,7 @@ async def list_audio_timbres(
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, ge=1, le=100),
         state: str = None,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> List[AudioTimbre]:
     """Get a list of sounds"""
     crud = AudioTimbreCRUD(db)
@@ -63,7 +63,7 @@ async def list_audio_timbres(
 async def update_audio_timbre(
         timbre_id: int,
         timbre_update: AudioTimbreUpdate,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> AudioTimbre:
     """update tone"""
     crud = AudioTimbreCRUD(db)
@@ -76,7 +76,7 @@ async def update_audio_timbre(
 @router_audio_timbre.delete("/{timbre_id}", response_model=bool)
 async def delete_audio_timbre(
         timbre_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> bool:
     """Delete timbre"""
     crud = AudioTimbreCRUD(db)
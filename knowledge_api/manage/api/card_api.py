@@ -1,10 +1,10 @@
 """Card API"""
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from fastapi_pagination import Page
 
-from knowledge_api.framework.database.database import get_session
+from knowledge_api.framework.database.database import get_async_session
 from knowledge_api.framework.utils.param_utils import build_filters
 from knowledge_api.mapper.card import (
     Card, 
@@ -23,7 +23,7 @@ router_card = APIRouter(prefix="/cards", tags=["Card Management"])
 @router_card.post("/", response_model=CardResponse)
 async def create_card(
     card: CardCreate,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> Card:
     """Create a card"""
     crud = CardCRUD(db)
@@ -41,7 +41,7 @@ async def create_card(
 @router_card.get("/{card_id}", response_model=CardResponse)
 async def get_card(
     card_id: int,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> Card:
     """Acquire a single card"""
     crud = CardCRUD(db)
@@ -60,7 +60,7 @@ async def list_cards(
     status: Optional[str] = Query(None, description="state"),
     role_id: Optional[str] = Query(None, description="Role ID"),
     is_limited: Optional[str] = Query(None, description="Whether to qualify the card"),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> Page[CardResponse]:
     """Get a list of cards (pagination)"""
     crud = CardCRUD(db)
@@ -84,7 +84,7 @@ async def get_cards_by_series(
     series_id: int,
     skip: int = Query(0, description="skip record count"),
     limit: int = Query(100, description="Limit the number of records"),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> List[Card]:
     """Get a list of cards by series ID"""
     crud = CardCRUD(db)
@@ -95,7 +95,7 @@ async def get_cards_by_series(
 async def update_card(
     card_id: int,
     card_update: CardUpdate,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> Card:
     """Update Card"""
     crud = CardCRUD(db)
@@ -117,7 +117,7 @@ async def update_card(
 @router_card.delete("/{card_id}", response_model=bool)
 async def delete_card(
     card_id: int,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> bool:
     """Delete Cards (Soft Delete)"""
     crud = CardCRUD(db)
@@ -130,7 +130,7 @@ async def delete_card(
 @router_card.get("/series/{series_id}/count", response_model=int)
 async def count_cards_by_series(
     series_id: int,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> int:
     """Count the number of cards in the series"""
     crud = CardCRUD(db)
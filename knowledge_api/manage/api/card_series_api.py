@@ -1,10 +1,10 @@
 """Card series API"""
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from fastapi_pagination import Page
 
-from knowledge_api.framework.database.database import get_session
+from knowledge_api.framework.database.database import get_async_session
 from knowledge_api.framework.utils.param_utils import build_filters
 from knowledge_api.mapper.card_series import (
     CardSeries, 
@@ -21,7 +21,7 @@ router_card_series = APIRouter(prefix="/card-series", tags=["Card series managem
 @router_card_series.post("/", response_model=CardSeriesResponse)
 async def create_card_series(
     series: CardSeriesCreate,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> CardSeries:
     """Create a card series"""
     crud = CardSeriesCRUD(db)
@@ -37,7 +37,7 @@ async def create_card_series(
 @router_card_series.get("/{series_id}", response_model=CardSeriesResponse)
 async def get_card_series(
     series_id: int,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> CardSeries:
     """Acquire a single card series"""
     crud = CardSeriesCRUD(db)
@@ -52,7 +52,7 @@ async def list_card_series(
     name: Optional[str] = Query(None, description="Series name"),
     code: Optional[str] = Query(None, description="serial coding"),
     status: Optional[str] = Query(None, description="state"),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> Page[CardSeriesResponse]:
     """Get a list of card series (pagination)"""
     crud = CardSeriesCRUD(db)
@@ -67,7 +67,7 @@ async def list_card_series(
 async def get_active_card_series(
     skip: int = Query(0, description="skip record count"),
     limit: int = Query(100, description="Limit the number of records"),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> List[CardSeries]:
     """Get a list of enabled card series"""
     crud = CardSeriesCRUD(db)
@@ -78,7 +78,7 @@ async def get_active_card_series(
 async def update_card_series(
     series_id: int,
     series_update: CardSeriesUpdate,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> CardSeries:
     """Update Card Series"""
     crud = CardSeriesCRUD(db)
@@ -98,7 +98,7 @@ async def update_card_series(
 @router_card_series.delete("/{series_id}", response_model=bool)
 async def delete_card_series(
     series_id: int,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> bool:
     """Delete Card Series (Soft Delete)"""
     crud = CardSeriesCRUD(db)
@@ -119,7 +119,7 @@ async def delete_card_series(
 @router_card_series.get("/code/{code}", response_model=CardSeriesResponse)
 async def get_card_series_by_code(
     code: str,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ) -> CardSeries:
     """Obtain a card series through code"""
     crud = CardSeriesCRUD(db)
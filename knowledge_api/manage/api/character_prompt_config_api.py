@@ -16,10 +16,24 @@ from knowledge_api.mapper.character_prompt_config.crud import CharacterPromptCon
 from knowledge_api.framework.database.database import get_session
 from knowledge_api.mapper.prompt_prologue import PromptPrologueCRUD, PromptPrologueCreate
 from knowledge_api.framework.exception.custom_exceptions import BusinessException
+from knowledge_api.framework.task.task_manager import get_task_manager
+from knowledge_api.framework.tts.tts_utils import prewarm_prologue_audio
 
 router_role_prompt = APIRouter(prefix="/character-prompt-config", tags=["Role cue word configuration"])
 
 
+async def prewarm_prologues(config: CharacterPromptConfig, prologues: List[str]) -> None:
+    """Synthesize the prologues of an enabled configuration in the background, the first chat replays them from the audio cache"""
+    if config.timbre and prologues and config.status == 1:
+        await get_task_manager().submit(
+            prewarm_prologue_audio,
+            config.timbre,
+            list(prologues),
+            description=f"Prewarm prologue audio {config.id}",
+            lane="bulk",
+        )
+
+
 def convert_to_response_model(config: CharacterPromptConfig) -> CharacterPromptConfigResponse:
     """Transforming the database model to a responsive model"""
     return CharacterPromptConfigResponse(
@@ -67,6 +81,7 @@ async def create_prompt_config(
                 prologue=prologue,
                 create_at="admin",
             ))
+        await prewarm_prologues(data, config.prologue)
         data.prologue = []
 
 
@@ -192,6 +207,11 @@ async def update_prompt_config(
                 create_at="admin",
             ))
     await CacheManager().update_character_prompt(config,crud)
+    prologues = config_update.prologue
+    if not prologues and config_update.timbre:
+        # Voice changed, the stored prologues need new audio
+        prologues = [p.prologue for p in await PromptPrologueCRUD(db).get_by_prompt_id(prompt_id=config_id)]
+    await prewarm_prologues(config, prologues or [])
     config.prologue = []
     return config
 
@@ -211,6 +231,9 @@ async def update_prompt_config_status(
     config = await crud.update(config_id, config_update)
     if not config:
         raise HTTPException(status_code=404, detail="Cue word configuration does not exist")
+    if status == 1:
+        prologues = await PromptPrologueCRUD(db).get_by_prompt_id(prompt_id=config_id)
+        await prewarm_prologues(config, [p.prologue for p in prologues])
     return config
 
 
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Dict, Any
 
-from knowledge_api.framework.database.database import get_session
+from knowledge_api.framework.database.database import get_async_session
 from knowledge_api.mapper.conversations.base import ConversationResponse, ConversationCreate, Conversation, ConversationUpdate
 from knowledge_api.mapper.conversations.crud import ConversationCRUD
 
@@ -12,7 +12,7 @@ router_conversation = APIRouter(prefix="/conversations", tags=["conversation man
 @router_conversation.post("/", response_model=ConversationResponse)
 async def create_conversation(
         conversation: ConversationCreate,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> Conversation:
     """Create conversation message"""
     crud = ConversationCRUD(db)
@@ -22,7 +22,7 @@ async def create_conversation(
 @router_conversation.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
         conversation_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> Conversation:
     """Get a single conversation message"""
     crud = ConversationCRUD(db)
@@ -35,7 +35,7 @@ async def get_conversation(
 @router_conversation.get("/message/{message_id}", response_model=ConversationResponse)
 async def get_conversation_by_message_id(
         message_id: str,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> Conversation:
     """Get conversation message according to message ID"""
     crud = ConversationCRUD(db)
@@ -50,7 +50,7 @@ async def get_conversations_by_session_id(
         session_id: str,
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, ge=1, le=1000),
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> List[Conversation]:
     """Get chat history based on session ID"""
     crud = ConversationCRUD(db)
@@ -62,7 +62,7 @@ async def get_conversations_by_conversation_id(
         conversation_id: str,
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, ge=1, le=1000),
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> List[Conversation]:
     """Get chat history based on conversation session ID"""
     crud = ConversationCRUD(db)
@@ -72,7 +72,7 @@ async def get_conversations_by_conversation_id(
 @router_conversation.get("/tree/{message_id}", response_model=Dict[str, Any])
 async def get_conversation_tree(
         message_id: str,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> Dict[str, Any]:
     """Get the dialog tree structure"""
     crud = ConversationCRUD(db)
@@ -87,7 +87,7 @@ async def get_conversations_by_user_id(
         user_id: str,
         skip: int = Query(default=0, ge=0),
         limit: int = Query(default=100, ge=1, le=1000),
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> List[Conversation]:
     """Get all user conversations"""
     crud = ConversationCRUD(db)
@@ -98,7 +98,7 @@ async def get_conversations_by_user_id(
 async def update_conversation(
         conversation_id: int,
         conversation_update: ConversationUpdate,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> Conversation:
     """Update conversation message"""
     crud = ConversationCRUD(db)
@@ -111,7 +111,7 @@ async def update_conversation(
 @router_conversation.delete("/{conversation_id}", response_model=bool)
 async def delete_conversation(
         conversation_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> bool:
     """Delete conversation message"""
     crud = ConversationCRUD(db)
@@ -124,7 +124,7 @@ async def delete_conversation(
 @router_conversation.delete("/session/{session_id}", response_model=int)
 async def delete_conversations_by_session_id(
         session_id: str,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ) -> int:
     """Delete all conversations in the conversation"""
     crud = ConversationCRUD(db)
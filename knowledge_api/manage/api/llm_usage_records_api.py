@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Body
 from sqlmodel import Session
 from fastapi_pagination import Page
 
+from knowledge_api.framework.ai_collect.usage_writer import get_usage_writer
 from knowledge_api.framework.database.database import get_session
 from knowledge_api.mapper.llm_usage_records.base import (
     LLMUsageRecord,
@@ -16,6 +17,7 @@ from knowledge_api.mapper.llm_usage_records.base import (
     LLMUsageRecordStats
 )
 from knowledge_api.mapper.llm_usage_records.crud import LLMUsageRecordCRUD
+from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD
 
 # Create route
 llm_usage_records_router = APIRouter(prefix="/llm-usage-records", tags=["LLM usage record"])
@@ -182,6 +184,15 @@ Bool: successfully deleted"""
     return True
 
 
+@llm_usage_records_router.get("/statistics/writer", response_model=Dict[str, Any])
+async def get_writer_metrics() -> Dict[str, Any]:
+    """Get the background usage writer metrics (queue depth, drop and spill counters)
+
+Returns:
+Dict [str, Any]: Writer metrics"""
+    return get_usage_writer().get_metrics()
+
+
 @llm_usage_records_router.get("/statistics/summary", response_model=LLMUsageRecordStats)
 async def get_statistics(
     start_date: Optional[datetime] = Query(None),
@@ -203,7 +214,8 @@ DB: database session
 
 Returns:
 LLMUsageRecordStats: Statistics"""
-    crud = LLMUsageRecordCRUD(db)
+    # Read the pre-aggregated rollups instead of scanning the raw records
+    crud = LLMUsageRollupCRUD(db)
     return await crud.get_statistics(
         start_date=start_date,
         end_date=end_date,
@@ -230,7 +242,7 @@ DB: database session
 
 Returns:
 Dict [str, Dict]: Daily statistics"""
-    crud = LLMUsageRecordCRUD(db)
+    crud = LLMUsageRollupCRUD(db)
     return await crud.get_daily_statistics(
         days=days,
         vendor_type=vendor_type,
@@ -342,6 +342,14 @@ async def get_temp_task_logs(
     return await log_crud.get_by_task_id_paginated(task_id)
 
 
+@router_task_manage.get("/executor-stats", response_model=Dict[str, Any])
+async def get_executor_stats() -> Dict[str, Any]:
+    """Get background task executor metrics
+
+@Return: slots in use, retained task records and per-lane queue depth, counters and latency histograms"""
+    return get_task_manager().get_lane_stats()
+
+
 @router_task_manage.get("/{task_id}", response_model=TaskManageResponse)
 async def get_task(
         task_id: str,
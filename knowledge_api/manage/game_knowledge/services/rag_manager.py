@@ -1,3 +1,4 @@
+import asyncio
 from typing import Dict, Type
 
 from knowledge_api.manage.game_knowledge.services.rag_service import RAGService
@@ -20,6 +21,9 @@ class RAGManager:
     
     # active service instance
     _active_services = {}
+
+    # Services being initialized, concurrent callers (startup warmup and the first chat) share one initialization
+    _pending_services: Dict[str, asyncio.Future] = {}
     
     def __new__(cls):
         """Ensure Singleton Pattern"""
@@ -67,6 +71,10 @@ RAG service example"""
         if cache_key in self._active_services:
             logger.info(f"使用现有的RAG服务: {cache_key}")
             return self._active_services[cache_key]
+
+        # Wait for an initialization already in progress
+        if cache_key in self._pending_services:
+            return await asyncio.shield(self._pending_services[cache_key])
             
         # Get service class
         if service_type not in self._service_types:
@@ -76,13 +84,27 @@ RAG service example"""
         
         # Create a new service instance
         logger.info(f"创建新的RAG服务: {cache_key}")
-        service = service_class(**kwargs)
-        
-        # initialization service
-        await service.initialize()
-        
-        # caching service instance
-        self._active_services[cache_key] = service
+        pending = asyncio.get_running_loop().create_future()
+        self._pending_services[cache_key] = pending
+        try:
+            service = service_class(**kwargs)
+
+            # initialization service
+            await service.initialize()
+
+            # caching service instance
+            self._active_services[cache_key] = service
+            pending.set_result(service)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark the error as retrieved when no other caller waits
+            pending.exception()
+            raise
+        finally:
+            self._pending_services.pop(cache_key, None)
         
         return service
         
@@ -87,9 +87,9 @@ generated text fragment"""
                 yield "<div>"
                 # Processing Text To Speech
                 if role_data.get("timbre"):
-                    from knowledge_api.utils.string_tool import remove_parentheses_content
+                    from knowledge_api.utils.string_tool import speakable_text
                     tts = await self.bytedance_tts.text_to_speech(
-                        remove_parentheses_content(collected_response),
+                        speakable_text(collected_response),
                         role_data.get("timbre")
                     )
 
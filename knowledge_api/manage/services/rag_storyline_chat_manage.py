@@ -36,7 +36,7 @@ generated text fragment"""
         )
         ai, messages =await self.get_ai(msg=input_data.message, prompt=prompt)
         response = await ai.chat_completion(messages=messages, temperature=input_data.temperature)
-        await self.update_chat(response=response, msg=input_data.message)
+        await self.update_chat(response=response, msg=input_data.message, session_id=input_data.session_id)
         """== Push the current plot according to key nodes and provide users with choices =="""
         tools.get_tool("StoryChoice") \
             .set_parameter_description("scene", "Current scene: If the protagonist wants to explore the secret realm, then scene = Do you want to explore the secret realm with me?") \
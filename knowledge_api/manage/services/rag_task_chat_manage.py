@@ -85,12 +85,12 @@ chat response"""
 
         # Processing Text To Speech
         if role_data.get("timbre"):
-            from knowledge_api.utils.string_tool import remove_parentheses_content
+            from knowledge_api.utils.string_tool import speakable_text
             from runtime import ExecutionTimer
             timer3 = ExecutionTimer("Text To Speech Time:")
             timer3.start()
             tts_data = await self.bytedance_tts.text_to_speech(
-                remove_parentheses_content(result["message"]),
+                speakable_text(result["message"]),
                 role_data.get("timbre")
             )
             result.update({
@@ -25,7 +25,8 @@ async def game_websocket_endpoint(
 
 1. The front end only needs to provide session_id establish the connection
 2. Automatically create a new game when the session does not exist
-3. Restore historical games when the session exists
+3. Restore historical games when the session exists, a reconnecting client sends the msgId
+   of the last message it has seen as last_msg_id and only receives the missing tail
 4. Users only need to send human messages, and the server automatically handles AI rounds and game flows
 
 Args:
@@ -67,12 +68,12 @@ DB: database session"""
             await task.init_task()
             game = task.game
             # Register WebSocket Connection
-            await game.register_websocket(session_id, websocket)
+            await game.register_websocket(session_id, websocket, init_data.get("last_msg_id"))
             logger.info(f"WebSocket连接注册成功: 会话ID={session_id}")
             await task.play_game(websocket)
         else:
             game = await GameFactory.create_game(game_type, db, task_input)
-            await game.register_websocket(session_id, websocket)
+            await game.register_websocket(session_id, websocket, init_data.get("last_msg_id"))
             logger.info(f"WebSocket连接注册成功:开始游戏玩法 会话ID={session_id}")
             await game.play_game(websocket)
 
@@ -18,7 +18,9 @@ from knowledge_api.framework.workflow.nodes.player_turn import PlayerTurnNode
 from knowledge_api.mapper.chat_session.base import Session
 from knowledge_api.mapper.roles.crud import RoleCRUD
 from knowledge_api.framework.database.database import get_session
+from knowledge_api.framework.redis.session_router import get_session_router
 from knowledge_api.framework.workflow import WorkflowEngine, NodeFactory, Node, WorkflowContext
+from knowledge_api.framework.workflow.compiler import WorkflowPlan, get_template_plan
 from knowledge_api.utils.log_config import get_logger
 
 # Initialize the logger
@@ -30,41 +32,159 @@ workflow_router = APIRouter(tags=["Workflow Engine"])
 # Session management (temporary memory storage, you should actually use persistent storage)
 sessions: Dict[str, Dict[str, Any]] = {}
 websockets: Dict[str, Set[WebSocket]] = {}
-workflow_engines: Dict[str, WorkflowEngine] = {}
 node_factories: Dict[str, NodeFactory] = {}
+# Last broadcast messages of each session in sending order, with msg_id -> sequence number and the
+# sequence number of the first message kept, for reconnect replay
+message_logs: Dict[str, List[Dict[str, Any]]] = {}
+message_log_index: Dict[str, Dict[str, int]] = {}
+message_log_start: Dict[str, int] = {}
+# Outbound queue and sending task of each registered connection
+connection_senders: Dict[WebSocket, "ConnectionSender"] = {}
+# Routing token -> connection, for events addressed to one connection of this worker
+connection_tokens: Dict[str, WebSocket] = {}
+# Pending expiry of the sessions without connections
+session_expiry: Dict[str, asyncio.Task] = {}
+
+# Subscriber key of this module on the session router
+ROUTE_SUBSCRIBER = "workflow"
+
+# Number of messages sent per history frame when a client resyncs
+REPLAY_CHUNK_SIZE = int(os.environ.get("WORKFLOW_REPLAY_CHUNK_SIZE", "200"))
+# Messages kept in the log of each session, older messages are no longer replayed
+MESSAGE_LOG_SIZE = int(os.environ.get("WORKFLOW_MESSAGE_LOG_SIZE", "2000"))
+
+# Outbound queue length and send timeout (seconds) of each connection, slower clients are disconnected
+OUTBOUND_QUEUE_SIZE = int(os.environ.get("WS_OUTBOUND_QUEUE_SIZE", "256"))
+SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "5"))
+
+# Seconds a session is kept after its last connection closed, then its ownership is released
+SESSION_IDLE_TIMEOUT = float(os.environ.get("WORKFLOW_SESSION_IDLE_TIMEOUT", "300"))
 
 # load template directory
 TEMPLATE_DIR = "knowledge_api/framework/workflow/templates"
 
 
-async def load_workflow_template(game_type: str) -> Dict[str, Any]:
-    """Load workflow template
+async def load_workflow_plan(game_type: str) -> WorkflowPlan:
+    """Load the compiled workflow plan of a game type
+
+The template is read and compiled once, later sessions reuse the cached plan until the file changes
 
 Args:
 game_type: Game Type
 
 Returns:
-workflow definition"""
+compiled workflow plan"""
     # build template file path
     template_path = os.path.join(TEMPLATE_DIR, f"{game_type}.json")
     
-    # Check if the file exists
-    if not os.path.exists(template_path):
-        logger.error(f"工作流模板不存在: {template_path}")
-        raise FileNotFoundError(f"找不到游戏类型 {game_type} 的工作流模板")
-    
     try:
-        # Read workflow definition
-        with open(template_path, 'r', encoding='utf-8') as f:
-            workflow_definition = json.load(f)
-        
-        logger.info(f"成功加载工作流模板: {game_type}")
-        return workflow_definition
+        return get_template_plan(template_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"找不到游戏类型 {game_type} 的工作流模板")
     except Exception as e:
         logger.error(f"加载工作流模板失败: {str(e)}")
         raise
 
 
+class ConnectionSender:
+    """Outbound queue of one WebSocket connection, drained by its own task
+
+Broadcasts only enqueue the serialized payload, so a slow or half-dead client never
+holds back the other connections of the session or the workflow node broadcasting.
+A connection whose queue is full or whose send exceeds the send timeout is treated
+as a slow consumer: it is closed and unregistered."""
+
+    def __init__(self, session_id: str, websocket: WebSocket,
+                 queue_size: Optional[int] = None, send_timeout: Optional[float] = None):
+        self.session_id = session_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or OUTBOUND_QUEUE_SIZE)
+        self.send_timeout = send_timeout or SEND_TIMEOUT
+        self.closed = False
+        self._task = asyncio.create_task(self._drain())
+
+    def enqueue(self, payload: str) -> bool:
+        """Queue a serialized message for sending
+
+Args:
+Payload: JSON text of the message
+
+Returns:
+Whether the message was queued"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"WebSocket发送队列已满，断开慢连接: 会话ID={self.session_id}, 连接ID={id(self.websocket)}")
+            self.evict()
+            return False
+
+    async def _drain(self) -> None:
+        """Send the queued messages in order"""
+        while True:
+            payload = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(payload), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"WebSocket发送超时，断开慢连接: 会话ID={self.session_id}, 连接ID={id(self.websocket)}")
+                self.evict()
+                return
+            except Exception as e:
+                logger.error(f"发送消息到WebSocket连接失败: {id(self.websocket)}, 错误: {str(e)}")
+                self.evict()
+                return
+
+    def evict(self) -> None:
+        """Unregister the connection and close it in the background"""
+        if self.closed:
+            return
+        self.stop()
+        _remove_connection(self.session_id, self.websocket)
+        asyncio.create_task(self._close_websocket())
+
+    def stop(self) -> None:
+        """Stop sending, queued messages are dropped"""
+        self.closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _close_websocket(self) -> None:
+        try:
+            # 1013: try again later, the client reconnects and resyncs with last_msg_id
+            await asyncio.wait_for(self.websocket.close(code=1013), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+
+def _remove_connection(session_id: str, websocket: WebSocket) -> None:
+    """Drop a connection from the session registries"""
+    if session_id in websockets:
+        websockets[session_id].discard(websocket)
+    connection_senders.pop(websocket, None)
+    connection_tokens.pop(connection_token(websocket), None)
+
+
+def connection_token(websocket: WebSocket) -> str:
+    """Routing token of a connection, unique across workers"""
+    return f"{get_session_router().worker_id}:{id(websocket)}"
+
+
+async def send_to_client(session_id: str, websocket: WebSocket, message: Dict[str, Any]) -> None:
+    """Send a message to one connection, through its outbound queue once it is registered
+
+Args:
+session_id: Session ID
+WebSocket: WebSocket connection
+Message: Message Content"""
+    sender = connection_senders.get(websocket)
+    if sender:
+        sender.enqueue(json.dumps(message, ensure_ascii=False, separators=(",", ":")))
+    else:
+        await websocket.send_json(message)
+
+
 async def register_websocket(session_id: str, websocket: WebSocket) -> None:
     """Register WebSocket Connection
 
@@ -77,25 +197,34 @@ WebSocket: WebSocket connection"""
     # Remove the old same connection first (if any).
     if websocket in websockets[session_id]:
         websockets[session_id].remove(websocket)
+        old_sender = connection_senders.pop(websocket, None)
+        if old_sender:
+            old_sender.stop()
         logger.info(f"移除会话 {session_id} 的旧WebSocket连接: {id(websocket)}")
     
+    # The session is in use again
+    expiry = session_expiry.pop(session_id, None)
+    if expiry:
+        expiry.cancel()
+
     # Add new connection
     websockets[session_id].add(websocket)
+    connection_senders[websocket] = ConnectionSender(session_id, websocket)
+    connection_tokens[connection_token(websocket)] = websocket
+    
+    # Receive the messages of the session broadcast on other workers
+    await get_session_router().subscribe(session_id, ROUTE_SUBSCRIBER, handle_routed_event)
     logger.info(f"WebSocket连接已注册: 会话ID={session_id}, 连接ID={id(websocket)}, 当前连接数={len(websockets[session_id])}")
     
     # Send a connection success confirmation message
-    try:
-        await websocket.send_json({
-            "type": "connection",
-            "status": "connected",
-            "message": "WebSocket connection established",
-            "session_id": session_id,
-            "connection_id": id(websocket),
-            "timestamp": datetime.now().isoformat()
-        })
-        logger.info(f"已发送连接确认消息到客户端: {session_id}, 连接ID={id(websocket)}")
-    except Exception as e:
-        logger.error(f"发送连接确认消息失败: {str(e)}")
+    await send_to_client(session_id, websocket, {
+        "type": "connection",
+        "status": "connected",
+        "message": "WebSocket connection established",
+        "session_id": session_id,
+        "connection_id": id(websocket),
+        "timestamp": datetime.now().isoformat()
+    })
 
 
 async def unregister_websocket(session_id: str, websocket: WebSocket) -> None:
@@ -104,24 +233,151 @@ async def unregister_websocket(session_id: str, websocket: WebSocket) -> None:
 Args:
 session_id: Session ID
 WebSocket: WebSocket connection"""
+    sender = connection_senders.get(websocket)
+    if sender:
+        sender.stop()
     if session_id in websockets and websocket in websockets[session_id]:
-        websockets[session_id].remove(websocket)
+        _remove_connection(session_id, websocket)
         logger.info(f"WebSocket连接已注销: 会话ID={session_id}")
+    
+    if websockets.get(session_id):
+        return
+    if session_id in sessions:
+        # Keep the session for a reconnect, then release it
+        if session_id not in session_expiry:
+            session_expiry[session_id] = asyncio.create_task(_expire_session(session_id))
+    else:
+        # A worker not running the session only listens while it holds connections of it
+        await get_session_router().unsubscribe(session_id, ROUTE_SUBSCRIBER)
+
+
+async def _expire_session(session_id: str) -> None:
+    """End a session that got no connection within SESSION_IDLE_TIMEOUT"""
+    await asyncio.sleep(SESSION_IDLE_TIMEOUT)
+    if session_expiry.get(session_id) is asyncio.current_task():
+        del session_expiry[session_id]
+    if not websockets.get(session_id):
+        logger.info(f"会话 {session_id} 空闲超时，释放会话")
+        await end_session(session_id)
+
+
+async def end_session(session_id: str) -> None:
+    """Drop the state of a session run by this worker and release its ownership
+
+Args:
+session_id: Session ID"""
+    expiry = session_expiry.pop(session_id, None)
+    if expiry and expiry is not asyncio.current_task():
+        expiry.cancel()
+    sessions.pop(session_id, None)
+    drop_message_log(session_id)
+    router = get_session_router()
+    await router.release_session(session_id)
+    if not websockets.get(session_id):
+        websockets.pop(session_id, None)
+        await router.unsubscribe(session_id, ROUTE_SUBSCRIBER)
+
+
+def record_message(session_id: str, message: Dict[str, Any]) -> None:
+    """Append a broadcast message to the session's message log, which keeps at least its last MESSAGE_LOG_SIZE messages
+
+Args:
+session_id: Session ID
+Message: Message Content, gets a msg_id if it has none"""
+    if not isinstance(message, dict):
+        return
+    msg_id = message.setdefault("msg_id", str(uuid.uuid4()))
+    index = message_log_index.setdefault(session_id, {})
+    if msg_id in index:
+        return
+    log = message_logs.setdefault(session_id, [])
+    start = message_log_start.setdefault(session_id, 0)
+    index[msg_id] = start + len(log)
+    log.append(message)
+
+    # Trimmed a chunk at a time, not on every message
+    if len(log) >= MESSAGE_LOG_SIZE + REPLAY_CHUNK_SIZE:
+        overflow = len(log) - MESSAGE_LOG_SIZE
+        for dropped in log[:overflow]:
+            index.pop(dropped["msg_id"], None)
+        del log[:overflow]
+        message_log_start[session_id] = start + overflow
+
+
+def drop_message_log(session_id: str) -> None:
+    """Drop the message log of a session
+
+Args:
+session_id: Session ID"""
+    message_logs.pop(session_id, None)
+    message_log_index.pop(session_id, None)
+    message_log_start.pop(session_id, None)
+
+
+def history_frames(session_id: str, last_msg_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Build the history frames of the messages broadcast after last_msg_id
+
+Each frame carries up to REPLAY_CHUNK_SIZE messages:
+{"type": "history", "session_id": ..., "messages": [...], "has_more": bool}
+
+Args:
+session_id: Session ID
+last_msg_id: msg_id of the last message the client has seen, None (or unknown, or trimmed) for the whole log
+
+Returns:
+history frames"""
+    log = message_logs.get(session_id, [])
+    start = 0
+    if last_msg_id and last_msg_id in message_log_index.get(session_id, {}):
+        start = message_log_index[session_id][last_msg_id] + 1 - message_log_start.get(session_id, 0)
+    missing = log[start:]
+
+    return [
+        {
+            "type": "history",
+            "session_id": session_id,
+            "messages": missing[offset:offset + REPLAY_CHUNK_SIZE],
+            "has_more": offset + REPLAY_CHUNK_SIZE < len(missing),
+            "timestamp": datetime.now().isoformat()
+        }
+        for offset in range(0, len(missing), REPLAY_CHUNK_SIZE)
+    ]
+
+
+async def replay_messages(session_id: str, websocket: WebSocket, last_msg_id: Optional[str] = None) -> int:
+    """Send the messages broadcast after last_msg_id in batched history frames
+
+When another worker runs the session, the frames are requested from it over the session router.
+
+Args:
+session_id: Session ID
+WebSocket: WebSocket connection
+last_msg_id: msg_id of the last message the client has seen, None (or unknown) for the whole log
+
+Returns:
+Number of messages sent"""
+    if session_id not in sessions and get_session_router().enabled:
+        await get_session_router().publish(session_id, {
+            "type": "replay",
+            "last_msg_id": last_msg_id,
+            "target": connection_token(websocket)
+        }, ROUTE_SUBSCRIBER)
+        return 0
+
+    frames = history_frames(session_id, last_msg_id)
+    for frame in frames:
+        await send_to_client(session_id, websocket, frame)
+    count = sum(len(frame["messages"]) for frame in frames)
+    logger.info(f"已向会话 {session_id} 补发 {count} 条消息")
+    return count
 
 
 async def broadcast_message(session_id: str, message: Dict[str, Any]) -> None:
-    """Broadcast messages to all WebSocket connections of the session
+    """Broadcast messages to all WebSocket connections of the session, on every worker
 
 Args:
 session_id: Session ID
 Message: Message Content"""
-    if session_id not in websockets:
-        logger.warning(f"广播消息失败: 找不到会话ID {session_id} 的WebSocket连接")
-        return
-    
-    logger.info(f"准备广播消息到会话 {session_id}, 连接数: {len(websockets[session_id])}")
-    logger.info(f"消息内容: {message}")
-    
     # Add message timestamp
     if isinstance(message, dict) and "timestamp" not in message:
         message["timestamp"] = datetime.now().isoformat()
@@ -130,28 +386,81 @@ Message: Message Content"""
     if isinstance(message, dict) and "session_id" not in message:
         message["session_id"] = session_id
     
-    # broadcast message
-    disconnected_websockets = set()
-    success_count = 0
+    deliver_message(session_id, message)
     
-    for ws in websockets[session_id]:
-        try:
-            await ws.send_json(message)
-            success_count += 1
-            logger.info(f"消息成功发送到WebSocket连接: {id(ws)}")
-        except Exception as e:
-            # Log error
-            logger.error(f"发送消息到WebSocket连接失败: {id(ws)}, 错误: {str(e)}")
-            # Mark broken connections
-            disconnected_websockets.add(ws)
+    # Connections held by other workers
+    await get_session_router().publish(session_id, {"type": "message", "message": message}, ROUTE_SUBSCRIBER)
+
+
+def deliver_message(session_id: str, message: Dict[str, Any]) -> None:
+    """Record a message and hand it to the connections of the session on this worker
+
+Args:
+session_id: Session ID
+Message: Message Content"""
+    # Record for reconnect replay, also when no client is connected. Only the worker running the session
+    # keeps a log, the other workers ask it for the history frames
+    if session_id in sessions:
+        record_message(session_id, message)
+    elif isinstance(message, dict):
+        message.setdefault("msg_id", str(uuid.uuid4()))
+    
+    if not websockets.get(session_id):
+        logger.debug(f"会话 {session_id} 在当前进程没有WebSocket连接")
+        return
+    
+    # Serialize once, every connection gets the same text frame
+    payload = json.dumps(message, ensure_ascii=False, separators=(",", ":"))
     
-    # Remove broken connections
-    for ws in disconnected_websockets:
-        if session_id in websockets and ws in websockets[session_id]:
-            websockets[session_id].remove(ws)
-            logger.info(f"已移除断开的WebSocket连接: {id(ws)}")
+    # Hand the message to the outbound queue of each connection, slow consumers are evicted there
+    queued = 0
+    for ws in list(websockets[session_id]):
+        sender = connection_senders.get(ws)
+        if sender is None:
+            sender = connection_senders[ws] = ConnectionSender(session_id, ws)
+        if sender.enqueue(payload):
+            queued += 1
     
-    logger.info(f"消息广播完成: 成功 {success_count}/{len(websockets[session_id])} 个连接, 移除 {len(disconnected_websockets)} 个断开连接")
+    logger.debug(f"消息已广播到会话 {session_id}: 入队 {queued} 个连接")
+
+
+async def handle_routed_event(session_id: str, event: Dict[str, Any]) -> None:
+    """Handle an event of a session published by another worker
+
+Args:
+session_id: Session ID
+Event: routed event"""
+    event_type = event.get("type")
+    if event_type == "message":
+        deliver_message(session_id, event["message"])
+    elif event_type == "input" and session_id in sessions:
+        # User input received by a worker not running the session
+        asyncio.create_task(_resume_routed_input(session_id, event.get("user_message", "")))
+    elif event_type == "replay" and session_id in sessions:
+        for frame in history_frames(session_id, event.get("last_msg_id")):
+            await get_session_router().publish(session_id, {
+                "type": "history",
+                "target": event.get("target"),
+                "frame": frame
+            }, ROUTE_SUBSCRIBER)
+    elif event_type == "history":
+        websocket = connection_tokens.get(event.get("target"))
+        if websocket is not None:
+            await send_to_client(session_id, websocket, event["frame"])
+
+
+async def _resume_routed_input(session_id: str, user_message: str) -> None:
+    """Run the workflow step of a user message routed from another worker"""
+    try:
+        await resume_workflow(session_id, sessions[session_id]["engine"], {"user_message": user_message})
+    except Exception as e:
+        logger.error(f"恢复工作流执行失败: {str(e)}")
+        await broadcast_message(session_id, {
+            "type": "workflow_error",
+            "message": f"处理消息失败: {str(e)}",
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        })
 
 
 def create_node_factory_for_game_type(game_type: str) -> NodeFactory:
@@ -182,61 +491,52 @@ Node Factory instance"""
     return factory
 
 
-async def create_or_get_workflow_engine(game_type: str, workflow_definition: Dict[str, Any]) -> WorkflowEngine:
-    """Create or acquire a workflow engine
+async def create_workflow_engine(game_type: str, plan: WorkflowPlan) -> WorkflowEngine:
+    """Create the workflow engine of a session
+
+The plan is shared by the sessions of the game type, the engine only holds the node
+instances and the context of the session
 
 Args:
 game_type: Game Type
-workflow_definition: Workflow Definition
+plan: Compiled workflow plan
 
 Returns:
 workflow engine instance"""
-    # Check if there is a workflow engine for this game type
-    if game_type in workflow_engines:
-        engine = workflow_engines[game_type]
-    else:
-        # Create a new workflow engine
-        node_factory = create_node_factory_for_game_type(game_type)
-        engine = WorkflowEngine(node_factory=node_factory)
-        workflow_engines[game_type] = engine
-    
-    # Make sure start_node is set
-    start_node = workflow_definition.get("start_node")
-    logger.info(f"工作流定义中的起始节点: {start_node}")
-    
-    # Load workflow definition
-    engine.load_workflow(workflow_definition)
-    
-    # If start_node_id is not set, set it
-    if not engine.start_node and start_node:
-        engine.start_node = start_node
-        logger.info(f"显式设置工作流起始节点: {start_node}")
-    
-    return engine
+    node_factory = create_node_factory_for_game_type(game_type)
+    return WorkflowEngine.from_plan(plan, node_factory=node_factory)
 
 
-async def create_session(game_type: str, initial_context: Dict[str, Any]) -> str:
+async def create_session(game_type: str, initial_context: Dict[str, Any],
+                         session_id: Optional[str] = None) -> Optional[str]:
     """Create a new session
 
 Args:
 game_type: Game Type
 initial_context: Initial Context
+session_id: Session ID provided by the client, generated when empty
 
 Returns:
-Session ID"""
+Session ID, None if another worker claimed the session first"""
     # Generate session ID
-    session_id = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
     
-    # Load workflow definition
-    workflow_definition = await load_workflow_template(game_type)
+    # This worker runs the session, it handles the input and replay requests routed from other workers
+    router = get_session_router()
+    if not await router.claim_session(session_id):
+        logger.info(f"会话 {session_id} 已由其他进程创建")
+        return None
+    
+    # Load the compiled workflow
+    plan = await load_workflow_plan(game_type)
     
     # Create a workflow engine
-    engine = await create_or_get_workflow_engine(game_type, workflow_definition)
+    engine = await create_workflow_engine(game_type, plan)
     
     # Create a session
     sessions[session_id] = {
         "game_type": game_type,
-        "workflow_id": workflow_definition.get("id", ""),
+        "workflow_id": plan.workflow_id,
         "context": initial_context,
         "created_at": datetime.now().isoformat(),
         "updated_at": datetime.now().isoformat(),
@@ -245,7 +545,9 @@ Session ID"""
     }
     
     # Initializing the WebSocket Collection
-    websockets[session_id] = set()
+    websockets.setdefault(session_id, set())
+    
+    await router.subscribe(session_id, ROUTE_SUBSCRIBER, handle_routed_event)
     
     logger.info(f"创建新会话: ID={session_id}, 游戏类型={game_type}")
     return session_id
@@ -320,7 +622,8 @@ async def workflow_websocket_endpoint(
 
 1. client side connection can provide session_id
 2. If session_id does not exist, create a new workflow session
-3. If session_id exists, restore the existing session
+3. If session_id exists, restore the existing session, the client sends the msg_id of the last
+   message it has seen as last_msg_id and receives the missing tail in history frames
 4. The message sent by the client side will be automatically passed to the workflow processing
 
 Args:
@@ -377,10 +680,39 @@ DB: database session"""
             "websockets": websockets
         }
         
+        # Check whether another worker runs the session
+        router = get_session_router()
+        owner = None
+        if session_id and session_id not in sessions:
+            owner = await router.get_owner(session_id)
+            if owner == router.worker_id:
+                owner = None
+        
+        new_session_id = None
+        if not owner and (not session_id or session_id not in sessions):
+            # Create a new session, another worker may claim the same session_id first
+            new_session_id = await create_session(game_type, initial_context, session_id)
+            if new_session_id is None:
+                owner = await router.get_owner(session_id)
+        
         # Check if there is an existing session
-        if not session_id or session_id not in sessions:
-            # Create a new session
-            new_session_id = await create_session(game_type, initial_context)
+        if owner:
+            # The workflow runs on another worker, this one only holds the connection
+            logger.info(f"会话 {session_id} 由进程 {owner} 执行，通过会话路由转发")
+            await websocket.send_json({
+                "type": "session_connected",
+                "session_id": session_id,
+                "message": "Connected to an existing session",
+                "timestamp": datetime.now().isoformat()
+            })
+            await register_websocket(session_id, websocket)
+            await replay_messages(session_id, websocket, init_data.get("last_msg_id"))
+            await broadcast_message(session_id, {
+                "type": "client_connected",
+                "message": "New client side connected",
+                "timestamp": datetime.now().isoformat()
+            })
+        elif new_session_id:
             if not session_id:
                 session_id = new_session_id
                 logger.info(f"创建新会话: ID={session_id}")
@@ -420,13 +752,13 @@ DB: database session"""
                 logger.error(traceback.format_exc())
                 
                 # Notify client side workflow execution failed
-                await websocket.send_json({
+                await send_to_client(session_id, websocket, {
                     "type": "workflow_error",
                     "message": f"工作流执行失败: {str(e)}",
                     "session_id": session_id,
                     "timestamp": datetime.now().isoformat()
                 })
-        else:
+        elif session_id in sessions:
             # Use an existing session
             logger.info(f"使用现有会话: ID={session_id}")
             
@@ -441,6 +773,9 @@ DB: database session"""
             # Register WebSocket Connection
             await register_websocket(session_id, websocket)
             
+            # Send the messages broadcast while the client was away
+            await replay_messages(session_id, websocket, init_data.get("last_msg_id"))
+            
             # Update session state
             sessions[session_id]["updated_at"] = datetime.now().isoformat()
             
@@ -452,6 +787,9 @@ DB: database session"""
                     "timestamp": datetime.now().isoformat()
                 })
         
+        else:
+            raise RuntimeError(f"会话 {session_id} 不可用")
+        
         # Keep receiving messages
         try:
             while True:
@@ -502,17 +840,35 @@ DB: database session"""
                     logger.info(f"创建恢复上下文: user_message='{resume_context.get('user_message')}'")
                     
                     try:
-                        # Get workflow engine
-                        engine = sessions[session_id]["engine"]
-                        
                         # Send message processing acknowledgment
-                        await websocket.send_json({
+                        await send_to_client(session_id, websocket, {
                             "type": "message_processing",
                             "message": "Your message is being processed.",
                             "content": message_content,
                             "timestamp": datetime.now().isoformat()
                         })
                         
+                        if session_id in sessions and not router.owns(session_id) \
+                                and not await router.claim_session(session_id):
+                            # The ownership expired and another worker took the session over
+                            logger.warning(f"会话 {session_id} 已由其他进程接管")
+                            await end_session(session_id)
+                        
+                        if session_id not in sessions:
+                            # Route the message to the worker running the session, its owner lease is
+                            # renewed by its heartbeat and lapses when that worker stops
+                            owner = await router.get_owner(session_id)
+                            if owner is None or owner == router.worker_id:
+                                raise RuntimeError("会话所在的工作进程不可用")
+                            await router.publish(session_id, {
+                                "type": "input",
+                                "user_message": message_content
+                            }, ROUTE_SUBSCRIBER)
+                            continue
+                        
+                        # Get workflow engine
+                        engine = sessions[session_id]["engine"]
+                        
                         # Resume workflow execution
                         logger.info(f"恢复会话 {session_id} 的工作流执行")
                         await resume_workflow(session_id, engine, resume_context)
@@ -522,7 +878,7 @@ DB: database session"""
                         logger.error(traceback.format_exc())
                         
                         # Notify client side workflow execution failed
-                        await websocket.send_json({
+                        await send_to_client(session_id, websocket, {
                             "type": "workflow_error",
                             "message": f"处理消息失败: {str(e)}",
                             "session_id": session_id,
@@ -535,7 +891,7 @@ DB: database session"""
                     
                     # Notify client side message processing failed
                     try:
-                        await websocket.send_json({
+                        await send_to_client(session_id, websocket, {
                             "type": "error",
                             "message": f"处理消息失败: {str(e)}",
                             "timestamp": datetime.now().isoformat()
@@ -635,6 +991,9 @@ Updated context data"""
                     logger.info(f"会话 {session_id} 状态已更新为已完成")
             except Exception as e:
                 logger.error(f"发送工作流完成消息失败: {str(e)}")
+            
+            # The session ended, release it
+            await end_session(session_id)
         
         # Update session context - preserves workflow state, but clears processed user messages
         if session_id in sessions:
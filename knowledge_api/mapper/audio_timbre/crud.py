@@ -1,5 +1,6 @@
 from sqlmodel import Session, select
-from typing import Optional, List, Dict, Any
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 
 from knowledge_api.mapper.base_crud import BaseCRUD
@@ -19,7 +20,7 @@ Inherited from BaseCRUD, the following methods are automatically provided:
 - filter_paginated: Paging Filter Tones
 - count: get total number of sounds"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Union[Session, AsyncSession]):
         """Initialize tone CRUD operation"""
         super().__init__(db, AudioTimbre)
 
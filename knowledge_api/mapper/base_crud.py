@@ -1,11 +1,17 @@
 """Generic CRUD operation base class
 
 This base class provides general database CRUD manipulation capabilities, supporting different models and schema types.
-Subclasses simply inherit from this class and specify the corresponding model and schema types to obtain the underlying CRUD functionality."""
+Subclasses simply inherit from this class and specify the corresponding model and schema types to obtain the underlying CRUD functionality.
+
+The CRUD accepts either a synchronous Session (get_session) or an AsyncSession
+(get_async_session). Subclasses should go through the _exec/_commit/_refresh/_delete
+helpers instead of calling self.db directly, so the same method works on both and
+does not block the event loop when an AsyncSession is used."""
 from typing import Generic, TypeVar, Type, List, Optional, Union, Dict, Any
 from datetime import datetime
 from sqlmodel import Session, select, desc, func
-from fastapi_pagination.ext.sqlmodel import paginate
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi_pagination.ext.sqlmodel import paginate, apaginate
 from fastapi_pagination import Page
 from pydantic import BaseModel
 from sqlmodel import SQLModel
@@ -34,14 +40,54 @@ FilterSchemaType: The schema type of the filter condition
 ResponseSchemaType: The schema type of the response data
 IdType: ID type (int or str)"""
     
-    def __init__(self, db: Session, model: Type[ModelType]):
+    def __init__(self, db: Union[Session, AsyncSession], model: Type[ModelType]):
         """Initialize CRUD operation
 
 Args:
-DB: database session
+DB: database session, synchronous Session or AsyncSession
 Model: Model class for operation"""
         self.db = db
         self.model = model
+        self.is_async = isinstance(db, AsyncSession)
+
+    async def _exec(self, statement):
+        """Execute a statement on either session type
+
+Args:
+Statement: select/update/delete statement or text query
+
+Returns:
+Result of Session.exec"""
+        if self.is_async:
+            return await self.db.exec(statement)
+        return self.db.exec(statement)
+
+    async def _commit(self) -> None:
+        """Commit the current transaction"""
+        if self.is_async:
+            await self.db.commit()
+        else:
+            self.db.commit()
+
+    async def _refresh(self, db_obj: ModelType) -> None:
+        """Reload the attributes of an object from the database"""
+        if self.is_async:
+            await self.db.refresh(db_obj)
+        else:
+            self.db.refresh(db_obj)
+
+    async def _delete(self, db_obj: ModelType) -> None:
+        """Mark an object for deletion"""
+        if self.is_async:
+            await self.db.delete(db_obj)
+        else:
+            self.db.delete(db_obj)
+
+    async def _paginate(self, query) -> Page:
+        """Paginate a query with the pagination helper matching the session type"""
+        if self.is_async:
+            return await apaginate(self.db, query)
+        return paginate(self.db, query)
     
     async def create(self, obj_in: CreateSchemaType, **kwargs) -> ModelType:
         """Create a new record
@@ -64,8 +110,8 @@ ModelType: Created record"""
         
         # Add to database and submit
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        await self._commit()
+        await self._refresh(db_obj)
         return db_obj
     
     async def get_by_id(self, id: IdType) -> Optional[ModelType]:
@@ -77,7 +123,7 @@ ID: record ID
 Returns:
 Optional [ModelType]: Record found or None"""
         statement = select(self.model).where(self.model.id == id)
-        result = self.db.exec(statement).first()
+        result = (await self._exec(statement)).first()
         return result
     
     async def get_all(self, 
@@ -120,7 +166,7 @@ List [ModelType]: List of records"""
             statement = statement.order_by(desc(self.model.created_at))
             
         # Execute Query
-        results = self.db.exec(statement).all()
+        results = (await self._exec(statement)).all()
         return results
     
     async def get_all_paginated(self, 
@@ -155,7 +201,7 @@ Page: paging records"""
         elif hasattr(self.model, 'created_at'):
             query = query.order_by(desc(self.model.created_at))
             
-        return paginate(self.db, query)
+        return await self._paginate(query)
     
     async def update(self, id: IdType, obj_in: UpdateSchemaType) -> Optional[ModelType]:
         """update record
@@ -185,8 +231,8 @@ Optional [ModelType]: Updated Record or None"""
             
         # commit changes
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        await self._commit()
+        await self._refresh(db_obj)
         return db_obj
     
     async def delete(self, id: IdType) -> bool:
@@ -201,8 +247,8 @@ Bool: successfully deleted"""
         if db_obj is None:
             return False
             
-        self.db.delete(db_obj)
-        self.db.commit()
+        await self._delete(db_obj)
+        await self._commit()
         return True
     
     async def filter(self, filters: Union[FilterSchemaType, Dict[str, Any]], skip: int = 0, limit: int = 100) -> List[ModelType]:
@@ -236,7 +282,7 @@ List [ModelType]: List of filtered records"""
         elif hasattr(self.model, 'created_at'):
             query = query.order_by(desc(self.model.created_at))
             
-        results = self.db.exec(query).all()
+        results = (await self._exec(query)).all()
         return results
     
     async def filter_paginated(self, filters: Union[FilterSchemaType, Dict[str, Any]]) -> Page:
@@ -265,7 +311,7 @@ Page: Page filtered records"""
         elif hasattr(self.model, 'created_at'):
             query = query.order_by(desc(self.model.created_at))
             
-        return paginate(self.db, query)
+        return await self._paginate(query)
     
     def _apply_filters(self, query, filter_data: Dict[str, Any]):
         """Apply Filter Criteria to Queries
@@ -317,5 +363,5 @@ Int: Total number of records"""
                 if value is not None and hasattr(self.model, field):
                     statement = statement.where(getattr(self.model, field) == value)
                     
-        result = self.db.exec(statement).one()
-        return result[0] 
\ No newline at end of file
+        result = (await self._exec(statement)).one()
+        return result[0] if isinstance(result, tuple) else result 
\ No newline at end of file
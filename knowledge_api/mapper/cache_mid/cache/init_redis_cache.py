@@ -1,16 +1,25 @@
 """Redis cache initialization module
 Provides the ability to migrate applications from in-memory cache to Redis cache"""
+import asyncio
+import functools
 import os
-from typing import Dict
+from typing import Callable, Dict
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
+from knowledge_api.framework.ai_collect.usage_writer import get_usage_writer
+from knowledge_api.framework.memory.conversation_summarizer import (SUMMARY_INTERVAL, ConversationSummarizer,
+                                                                    set_conversation_summarizer)
+from knowledge_api.framework.memory.summary_scheduler import get_summary_scheduler
 from knowledge_api.framework.redis.cache_manager import RedisCacheManager
 from knowledge_api.framework.redis.config import get_redis_config
 from knowledge_api.framework.redis.connection import get_async_redis
+from knowledge_api.framework.redis.session_router import get_session_router
+from knowledge_api.framework.tts.tts_service import close_http_client
+from knowledge_api.framework.warmup import WarmupOrchestrator, get_warmup_orchestrator
 from knowledge_api.mapper.character_prompt_config.crud import CharacterPromptConfigCRUD
-from knowledge_api.framework.database.database import get_session
+from knowledge_api.framework.database.database import get_session, dispose_async_engine
 from knowledge_api.mapper.llm_model_config import LLMModelConfigCRUD
 from knowledge_api.mapper.llm_provider_config.crud import LLMProviderConfigCRUD
 from knowledge_api.mapper.roles.crud import RoleCRUD
@@ -47,85 +56,47 @@ App: FastAPI Application Example"""
     # Initialize Snowflake Algorithm ID Generator
     init_snowflake(machine_id=machine_id)
 
-    logger.info("Initializing vector model and Redis cache...")
-    # Initialize the vector model
-    from knowledge_api.config import EMBEDDING_MODEL_DEVICE
-    HuggingFaceEmbeddings.get_instance("./model/models--BAAI--bge-small-zh-v1.5",
-                                     EMBEDDING_MODEL_DEVICE)
-    logger.info("The vector model was successfully initialized, initializing the Redis cache....")
-    
-    # Initialize the sorting model
-    try:
-        logger.info("Initializing text sorting model...")
-        TextRankingModel.initialize(r"./model/model_ranking_chinese_tiny")
-        logger.info(f"文本排序模型初始化成功，使用模型路径: {TextRankingModel.get_model_id()}")
-    except Exception as e:
-        logger.error(f"初始化文本排序模型失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
-    
-    # Operation at startup
-    db = next(get_session())
-    try:
-        # Initialize individual services and CRUD instances
-        character_prompt_crud = CharacterPromptConfigCRUD(db)
-        system_config_service = SystemConfigCRUD(db)
-        llm_provider_crud = LLMProviderConfigCRUD(db)
-        llm_model_config_crud = LLMModelConfigCRUD(db)
-        role_crud = RoleCRUD(db)
-
-        # Load Redis cache configuration from configuration file
-        redis_config = get_redis_config()
-        
-        # Check if the Redis connection is available
-        await check_redis_connection()
+    # Warm models, caches and RAG services in the background, /ready reports when the critical ones are loaded
+    orchestrator = get_warmup_orchestrator()
+    register_warmup_components(orchestrator)
+    orchestrator.start()
 
-        # Directly use the cache configuration defined in the code
-        redis_cache_manager.set_cache_config(CACHE_CONFIG)
+    yield  # This is where the app runs.
 
-        # Load the system configuration first, as other functions may depend on the system configuration
-        await redis_cache_manager.load_system_configs(system_config_service)
+    # Operation on shutdown
+    try:
+        await orchestrator.close()
+    except Exception as e:
+        logger.error(f"停止启动预热时出错: {e}")
 
-        # Load other cached data
-        if CACHE_CONFIG["enable_character_prompt_cache"]:
-            await redis_cache_manager.load_character_prompts(character_prompt_crud)
-            
-        if CACHE_CONFIG["enable_llm_provider_cache"]:
-            await redis_cache_manager.load_llm_providers(llm_provider_crud)
-            
-        if CACHE_CONFIG["enable_model_config_cache"]:
-            await redis_cache_manager.load_model_configs(llm_model_config_crud)
+    # Queued summaries are dropped, the sessions ask for them again on their next rounds
+    try:
+        set_conversation_summarizer(None)
+        await get_summary_scheduler().close()
+    except Exception as e:
+        logger.error(f"停止对话总结服务时出错: {e}")
 
-        if CACHE_CONFIG["enable_role_config_cache"]:
-            await redis_cache_manager.load_role_configs(role_crud)
-        
-        # Initialize default model configuration
-        default_model_id = await redis_cache_manager.system_config_cache.get_value("DEFAULT_LLM_MODEL")
-        if default_model_id:
-            # Create an LLM instance
-            llm = await redis_cache_manager.get_ai_by_model_id(default_model_id)
-            if llm:
-                logger.info(f"默认模型 {default_model_id} 链接创建成功")
-            else:
-                logger.error(f"创建默认模型 {default_model_id} 链接失败")
-        else:
-            logger.warning("Default LLM model not configured")
+    # Flush pending LLM usage records before the process exits
+    try:
+        get_usage_writer().stop()
+    except Exception as e:
+        logger.error(f"关闭LLM使用记录写入器时出错: {e}")
 
-        # Record the initialization completion information
-        logger.info(f"Redis缓存初始化完成，配置状态: {CACHE_CONFIG}")
-        logger.info(f"Redis连接信息: {redis_config.HOST}:{redis_config.PORT} (DB: {redis_config.DB})")
-        
+    try:
+        await dispose_async_engine()
     except Exception as e:
-        import traceback
-        traceback.print_exc()  # Print detailed error information
-        logger.error(f"Redis缓存初始化失败: {str(e)}")
+        logger.error(f"关闭异步数据库连接池时出错: {e}")
 
-    finally:
-        db.close()
+    try:
+        await close_http_client()
+    except Exception as e:
+        logger.error(f"关闭TTS连接池时出错: {e}")
 
-    yield  # This is where the app runs.
+    try:
+        await get_session_router().close()
+    except Exception as e:
+        logger.error(f"关闭WebSocket会话路由时出错: {e}")
 
-    # Operation on shutdown
     logger.info("Closing Redis connection...")
     
     # In a distributed environment, simply close local connections and LLM instances without clearing cached data
@@ -137,6 +108,99 @@ App: FastAPI Application Example"""
         logger.error(f"关闭Redis连接时出错: {e}")
 
 
+def register_warmup_components(orchestrator: WarmupOrchestrator) -> None:
+    """Declare the components warmed at startup and their dependencies
+
+Independent components load in parallel. Critical ones gate /ready: Redis and the configuration caches,
+the vector model and the RAG services of the first chat. The sorting model and the default LLM link are
+warmed after them, chats fall back to the unsorted recall and create the link on first use. The chat
+summarizer starts once the default LLM link is ready, sessions are not summarized before
+
+Args:
+Orchestrator: Warmup orchestrator"""
+    if orchestrator.components:
+        return
+
+    async def load_cache(loader: Callable, crud_class: type) -> None:
+        db = next(get_session())
+        try:
+            await loader(crud_class(db))
+        finally:
+            db.close()
+
+    async def warm_redis() -> None:
+        await check_redis_connection()
+        redis_cache_manager.set_cache_config(CACHE_CONFIG)
+        redis_config = get_redis_config()
+        logger.info(f"Redis连接信息: {redis_config.HOST}:{redis_config.PORT} (DB: {redis_config.DB})")
+
+    async def warm_default_llm() -> None:
+        default_model_id = await redis_cache_manager.system_config_cache.get_value("DEFAULT_LLM_MODEL")
+        if not default_model_id:
+            logger.warning("Default LLM model not configured")
+            return
+        # Create an LLM instance
+        if not await redis_cache_manager.get_ai_by_model_id(default_model_id):
+            raise RuntimeError(f"创建默认模型 {default_model_id} 链接失败")
+        logger.info(f"默认模型 {default_model_id} 链接创建成功")
+
+    def warm_embedding_model() -> None:
+        from knowledge_api.config import EMBEDDING_MODEL_DEVICE
+        embeddings = HuggingFaceEmbeddings.get_instance("./model/models--BAAI--bge-small-zh-v1.5",
+                                                        EMBEDDING_MODEL_DEVICE)
+        # The first inference is much slower than the following ones
+        embeddings.embed_query("预热")
+
+    async def start_summarizer() -> None:
+        llm = await redis_cache_manager.get_ai()
+        if llm is None:
+            raise RuntimeError("默认模型不可用，对话总结未启用")
+        set_conversation_summarizer(ConversationSummarizer(llm=llm, summary_interval=SUMMARY_INTERVAL))
+        logger.info(f"对话总结服务已启用，每 {SUMMARY_INTERVAL} 轮对话总结一次")
+
+    def create_usage_rollup_table() -> None:
+        from knowledge_api.framework.database.database import get_engine
+        from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD
+        if LLMUsageRollupCRUD.create_table(get_engine()):
+            logger.info("LLM使用汇总表已创建，并已从原始记录回填")
+
+    def create_session_summary_table() -> None:
+        from knowledge_api.framework.database.database import get_engine
+        from knowledge_api.mapper.chat_session_summary.crud import ChatSessionSummaryCRUD
+        ChatSessionSummaryCRUD.create_table(get_engine())
+
+    def warm_ranking_model() -> None:
+        TextRankingModel.initialize(r"./model/model_ranking_chinese_tiny")
+        TextRankingModel.rank({"source_sentence": ["预热"], "sentences_to_compare": ["预热"]})
+        logger.info(f"文本排序模型初始化成功，使用模型路径: {TextRankingModel.get_model_id()}")
+
+    async def warm_rag_services() -> None:
+        from knowledge_api.manage.game_knowledge.services.rag_manager import RAGManager
+        rag_manager = RAGManager()
+        await asyncio.gather(rag_manager.get_service("role"), rag_manager.get_service("world"))
+
+    orchestrator.register("redis", warm_redis)
+    # Load the system configuration first, as other functions may depend on the system configuration
+    orchestrator.register("system_config",
+                          functools.partial(load_cache, redis_cache_manager.load_system_configs, SystemConfigCRUD),
+                          depends_on=["redis"])
+    for name, loader, crud_class in (
+            ("character_prompts", redis_cache_manager.load_character_prompts, CharacterPromptConfigCRUD),
+            ("llm_providers", redis_cache_manager.load_llm_providers, LLMProviderConfigCRUD),
+            ("model_configs", redis_cache_manager.load_model_configs, LLMModelConfigCRUD),
+            ("role_configs", redis_cache_manager.load_role_configs, RoleCRUD),
+    ):
+        orchestrator.register(name, functools.partial(load_cache, loader, crud_class), depends_on=["system_config"])
+    orchestrator.register("default_llm", warm_default_llm, depends_on=["llm_providers", "model_configs"],
+                          critical=False)
+    orchestrator.register("summarizer", start_summarizer, depends_on=["default_llm"], critical=False)
+    orchestrator.register("llm_usage_rollups", create_usage_rollup_table, critical=False)
+    orchestrator.register("chat_session_summaries", create_session_summary_table, critical=False)
+    orchestrator.register("embedding_model", warm_embedding_model)
+    orchestrator.register("ranking_model", warm_ranking_model, critical=False)
+    orchestrator.register("rag_services", warm_rag_services, depends_on=["embedding_model", "system_config"])
+
+
 async def check_redis_connection():
     """Check if the Redis connection is available
 
@@ -1,6 +1,7 @@
 """Card CRUD operation"""
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from sqlmodel import Session, select, and_, text
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi_pagination import Page
 
 from knowledge_api.mapper.base_crud import BaseCRUD
@@ -15,7 +16,7 @@ from knowledge_api.mapper.card.base import (
 class CardCRUD(BaseCRUD[Card, CardCreate, CardUpdate, CardFilter, CardResponse, int]):
     """Card CRUD operation class"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Union[Session, AsyncSession]):
         """Initialize CRUD operation"""
         super().__init__(db, Card)
     
@@ -58,8 +59,8 @@ Optional [Card]: Updated Card"""
         
         # commit changes
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        await self._commit()
+        await self._refresh(db_obj)
         return db_obj
     
     async def get_by_id(self, id: int) -> Optional[Card]:
@@ -73,7 +74,7 @@ Optional [Card]: Card or None"""
         statement = select(self.model).where(
             and_(self.model.id == id, self.model.is_deleted == 0)
         )
-        result = self.db.exec(statement).first()
+        result = (await self._exec(statement)).first()
         return result
     
     async def get_by_series_id(self, series_id: int, skip: int = 0, limit: int = 100) -> List[Card]:
@@ -90,7 +91,7 @@ List [Cards]: Card List"""
             and_(self.model.series_id == series_id, self.model.is_deleted == 0)
         ).order_by(self.model.sort_order, self.model.rarity.desc(), self.model.create_time.desc()).offset(skip).limit(limit)
         
-        results = self.db.exec(statement).all()
+        results = (await self._exec(statement)).all()
         return results
     
     async def get_series_cards_with_user_unlock_status(self, series_id: int, user_id: int, limit: int = 999) -> List[Dict[str, Any]]:
@@ -124,11 +125,11 @@ List [Dict [str, Any]]: A list of cards, each containing is_unlocked fields"""
             LIMIT :limit
         """)
         
-        results = self.db.exec(query.bindparams(
+        results = (await self._exec(query.bindparams(
             series_id=series_id,
             user_id=user_id,
             limit=limit
-        )).all()
+        ))).all()
         
         # Convert the result to a dictionary list
         cards_with_status = []
@@ -190,7 +191,7 @@ List [Cards]: Card List"""
             and_(self.model.rarity == rarity, self.model.is_deleted == 0, self.model.status == 1)
         ).order_by(self.model.sort_order, self.model.create_time.desc()).offset(skip).limit(limit)
         
-        results = self.db.exec(statement).all()
+        results = (await self._exec(statement)).all()
         return results
     
     async def get_by_role_id(self, role_id: str, skip: int = 0, limit: int = 100) -> List[Card]:
@@ -207,7 +208,7 @@ List [Cards]: Card List"""
             and_(self.model.role_id == role_id, self.model.is_deleted == 0)
         ).order_by(self.model.sort_order, self.model.rarity.desc()).offset(skip).limit(limit)
         
-        results = self.db.exec(statement).all()
+        results = (await self._exec(statement)).all()
         return results
     
     async def get_limited_cards(self, skip: int = 0, limit: int = 100) -> List[Card]:
@@ -223,7 +224,7 @@ List [Cards]: Limited Card List"""
             and_(self.model.is_limited == 1, self.model.is_deleted == 0, self.model.status == 1)
         ).order_by(self.model.rarity.desc(), self.model.create_time.desc()).offset(skip).limit(limit)
         
-        results = self.db.exec(statement).all()
+        results = (await self._exec(statement)).all()
         return results
     
     async def soft_delete(self, id: int, updater_id: Optional[int] = None) -> bool:
@@ -244,7 +245,7 @@ Bool: whether the deletion was successful"""
             db_obj.updater_id = updater_id
             
         self.db.add(db_obj)
-        self.db.commit()
+        await self._commit()
         return True
     
     async def count_by_series(self, series_id: int) -> int:
@@ -259,7 +260,7 @@ Int: Number of cards"""
         statement = select(func.count()).select_from(self.model).where(
             and_(self.model.series_id == series_id, self.model.is_deleted == 0)
         )
-        result = self.db.exec(statement).one()
+        result = (await self._exec(statement)).one()
         return result[0] if isinstance(result, tuple) else result
     
     def _apply_filters(self, query, filter_data: Dict[str, Any]):
@@ -1,6 +1,7 @@
 """Card series CRUD operation"""
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from sqlmodel import Session, select, and_
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi_pagination import Page
 
 from knowledge_api.mapper.base_crud import BaseCRUD
@@ -15,7 +16,7 @@ from knowledge_api.mapper.card_series.base import (
 class CardSeriesCRUD(BaseCRUD[CardSeries, CardSeriesCreate, CardSeriesUpdate, CardSeriesFilter, CardSeriesResponse, int]):
     """Card series CRUD operation class"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Union[Session, AsyncSession]):
         """Initialize CRUD operation"""
         super().__init__(db, CardSeries)
     
@@ -58,8 +59,8 @@ Optional [CardSeries]: Updated Card Series"""
         
         # commit changes
         self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        await self._commit()
+        await self._refresh(db_obj)
         return db_obj
     
     async def get_by_id(self, id: int) -> Optional[CardSeries]:
@@ -73,7 +74,7 @@ Optional [CardSeries]: Card Series or None"""
         statement = select(self.model).where(
             and_(self.model.id == id, self.model.is_deleted == 0)
         )
-        result = self.db.exec(statement).first()
+        result = (await self._exec(statement)).first()
         return result
     
     async def get_by_code(self, code: str) -> Optional[CardSeries]:
@@ -87,7 +88,7 @@ Optional [CardSeries]: Card Series or None"""
         statement = select(self.model).where(
             and_(self.model.code == code, self.model.is_deleted == 0)
         )
-        result = self.db.exec(statement).first()
+        result = (await self._exec(statement)).first()
         return result
     
     async def get_active_series(self, skip: int = 0, limit: int = 100) -> List[CardSeries]:
@@ -103,7 +104,7 @@ List [CardSeries]: Series List"""
             and_(self.model.status == 1, self.model.is_deleted == 0)
         ).order_by(self.model.sort_order, self.model.create_time.desc()).offset(skip).limit(limit)
         
-        results = self.db.exec(statement).all()
+        results = (await self._exec(statement)).all()
         return results
     
     async def soft_delete(self, id: int, updater_id: Optional[int] = None) -> bool:
@@ -124,7 +125,7 @@ Bool: whether the deletion was successful"""
             db_obj.updater_id = updater_id
             
         self.db.add(db_obj)
-        self.db.commit()
+        await self._commit()
         return True
     
     def _apply_filters(self, query, filter_data: Dict[str, Any]):
@@ -21,19 +21,20 @@ ID: Session ID
 Returns:
 Optional [ChatSession]: Found Session or None"""
         statement = select(self.model).where(self.model.session_id == id)
-        result = self.db.exec(statement).first()
+        result = (await self._exec(statement)).first()
         return result
 
-    async def create(self, session: SessionCreate) -> ChatSession:
+    async def create(self, session: SessionCreate, session_id: Optional[str] = None) -> ChatSession:
         """Create a session, add a session ID
 
 Args:
 Session: session creation model
+session_id: Session ID, a UUID if None
 
 Returns:
 ChatSession: Created session"""
         # Use UUID as session ID
-        return await super().create(session, session_id=str(uuid.uuid4()))
+        return await super().create(session, session_id=session_id or str(uuid.uuid4()))
 
     async def get_by_user_id(self, user_id: str, skip: int = 0, limit: int = 100) -> List[ChatSession]:
         """Get all sessions of the user
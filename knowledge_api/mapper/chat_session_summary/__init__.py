@@ -0,0 +1,18 @@
+"""Chat session summary data models and operations
+
+This module contains:
+- ChatSessionSummary: database model
+- ChatSessionSummaryResponse: responsive model
+- ChatSessionSummaryCRUD: Database operation class"""
+
+from knowledge_api.mapper.chat_session_summary.base import (
+    ChatSessionSummary,
+    ChatSessionSummaryResponse
+)
+from knowledge_api.mapper.chat_session_summary.crud import ChatSessionSummaryCRUD
+
+__all__ = [
+    "ChatSessionSummary",
+    "ChatSessionSummaryResponse",
+    "ChatSessionSummaryCRUD"
+]
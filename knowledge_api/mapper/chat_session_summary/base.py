@@ -0,0 +1,30 @@
+"""Chat session summary data model definition
+
+Rolling summary written by the conversation summarizer, kept apart from the
+session_summary of llm_chat_sessions, which is the introduction edited by the administrators."""
+
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class ChatSessionSummaryBase(SQLModel):
+    """chat session summary base model"""
+    summary: str = Field(..., description="Summary of the earlier rounds of the session")
+    summarized_rounds: int = Field(default=0, description="Number of rounds (user message + reply) covered by the summary")
+
+
+class ChatSessionSummary(ChatSessionSummaryBase, table=True):
+    """database model"""
+    __tablename__ = "llm_chat_session_summaries"
+
+    session_id: str = Field(primary_key=True, max_length=64, description="Session ID")
+    updated_at: datetime = Field(default_factory=datetime.now, description="update time")
+
+
+class ChatSessionSummaryResponse(ChatSessionSummaryBase):
+    """response model"""
+    session_id: str
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
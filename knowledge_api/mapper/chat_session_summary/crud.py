@@ -0,0 +1,65 @@
+"""Chat session summary database operations
+
+The llm_chat_session_summaries table is created on startup (create_table) when it does not exist,
+existing sessions get their row with their next summary."""
+
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from sqlmodel import Session, select
+
+from knowledge_api.mapper.base_crud import BaseCRUD
+from knowledge_api.mapper.chat_session_summary.base import ChatSessionSummary, ChatSessionSummaryResponse
+
+
+class ChatSessionSummaryCRUD(BaseCRUD[ChatSessionSummary, ChatSessionSummaryResponse, ChatSessionSummaryResponse, Dict[str, Any], ChatSessionSummaryResponse, str]):
+    """Chat session summary CRUD operations"""
+
+    def __init__(self, db: Session):
+        """Initialize the chat session summary CRUD operations"""
+        super().__init__(db, ChatSessionSummary)
+
+    @staticmethod
+    def create_table(engine) -> None:
+        """Create the llm_chat_session_summaries table when it does not exist
+
+Args:
+Engine: synchronous database engine"""
+        ChatSessionSummary.__table__.create(engine, checkfirst=True)
+
+    async def get_by_id(self, id: str) -> Optional[ChatSessionSummary]:
+        """Get the summary of a session
+
+Args:
+ID: Session ID
+
+Returns:
+Optional [ChatSessionSummary]: summary or None if the session has not been summarized"""
+        statement = select(ChatSessionSummary).where(ChatSessionSummary.session_id == id)
+        return (await self._exec(statement)).first()
+
+    async def save(self, session_id: str, summary: str, summarized_rounds: int) -> Optional[ChatSessionSummary]:
+        """Store the summary of a session unless a summary covering more rounds is already stored
+
+Summaries of one session can be written by several workers, the one covering the most rounds is kept.
+
+Args:
+session_id: Session ID
+Summary: summary text
+summarized_rounds: number of rounds covered by the summary
+
+Returns:
+Optional [ChatSessionSummary]: stored summary, None if a newer one was already stored"""
+        db_obj = await self.get_by_id(session_id)
+        if db_obj is None:
+            db_obj = ChatSessionSummary(session_id=session_id, summary=summary, summarized_rounds=summarized_rounds)
+        elif db_obj.summarized_rounds > summarized_rounds:
+            return None
+        else:
+            db_obj.summary = summary
+            db_obj.summarized_rounds = summarized_rounds
+            db_obj.updated_at = datetime.now()
+        self.db.add(db_obj)
+        await self._commit()
+        await self._refresh(db_obj)
+        return db_obj
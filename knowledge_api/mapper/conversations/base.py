@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, Literal
-from sqlmodel import SQLModel, Field, JSON
+from sqlmodel import SQLModel, Field, JSON, Index
 
 
 class ConversationBase(SQLModel):
@@ -27,6 +27,11 @@ class Conversation(ConversationBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.now, description="creation time")
 
+    # Serves the tail of a session (last turns) without reading its whole history
+    __table_args__ = (
+        Index("idx_llm_conversations_session_created", "session_id", "created_at"),
+    )
+
 
 class ConversationCreate(ConversationBase):
     """Create a conversation request model"""
@@ -1,5 +1,6 @@
-from sqlmodel import Session, select
-from typing import Optional, List, Dict, Any
+from sqlmodel import Session, select, desc, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, List, Dict, Any, Union
 import uuid
 
 from knowledge_api.mapper.base_crud import BaseCRUD
@@ -8,7 +9,7 @@ from .base import Conversation, ConversationCreate, ConversationUpdate, Conversa
 class ConversationCRUD(BaseCRUD[Conversation, ConversationCreate, ConversationUpdate, Dict[str, Any], ConversationResponse, int]):
     """Dialogue CRUD operation"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Union[Session, AsyncSession]):
         """Initialize dialogue CRUD operation"""
         super().__init__(db, Conversation)
 
@@ -57,6 +58,49 @@ List [Conversation]: Conversation list"""
             order_desc=False
         )
 
+    async def get_recent_by_session_id(self, session_id: str, limit: Optional[int] = 10) -> List[Conversation]:
+        """Get the last messages of a session, oldest first
+
+Served by the (session_id, created_at) index, only the last limit rows are read
+whatever the length of the session.
+
+Args:
+session_id: Session ID
+Limit: number of messages, all messages if None
+
+Returns:
+List [Conversation]: last messages in chronological order"""
+        statement = (
+            select(Conversation)
+            .where(Conversation.session_id == session_id)
+            .order_by(desc(Conversation.created_at), desc(Conversation.id))
+            .limit(limit)
+        )
+        records = (await self._exec(statement)).all()
+        return list(reversed(records))
+
+    async def create_many(self, conversations: List[ConversationCreate]) -> int:
+        """Create several conversations with one multi-row INSERT and one commit
+
+Used to write the user message and the reply of a turn together.
+
+Args:
+Conversations: Conversation Creation Models, in chronological order
+
+Returns:
+Int: number of records created"""
+        if not conversations:
+            return 0
+        rows = []
+        for conversation in conversations:
+            data = conversation.dict() if hasattr(conversation, 'dict') else conversation.model_dump()
+            if not data.get("message_id"):
+                data["message_id"] = str(uuid.uuid4())
+            rows.append(Conversation(**data).model_dump(exclude={"id"}))
+        await self._exec(insert(Conversation).values(rows))
+        await self._commit()
+        return len(rows)
+
     async def get_by_conversation_id(self, conversation_id: str, skip: int = 0, limit: int = 100) -> List[Conversation]:
         """Get chat history based on conversation session ID
 
@@ -129,9 +173,9 @@ Int: number of records deleted"""
         conversations = await self.get_by_session_id(session_id=session_id, limit=1000000)  # Set a large limit to obtain all records
         count = 0
         for conversation in conversations:
-            self.db.delete(conversation)
+            await self._delete(conversation)
             count += 1
-        self.db.commit()
+        await self._commit()
         return count
 
     async def get_all_conversations_by_not_syncing(self,user_id:str,role_id:str) -> List[Conversation]:
@@ -158,12 +202,12 @@ is_sync: Is it synced?
 Returns:
 Optional [Conversation]: Updated Conversation or None"""
         statement = select(Conversation).where(Conversation.id.in_(conversation_id))
-        conversations = await self.db.exec(statement)
+        conversations = await self._exec(statement)
         conversations = conversations.all()
         if not conversations:
             return None
         for conversation in conversations:
             conversation.is_sync = 1
             self.db.add(conversation)
-        self.db.commit()
+        await self._commit()
         return True
\ No newline at end of file
@@ -1,7 +1,7 @@
 """LLM uses database operations that record contextual data"""
 
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlmodel import Session, select, and_
 from sqlalchemy import desc
 
@@ -53,7 +53,28 @@ additional_data: Additional data
 
 Returns:
 LLMUsageContext: record created"""
-        # Extracting system_prompt and user_prompt
+        system_prompt, user_prompt = self.extract_prompts(messages)
+
+        # Create record
+        context = LLMUsageContextCreate(
+            record_id=record_id,
+            messages=messages,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            additional_data=additional_data
+        )
+        
+        return await self.create(context)
+
+    @staticmethod
+    def extract_prompts(messages: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+        """Extract the first system prompt and the last user prompt from a message list
+
+Args:
+Messages: Message List
+
+Returns:
+(system_prompt, user_prompt)"""
         system_prompt = None
         user_prompt = None
         
@@ -71,17 +92,8 @@ LLMUsageContext: record created"""
                 if msg.get("role") == "user":
                     user_prompt = msg.get("content")
                     break
-        
-        # Create record
-        context = LLMUsageContextCreate(
-            record_id=record_id,
-            messages=messages,
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            additional_data=additional_data
-        )
-        
-        return await self.create(context)
+
+        return system_prompt, user_prompt
     
     async def get_by_record_id(self, record_id: int) -> Optional[LLMUsageContext]:
         """Obtain context records using record ID according to LLM
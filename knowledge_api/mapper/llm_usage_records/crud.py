@@ -62,6 +62,34 @@ related_record_id: Associated Record ID
 
 Returns:
 LLMUsageRecord: created record"""
+        record = self.build_from_response(
+            response_data=response_data,
+            vendor_type=vendor_type,
+            model_id=model_id,
+            application_scenario=application_scenario,
+            related_record_id=related_record_id
+        )
+        return await self.create(record)
+
+    @staticmethod
+    def build_from_response(
+        response_data: Dict[str, Any],
+        vendor_type: str,
+        model_id: str,
+        application_scenario: Optional[str] = None,
+        related_record_id: Optional[str] = None
+    ) -> LLMUsageRecordCreate:
+        """Build a usage record create model from LLM response data (no database access)
+
+Args:
+response_data: LLM Response Data
+vendor_type: Supplier Type
+model_id: Model ID
+application_scenario: Application Scenarios
+related_record_id: Associated Record ID
+
+Returns:
+LLMUsageRecordCreate: record to be inserted"""
         # Handling common LLM response formats
         content = response_data.get("content", "")
         input_tokens = response_data.get("input_tokens", 0)
@@ -73,8 +101,7 @@ LLMUsageRecord: created record"""
         request_id = response_data.get("id", None)
         total_price = response_data.get("total_price", Decimal("0.00000000"))
         
-        # Create record
-        record = LLMUsageRecordCreate(
+        return LLMUsageRecordCreate(
             request_id=request_id,
             vendor_type=vendor_type,
             model_id=model_id,
@@ -89,8 +116,6 @@ LLMUsageRecord: created record"""
             related_record_id=related_record_id,
             total_price=total_price
         )
-        
-        return await self.create(record)
     
     async def get_by_request_id(self, request_id: str) -> Optional[LLMUsageRecord]:
         """Get records by request ID
@@ -0,0 +1,18 @@
+"""LLM usage rollup (pre-aggregated statistics) data models and operations
+
+This module contains:
+- LLMUsageRollup: database model
+- LLMUsageRollupResponse: responsive model
+- LLMUsageRollupCRUD: Database operation class"""
+
+from knowledge_api.mapper.llm_usage_rollups.base import (
+    LLMUsageRollup,
+    LLMUsageRollupResponse
+)
+from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD
+
+__all__ = [
+    "LLMUsageRollup",
+    "LLMUsageRollupResponse",
+    "LLMUsageRollupCRUD"
+]
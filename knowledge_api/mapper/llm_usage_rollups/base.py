@@ -0,0 +1,53 @@
+"""LLM usage rollup data model definition
+
+Hourly and daily pre-aggregated usage keyed by model, vendor and application scenario,
+so the statistics endpoints never scan the raw llm_usage_records table."""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from sqlmodel import Field, SQLModel, UniqueConstraint
+
+# Rollup granularities
+GRANULARITY_HOUR = "hour"
+GRANULARITY_DAY = "day"
+
+
+class LLMUsageRollupBase(SQLModel):
+    """LLM usage rollup base model"""
+    granularity: str = Field(max_length=8, description="Bucket granularity: hour, day")
+    bucket_start: datetime = Field(index=True, description="Bucket start time (UTC)")
+    model_id: str = Field(max_length=128, description="Model ID")
+    vendor_type: str = Field(max_length=64, description="Type of supplier (e.g. doubao, openai, etc.)")
+    application_scenario: str = Field(default="", max_length=128, description="application scenario, empty when not set")
+    record_count: int = Field(default=0, description="Number of usage records")
+    input_tokens: int = Field(default=0, description="Enter number of tokens")
+    output_tokens: int = Field(default=0, description="Number of output tokens")
+    total_tokens: int = Field(default=0, description="Total tokens")
+    total_price: Decimal = Field(default=Decimal("0.00000000"), max_digits=20, decimal_places=8, description="total price")
+    total_elapsed_time: float = Field(default=0.0, description="Sum of request time (seconds)")
+
+
+class LLMUsageRollup(LLMUsageRollupBase, table=True):
+    """database model"""
+    __tablename__ = "llm_usage_rollups"
+
+    id: Optional[int] = Field(default=None, primary_key=True, description="primary key ID")
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        description="update time"
+    )
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "model_id", "vendor_type", "application_scenario",
+                         name="uix_llm_usage_rollup_bucket"),
+    )
+
+
+class LLMUsageRollupResponse(LLMUsageRollupBase):
+    """response model"""
+    id: int
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
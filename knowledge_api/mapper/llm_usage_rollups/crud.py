@@ -0,0 +1,394 @@
+"""LLM usage rollup database operations
+
+Rollups are maintained incrementally by the usage writer (upsert_records, in the transaction inserting
+the raw records) and can be rebuilt from the raw records for a time range by the scheduled job (rebuild).
+The llm_usage_rollups table is created on startup (create_table) when it does not exist and filled
+from the raw records already stored. The buckets still open at that time (the current hour and day)
+are completed by the next run of the "Rebuild LLM usage rollups" task once they are closed."""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+from sqlalchemy import insert, inspect
+from sqlmodel import Session, select, func, and_, delete
+
+from knowledge_api.mapper.base_crud import BaseCRUD
+from knowledge_api.mapper.llm_usage_records.base import LLMUsageRecord, LLMUsageRecordStats
+from knowledge_api.mapper.llm_usage_rollups.base import (
+    LLMUsageRollup,
+    LLMUsageRollupResponse,
+    GRANULARITY_HOUR,
+    GRANULARITY_DAY
+)
+
+# Columns identifying a bucket and columns accumulated into it
+KEY_COLUMNS = ("granularity", "bucket_start", "model_id", "vendor_type", "application_scenario")
+SUM_COLUMNS = ("record_count", "input_tokens", "output_tokens", "total_tokens", "total_price", "total_elapsed_time")
+
+# Buckets ending less than this before now may still receive increments from the usage writer
+# (queued or spilled entries) and are not rebuilt
+REBUILD_CLOSE_DELAY = timedelta(minutes=15)
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class LLMUsageRollupCRUD(BaseCRUD[LLMUsageRollup, LLMUsageRollupResponse, LLMUsageRollupResponse, Dict[str, Any], LLMUsageRollupResponse, int]):
+    """LLM usage rollup CRUD operations"""
+
+    def __init__(self, db: Session):
+        """Initialize the LLM usage rollup CRUD operations"""
+        super().__init__(db, LLMUsageRollup)
+
+    @staticmethod
+    def create_table(engine) -> bool:
+        """Create the llm_usage_rollups table and its indexes when they do not exist
+
+A new table is backfilled with the closed buckets of the raw records already stored.
+
+Args:
+Engine: synchronous database engine
+
+Returns:
+Bool: whether the table was created"""
+        if inspect(engine).has_table(LLMUsageRollup.__tablename__):
+            return False
+        LLMUsageRollup.__table__.create(engine, checkfirst=True)
+        with Session(engine) as db:
+            first = db.exec(select(func.min(LLMUsageRecord.created_at))).first()
+            if first is not None:
+                LLMUsageRollupCRUD(db)._rebuild(first, datetime.utcnow())
+        return True
+
+    @staticmethod
+    def aggregate(records: Iterable[LLMUsageRecord]) -> Dict[Tuple, Dict[str, Any]]:
+        """Aggregate raw records into hourly and daily bucket deltas
+
+Args:
+Records: Usage records (created_at must be set)
+
+Returns:
+Dict [Tuple, Dict]: bucket key -> accumulated values"""
+        buckets: Dict[Tuple, Dict[str, Any]] = {}
+        for record in records:
+            for granularity, bucket_start in (
+                (GRANULARITY_HOUR, _floor_hour(record.created_at)),
+                (GRANULARITY_DAY, _floor_day(record.created_at)),
+            ):
+                key = (granularity, bucket_start, record.model_id, record.vendor_type, record.application_scenario or "")
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = {column: 0 for column in SUM_COLUMNS}
+                    bucket["total_price"] = Decimal("0")
+                    bucket["total_elapsed_time"] = 0.0
+                bucket["record_count"] += 1
+                bucket["input_tokens"] += record.input_tokens or 0
+                bucket["output_tokens"] += record.output_tokens or 0
+                bucket["total_tokens"] += record.total_tokens or 0
+                bucket["total_price"] += Decimal(str(record.total_price or 0))
+                bucket["total_elapsed_time"] += record.elapsed_time or 0.0
+        return buckets
+
+    def upsert_records(self, records: List[LLMUsageRecord]) -> int:
+        """Add the given records to their hourly and daily buckets
+
+Synchronous on purpose: it is called by the usage writer thread, the caller commits.
+
+Args:
+Records: Usage records that were just inserted
+
+Returns:
+Int: number of buckets touched"""
+        return self.upsert_buckets(self.aggregate(records))
+
+    def upsert_buckets(self, buckets: Dict[Tuple, Dict[str, Any]]) -> int:
+        """Add bucket deltas (see aggregate) to the rollups, the caller commits
+
+Args:
+Buckets: bucket key -> accumulated values
+
+Returns:
+Int: number of buckets touched"""
+        if not buckets:
+            return 0
+
+        now = datetime.utcnow()
+        rows = [
+            {**dict(zip(KEY_COLUMNS, key)), **values, "updated_at": now}
+            for key, values in buckets.items()
+        ]
+        table = LLMUsageRollup.__table__
+        dialect = self.db.bind.dialect.name
+
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as upsert_insert
+            statement = upsert_insert(table).values(rows)
+            statement = statement.on_duplicate_key_update(
+                **{column: table.c[column] + statement.inserted[column] for column in SUM_COLUMNS},
+                updated_at=statement.inserted.updated_at
+            )
+        elif dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as upsert_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as upsert_insert
+            statement = upsert_insert(table).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(KEY_COLUMNS),
+                set_={
+                    **{column: table.c[column] + statement.excluded[column] for column in SUM_COLUMNS},
+                    "updated_at": statement.excluded.updated_at
+                }
+            )
+        else:
+            raise ValueError(f"不支持的数据库引擎: {dialect}")
+
+        self.db.execute(statement)
+        return len(rows)
+
+    async def rebuild(self, start_date: datetime, end_date: datetime) -> int:
+        """Recompute the closed rollups of a time range from the raw records (see _rebuild)
+
+Args:
+start_date: Start time (UTC)
+end_date: End time (UTC)
+
+Returns:
+Int: number of buckets written"""
+        return self._rebuild(start_date, end_date)
+
+    def _rebuild(self, start_date: datetime, end_date: datetime) -> int:
+        """Recompute the closed rollups of a time range from the raw records
+
+The range is widened to whole days so daily buckets stay complete. Only closed buckets are replaced:
+hours that ended REBUILD_CLOSE_DELAY before now and the days made of such hours. The usage writer
+still adds increments to the open buckets, replacing them would lose or double count those.
+Late entries (replayed from the spill file) add their increments in the transaction inserting them,
+so a closed bucket never holds a row counted twice.
+
+Args:
+start_date: Start time (UTC)
+end_date: End time (UTC)
+
+Returns:
+Int: number of buckets written"""
+        start = _floor_day(start_date)
+        end = _floor_day(end_date) + timedelta(days=1) if end_date != _floor_day(end_date) else end_date
+        # Hourly buckets are rebuilt up to hour_end, daily buckets up to day_end
+        hour_end = min(end, _floor_hour(datetime.utcnow() - REBUILD_CLOSE_DELAY))
+        day_end = _floor_day(hour_end)
+        if hour_end <= start:
+            return 0
+
+        # Group raw records by hour on the database side
+        dialect = self.db.bind.dialect.name
+        if dialect == "sqlite":
+            hour_func = func.strftime("%Y-%m-%d %H:00:00", LLMUsageRecord.created_at)
+        elif dialect == "postgresql":
+            hour_func = func.date_trunc("hour", LLMUsageRecord.created_at)
+        else:
+            hour_func = func.date_format(LLMUsageRecord.created_at, "%Y-%m-%d %H:00:00")
+
+        query = select(
+            hour_func.label("bucket"),
+            LLMUsageRecord.model_id,
+            LLMUsageRecord.vendor_type,
+            LLMUsageRecord.application_scenario,
+            func.count().label("record_count"),
+            func.sum(LLMUsageRecord.input_tokens).label("input_tokens"),
+            func.sum(LLMUsageRecord.output_tokens).label("output_tokens"),
+            func.sum(LLMUsageRecord.total_tokens).label("total_tokens"),
+            func.sum(LLMUsageRecord.total_price).label("total_price"),
+            func.sum(LLMUsageRecord.elapsed_time).label("total_elapsed_time")
+        ).where(
+            and_(LLMUsageRecord.created_at >= start, LLMUsageRecord.created_at < hour_end)
+        ).group_by(
+            hour_func,
+            LLMUsageRecord.model_id,
+            LLMUsageRecord.vendor_type,
+            LLMUsageRecord.application_scenario
+        )
+        results = self.db.exec(query).all()
+
+        buckets: Dict[Tuple, Dict[str, Any]] = {}
+        for r in results:
+            hour = r.bucket if isinstance(r.bucket, datetime) else datetime.strptime(r.bucket, "%Y-%m-%d %H:%M:%S")
+            values = {
+                "record_count": r.record_count or 0,
+                "input_tokens": r.input_tokens or 0,
+                "output_tokens": r.output_tokens or 0,
+                "total_tokens": r.total_tokens or 0,
+                "total_price": Decimal(str(r.total_price or 0)),
+                "total_elapsed_time": r.total_elapsed_time or 0.0,
+            }
+            scenario = r.application_scenario or ""
+            keys = [(GRANULARITY_HOUR, hour, r.model_id, r.vendor_type, scenario)]
+            if hour < day_end:
+                keys.append((GRANULARITY_DAY, _floor_day(hour), r.model_id, r.vendor_type, scenario))
+            for key in keys:
+                bucket = buckets.setdefault(key, {column: 0 for column in SUM_COLUMNS})
+                for column, value in values.items():
+                    bucket[column] += value
+
+        # Replace the closed buckets of the range in one transaction
+        self.db.execute(delete(LLMUsageRollup).where(
+            and_(LLMUsageRollup.granularity == GRANULARITY_HOUR,
+                 LLMUsageRollup.bucket_start >= start, LLMUsageRollup.bucket_start < hour_end)
+        ))
+        self.db.execute(delete(LLMUsageRollup).where(
+            and_(LLMUsageRollup.granularity == GRANULARITY_DAY,
+                 LLMUsageRollup.bucket_start >= start, LLMUsageRollup.bucket_start < day_end)
+        ))
+        if buckets:
+            now = datetime.utcnow()
+            self.db.execute(insert(LLMUsageRollup.__table__), [
+                {**dict(zip(KEY_COLUMNS, key)), **values, "updated_at": now}
+                for key, values in buckets.items()
+            ])
+        self.db.commit()
+        return len(buckets)
+
+    async def get_statistics(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        vendor_type: Optional[str] = None,
+        model_id: Optional[str] = None,
+        application_scenario: Optional[str] = None
+    ) -> LLMUsageRecordStats:
+        """Get usage statistics from the rollups (same result shape as LLMUsageRecordCRUD.get_statistics)
+
+Daily buckets are used when the range is day-aligned, hourly buckets otherwise. end_date includes its whole
+day like LLMUsageRecordCRUD.get_statistics; a bucket is counted only when it ends by that bound.
+
+Args:
+start_date: Start Date
+end_date: End date
+vendor_type: Supplier Type
+model_id: Model ID
+application_scenario: Application Scenarios
+
+Returns:
+LLMUsageRecordStats: Statistics"""
+        # Add a day so that end_date contains all records for the day
+        end = end_date + timedelta(days=1) if end_date else None
+        granularity = GRANULARITY_DAY
+        if (start_date and start_date != _floor_day(start_date)) or (end and end != _floor_day(end)):
+            granularity = GRANULARITY_HOUR
+        conditions = []
+        if start_date:
+            conditions.append(LLMUsageRollup.bucket_start >= _floor_hour(start_date))
+        if end:
+            # Exclusive end bound: the bucket must end by the end of the range
+            size = timedelta(days=1) if granularity == GRANULARITY_DAY else timedelta(hours=1)
+            conditions.append(LLMUsageRollup.bucket_start <= end - size)
+        if vendor_type:
+            conditions.append(LLMUsageRollup.vendor_type == vendor_type)
+        if model_id:
+            conditions.append(LLMUsageRollup.model_id == model_id)
+        if application_scenario:
+            conditions.append(LLMUsageRollup.application_scenario == application_scenario)
+        conditions.append(LLMUsageRollup.granularity == granularity)
+
+        # One grouped query, totals and per-vendor figures are folded in Python
+        query = select(
+            LLMUsageRollup.model_id,
+            LLMUsageRollup.vendor_type,
+            func.sum(LLMUsageRollup.record_count).label("count"),
+            func.sum(LLMUsageRollup.input_tokens).label("input_tokens"),
+            func.sum(LLMUsageRollup.output_tokens).label("output_tokens"),
+            func.sum(LLMUsageRollup.total_tokens).label("total_tokens"),
+            func.sum(LLMUsageRollup.total_price).label("total_price"),
+            func.sum(LLMUsageRollup.total_elapsed_time).label("total_elapsed_time")
+        ).where(and_(*conditions)).group_by(LLMUsageRollup.model_id, LLMUsageRollup.vendor_type)
+        results = self.db.exec(query).all()
+
+        total_records = total_input = total_output = total_tokens = 0
+        total_price = Decimal("0.00000000")
+        total_elapsed = 0.0
+        records_by_model: Dict[str, Dict[str, Any]] = {}
+        records_by_vendor: Dict[str, Dict[str, Any]] = {}
+        for r in results:
+            count = int(r.count or 0)
+            tokens = int(r.total_tokens or 0)
+            price = Decimal(str(r.total_price or 0))
+            total_records += count
+            total_input += int(r.input_tokens or 0)
+            total_output += int(r.output_tokens or 0)
+            total_tokens += tokens
+            total_price += price
+            total_elapsed += float(r.total_elapsed_time or 0.0)
+            for group, name in ((records_by_model, r.model_id), (records_by_vendor, r.vendor_type)):
+                item = group.setdefault(name, {"count": 0, "total_tokens": 0, "total_price": 0.0})
+                item["count"] += count
+                item["total_tokens"] += tokens
+                item["total_price"] += float(price)
+
+        return LLMUsageRecordStats(
+            total_records=total_records,
+            total_input_tokens=total_input,
+            total_output_tokens=total_output,
+            total_tokens=total_tokens,
+            total_price=total_price,
+            average_elapsed_time=total_elapsed / total_records if total_records else 0.0,
+            records_by_model=records_by_model,
+            records_by_vendor=records_by_vendor
+        )
+
+    async def get_daily_statistics(
+        self,
+        days: int = 30,
+        vendor_type: Optional[str] = None,
+        model_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """Acquire daily statistics from the daily rollups
+
+Args:
+Days: statistical days
+vendor_type: Supplier Type
+model_id: Model ID
+
+Returns:
+Dict [str, Dict]: Statistics grouped by date"""
+        start_date = _floor_day(datetime.utcnow() - timedelta(days=days))
+
+        conditions = [
+            LLMUsageRollup.granularity == GRANULARITY_DAY,
+            LLMUsageRollup.bucket_start >= start_date
+        ]
+        if vendor_type:
+            conditions.append(LLMUsageRollup.vendor_type == vendor_type)
+        if model_id:
+            conditions.append(LLMUsageRollup.model_id == model_id)
+
+        query = select(
+            LLMUsageRollup.bucket_start,
+            func.sum(LLMUsageRollup.record_count).label("count"),
+            func.sum(LLMUsageRollup.input_tokens).label("input_tokens"),
+            func.sum(LLMUsageRollup.output_tokens).label("output_tokens"),
+            func.sum(LLMUsageRollup.total_tokens).label("total_tokens"),
+            func.sum(LLMUsageRollup.total_price).label("total_price"),
+            func.sum(LLMUsageRollup.total_elapsed_time).label("total_elapsed_time")
+        ).where(and_(*conditions)).group_by(LLMUsageRollup.bucket_start).order_by(LLMUsageRollup.bucket_start)
+
+        results = self.db.exec(query).all()
+
+        stats_by_date = {}
+        for r in results:
+            count = int(r.count or 0)
+            stats_by_date[r.bucket_start.strftime("%Y-%m-%d")] = {
+                "count": count,
+                "input_tokens": int(r.input_tokens or 0),
+                "output_tokens": int(r.output_tokens or 0),
+                "total_tokens": int(r.total_tokens or 0),
+                "total_price": float(r.total_price or 0),
+                "avg_elapsed_time": float(r.total_elapsed_time or 0.0) / count if count else 0.0
+            }
+
+        return stats_by_date
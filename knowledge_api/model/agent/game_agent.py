@@ -1,9 +1,11 @@
 from knowledge_api.framework.ai_collect import BaseLLM
+from knowledge_api.framework.ai_collect.base_llm import get_provider_semaphore
 from knowledge_api.framework.redis.cache_manager import CacheManager
 from knowledge_api.framework.memory.enhanced_chat_memory_manager import EnhancedChatMemoryManager
+import asyncio
 import time
 import uuid
-from typing import Optional
+from typing import Any, Awaitable, Callable, List, Optional
 from pydantic import BaseModel, Field, root_validator
 
 
@@ -51,6 +53,29 @@ class BaseGameAgent:
             self.memory.add_ai_message(chat_data.content)
         return chat_data.content
 
+    @property
+    def provider_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore bounding the concurrent requests to the provider of this agent's model"""
+        return get_provider_semaphore(self.client.llm_type if self.client else None)
+
+
+async def gather_agent_calls(agents: List[Any], call: Callable[[Any], Awaitable[Any]]) -> List[Any]:
+    """Run a model call for every agent at the same time, bounded by the semaphore of each agent's provider
+
+Args:
+Agents: agents taking part, the results keep this order
+Call: coroutine function called with the agent
+
+Returns:
+List: result of each agent in the order of agents, the exception in place of a failed call"""
+
+    async def run(agent):
+        semaphore = getattr(agent, "provider_semaphore", None) or get_provider_semaphore()
+        async with semaphore:
+            return await call(agent)
+
+    return await asyncio.gather(*(run(agent) for agent in agents), return_exceptions=True)
+
 
 class TurtleSoupGameAgent(BaseGameAgent):
     def __init__(self, role, system, identity="player"):
@@ -0,0 +1,43 @@
+"""LLM usage timed tasks
+
+Reconciliation and backfill of the pre-aggregated LLM usage rollups"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from knowledge_api.framework.database.database import get_engine, get_session
+from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD
+from knowledge_api.scheduler_task import scheduled_task
+
+logger = logging.getLogger(__name__)
+
+
+@scheduled_task(
+    name="Rebuild LLM usage rollups",
+    description="Recompute the closed hourly/daily LLM usage rollups from the raw usage records (backfill or reconciliation)",
+    tags=["llm", "statistics"]
+)
+async def rebuild_llm_usage_rollups(days: int = 1, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+    """Rebuild the LLM usage rollups of a time range
+
+@param days: number of recent days to rebuild when no explicit range is given
+@param start_date: range start (YYYY-MM-DD, UTC), optional
+@param end_date: range end (YYYY-MM-DD, UTC, inclusive), optional
+@Return: execution result"""
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else datetime.utcnow()
+    start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else end - timedelta(days=days)
+
+    LLMUsageRollupCRUD.create_table(get_engine())
+    db = next(get_session())
+    try:
+        buckets = await LLMUsageRollupCRUD(db).rebuild(start, end)
+    finally:
+        db.close()
+
+    logger.info(f"LLM usage rollups rebuilt: {start} - {end}, {buckets} buckets")
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "buckets": buckets,
+        "timestamp": datetime.now().isoformat()
+    }
@@ -1,12 +1,21 @@
 # ... existing code ...
+import atexit
+import copy
+import glob
+import json
 import logging
 import os
 import pprint
+import queue
+import random
 import sys
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
 import colorlog
 from fastapi import FastAPI, Request
-from typing import Callable, Dict, Any, Optional, List, Union
+from typing import Callable, Dict, Any, Optional, List, Union, Tuple
 class EnhancedLogger(logging.Logger):
     """Enhanced Logger class to support print-like multi-parameter printing"""
 
@@ -16,9 +25,12 @@ class EnhancedLogger(logging.Logger):
 @Param {int} level - log level
 @Param {tuple} args - positional argument
 @Param {dict} kwargs - keyword arguments"""
-        if not args:
+        if not args or not self.isEnabledFor(level):
             return
 
+        # Report the caller of debug/info/... instead of this method (module, line, function)
+        kwargs["stacklevel"] = kwargs.get("stacklevel", 1) + 2
+
         # If there is only one parameter, use standard logging
         if len(args) == 1:
             self._log(level, args[0], (), **kwargs)
@@ -57,9 +69,264 @@ class EnhancedLogger(logging.Logger):
         """Enhanced critical methods with multi-parameter support"""
         self._log_multi_args(logging.CRITICAL, args, kwargs)
 
+    def exception(self, *args, exc_info=True, **kwargs) -> None:
+        """Enhanced exception method, error level with the traceback of the current exception"""
+        self._log_multi_args(logging.ERROR, args, dict(kwargs, exc_info=exc_info))
+
     # Add an alias for warning
     warn = warning
 
+# Root of the project, used to turn source paths into dotted module names
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_module_names: Dict[str, str] = {}
+
+# LogRecord attributes, everything else given with extra= goes into the JSON output
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+
+def module_name_of(record: logging.LogRecord) -> str:
+    """Dotted module name of the code that logged a record, e.g. knowledge_api.framework.workflow.engine
+
+@Param {LogRecord} record - log record
+@Return {str} dotted module name, the bare module name outside the project"""
+    name = _module_names.get(record.pathname)
+    if name is None:
+        path = os.path.abspath(record.pathname)
+        if path.startswith(_PROJECT_ROOT + os.sep):
+            name = os.path.splitext(os.path.relpath(path, _PROJECT_ROOT))[0].replace(os.sep, ".")
+            if name.endswith(".__init__"):
+                name = name[:-len(".__init__")]
+        else:
+            name = record.module
+        _module_names[record.pathname] = name
+    return name
+
+
+def _parse_rules(value: str, cast: Callable[[str], Any]) -> Dict[str, Any]:
+    """Parse "module=value,module=value" rules of the environment variables"""
+    rules = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        key, rule = item.split("=", 1)
+        try:
+            rules[key.strip()] = cast(rule.strip())
+        except ValueError:
+            print(f"忽略无效的日志规则: {item}", file=sys.stderr)
+    return rules
+
+
+class LogThrottle(logging.Filter):
+    """Per module sampling and rate limits for noisy loggers
+
+Rules are matched by the longest dotted prefix of the module that logged the record
+(or of the logger name, e.g. uvicorn.access). Only records below WARNING are dropped,
+records dropped by a rate limit are reported once per second with a warning."""
+
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None, rate_limits: Optional[Dict[str, int]] = None):
+        """Initialize the throttle
+
+@Param {Dict[str, float]} sample_rates - module prefix -> fraction of the records kept (0-1)
+@Param {Dict[str, int]} rate_limits - module prefix -> records kept per second"""
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limits = rate_limits or {}
+        self.sampled = 0
+        self.rate_limited = 0
+        self._rules: Dict[Tuple[str, str], Tuple[float, Optional[str], int]] = {}
+        # rate limit key -> [second, kept, dropped]
+        self._windows: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sample_rates or self.rate_limits)
+
+    @staticmethod
+    def _match(rules: Dict[str, Any], names: Tuple[str, ...]) -> Optional[str]:
+        best = None
+        for prefix in rules:
+            for name in names:
+                if (name == prefix or name.startswith(prefix + ".")) and (best is None or len(prefix) > len(best)):
+                    best = prefix
+        return best
+
+    def _rule_of(self, record: logging.LogRecord) -> Tuple[float, Optional[str], int]:
+        key = (record.name, record.pathname)
+        rule = self._rules.get(key)
+        if rule is None:
+            names = (module_name_of(record), record.name)
+            sample_key = self._match(self.sample_rates, names)
+            limit_key = self._match(self.rate_limits, names)
+            rule = self._rules[key] = (
+                self.sample_rates[sample_key] if sample_key else 1.0,
+                limit_key,
+                self.rate_limits[limit_key] if limit_key else 0,
+            )
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.enabled:
+            return True
+        sample_rate, limit_key, limit = self._rule_of(record)
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            self.sampled += 1
+            return False
+        if not limit_key:
+            return True
+
+        second = int(record.created)
+        report = None
+        with self._lock:
+            window = self._windows.get(limit_key)
+            if window is None or window[0] != second:
+                if window is not None and window[2]:
+                    report = window[2]
+                window = self._windows[limit_key] = [second, 0, 0]
+            if window[1] >= limit:
+                window[2] += 1
+                self.rate_limited += 1
+                return False
+            window[1] += 1
+        if report:
+            self._report(record, limit_key, limit, report)
+        return True
+
+    @staticmethod
+    def _report(record: logging.LogRecord, limit_key: str, limit: int, dropped: int) -> None:
+        summary = logging.makeLogRecord({
+            "name": record.name, "levelno": logging.WARNING, "levelname": "WARNING",
+            "pathname": record.pathname, "module": record.module, "funcName": record.funcName,
+            "lineno": record.lineno, "created": record.created, "msecs": record.msecs,
+            "msg": f"日志限流: {limit_key} 超过每秒 {limit} 条, 已丢弃 {dropped} 条",
+        })
+        logging.getLogger(record.name).handle(summary)
+
+
+class JsonFormatter(logging.Formatter):
+    """Structured log output, one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": module_name_of(record),
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DailyFileHandler(logging.FileHandler):
+    """File handler writing to {app_name}_{YYYY-MM-DD}.log, switching files at midnight
+
+Files dated more than backup_days days before the current day are deleted when the file is switched
+(0 keeps all files). The date is read from the file name, days without logs do not count."""
+
+    def __init__(self, log_dir: str, app_name: str, backup_days: int = 0, encoding: str = "utf-8"):
+        self.log_dir = log_dir
+        self.app_name = app_name
+        self.backup_days = backup_days
+        self._rollover_at = 0.0
+        now = time.time()
+        super().__init__(self._file_for(now), encoding=encoding)
+        self._purge(now)
+
+    def _file_for(self, timestamp: float) -> str:
+        day = datetime.fromtimestamp(timestamp)
+        next_day = datetime(day.year, day.month, day.day) + timedelta(days=1)
+        self._rollover_at = next_day.timestamp()
+        return os.path.abspath(os.path.join(self.log_dir, f"{self.app_name}_{day.strftime('%Y-%m-%d')}.log"))
+
+    def _purge(self, timestamp: float) -> None:
+        if self.backup_days <= 0:
+            return
+        # ISO dates compare as strings
+        cutoff = (datetime.fromtimestamp(timestamp) - timedelta(days=self.backup_days)).strftime("%Y-%m-%d")
+        prefix_length = len(self.app_name) + 1
+        for path in glob.glob(os.path.join(self.log_dir, f"{self.app_name}_????-??-??.log")):
+            if os.path.basename(path)[prefix_length:-len(".log")] < cutoff:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.created >= self._rollover_at:
+            self.acquire()
+            try:
+                if record.created >= self._rollover_at:
+                    if self.stream:
+                        self.stream.close()
+                        self.stream = None
+                    self.baseFilename = self._file_for(record.created)
+                    self._purge(record.created)
+            finally:
+                self.release()
+        super().emit(record)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Queue handler of the asynchronous logging pipeline
+
+The calling thread only renders the message and puts the record into a bounded queue,
+formatting and writing happen on the listener thread. When the queue is full records
+below WARNING are dropped (and reported later), warnings and errors wait for a free slot."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the handlers of the listener, only the values that may change are rendered
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING:
+            try:
+                self.queue.put(record, timeout=1.0)
+            except queue.Full:
+                self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            return
+        if self._unreported:
+            dropped, self._unreported = self._unreported, 0
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": record.name, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "created": record.created, "msecs": record.msecs,
+                    "msg": f"日志队列已满, 丢弃 {dropped} 条日志",
+                }))
+            except queue.Full:
+                self._unreported += dropped
+
+
 class LogConfig:
     """Log configuration class to set basic parameters for logging"""
 
@@ -72,7 +339,13 @@ class LogConfig:
             app_name: str = "fastapi-app",
             console_log: bool = True,
             file_log: bool = True,
-            log_colors: Optional[Dict[str, str]] = None
+            log_colors: Optional[Dict[str, str]] = None,
+            async_log: bool = True,
+            json_log: bool = False,
+            backup_days: int = 0,
+            queue_size: int = 10000,
+            sample_rates: Optional[Dict[str, float]] = None,
+            rate_limits: Optional[Dict[str, int]] = None
     ):
         """Initialize log configuration
 
@@ -83,7 +356,13 @@ class LogConfig:
 @Param {string} app_name - application name for log file names
 @Param {boolean} console_log - whether to output to console
 @Param {boolean} file_log - whether to output to file
-@Param {Dict [str, str]} log_colors - Log Color Configuration"""
+@Param {Dict [str, str]} log_colors - Log Color Configuration
+@Param {boolean} async_log - write the logs on a background thread through a queue
+@Param {boolean} json_log - structured JSON output, one object per line
+@Param {int} backup_days - days of log files kept, 0 keeps all files
+@Param {int} queue_size - records waiting in the queue of the asynchronous pipeline
+@Param {Dict[str, float]} sample_rates - module prefix -> fraction of the records below WARNING kept
+@Param {Dict[str, int]} rate_limits - module prefix -> records below WARNING kept per second"""
         self.log_level = log_level
         self.log_format = log_format
         self.date_format = date_format
@@ -91,6 +370,12 @@ class LogConfig:
         self.app_name = app_name
         self.console_log = console_log
         self.file_log = file_log
+        self.async_log = async_log
+        self.json_log = json_log
+        self.backup_days = backup_days
+        self.queue_size = queue_size
+        self.sample_rates = sample_rates or {}
+        self.rate_limits = rate_limits or {}
 
         if log_colors is None:
             self.log_colors = {
@@ -103,6 +388,22 @@ class LogConfig:
         else:
             self.log_colors = log_colors
 
+    @classmethod
+    def from_env(cls) -> 'LogConfig':
+        """Create the log configuration from environment variables
+
+@Return {LogConfig} log configuration"""
+        return cls(
+            log_level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+            log_dir=os.environ.get("LOG_DIR", "logs"),
+            async_log=os.environ.get("LOG_ASYNC", "true").lower() == "true",
+            json_log=os.environ.get("LOG_JSON", "false").lower() == "true",
+            backup_days=int(os.environ.get("LOG_BACKUP_DAYS", "0")),
+            queue_size=int(os.environ.get("LOG_QUEUE_SIZE", "10000")),
+            sample_rates=_parse_rules(os.environ.get("LOG_SAMPLE_RATES", ""), float),
+            rate_limits=_parse_rules(os.environ.get("LOG_RATE_LIMITS", ""), int),
+        )
+
 
 class APILogger:
     """Logging utility class for FastAPI applications"""
@@ -118,18 +419,47 @@ class APILogger:
 @Param {bool} recreate - whether to recreate the instance
 @return {APILogger} APILogger instance"""
         if cls._instance is None or recreate:
+            if cls._instance is not None:
+                # Flush the records still queued by the previous pipeline
+                cls._instance.shutdown()
             cls._instance = cls(config)
         return cls._instance
 
     def __init__(self, config: Optional[LogConfig] = None):
         """Initialize logging tool
 
-@Param {LogConfig} config - log configuration, if None use default configuration"""
-        self.config = config or LogConfig()
+@Param {LogConfig} config - log configuration, if None use the environment variables"""
+        self.config = config or LogConfig.from_env()
+        self.throttle = LogThrottle(self.config.sample_rates, self.config.rate_limits)
+        # (queue handler, listener) of the asynchronous pipelines
+        self._pipelines: List[Tuple[AsyncQueueHandler, QueueListener]] = []
         self.setup_logger()
         # Added special handling for Uvicorn logs
         self._fix_uvicorn_logger()
 
+    def _formatter(self, log_format: str, colored: bool) -> logging.Formatter:
+        """Formatter of a handler, JSON when json_log is enabled"""
+        if self.config.json_log:
+            return JsonFormatter()
+        if colored:
+            return colorlog.ColoredFormatter(log_format, datefmt=self.config.date_format,
+                                             log_colors=self.config.log_colors)
+        return logging.Formatter(log_format.replace('%(log_color)s', ''), datefmt=self.config.date_format)
+
+    def _attach(self, logger: logging.Logger, handlers: List[logging.Handler]) -> None:
+        """Attach handlers to a logger, behind a queue and a listener thread when async_log is enabled"""
+        if not handlers:
+            return
+        if not self.config.async_log:
+            for handler in handlers:
+                logger.addHandler(handler)
+            return
+        queue_handler = AsyncQueueHandler(queue.Queue(self.config.queue_size))
+        listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        self._pipelines.append((queue_handler, listener))
+        logger.addHandler(queue_handler)
+
     def setup_logger(self) -> None:
         """Set up a logger"""
         # Add the following code before creating the logger
@@ -147,43 +477,33 @@ class APILogger:
         self.logger.setLevel(log_level)
         self.logger.propagate = False
 
-        # Clear existing processors to avoid duplicate additions
+        # Clear existing processors and filters to avoid duplicate additions
         if self.logger.handlers:
             self.logger.handlers.clear()
+        self.logger.filters = [f for f in self.logger.filters if not isinstance(f, LogThrottle)]
+        # Sampling and rate limits are applied before the records reach the handlers
+        self.logger.addFilter(self.throttle)
 
+        handlers = []
         # Add Console Processor
         if self.config.console_log:
             console_handler = colorlog.StreamHandler(stream=sys.stdout)
-            formatter = colorlog.ColoredFormatter(
-                self.config.log_format,
-                datefmt=self.config.date_format,
-                log_colors=self.config.log_colors
-            )
-            console_handler.setFormatter(formatter)
+            console_handler.setFormatter(self._formatter(self.config.log_format, colored=True))
             console_handler.setLevel(log_level)
-            self.logger.addHandler(console_handler)
+            handlers.append(console_handler)
 
         # Add a file processor
         if self.config.file_log:
             # Make sure the log directory exists
             os.makedirs(self.config.log_dir, exist_ok=True)
 
-            # Create a log file name in date format
-            today = datetime.now().strftime('%Y-%m-%d')
-            log_file = os.path.join(
-                self.config.log_dir,
-                f"{self.config.app_name}_{today}.log"
-            )
-
-            # Create file processor
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
-            file_formatter = logging.Formatter(
-                self.config.log_format.replace('%(log_color)s', ''),
-                datefmt=self.config.date_format
-            )
-            file_handler.setFormatter(file_formatter)
+            # Log file named by date, switched at midnight
+            file_handler = DailyFileHandler(self.config.log_dir, self.config.app_name, self.config.backup_days)
+            file_handler.setFormatter(self._formatter(self.config.log_format, colored=False))
             file_handler.setLevel(log_level)
-            self.logger.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        self._attach(self.logger, handlers)
 
         # Update class variables for easy global access
         APILogger._logger = self.logger
@@ -194,18 +514,46 @@ class APILogger:
         uvicorn_access = logging.getLogger("uvicorn.access")
         uvicorn_access.handlers = []
         uvicorn_access.propagate = False
+        uvicorn_access.filters = [f for f in uvicorn_access.filters if not isinstance(f, LogThrottle)]
+        uvicorn_access.addFilter(self.throttle)
 
         # Use our format to reconfigure
         if self.config.console_log:
             handler = colorlog.StreamHandler()
-            formatter = colorlog.ColoredFormatter(
-                "%(log_color)s[%(asctime)s] [%(levelname)s] [uvicorn] %(message)s",
-                datefmt=self.config.date_format,
-                log_colors=self.config.log_colors
-            )
-            handler.setFormatter(formatter)
-            uvicorn_access.addHandler(handler)
-
+            handler.setFormatter(self._formatter(
+                "%(log_color)s[%(asctime)s] [%(levelname)s] [uvicorn] %(message)s", colored=True))
+            self._attach(uvicorn_access, [handler])
+
+    def _restart_after_fork(self) -> None:
+        """Start new listener threads in a forked worker process, threads do not survive fork"""
+        pipelines = []
+        for queue_handler, listener in self._pipelines:
+            # The queue of the parent may have been copied with its lock held
+            queue_handler.queue = queue.Queue(self.config.queue_size)
+            listener = QueueListener(queue_handler.queue, *listener.handlers, respect_handler_level=True)
+            listener.start()
+            pipelines.append((queue_handler, listener))
+        self._pipelines = pipelines
+
+    def shutdown(self) -> None:
+        """Write the queued records and stop the listener threads"""
+        for queue_handler, listener in self._pipelines:
+            if listener._thread is not None:
+                listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        self._pipelines = []
+
+    def get_stats(self) -> Dict[str, int]:
+        """Records dropped by the pipeline
+
+@Return {Dict[str, int]} sampled, rate_limited and queue_full record counts, queued records"""
+        return {
+            "sampled": self.throttle.sampled,
+            "rate_limited": self.throttle.rate_limited,
+            "queue_full": sum(queue_handler.dropped for queue_handler, _ in self._pipelines),
+            "queued": sum(queue_handler.queue.qsize() for queue_handler, _ in self._pipelines),
+        }
 
     def get_logger(self) -> EnhancedLogger:
         """Get the configured logger instance
@@ -223,6 +571,21 @@ class APILogger:
         return cls._logger
 
 
+def _shutdown_logging() -> None:
+    if APILogger._instance is not None:
+        APILogger._instance.shutdown()
+
+
+def _restart_logging_after_fork() -> None:
+    if APILogger._instance is not None:
+        APILogger._instance._restart_after_fork()
+
+
+# Queued records are written before the interpreter exits, gunicorn workers forked
+# from a preloaded app get their own listener threads
+atexit.register(_shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_logging_after_fork)
 
 
 # The global function is used to obtain the logger, adding an explicit return type
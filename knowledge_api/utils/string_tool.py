@@ -14,3 +14,16 @@ Str: Processed text"""
     return result
 
 
+def speakable_text(text):
+    """Text spoken by TTS: without the parenthesized actions and the surrounding whitespace
+
+Audio cache keys are built from this text, the chat and the prologue prewarm must normalize the same way
+
+Parameter:
+Text (str): entered text
+
+Return:
+Str: Processed text"""
+    return remove_parentheses_content(text).strip()
+
+
@@ -1,4 +1,5 @@
 # embeddings/huggingface_embeddings.py
+import threading
 from typing import List, Optional
 from langchain_community.embeddings import HuggingFaceBgeEmbeddings
 
@@ -11,6 +12,8 @@ class HuggingFaceEmbeddings(EmbeddingEngine):
 
     # 单例实例
     _instance: Optional['HuggingFaceEmbeddings'] = None
+    # 启动预热在工作线程中加载模型，加锁避免同时加载两次
+    _init_lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         """确保只创建一个实例"""
@@ -31,17 +34,21 @@ class HuggingFaceEmbeddings(EmbeddingEngine):
         if getattr(self, "_initialized", False):
             return
 
-        self.model_name = model_name
-        self.device = device
+        with self._init_lock:
+            if self._initialized:
+                return
 
-        # 初始化嵌入模型
-        logger.info(f"初始化HuggingFace嵌入模型: {model_name} 在 {device} 上")
-        self.embedder = HuggingFaceBgeEmbeddings(
-            model_name=model_name,
-            model_kwargs={"device": device}
-        )
+            self.model_name = model_name
+            self.device = device
 
-        self._initialized = True
+            # 初始化嵌入模型
+            logger.info(f"初始化HuggingFace嵌入模型: {model_name} 在 {device} 上")
+            self.embedder = HuggingFaceBgeEmbeddings(
+                model_name=model_name,
+                model_kwargs={"device": device}
+            )
+
+            self._initialized = True
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """将文本列表转换为嵌入向量列表"""
@@ -1,3 +1,5 @@
+import threading
+
 from modelscope.pipelines import pipeline
 from modelscope.utils.constant import Tasks
 from knowledge_manage.rerank_model.base import BaseRankingModel
@@ -6,6 +8,8 @@ class TextRankingModel(BaseRankingModel):
     # 静态变量，用于存储pipeline实例
     _pipeline_instance = None
     _model_id = None
+    # 启动预热在工作线程中初始化，加锁避免重复创建pipeline
+    _init_lock = threading.Lock()
     
     @classmethod
     def initialize(cls, model_dir):
@@ -15,11 +19,12 @@ class TextRankingModel(BaseRankingModel):
         Args:
             model_dir: 模型目录路径
         """
-        if cls._pipeline_instance is None:
-            cls._model_id = model_dir
-            cls._pipeline_instance = pipeline(task=Tasks.text_ranking, model=model_dir, model_revision='v1.1.0')
-            return True
-        return False
+        with cls._init_lock:
+            if cls._pipeline_instance is None:
+                cls._model_id = model_dir
+                cls._pipeline_instance = pipeline(task=Tasks.text_ranking, model=model_dir, model_revision='v1.1.0')
+                return True
+            return False
     
     @classmethod
     def rank(cls, inputs):
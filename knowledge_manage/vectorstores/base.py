@@ -103,6 +103,24 @@ class VectorStore:
             traceback.print_exc()
             return 0
 
+    async def add_documents_status(self, documents: List[Dict[str, Any]],
+                                   embeddings: List[List[float]]) -> List[bool]:
+        """
+        异步添加文档到向量数据库，并返回每个文档是否写入
+
+        基类只知道写入数量：部分写入时无法区分哪些文档写入了，全部视为未写入。
+        能逐条确认写入结果的存储应覆盖此方法
+
+        Args:
+            documents: 文档列表，每个文档包含文本和元数据
+            embeddings: 文档对应的嵌入向量列表
+
+        Returns:
+            与documents一一对应的写入结果
+        """
+        added = await self.add_documents(documents, embeddings)
+        return [bool(documents) and added >= len(documents)] * len(documents)
+
     async def initialize(self):
         """
         初始化向量存储
@@ -4,7 +4,7 @@ import httpx
 from typing import List, Dict, Any
 
 from knowledge_api.utils.log_config import get_logger
-from knowledge_manage.vectorstores.base import VectorStore
+from knowledge_manage.vectorstores.base import VectorStore, _preprocess_documents
 
 
 logger= get_logger()
@@ -187,6 +187,34 @@ class DashVectorHTTPStore(VectorStore):
         Returns:
             添加的文档数量
         """
+        return sum(await self._insert_processed_documents(processed_docs))
+
+    async def add_documents_status(self, documents: List[Dict[str, Any]],
+                                   embeddings: List[List[float]]) -> List[bool]:
+        """
+        异步添加文档到DashVector，按DashVector逐条返回的结果确认每个文档是否写入
+
+        Args:
+            documents: 文档列表，每个文档包含文本和元数据
+            embeddings: 文档对应的嵌入向量列表
+
+        Returns:
+            与documents一一对应的写入结果
+        """
+        if not documents or (embeddings is not None and len(documents) != len(embeddings)):
+            return [False] * len(documents)
+        return await self._insert_processed_documents(_preprocess_documents(documents, embeddings))
+
+    async def _insert_processed_documents(self, processed_docs: List[Dict[str, Any]]) -> List[bool]:
+        """
+        批量插入预处理后的文档
+
+        Args:
+            processed_docs: 预处理后的文档列表
+
+        Returns:
+            与processed_docs一一对应的插入结果
+        """
         docs_to_insert = []
         for doc in processed_docs:
             temp_doc = doc.copy()
@@ -202,25 +230,26 @@ class DashVectorHTTPStore(VectorStore):
             })
 
         # 批量插入文档
+        inserted = [False] * len(processed_docs)
         try:
             result = await self._make_request(
                 "POST",
                 f"{self.endpoint}/v1/collections/{self.collection_name}/docs",
                 {"docs": docs_to_insert}
             )
-            success_count = 0
             if "output" in result:
-                # 计算成功插入的文档数
-                success_count = sum(1 for doc_result in result["output"] if doc_result.get("code", -1) == 0)
-                logger.info(f"成功插入 {success_count} 个文档")
+                # 逐条插入结果与文档顺序一致
+                for i, doc_result in enumerate(result["output"][:len(inserted)]):
+                    inserted[i] = doc_result.get("code", -1) == 0
+                logger.info(f"成功插入 {sum(inserted)} 个文档")
             else:
                 logger.info(f"无法确定插入结果")
-            return success_count
+            return inserted
         except Exception as e:
             logger.error(f"插入文档时出错: {e}")
             import traceback
             traceback.print_exc()
-            return 0
+            return inserted
 
     async def search(self, query_embedding: List[float]=None, top_k: int = 5, filter_str: str = None) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,604 @@
+"""
+记忆写入分区模块
+按 (user_id, role_id, session_id) 的哈希把对话写入固定数量的 Redis Stream 分区，
+每个分区由持有其租约的进程读取，同一会话的对话由同一个消费者按写入顺序处理
+"""
+import asyncio
+import math
+import os
+import random
+import socket
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from redis.exceptions import ResponseError
+
+from knowledge_api.framework.redis.connection import get_async_redis
+from knowledge_api.utils.log_config import get_logger
+from ..utils.json_utils import deserialize_datetime_aware, serialize_with_datetime
+from ..utils.key_utils import MemoryKeyBuilder
+
+logger = get_logger()
+
+# 分区数量，所有进程必须一致（修改后已写入的对话仍在原分区中处理）
+MEMORY_INGEST_PARTITIONS = int(os.environ.get("MEMORY_INGEST_PARTITIONS", "8"))
+# 消费分区的进程总数（所有主机），每个进程先领取 分区数 / 进程总数 个分区，无人领取的分区由任意进程接管
+MEMORY_INGEST_WORKER_COUNT = int(os.environ.get("MEMORY_INGEST_WORKER_COUNT", os.environ.get("GUNICORN_WORKERS", "1")))
+# 分区租约有效期（毫秒），进程每 1/3 有效期续约一次，进程退出后其分区最迟在租约过期后被接管
+MEMORY_INGEST_LEASE_MS = int(os.environ.get("MEMORY_INGEST_LEASE_MS", "15000"))
+# 每次从分区读取的最大消息数与阻塞等待时间（毫秒）
+MEMORY_INGEST_READ_COUNT = int(os.environ.get("MEMORY_INGEST_READ_COUNT", "100"))
+MEMORY_INGEST_BLOCK_MS = int(os.environ.get("MEMORY_INGEST_BLOCK_MS", "1000"))
+
+_GROUP = "memory_ingest"
+_LAG_SAMPLES = 1000
+
+# 租约仍属于本进程时续约 / 删除
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# store_batch(user_id, role_id, session_id, dialogs) -> 需要稍后重试的对话，整批写入失败时抛出异常
+StoreBatch = Callable[[str, str, Optional[str], List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+
+
+class PartitionedMemoryIngestion:
+    """分区记忆写入
+
+    对话以消息的形式追加到所属分区的 Stream，分区消费者把同一会话的对话缓存到达到批次大小后
+    调用 store_batch 写入记忆系统，写入成功后才确认（XACK）并删除消息。
+
+    分区由进程通过 Redis 租约领取，同一时间只有一个进程消费一个分区；租约定期续约，续约失败的进程
+    立即停止消费该分区。领取分区后先用 XAUTOCLAIM 接管该分区所有未确认的消息（包括已退出进程的），
+    处理完成后才读取新消息，缓存中未满批次的对话不会丢失，同一会话的顺序不变。
+
+    每个进程只用一个连接阻塞读取自己持有的所有分区，读取的消息按分区交给分区消费者；
+    同一分区内不同会话的对话并发处理，同一会话的对话按顺序处理。
+
+    示例:
+        ```python
+        ingestion = PartitionedMemoryIngestion(processor.store_dialog_batch, lambda: 2)
+        await ingestion.start()
+        await ingestion.submit({"content": "你好", "source": "user"}, "user_1", "role_1", "session_1")
+        ```
+    """
+
+    def __init__(
+        self,
+        store_batch: StoreBatch,
+        batch_size: Union[int, Callable[[], int]] = 1,
+        partitions: int = MEMORY_INGEST_PARTITIONS,
+        worker_count: int = MEMORY_INGEST_WORKER_COUNT,
+        read_count: int = MEMORY_INGEST_READ_COUNT,
+        block_ms: int = MEMORY_INGEST_BLOCK_MS,
+        lease_ms: int = MEMORY_INGEST_LEASE_MS,
+        stream_prefix: str = "memory_manager:ingest"
+    ):
+        """
+        初始化分区记忆写入
+
+        Args:
+            store_batch: 批次写入函数，返回需要稍后重试的对话，整批失败时抛出异常
+            batch_size: 对话批次大小，或返回当前批次大小的函数
+            partitions: 分区数量
+            worker_count: 进程总数
+            read_count: 每次读取的最大消息数
+            block_ms: 阻塞读取时间(毫秒)
+            lease_ms: 分区租约有效期(毫秒)
+            stream_prefix: Stream 键前缀
+        """
+        self.store_batch = store_batch
+        self._batch_size = batch_size
+        self.partitions = max(1, partitions)
+        # 本进程先领取的分区数
+        self.share = math.ceil(self.partitions / max(1, worker_count))
+        self.read_count = read_count
+        self.block_ms = block_ms
+        self.lease_ms = max(1000, lease_ms)
+        self.stream_prefix = stream_prefix
+        self._key_builder = MemoryKeyBuilder()
+        # 每个进程的消费者名称唯一，重启后的进程通过 XAUTOCLAIM 接管之前的未确认消息
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        # 分区 -> 会话键 -> 已读取未写入的 (消息ID, 对话)
+        self._buffers: Dict[int, Dict[str, List[Tuple[Any, Dict[str, Any]]]]] = {}
+        # 持有租约的分区 -> 分区消费者
+        self._consumers: Dict[int, asyncio.Task] = {}
+        # 已接管未确认消息、可以读取新消息的分区
+        self._readable: set = set()
+        # 上一轮无人持有租约的分区
+        self._orphans: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._stopping = False
+        self._start_lock = asyncio.Lock()
+        self._lags: Deque[float] = deque(maxlen=_LAG_SAMPLES)
+        self._stats = {
+            "submitted": 0,
+            "processed_count": 0,
+            "stored_batches": 0,
+            "stored_dialogs": 0,
+            "retry_count": 0,
+            "error_count": 0,
+        }
+
+    @property
+    def batch_size(self) -> int:
+        """当前对话批次大小"""
+        size = self._batch_size() if callable(self._batch_size) else self._batch_size
+        return max(1, size or 1)
+
+    def stream_key(self, partition: int) -> str:
+        """分区的 Stream 键"""
+        return f"{self.stream_prefix}:{partition}"
+
+    @property
+    def owned_partitions(self) -> List[int]:
+        """本进程持有租约的分区"""
+        return sorted(self._consumers)
+
+    def lease_key(self, partition: int) -> str:
+        """分区的租约键"""
+        return f"{self.stream_prefix}:lease:{partition}"
+
+    def partition_of(self, user_id: str, role_id: str, session_id: Optional[str] = None) -> int:
+        """
+        会话所属分区，所有进程计算结果一致
+
+        Args:
+            user_id: 用户ID
+            role_id: 角色ID
+            session_id: 会话ID
+
+        Returns:
+            int: 分区编号
+        """
+        key = self._key_builder.build_user_cache_key(user_id, role_id, session_id)
+        return zlib.crc32(key.encode("utf-8")) % self.partitions
+
+    @staticmethod
+    def _message(data: Optional[Dict[str, Any]], user_id: str, role_id: str, session_id: Optional[str],
+                 flush: bool = False) -> str:
+        message = {"user_id": user_id, "role_id": role_id, "session_id": session_id, "queue_time": time.time()}
+        if data is not None:
+            message["data"] = data
+        if flush:
+            message["flush"] = True
+        return serialize_with_datetime(message)
+
+    async def submit(self, data: Dict[str, Any], user_id: str, role_id: str, session_id: Optional[str] = None,
+                     flush: bool = False) -> bool:
+        """
+        写入一条对话
+
+        Args:
+            data: 对话数据
+            user_id: 用户ID，必填
+            role_id: 角色ID，必填
+            session_id: 会话ID，可选
+            flush: 是否立即写入该会话缓存的对话，不等待批次填满
+
+        Returns:
+            bool: 是否成功写入分区
+        """
+        try:
+            redis = await get_async_redis()
+            partition = self.partition_of(user_id, role_id, session_id)
+            await redis.xadd(self.stream_key(partition), {"m": self._message(data, user_id, role_id, session_id, flush)})
+            self._stats["submitted"] += 1
+            return True
+        except Exception as e:
+            logger.error(f"对话写入分区失败，用户: {user_id}, 角色: {role_id}, 会话: {session_id}: {e}")
+            return False
+
+    async def submit_many(self, items: List[Dict[str, Any]]) -> int:
+        """
+        批量写入对话，一次往返
+
+        Args:
+            items: 对话列表，每项包含 data, user_id, role_id, 以及可选的 session_id
+
+        Returns:
+            int: 成功写入的对话数量
+        """
+        if not items:
+            return 0
+        try:
+            redis = await get_async_redis()
+            pipe = redis.pipeline(transaction=False)
+            for item in items:
+                partition = self.partition_of(item["user_id"], item["role_id"], item.get("session_id"))
+                pipe.xadd(self.stream_key(partition),
+                          {"m": self._message(item["data"], item["user_id"], item["role_id"], item.get("session_id"))})
+            await pipe.execute()
+            self._stats["submitted"] += len(items)
+            return len(items)
+        except Exception as e:
+            logger.error(f"批量写入分区失败: {e}")
+            return 0
+
+    async def flush(self, user_id: str, role_id: str, session_id: Optional[str] = None) -> bool:
+        """
+        立即写入会话缓存的对话（在该会话已写入的对话之后处理）
+
+        Args:
+            user_id: 用户ID
+            role_id: 角色ID
+            session_id: 会话ID
+
+        Returns:
+            bool: 是否成功写入分区
+        """
+        try:
+            redis = await get_async_redis()
+            partition = self.partition_of(user_id, role_id, session_id)
+            await redis.xadd(self.stream_key(partition), {"m": self._message(None, user_id, role_id, session_id, True)})
+            return True
+        except Exception as e:
+            logger.error(f"写入刷新消息失败，用户: {user_id}, 角色: {role_id}, 会话: {session_id}: {e}")
+            return False
+
+    async def flush_all(self) -> None:
+        """立即写入所有分区缓存的对话"""
+        redis = await get_async_redis()
+        pipe = redis.pipeline(transaction=False)
+        for partition in range(self.partitions):
+            pipe.xadd(self.stream_key(partition), {"m": serialize_with_datetime({"flush_all": True})})
+        await pipe.execute()
+
+    async def import_legacy_lists(self) -> int:
+        """
+        把升级前等待队列与对话缓存列表中的对话按顺序写入分区并删除列表
+
+        Returns:
+            int: 导入的对话数量
+        """
+        redis = await get_async_redis()
+        imported = 0
+        keys = []
+        for pattern in ("memory_manager:waiting:*", "memory_manager:dialog_cache:*"):
+            keys += [key async for key in redis.scan_iter(match=pattern, count=500)]
+        for key in keys:
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            try:
+                user_id, role_id, session_id = self._key_builder.parse_cache_key(key.split(":", 2)[-1])
+                async with redis.pipeline() as pipe:
+                    pipe.lrange(key, 0, -1)
+                    pipe.delete(key)
+                    dialogs = (await pipe.execute())[0]
+                items = [{"data": deserialize_datetime_aware(dialog), "user_id": user_id, "role_id": role_id,
+                          "session_id": session_id} for dialog in dialogs]
+                imported += await self.submit_many(items)
+            except Exception as e:
+                logger.error(f"导入旧对话缓存失败: {key}, 错误: {e}")
+        if imported:
+            logger.info(f"已将 {imported} 条旧对话缓存导入分区")
+        return imported
+
+    async def start(self) -> None:
+        """领取分区租约并启动分区读取"""
+        async with self._start_lock:
+            if self.running:
+                return
+            self._stopping = False
+            self._orphans = set()
+            await self._balance()
+            self._tasks = [asyncio.create_task(self._read()), asyncio.create_task(self._lease())]
+            logger.info(f"记忆分区消费者已启动 ({self.consumer_name})，分区: {self.owned_partitions} / {self.partitions}")
+
+    @property
+    def running(self) -> bool:
+        """分区读取是否在运行"""
+        return bool(self._tasks) and not all(task.done() for task in self._tasks)
+
+    async def close(self) -> None:
+        """停止分区消费者并释放租约，未写入的对话保留在分区中，由接管分区的进程继续处理"""
+        self._stopping = True
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        partitions = self.owned_partitions
+        for partition in partitions:
+            await self._drop(partition)
+        try:
+            redis = await get_async_redis()
+            for partition in partitions:
+                await redis.eval(_RELEASE_SCRIPT, 1, self.lease_key(partition), self.consumer_name)
+        except Exception as e:
+            logger.error(f"释放记忆分区租约失败: {e}")
+        logger.info("记忆分区消费者已停止")
+
+    async def _lease(self) -> None:
+        """每 1/3 租约有效期续约并重新分配分区"""
+        while not self._stopping:
+            await asyncio.sleep(self.lease_ms / 3000)
+            try:
+                await self._balance()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["error_count"] += 1
+                logger.error(f"记忆分区租约续约异常: {e}")
+
+    async def _balance(self) -> None:
+        """续约持有的分区，续约失败的分区停止消费；再领取空闲分区直到持有 share 个，上一轮已无人持有的分区直接领取"""
+        redis = await get_async_redis()
+        owned = self.owned_partitions
+        if owned:
+            pipe = redis.pipeline(transaction=False)
+            for partition in owned:
+                pipe.eval(_RENEW_SCRIPT, 1, self.lease_key(partition), self.consumer_name, self.lease_ms)
+            for partition, renewed in zip(owned, await pipe.execute()):
+                if not renewed:
+                    logger.warning(f"记忆分区 {partition} 租约已失效，停止消费")
+                    await self._drop(partition)
+
+        holders = await redis.mget([self.lease_key(p) for p in range(self.partitions)])
+        free = [p for p, holder in enumerate(holders) if holder is None]
+        # 从随机位置开始领取，进程同时启动时分区分散到不同进程
+        offset = random.randrange(self.partitions)
+        free.sort(key=lambda p: (p - offset) % self.partitions)
+        for partition in free:
+            if len(self._consumers) >= self.share and partition not in self._orphans:
+                continue
+            if await redis.set(self.lease_key(partition), self.consumer_name, nx=True, px=self.lease_ms):
+                await self._acquire(partition)
+        self._orphans = set(free) - set(self._consumers)
+
+    async def _acquire(self, partition: int) -> None:
+        """开始消费已领取租约的分区"""
+        redis = await get_async_redis()
+        try:
+            await redis.xgroup_create(self.stream_key(partition), _GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._buffers[partition] = {}
+        # 分区消费者处理不过来时读取暂停
+        self._queues[partition] = asyncio.Queue(maxsize=2)
+        self._consumers[partition] = asyncio.create_task(self._consume(partition))
+        logger.info(f"已领取记忆分区 {partition}")
+
+    async def _drop(self, partition: int) -> None:
+        """停止消费分区，已读取未确认的消息由接管分区的进程重新处理"""
+        self._readable.discard(partition)
+        task = self._consumers.pop(partition, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._queues.pop(partition, None)
+        self._buffers.pop(partition, None)
+
+    async def _claim(self, partition: int) -> None:
+        """接管分区所有未确认的消息并按消息ID顺序处理，再清理没有未确认消息的旧消费者"""
+        redis = await get_async_redis()
+        stream = self.stream_key(partition)
+        start_id = "0-0"
+        while True:
+            # 持有租约即独占分区，不需要等待消息空闲
+            response = await redis.xautoclaim(stream, _GROUP, self.consumer_name, min_idle_time=0,
+                                              start_id=start_id, count=self.read_count)
+            start_id = response[0]
+            # 已删除的消息没有内容
+            entries = [entry for entry in response[1] if entry and entry[1]]
+            if entries:
+                await self._handle(partition, entries)
+            if start_id in (b"0-0", "0-0"):
+                break
+        try:
+            for consumer in await redis.xinfo_consumers(stream, _GROUP):
+                name = consumer["name"]
+                name = name.decode("utf-8") if isinstance(name, bytes) else name
+                if name != self.consumer_name and not consumer["pending"]:
+                    await redis.xgroup_delconsumer(stream, _GROUP, name)
+        except Exception as e:
+            logger.warning(f"清理记忆分区 {partition} 的旧消费者失败: {e}")
+
+    async def _read(self) -> None:
+        """阻塞读取本进程可以读取的分区的新消息"""
+        # 阻塞读取被取消时 redis 客户端可能吞掉取消，以停止标记为准
+        while not self._stopping:
+            try:
+                readable = {self.stream_key(p).encode("utf-8"): p for p in self._readable}
+                if not readable:
+                    await asyncio.sleep(min(self.block_ms, 50) / 1000)
+                    continue
+                redis = await get_async_redis()
+                response = await redis.xreadgroup(_GROUP, self.consumer_name,
+                                                  {stream.decode("utf-8"): ">" for stream in readable},
+                                                  count=self.read_count, block=self.block_ms)
+                received = False
+                for stream, entries in response or []:
+                    stream = stream if isinstance(stream, bytes) else stream.encode("utf-8")
+                    queue = self._queues.get(readable[stream])
+                    # 读取期间失去租约的分区不再处理，消息由接管的进程重新处理
+                    if entries and queue is not None and readable[stream] in self._readable:
+                        received = True
+                        await queue.put(entries)
+                if not received:
+                    # 不支持阻塞读取的服务端（如部分代理）会立即返回空结果，避免空转
+                    await asyncio.sleep(min(self.block_ms, 50) / 1000)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._stopping:
+                    return
+                self._stats["error_count"] += 1
+                logger.error(f"读取记忆分区异常: {e}")
+                await asyncio.sleep(1)
+
+    async def _consume(self, partition: int) -> None:
+        """分区消费者：先接管未确认的消息，再按读取顺序处理分区的新消息"""
+        queue = self._queues[partition]
+        while True:
+            try:
+                await self._claim(partition)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["error_count"] += 1
+                logger.error(f"接管记忆分区 {partition} 未确认消息异常: {e}")
+                await asyncio.sleep(1)
+        self._readable.add(partition)
+        while True:
+            entries = await queue.get()
+            try:
+                await self._handle(partition, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 未确认的消息由下一个持有租约的消费者重新处理
+                self._stats["error_count"] += 1
+                logger.error(f"记忆分区 {partition} 处理异常: {e}")
+
+    async def _handle(self, partition: int, entries: List[Tuple[Any, Dict[Any, Any]]]) -> None:
+        """处理一次读取的消息：按会话分组，会话之间并发，会话内按顺序"""
+        groups: "OrderedDict[str, List[Tuple[Any, Dict[str, Any]]]]" = OrderedDict()
+        done_ids: List[Any] = []
+        flush_all = False
+        for entry_id, fields in entries:
+            self._stats["processed_count"] += 1
+            try:
+                message = deserialize_datetime_aware(fields.get(b"m") or fields.get("m"))
+            except Exception as e:
+                logger.error(f"解析分区消息失败: {entry_id}, 错误: {e}")
+                done_ids.append(entry_id)
+                continue
+            if message.get("flush_all"):
+                flush_all = True
+                done_ids.append(entry_id)
+                continue
+            if not message.get("user_id") or not message.get("role_id"):
+                logger.error(f"分区消息缺少必要字段: user_id={message.get('user_id')}, role_id={message.get('role_id')}")
+                done_ids.append(entry_id)
+                continue
+            key = self._key_builder.build_user_cache_key(message["user_id"], message["role_id"], message.get("session_id"))
+            groups.setdefault(key, []).append((entry_id, message))
+
+        results = await asyncio.gather(*(self._handle_session(partition, key, items) for key, items in groups.items()))
+        for ids in results:
+            done_ids.extend(ids)
+        if flush_all:
+            buffers = self._buffers.get(partition, {})
+            results = await asyncio.gather(*(self._store(partition, key) for key in list(buffers)))
+            for ids in results:
+                done_ids.extend(ids)
+        if done_ids:
+            redis = await get_async_redis()
+            stream = self.stream_key(partition)
+            pipe = redis.pipeline(transaction=False)
+            pipe.xack(stream, _GROUP, *done_ids)
+            pipe.xdel(stream, *done_ids)
+            await pipe.execute()
+
+    async def _handle_session(self, partition: int, key: str, items: List[Tuple[Any, Dict[str, Any]]]) -> List[Any]:
+        """按顺序处理一个会话的消息，返回可以确认的消息ID"""
+        buffers = self._buffers.setdefault(partition, {})
+        done_ids = []
+        for entry_id, message in items:
+            # 写入后缓存会被替换，每条消息重新获取
+            buffer = buffers.setdefault(key, [])
+            data = message.get("data")
+            if data:
+                data.setdefault("_queue_time", message.get("queue_time"))
+                buffer.append((entry_id, data))
+            else:
+                # 刷新消息没有对话内容
+                done_ids.append(entry_id)
+            if buffer and (message.get("flush") or len(buffer) >= self.batch_size):
+                done_ids.extend(await self._store(partition, key))
+        return done_ids
+
+    async def _store(self, partition: int, key: str) -> List[Any]:
+        """写入会话缓存的对话，需要重试的对话留在缓存中，返回可以确认的消息ID"""
+        buffer = self._buffers.get(partition, {}).pop(key, [])
+        if not buffer:
+            return []
+        user_id, role_id, session_id = self._key_builder.parse_cache_key(key)
+        dialogs = []
+        queue_times = {}
+        for _, data in buffer:
+            queue_time = data.pop("_queue_time", None)
+            if queue_time:
+                queue_times[id(data)] = queue_time
+            dialogs.append(data)
+        try:
+            pending = await self.store_batch(user_id, role_id, session_id, dialogs) or []
+        except Exception as e:
+            self._stats["error_count"] += 1
+            logger.error(f"记忆写入失败，整批稍后重试，用户: {user_id}, 角色: {role_id}, 会话: {session_id}: {e}")
+            # 批次写入失败，所有对话都不确认
+            pending = dialogs
+        pending_ids = {id(dialog) for dialog in pending}
+        retry = [(entry_id, data) for entry_id, data in buffer if id(data) in pending_ids]
+        for _, data in retry:
+            if id(data) in queue_times:
+                data["_queue_time"] = queue_times[id(data)]
+        if retry and partition in self._buffers:
+            # 保持顺序，与该会话之后的对话一起重试
+            self._stats["retry_count"] += len(retry)
+            self._buffers[partition][key] = retry + self._buffers[partition].get(key, [])
+        self._stats["stored_batches"] += 1
+        self._stats["stored_dialogs"] += len(buffer) - len(retry)
+        if queue_times:
+            self._lags.append(time.time() - min(queue_times.values()))
+        return [entry_id for entry_id, data in buffer if id(data) not in pending_ids]
+
+    def pending_count(self, user_id: str = None, role_id: str = None, session_id: Optional[str] = None) -> int:
+        """
+        本进程已读取但未写入的对话数量
+
+        Args:
+            user_id: 用户ID，与role_id一起指定时只统计该会话
+            role_id: 角色ID
+            session_id: 会话ID
+
+        Returns:
+            int: 未写入的对话数量
+        """
+        if user_id and role_id:
+            partition = self.partition_of(user_id, role_id, session_id)
+            key = self._key_builder.build_user_cache_key(user_id, role_id, session_id)
+            return len(self._buffers.get(partition, {}).get(key, []))
+        return sum(len(buffer) for buffers in self._buffers.values() for buffer in buffers.values())
+
+    async def get_status(self) -> Dict[str, Any]:
+        """
+        获取分区状态
+
+        Returns:
+            Dict[str, Any]: 分区长度、未写入对话数量、处理统计与写入延迟(秒)
+        """
+        lengths = {}
+        try:
+            redis = await get_async_redis()
+            pipe = redis.pipeline(transaction=False)
+            for partition in range(self.partitions):
+                pipe.xlen(self.stream_key(partition))
+            lengths = dict(zip(range(self.partitions), await pipe.execute()))
+        except Exception as e:
+            logger.error(f"获取分区长度失败: {e}")
+        lags = sorted(self._lags)
+        return {
+            **self._stats,
+            "partitions": self.partitions,
+            "owned_partitions": self.owned_partitions,
+            "partition_lengths": lengths,
+            "buffered_dialogs": self.pending_count(),
+            "lag_p50": lags[len(lags) // 2] if lags else 0.0,
+            "lag_max": lags[-1] if lags else 0.0,
+            "running": self.running,
+        }
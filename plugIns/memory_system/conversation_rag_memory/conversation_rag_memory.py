@@ -121,6 +121,32 @@ class ConversationRAGMemory(MemoryInterface):
             traceback.print_exc()
             raise
 
+    def _check_user_metadata(self, user_metadata: Optional[UserMetadata]) -> Optional[str]:
+        """检查存储所需的用户元数据，返回错误信息"""
+        if not user_metadata:
+            return "必须提供user_metadata"
+        if not user_metadata.user_id:
+            return "user_metadata中缺少必填字段user_id"
+        if not user_metadata.role_id:
+            return "user_metadata中缺少必填字段role_id"
+        return None
+
+    @staticmethod
+    def _build_document(data: MemoryContext, user_metadata: UserMetadata) -> Dict[str, Any]:
+        """构建向量存储文档"""
+        return {
+            "text": data.content,
+            "user_id": user_metadata.user_id,
+            "role_id": user_metadata.role_id,
+            "session_id": user_metadata.session_id or "",
+            "conversation_id": data.conversation_id or "",
+            "message_id": data.message_id or str(uuid.uuid4()),
+            "parent_message_id": data.parent_message_id or "",
+            "role": data.source,  # 使用source作为role
+            "timestamp": data.timestamp.isoformat() if data.timestamp else datetime.now().isoformat(),
+            "metadata": json.dumps(data.metadata or {})
+        }
+
     async def store(self, data: MemoryContext, user_metadata: Optional[UserMetadata] = None) -> bool:
         """
         存储对话数据到记忆系统
@@ -137,17 +163,9 @@ class ConversationRAGMemory(MemoryInterface):
             
         try:
             # 验证user_metadata是否有效
-            if not user_metadata:
-                self._logger.error("存储失败: 必须提供user_metadata")
-                return False
-            
-            # 确保user_id和role_id存在
-            if not user_metadata.user_id:
-                self._logger.error("存储失败: user_metadata中缺少必填字段user_id")
-                return False
-                
-            if not user_metadata.role_id:
-                self._logger.error("存储失败: user_metadata中缺少必填字段role_id")
+            error = self._check_user_metadata(user_metadata)
+            if error:
+                self._logger.error(f"存储失败: {error}")
                 return False
             
             # 直接使用MemoryContext对象属性
@@ -157,18 +175,7 @@ class ConversationRAGMemory(MemoryInterface):
                 return True
             
             # 构建文档
-            document = {
-                "text": text,
-                "user_id": user_metadata.user_id,
-                "role_id": user_metadata.role_id,
-                "session_id": user_metadata.session_id or "",
-                "conversation_id": data.conversation_id or "",
-                "message_id": data.message_id or str(uuid.uuid4()),
-                "parent_message_id": data.parent_message_id or "",
-                "role": data.source,  # 使用source作为role
-                "timestamp": data.timestamp.isoformat() if data.timestamp else datetime.now().isoformat(),
-                "metadata": json.dumps(data.metadata or {})
-            }
+            document = self._build_document(data, user_metadata)
             
             # 生成嵌入向量
             embeddings = self._embedding_engine.embed_documents([text])
@@ -183,6 +190,52 @@ class ConversationRAGMemory(MemoryInterface):
             import traceback
             traceback.print_exc()
             return False
+
+    async def store_many(self, items: List[MemoryContext],
+                         user_metadata: Optional[UserMetadata] = None) -> List[Optional[Exception]]:
+        """
+        批量存储对话数据，所有对话一次嵌入、一次写入向量数据库
+
+        Args:
+            items: 要存储的对话数据列表
+            user_metadata: 用户元数据，必须包含user_id和role_id两个必填字段
+
+        Returns:
+            List[Optional[Exception]]: 与items一一对应的存储结果，None表示成功，
+                向量数据库未确认写入的对话为RuntimeError，调用方可以重试
+        """
+        results: List[Optional[Exception]] = [None] * len(items)
+        error = self._check_user_metadata(user_metadata)
+        if error:
+            self._logger.error(f"批量存储失败: {error}")
+            return [ValueError(error) for _ in items]
+
+        # 内容为空的对话跳过存储，与store一致视为成功
+        indexes = [i for i, data in enumerate(items) if data.content]
+        if not indexes:
+            return results
+
+        try:
+            if not self._is_initialized:
+                await self._initialize()
+            documents = [self._build_document(items[i], user_metadata) for i in indexes]
+            embeddings = self._embedding_engine.embed_documents([document["text"] for document in documents])
+            inserted = await self._vector_store.add_documents_status(documents, embeddings)
+            # 未确认写入的对话记为失败，由调用方重试
+            for i, ok in zip(indexes, inserted):
+                if not ok:
+                    results[i] = RuntimeError("向量数据库未确认写入该对话记录")
+            added = sum(1 for ok in inserted if ok)
+            if added != len(documents):
+                self._logger.warning(f"向量数据库确认写入 {added}/{len(documents)} 条对话记录")
+            self._logger.info(f"成功批量存储 {added} 条对话记录，用户:{user_metadata.user_id}，"
+                              f"角色:{user_metadata.role_id}")
+        except Exception as e:
+            # 嵌入与写入都是一次调用，失败时该批次的每条对话都未写入
+            self._logger.error(f"批量存储对话记录失败: {e}")
+            for i in indexes:
+                results[i] = e
+        return results
     
     async def retrieve(self, query: str, top_k: int = 5, user_metadata: Optional[UserMetadata] = None, **kwargs) -> \
             List[Dict[str, Any]]:
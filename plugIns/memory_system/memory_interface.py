@@ -33,6 +33,30 @@ class MemoryInterface(ABC):
         """
         pass
 
+    async def store_many(self, items: List[MemoryContext],
+                         user_metadata: Optional[UserMetadata] = None) -> List[Optional[Exception]]:
+        """
+        批量存储数据到记忆系统（通用实现，逐条调用store）
+
+        支持批量嵌入与写入的子类应覆盖此方法，一次嵌入、一次写入所有记忆
+
+        Args:
+            items: 要存储的数据列表
+            user_metadata: 用户元数据，必须包含user_id和role_id两个必填字段
+
+        Returns:
+            List[Optional[Exception]]: 与items一一对应的存储结果，None表示成功，
+                ValueError表示数据被拒绝（不应重试），其他异常表示可能是临时问题
+        """
+        results: List[Optional[Exception]] = []
+        for item in items:
+            try:
+                stored = await self.store(item, user_metadata=user_metadata)
+                results.append(None if stored else ValueError(f"{self.name} 未接受该记忆"))
+            except Exception as e:
+                results.append(e)
+        return results
+
     @abstractmethod
     async def retrieve(self, query: str, top_k: int = 5, user_metadata: Optional[UserMetadata] = None, **kwargs) -> \
             List[Dict[str, Any]]:
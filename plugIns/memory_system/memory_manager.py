@@ -6,14 +6,13 @@ import threading
 from datetime import datetime
 from collections import defaultdict
 
-from knowledge_api.framework.redis.connection import get_async_redis
 from .memory_factory import MemoryFactory, MemoryLevel
 from .memory_interface import MemoryInterface, UserMetadata
 from plugIns.memory_system.cache_system.memory_queue import MemoryQueueManager
+from plugIns.memory_system.cache_system.memory_ingestion import PartitionedMemoryIngestion
 from knowledge_api.framework.redis.redis_lock import RedisLock
 from plugIns.memory_system.cache_system.dialog_history_manager import DialogHistoryManager
 from .model import MemoryContext
-from .utils.json_utils import serialize_with_datetime, deserialize_datetime_aware
 from .utils.key_utils import MemoryKeyBuilder
 
 
@@ -95,9 +94,6 @@ class MemoryManager:
             self._history_manager = DialogHistoryManager.get_instance(max_history_size=max_history_size)
             self._logger.info(f"对话历史管理器初始化完成，最大历史轮数: {max_history_size}")
 
-            # 后台任务列表
-            self._background_tasks = {}
-
             # 队列处理相关
             self._use_queue = use_queue
             self._queue_manager = None
@@ -109,6 +105,12 @@ class MemoryManager:
             from .processors.dialog_batch_processor import DialogBatchProcessor
             self._batch_processor = DialogBatchProcessor(self)
 
+            # 记忆写入分区：同一会话的对话由所属分区的消费者按顺序写入
+            self._ingestion = PartitionedMemoryIngestion(
+                store_batch=self._batch_processor.store_dialog_batch,
+                batch_size=lambda: self._dialog_batch_size
+            )
+
             # 如果启用队列，初始化队列管理器
             if self._use_queue:
                 self._init_queue_manager()
@@ -168,6 +170,11 @@ class MemoryManager:
             await self._queue_manager.initialize()
             self._logger.info("队列管理器已初始化完成")
 
+    async def _ensure_ingestion_started(self):
+        """确保本进程负责的记忆分区消费者已启动"""
+        if not self._ingestion.running:
+            await self._ingestion.start()
+
     async def set_memory_level(self, level: Union[int, MemoryLevel], **kwargs) -> bool:
         """
         设置当前使用的记忆级别
@@ -388,52 +395,21 @@ class MemoryManager:
             data['timestamp'] = datetime.now().isoformat()
             self._logger.info(f"添加时间戳: {data['timestamp']}")
 
-        # 检查是否有任务正在处理
-        redis = await get_async_redis()
-        processing_lock_key = self._key_builder.build_processing_lock_key(user_id, role_id, session_id)
-        is_processing = await redis.exists(f"redis_lock:{processing_lock_key}")
-
-        # 使用Redis存储对话缓存
-        dialog_cache_key = self._key_builder.build_dialog_cache_key(user_id, role_id, session_id)
-        # 序列化对话数据
-        dialog_json = serialize_with_datetime(data)
-        self._logger.info(f"序列化对话数据成功，准备存入Redis")
-        await redis.rpush(dialog_cache_key, dialog_json)
-
-        # 获取当前缓存大小
-        current_size = await redis.llen(dialog_cache_key)
-        self._logger.info(
-            f"将对话添加到Redis缓存, 用户:{user_id}, 角色:{role_id}, 会话:{session_id}, 当前缓存大小: {current_size}, 批次阈值: {self._dialog_batch_size}")
-
-        # 输出状态信息，便于调试
-        if is_processing:
-            self._logger.info(f"当前有处理任务正在执行, 用户: {user_id}, 角色: {role_id}, 会话: {session_id}")
-
-        # 检查是否需要立即存储
-        should_process = force_immediate or current_size >= self._dialog_batch_size
-
-        if should_process and not is_processing:
-            # 如果没有正在处理的任务，则获取锁进行处理
-            self._logger.info(f"触发存储条件且无处理任务正在执行，准备处理, 用户:{user_id}, 角色:{role_id}, 会话:{session_id}")
-
-            # 创建异步任务处理
-            try:
-                task = asyncio.create_task(self._process_dialog_batch(user_id, role_id, session_id))
-                self._logger.info(f"已创建异步处理任务, 用户:{user_id}, 角色:{role_id}, 会话:{session_id}")
-            except Exception as e:
-                self._logger.error(f"创建异步处理任务失败: {e}")
-                return False
-        elif should_process and is_processing:
-            self._logger.info(f"触发存储条件但已有处理任务在执行，添加到缓存等待后续处理, 用户:{user_id}, 角色:{role_id}, 会话:{session_id}")
-        else:
-            self._logger.info(f"不需要立即存储，返回成功, 用户:{user_id}, 角色:{role_id}, 会话:{session_id}")
+        # 写入会话所属分区，由分区消费者按顺序缓存到批次大小后写入记忆系统
+        await self._ensure_ingestion_started()
+        success = await self._ingestion.submit(data, user_id, role_id, session_id, flush=force_immediate)
+        if not success:
+            self._logger.error(f"对话写入分区失败, 用户:{user_id}, 角色:{role_id}, 会话:{session_id}")
+            return False
 
+        self._logger.info(f"对话已写入分区 {self._ingestion.partition_of(user_id, role_id, session_id)}, "
+                          f"用户:{user_id}, 角色:{role_id}, 会话:{session_id}")
         self._logger.info(f"===== 存储过程结束 =====")
         return True
 
     async def _process_dialog_batch(self, user_id: str, role_id: str, session_id: Optional[str] = None) -> bool:
         """
-        处理对话批次 - 委托给对话批次处理器
+        处理对话批次 - 由会话所属分区的消费者在已写入的对话之后立即写入缓存的对话
 
         Args:
             user_id: 用户ID
@@ -441,9 +417,42 @@ class MemoryManager:
             session_id: 会话ID
 
         Returns:
-            bool: 处理是否成功
+            bool: 刷新消息是否写入成功
+        """
+        await self._ensure_ingestion_started()
+        return await self._ingestion.flush(user_id, role_id, session_id)
+
+    async def store_many(self,
+                         memory_contexts: List[Union[MemoryContext, Dict[str, Any]]],
+                         user_id: str,
+                         role_id: str,
+                         session_id: Optional[str] = None) -> List[Optional[Exception]]:
         """
-        return await self._batch_processor.process_dialog_batch(user_id, role_id, session_id)
+        批量存储数据到当前记忆系统，不经过批处理，支持批量写入的记忆系统一次嵌入、一次写入
+
+        Args:
+            memory_contexts: 要存储的记忆内容列表，MemoryContext对象或符合其结构的字典
+            user_id: 用户ID，必填
+            role_id: 角色ID，必填
+            session_id: 会话ID，可选
+
+        Returns:
+            List[Optional[Exception]]: 与memory_contexts一一对应的存储结果，None表示成功
+        """
+        if not user_id or not role_id:
+            self._logger.error(f"批量存储失败: user_id和role_id都是必填字段")
+            return [ValueError("user_id和role_id都是必填字段") for _ in memory_contexts]
+        if self._current_memory is None:
+            return [RuntimeError("未设置记忆系统") for _ in memory_contexts]
+
+        items = [MemoryContext.from_dict(dict(context)) if isinstance(context, dict) else context
+                 for context in memory_contexts]
+        user_metadata = await self.get_or_create_user_metadata(user_id, role_id, session_id)
+        results = await self._current_memory.store_many(items, user_metadata=user_metadata)
+        failed = sum(1 for error in results if error is not None)
+        self._logger.info(f"批量存储完成, 用户:{user_id}, 角色:{role_id}, 会话:{session_id}, "
+                          f"成功: {len(items) - failed}/{len(items)}")
+        return results
 
     async def retrieve(self, query: str,
                       user_id: str,
@@ -916,29 +925,14 @@ class MemoryManager:
             role_id: 角色ID，如果指定则只处理该角色的对话
             session_id: 会话ID，如果指定则只处理该会话的对话
         """
-        async with RedisLock("memory_manager_v2:force_process", expire=10) as lock_acquired:
-            if not lock_acquired:
-                self._logger.warning(f"获取强制处理对话锁失败")
-                return
-
-            if user_id and role_id:
-                # 处理特定用户角色的对话
-                await self._process_dialog_batch(user_id, role_id, session_id)
-            else:
-                # 处理所有待处理的对话 - 需要从Redis中获取所有缓存键
-                # 这里简化处理，实际应用中可能需要更复杂的逻辑
-                redis = await get_async_redis()
-                pattern = "memory_manager:dialog_cache:*"
-                keys = await redis.keys(pattern)
-
-                for key in keys:
-                    # 解析键值获取用户ID、角色ID和会话ID
-                    try:
-                        cache_part = key.split(":", 3)[-1]  # 去掉前缀
-                        user_id_part, role_id_part, session_id_part = self._key_builder.parse_cache_key(cache_part)
-                        await self._process_dialog_batch(user_id_part, role_id_part, session_id_part)
-                    except Exception as e:
-                        self._logger.error(f"解析缓存键失败: {key}, 错误: {e}")
+        if user_id and role_id:
+            # 处理特定用户角色的对话
+            await self._process_dialog_batch(user_id, role_id, session_id)
+        else:
+            # 导入升级前残留的对话缓存列表，再刷新所有分区
+            await self._ensure_ingestion_started()
+            await self._ingestion.import_legacy_lists()
+            await self._ingestion.flush_all()
 
     def set_dialog_batch_size(self, batch_size: int) -> None:
         """
@@ -970,11 +964,9 @@ class MemoryManager:
             session_id: 会话ID
 
         Returns:
-            int: 待处理对话数量
+            int: 本进程负责的分区中已读取、未达到批次大小的对话数量
         """
-        # 这需要异步调用Redis，但这个方法是同步的，所以返回0
-        # 在实际应用中，可能需要改为异步方法
-        return 0
+        return self._ingestion.pending_count(user_id, role_id, session_id)
 
     def enable_queue(self, enabled: bool = True):
         """
@@ -1028,10 +1020,11 @@ class MemoryManager:
         return await self._queue_manager.store_batch(items)
 
     async def close_queue(self):
-        """关闭队列管理器"""
+        """关闭队列管理器与记忆分区消费者"""
         if self._queue_manager:
             await self._queue_manager.close()
             self._logger.info("队列管理器已关闭")
+        await self._ingestion.close()
 
     async def get_dialog_history(self, user_id: str, role_id: str, session_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
@@ -1,17 +1,15 @@
-import asyncio
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from knowledge_api.framework.redis.connection import get_async_redis
-from knowledge_api.framework.redis.redis_lock import RedisLock
-from ..utils.json_utils import serialize_with_datetime, deserialize_datetime_aware
-from ..utils.key_utils import MemoryKeyBuilder
 from ..model import MemoryContext
 
 
 class DialogBatchProcessor:
-    """对话批次处理器"""
+    """对话批次处理器
+
+    把记忆分区消费者缓存的一个会话的对话写入历史缓存与当前记忆系统
+    """
     
     def __init__(self, memory_manager):
         """
@@ -22,234 +20,27 @@ class DialogBatchProcessor:
         """
         self.memory_manager = memory_manager
         self._logger = logging.getLogger("DialogBatchProcessor")
-        self._key_builder = MemoryKeyBuilder()
     
-    async def process_dialog_batch(self, user_id: str, role_id: str, session_id: Optional[str] = None) -> bool:
+    async def store_dialog_batch(self, user_id: str, role_id: str, session_id: Optional[str],
+                                 dialog_batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        处理对话批次
+        写入对话批次，由会话所属的记忆分区消费者按顺序调用，同一会话不会并发
 
         Args:
             user_id: 用户ID
             role_id: 角色ID
             session_id: 会话ID
-
-        Returns:
-            bool: 处理是否成功
-        """
-        cache_key = self._key_builder.build_user_cache_key(user_id, role_id, session_id)
-        self._logger.info(f"===== 开始处理对话批次 =====")
-        self._logger.info(f"处理批次参数: user_id={user_id}, role_id={role_id}, session_id={session_id}")
-
-        # 使用Redis锁检查是否正在处理
-        processing_lock_key = self._key_builder.build_processing_lock_key(user_id, role_id, session_id)
-        processing_lock = RedisLock(processing_lock_key, expire=60, max_retries=3)
-        is_processing = False
-
-        try:
-            # 尝试获取处理锁
-            self._logger.info(f"尝试获取处理锁: {cache_key}")
-            is_processing = await processing_lock.acquire()
-
-            if not is_processing:
-                self._logger.warning(f"用户 {user_id} 角色 {role_id} 的对话批次正在处理中，将当前对话加入等待队列")
-
-                # 获取当前缓存中的对话
-                dialog_batch = await self._get_dialog_batch(user_id, role_id, session_id)
-
-                if not dialog_batch:
-                    self._logger.info(f"缓存中没有对话需要处理，用户: {user_id}, 角色: {role_id}")
-                    return True
-
-                # 将对话添加到等待队列
-                return await self._add_to_waiting_queue(user_id, role_id, session_id, dialog_batch)
-
-            self._logger.info(f"成功获取处理锁，开始处理用户 {user_id} 角色 {role_id} 的对话批次")
-
-            # 获取缓存并处理
-            dialog_batch = await self._get_dialog_batch(user_id, role_id, session_id)
-
-            if not dialog_batch:
-                self._logger.info(f"没有对话需要处理，用户: {user_id}, 角色: {role_id}")
-                await processing_lock.release()
-                self._logger.info(f"释放处理锁 (无对话): {cache_key}")
-                return True
-
-            # 在后台处理
-            self._logger.info(f"创建后台任务处理 {len(dialog_batch)} 条对话，用户: {user_id}, 角色: {role_id}")
-            task = asyncio.create_task(self._background_store(user_id, role_id, session_id, dialog_batch, processing_lock))
-            
-            # 将任务添加到管理器的任务列表
-            self.memory_manager._background_tasks[cache_key] = task
-
-            # 成功创建任务
-            self._logger.info(f"成功创建后台处理任务: {cache_key}")
-            return True
-        except Exception as e:
-            self._logger.error(f"获取处理锁过程中出错: {e}")
-            # 确保处理锁被释放
-            if is_processing:
-                try:
-                    await processing_lock.release()
-                    self._logger.info(f"由于异常释放处理锁: {cache_key}")
-                except Exception as release_error:
-                    self._logger.error(f"释放处理锁失败: {release_error}")
-            return False
-        finally:
-            self._logger.info(f"===== 处理对话批次结束 =====")
-
-    async def _get_dialog_batch(self, user_id: str, role_id: str, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """
-        获取并清空对话批次缓存
-        
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID
-            session_id: 会话ID
-            
-        Returns:
-            List[Dict[str, Any]]: 对话批次
-        """
-        dialog_cache_key = self._key_builder.build_dialog_cache_key(user_id, role_id, session_id)
-        self._logger.info(f"获取对话批次，用户: {user_id}, 角色: {role_id}, 会话: {session_id}")
-
-        try:
-            redis = await get_async_redis()
-
-            # 使用管道操作，原子性获取并清空列表
-            async with redis.pipeline() as pipe:
-                # 获取所有元素
-                await pipe.lrange(dialog_cache_key, 0, -1)
-                # 删除列表
-                await pipe.delete(dialog_cache_key)
-                # 执行操作
-                results = await pipe.execute()
-
-            # 解析结果
-            dialog_jsons = results[0]
-
-            if not dialog_jsons:
-                self._logger.info(f"Redis缓存中没有找到用户对话: {user_id}:{role_id}")
-                return []
-
-            # 将JSON解析为对象
-            dialogs = []
-            for i, dialog_json in enumerate(dialog_jsons):
-                try:
-                    dialog = deserialize_datetime_aware(dialog_json)
-                    dialogs.append(dialog)
-                    # 添加详细调试信息
-                    content_preview = dialog.get('content', '')[:50] + ('...' if len(dialog.get('content', '')) > 50 else '')
-                    self._logger.debug(f"获取第 {i+1} 条对话: 角色={dialog.get('source', 'unknown')}, 时间={dialog.get('timestamp', 'unknown')}, 内容={content_preview}")
-                except Exception as e:
-                    self._logger.error(f"解析缓存对话失败: {e}")
-
-            self._logger.info(f"获取到 {len(dialogs)} 条对话，并清空缓存")
-            
-            # 输出获取到的对话摘要信息
-            for i, dialog in enumerate(dialogs):
-                source = dialog.get('source', 'unknown')
-                timestamp = dialog.get('timestamp', 'unknown')
-                content_len = len(dialog.get('content', ''))
-                self._logger.info(f"对话 {i+1}: {source} | {timestamp} | 长度: {content_len}")
-                
-            return dialogs
-        except Exception as e:
-            self._logger.error(f"获取对话批次出错: {e}")
-            return []
-
-    async def _add_to_waiting_queue(self, user_id: str, role_id: str, session_id: Optional[str], dialog_batch: List[Dict[str, Any]]) -> bool:
-        """
-        将对话添加到等待队列
-        
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID  
-            session_id: 会话ID
             dialog_batch: 对话批次
-            
-        Returns:
-            bool: 操作是否成功
-        """
-        waiting_key = self._key_builder.build_waiting_queue_key(user_id, role_id, session_id)
-        
-        try:
-            redis = await get_async_redis()
-            
-            # 序列化对话批次
-            waiting_dialogs = [serialize_with_datetime(dialog) for dialog in dialog_batch]
 
-            # 添加到Redis等待队列
-            pipeline = redis.pipeline()
-            for dialog_str in waiting_dialogs:
-                pipeline.rpush(waiting_key, dialog_str)
-            await pipeline.execute()
-
-            # 获取等待队列长度
-            waiting_count = await redis.llen(waiting_key)
-
-            self._logger.info(
-                f"已将 {len(dialog_batch)} 条对话添加到等待队列，当前等待队列大小: {waiting_count}，用户: {user_id}, 角色: {role_id}")
-            return True
-        except Exception as e:
-            self._logger.error(f"添加对话到等待队列失败: {e}")
-            # 如果添加到等待队列失败，将对话放回缓存
-            await self._restore_dialog_batch(user_id, role_id, session_id, dialog_batch)
-            return False
-
-    async def _restore_dialog_batch(self, user_id: str, role_id: str, session_id: Optional[str], dialog_batch: List[Dict[str, Any]]) -> bool:
-        """
-        恢复对话批次到缓存
-        
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID
-            session_id: 会话ID
-            dialog_batch: 对话批次
-            
         Returns:
-            bool: 恢复是否成功
-        """
-        if not dialog_batch:
-            return True
-
-        dialog_cache_key = self._key_builder.build_dialog_cache_key(user_id, role_id, session_id)
-
-        try:
-            redis = await get_async_redis()
-
-            # 序列化对话并添加到Redis列表
-            pipeline = redis.pipeline()
-            for dialog in dialog_batch:
-                dialog_json = serialize_with_datetime(dialog)
-                # 添加到列表头部，确保这些对话会被先处理
-                pipeline.lpush(dialog_cache_key, dialog_json)
-            await pipeline.execute()
-
-            # 获取当前缓存大小
-            cache_size = await redis.llen(dialog_cache_key)
+            List[Dict[str, Any]]: 因临时问题存储失败、需要稍后重试的对话
 
-            self._logger.info(f"已将 {len(dialog_batch)} 条对话恢复到缓存，当前缓存大小: {cache_size}，用户: {user_id}, 角色: {role_id}")
-            return True
-        except Exception as e:
-            self._logger.error(f"恢复对话批次到缓存失败: {e}")
-            return False 
-
-    async def _background_store(self, user_id: str, role_id: str, session_id: Optional[str], 
-                               dialog_batch: List[Dict[str, Any]], processing_lock: RedisLock) -> None:
-        """
-        后台处理存储任务
-
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID
-            session_id: 会话ID
-            dialog_batch: 对话批次
-            processing_lock: 处理锁
+        Raises:
+            Exception: 整个批次写入失败（如获取用户元数据、批量写入出错），调用方应保留整个批次稍后重试
         """
-        cache_key = self._key_builder.build_user_cache_key(user_id, role_id, session_id)
-        self._logger.info(f"===== 开始后台存储任务 =====")
-        self._logger.info(f"后台存储参数: user_id={user_id}, role_id={role_id}, session_id={session_id}, 对话数量={len(dialog_batch)}")
-        redis = await get_async_redis()
+        self._logger.info(f"===== 开始存储对话批次 =====")
+        self._logger.info(f"存储参数: user_id={user_id}, role_id={role_id}, session_id={session_id}, 对话数量={len(dialog_batch)}")
+        pending_dialogs = []  # 存储失败但可能是因为临时问题的对话
 
         try:
             # 获取用户元数据
@@ -263,8 +54,8 @@ class DialogBatchProcessor:
             self._logger.info(f"存储 {len(dialog_batch)} 条对话到历史缓存，用户: {user_id}, 角色: {role_id}, 会话: {session_id or 'all_sessions'}")
             await self.memory_manager._history_manager.store_dialog_batch(user_id, role_id, session_id, dialog_batch)
 
-            # 强制启用自动汇总，合并对话为一条记录
-            if len(dialog_batch) > 1:
+            # 启用自动汇总时合并对话为一条记录
+            if self.memory_manager._auto_summarize and len(dialog_batch) > 1:
                 self._logger.info(f"执行对话汇总, 对话数量: {len(dialog_batch)}")
 
                 # 获取历史对话
@@ -293,167 +84,57 @@ class DialogBatchProcessor:
                         self._logger.warning(f"汇总数据存储受到限制: {e}")
                     else:
                         self._logger.error(f"汇总数据存储失败: {e}")
+                        # 汇总记录包含整个批次，整批稍后重试
+                        pending_dialogs = list(dialog_batch)
             else:
-                # 只有一条对话，直接存储
-                self._logger.info(f"开始逐个存储 {len(dialog_batch)} 条对话，用户: {user_id}")
-                success_count = 0
-                failed_count = 0
-                pending_dialogs = []  # 存储失败但可能是因为临时问题的对话
+                # 逐条存储：所有对话一次批量写入记忆系统，按条返回结果
+                self._logger.info(f"开始批量存储 {len(dialog_batch)} 条对话，用户: {user_id}")
 
+                # 确保传给插件的是MemoryContext对象，无效的对话单独记为失败
+                results: List[Optional[Exception]] = [None] * len(dialog_batch)
+                memory_contexts, positions = [], []
                 for i, dialog in enumerate(dialog_batch):
                     try:
-                        self._logger.info(f"存储第 {i + 1}/{len(dialog_batch)} 条对话")
-                        
-                        # 确保传给插件的是MemoryContext对象
-                        if isinstance(dialog, dict):
-                            memory_context = MemoryContext.from_dict(dialog)
-                        else:
-                            memory_context = dialog
-                            
-                        await self.memory_manager._current_memory.store(memory_context, user_metadata=user_metadata)
-                        success_count += 1
-                        self._logger.debug(f"第 {i + 1} 条对话存储成功")
+                        memory_contexts.append(MemoryContext.from_dict(dialog) if isinstance(dialog, dict) else dialog)
+                        positions.append(i)
                     except Exception as e:
-                        error_msg = str(e).lower()
-                        # 区分容量限制和其他错误
-                        if "capacity" in error_msg or "limit" in error_msg or "reject" in error_msg:
-                            self._logger.warning(f"第 {i + 1} 条对话存储受限: {e}")
-                            failed_count += 1
-                        else:
-                            self._logger.error(f"第 {i + 1} 条对话存储失败: {e}")
-                            # 对于非容量限制的错误，可能是临时问题，放入待处理列表
-                            pending_dialogs.append(dialog)
-                            failed_count += 1
-
-                # 如果有待处理的对话，放回缓存，下次再处理
+                        results[i] = ValueError(f"对话数据无效: {e}")
+                if memory_contexts:
+                    stored = await self.memory_manager._current_memory.store_many(memory_contexts,
+                                                                                  user_metadata=user_metadata)
+                    for i, error in zip(positions, stored):
+                        results[i] = error
+                failed_count = 0
+                for i, (dialog, error) in enumerate(zip(dialog_batch, results)):
+                    if error is None:
+                        continue
+                    failed_count += 1
+                    error_msg = str(error).lower()
+                    # 区分被拒绝（数据无效、容量限制）和其他错误
+                    if isinstance(error, ValueError) or "capacity" in error_msg or "limit" in error_msg \
+                            or "reject" in error_msg:
+                        self._logger.warning(f"第 {i + 1} 条对话存储受限: {error}")
+                    else:
+                        self._logger.error(f"第 {i + 1} 条对话存储失败: {error}")
+                        # 对于非容量限制的错误，可能是临时问题，放入待处理列表
+                        pending_dialogs.append(dialog)
+
+                # 如果有待处理的对话，留在分区中与之后的对话一起重试
                 if pending_dialogs:
-                    # 恢复到Redis缓存
-                    await self._restore_dialog_batch(user_id, role_id, session_id, pending_dialogs)
-                    self._logger.info(f"将 {len(pending_dialogs)} 条未成功处理的对话放回缓存")
+                    self._logger.info(f"{len(pending_dialogs)} 条对话未成功处理，稍后重试")
 
-                self._logger.info(f"对话存储完成, 成功: {success_count}/{len(dialog_batch)}, 失败: {failed_count}")
+                self._logger.info(f"对话存储完成, 成功: {len(dialog_batch) - failed_count}/{len(dialog_batch)}, "
+                                  f"失败: {failed_count}")
 
-            self._logger.info(f"后台存储任务完成，用户: {user_id}")
+            self._logger.info(f"对话批次存储完成，用户: {user_id}")
         except Exception as e:
             import traceback
             traceback.print_exc()
-            self._logger.error(f"后台存储任务异常: {e}")
-        finally:
-            # 释放处理锁
-            try:
-                self._logger.info(f"准备释放处理锁，用户: {user_id}")
-                await processing_lock.release()
-                self._logger.info(f"处理锁释放成功，用户: {user_id}")
-
-                # 检查等待队列中是否有新的对话需要处理
-                waiting_key = self._key_builder.build_waiting_queue_key(user_id, role_id, session_id)
-
-                # 查看等待队列大小
-                waiting_count = await redis.llen(waiting_key)
-                if waiting_count > 0:
-                    self._logger.info(f"检测到 {waiting_count} 条等待处理的对话，用户: {user_id}, 角色: {role_id}")
-                    # 创建异步任务处理等待队列
-                    asyncio.create_task(self._process_waiting_queue(user_id, role_id, session_id))
-                else:
-                    # 查看普通缓存中是否有未处理的对话
-                    dialog_cache_key = self._key_builder.build_dialog_cache_key(user_id, role_id, session_id)
-                    current_cache_size = await redis.llen(dialog_cache_key)
-
-                    if current_cache_size > 0:
-                        self._logger.info(f"缓存中有 {current_cache_size} 条未处理的对话，将触发处理")
-                        # 检查是否达到了批次大小
-                        if current_cache_size >= self.memory_manager._dialog_batch_size:
-                            # 创建异步任务处理
-                            asyncio.create_task(self.process_dialog_batch(user_id, role_id, session_id))
-                        else:
-                            self._logger.info(
-                                f"缓存大小 {current_cache_size} 未达到批次大小 {self.memory_manager._dialog_batch_size}，暂不处理")
-            except Exception as e:
-                self._logger.error(f"释放处理锁失败: {e}")
-
-            # 从任务列表移除
-            if cache_key in self.memory_manager._background_tasks:
-                del self.memory_manager._background_tasks[cache_key]
-                self._logger.info(f"从后台任务列表移除: {cache_key}")
-
-            self._logger.info(f"===== 后台存储任务结束 =====")
-
-    async def _process_waiting_queue(self, user_id: str, role_id: str, session_id: Optional[str] = None) -> bool:
-        """
-        处理等待队列中的对话
-        
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID
-            session_id: 会话ID
-            
-        Returns:
-            bool: 处理是否成功
-        """
-        waiting_key = self._key_builder.build_waiting_queue_key(user_id, role_id, session_id)
-        self._logger.info(f"===== 开始处理等待队列 =====")
-        self._logger.info(f"等待队列处理参数: user_id={user_id}, role_id={role_id}, session_id={session_id}")
-
-        redis = await get_async_redis()
-
-        try:
-            # 使用管道操作，原子性获取并清空等待队列
-            async with redis.pipeline() as pipe:
-                # 获取所有元素
-                await pipe.lrange(waiting_key, 0, -1)
-                # 删除列表
-                await pipe.delete(waiting_key)
-                # 执行操作
-                results = await pipe.execute()
-
-            # 解析结果
-            waiting_dialogs_raw = results[0]
-
-            if not waiting_dialogs_raw:
-                self._logger.info(f"等待队列为空，无需处理")
-                return True
-
-            # 解析对话数据
-            waiting_dialogs = []
-            for dialog_str in waiting_dialogs_raw:
-                try:
-                    dialog = deserialize_datetime_aware(dialog_str)
-                    waiting_dialogs.append(dialog)
-                except Exception as e:
-                    self._logger.error(f"解析等待队列对话失败: {e}")
-
-            self._logger.info(f"从等待队列获取了 {len(waiting_dialogs)} 条对话")
-
-            if not waiting_dialogs:
-                return True
-
-            # 将等待队列的对话添加到缓存
-            dialog_cache_key = self._key_builder.build_dialog_cache_key(user_id, role_id, session_id)
-
-            # 序列化对话并添加到Redis列表
-            pipeline = redis.pipeline()
-            for dialog in waiting_dialogs:
-                dialog_json = serialize_with_datetime(dialog)
-                pipeline.rpush(dialog_cache_key, dialog_json)
-            await pipeline.execute()
-
-            self._logger.info(f"将 {len(waiting_dialogs)} 条等待队列的对话添加到缓存")
-
-            # 获取当前缓存大小
-            current_cache_size = await redis.llen(dialog_cache_key)
-
-            # 如果达到批次大小，触发处理
-            if current_cache_size >= self.memory_manager._dialog_batch_size:
-                self._logger.info(f"缓存大小 {current_cache_size} 达到批次大小 {self.memory_manager._dialog_batch_size}，触发处理")
-                return await self.process_dialog_batch(user_id, role_id, session_id)
-            else:
-                self._logger.info(f"缓存大小 {current_cache_size} 未达到批次大小 {self.memory_manager._dialog_batch_size}，暂不处理")
-                return True
-        except Exception as e:
-            self._logger.error(f"处理等待队列失败: {e}")
-            return False
+            self._logger.error(f"对话批次存储异常: {e}")
+            raise
         finally:
-            self._logger.info(f"===== 等待队列处理结束 =====")
+            self._logger.info(f"===== 对话批次存储结束 =====")
+        return pending_dialogs
 
     def _summarize_dialog_batch(self, dialog_batch: List[Dict[str, Any]],
                                 history_dialogs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
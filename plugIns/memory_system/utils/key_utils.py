@@ -22,54 +22,6 @@ class MemoryKeyBuilder:
         else:
             return f"{user_id}:{role_id}"
     
-    @staticmethod
-    def build_dialog_cache_key(user_id: str, role_id: str, session_id: Optional[str] = None) -> str:
-        """
-        构建对话缓存键
-        
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID
-            session_id: 会话ID，可选
-            
-        Returns:
-            str: 对话缓存键
-        """
-        base_key = MemoryKeyBuilder.build_user_cache_key(user_id, role_id, session_id)
-        return f"memory_manager:dialog_cache:{base_key}"
-    
-    @staticmethod
-    def build_processing_lock_key(user_id: str, role_id: str, session_id: Optional[str] = None) -> str:
-        """
-        构建处理锁键
-        
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID
-            session_id: 会话ID，可选
-            
-        Returns:
-            str: 处理锁键
-        """
-        base_key = MemoryKeyBuilder.build_user_cache_key(user_id, role_id, session_id)
-        return f"memory_manager:processing:{base_key}"
-    
-    @staticmethod
-    def build_waiting_queue_key(user_id: str, role_id: str, session_id: Optional[str] = None) -> str:
-        """
-        构建等待队列键
-        
-        Args:
-            user_id: 用户ID
-            role_id: 角色ID
-            session_id: 会话ID，可选
-            
-        Returns:
-            str: 等待队列键
-        """
-        base_key = MemoryKeyBuilder.build_user_cache_key(user_id, role_id, session_id)
-        return f"memory_manager:waiting:{base_key}"
-    
     @staticmethod
     def build_metadata_lock_key(user_id: str, role_id: str) -> str:
         """
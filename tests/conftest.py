@@ -0,0 +1,19 @@
+"""Shared fixtures of the tests"""
+import asyncio
+
+import pytest
+
+from knowledge_api.framework.redis.connection import get_async_redis
+
+
+@pytest.fixture(scope="session")
+def redis_available():
+    """Skip the test when the Redis server of the configuration cannot be reached"""
+    async def ping():
+        redis = await get_async_redis()
+        await redis.ping()
+
+    try:
+        asyncio.run(ping())
+    except Exception:
+        pytest.skip("Redis is not available")
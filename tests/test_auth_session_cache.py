@@ -0,0 +1,61 @@
+"""Tests of the in-process session cache and the activity refresh of the auth middleware (needs a Redis server)"""
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from knowledge_api.framework.auth import auth_middleware
+from knowledge_api.framework.auth.auth_middleware import JWTAuthMiddleware
+from knowledge_api.framework.auth.session_manager import SessionManager
+
+pytestmark = pytest.mark.usefixtures("redis_available")
+
+
+def test_cached_sessions_are_copies():
+    manager = SessionManager(local_cache_ttl=60)
+    session_id = uuid.uuid4().hex
+
+    async def scenario():
+        await manager.create_session(1, "user", session_id, roles=["admin"])
+        first = await manager.get_cached_session(session_id)
+        first.roles.append("changed")
+        first.update_activity()
+        second = await manager.get_cached_session(session_id)
+        await manager.delete_session(session_id)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is not second
+    assert second.roles == ["admin"]
+    assert second.last_active_at <= first.last_active_at
+
+
+def test_activity_refresh_is_scheduled_once_and_referenced(monkeypatch):
+    manager = SessionManager(local_cache_ttl=60)
+    monkeypatch.setattr(auth_middleware, "get_session_manager", lambda: manager)
+    middleware = JWTAuthMiddleware(app=None, activity_refresh_interval=60)
+    session_id = uuid.uuid4().hex
+    writes = []
+
+    async def write(session):
+        writes.append(session)
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(middleware, "_write_session_activity", write)
+
+    async def scenario():
+        await manager.create_session(1, "user", session_id)
+        await manager.get_cached_session(session_id)
+        manager.mark_session_active(session_id, time.time() - 120)
+        for _ in range(3):
+            middleware._refresh_session_activity(await manager.get_cached_session(session_id))
+        pending = len(middleware._refresh_tasks)
+        await asyncio.sleep(0.05)
+        await manager.delete_session(session_id)
+        return pending
+
+    pending = asyncio.run(scenario())
+    assert len(writes) == 1
+    assert pending == 1
+    assert not middleware._refresh_tasks
@@ -0,0 +1,59 @@
+"""Tests of BaseCRUD on the synchronous Session and the AsyncSession"""
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from knowledge_api.mapper.card_series import CardSeries, CardSeriesCRUD
+from knowledge_api.mapper.card_series.base import CardSeriesCreate, CardSeriesUpdate
+
+
+async def exercise(crud: CardSeriesCRUD):
+    created = await crud.create(CardSeriesCreate(name="first", code="S0001", status=1, sort_order=1))
+    await crud.create(CardSeriesCreate(name="second", code="S0002", status=1, sort_order=2))
+    await crud.update(created.id, CardSeriesUpdate(name="renamed"))
+    await crud.soft_delete(created.id)
+    return {
+        "by_code": (await crud.get_by_code("S0002")).name,
+        "active": [series.code for series in await crud.get_active_series()],
+        "count": await crud.count(),
+    }
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "crud.db"
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine, tables=[CardSeries.__table__])
+    engine.dispose()
+    return path
+
+
+def test_sync_and_async_sessions_give_the_same_results(database, tmp_path):
+    async_path = tmp_path / "crud_async.db"
+    async_path.write_bytes(database.read_bytes())
+
+    sync_engine = create_engine(f"sqlite:///{database}")
+    with Session(sync_engine) as session:
+        crud = CardSeriesCRUD(session)
+        assert not crud.is_async
+        sync_result = asyncio.run(exercise(crud))
+    sync_engine.dispose()
+
+    async def run_async():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{async_path}")
+        try:
+            # Same session options as get_async_session
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                crud = CardSeriesCRUD(session)
+                assert crud.is_async
+                return await exercise(crud)
+        finally:
+            await engine.dispose()
+
+    async_result = asyncio.run(run_async())
+    assert sync_result == async_result
+    assert async_result["by_code"] == "second"
+    assert async_result["active"] == ["S0002"]
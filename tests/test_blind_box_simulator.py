@@ -0,0 +1,49 @@
+"""Tests of the blind box Monte-Carlo simulator"""
+import numpy as np
+
+from knowledge_api.framework.blind_box.blind_box_simulator import BlindBoxSimulator
+from knowledge_api.mapper.card.base import CardAlg
+
+
+def make_cards(rarities):
+    return [CardAlg(id=i, name=f"card_{i}", rarity=rarity, weight=1, series_id=0)
+            for i, rarity in enumerate(rarities, 1)]
+
+
+def make_rules(*rules):
+    return {'guarantee_rule': {'enabled': True, 'rules': [
+        {'count': count, 'guarantee_rarity': rarity} for count, rarity in rules
+    ]}}
+
+
+def test_guaranteed_draws_have_the_guaranteed_rarity():
+    cards = make_cards([1, 1, 1, 1, 3])
+    simulator = BlindBoxSimulator(cards, make_rules((10, 3)), random_seed=1)
+    report = simulator.run(users=1000, draws_per_user=30)
+
+    assert report['guarantee_triggers'] == {3: 3 * 1000}
+    assert report['guarantee_trigger_rate'] == 10.0
+    # One draw in ten is the rarity 3 card, the others draw it with probability 1/5
+    expected_rate = (0.1 + 0.9 / 5) * 100
+    assert abs(report['rarity_distribution'][3]['rate'] - expected_rate) < 1.0
+
+
+def test_guarantee_without_eligible_cards_does_not_trigger():
+    cards = make_cards([1, 1, 2])
+    simulator = BlindBoxSimulator(cards, make_rules((10, 4), (5, 2)), random_seed=1)
+    report = simulator.run(users=100, draws_per_user=20)
+
+    # No card of rarity 4: its guarantee points fall back to the whole pool
+    assert report['guarantee_triggers'][4] == 0
+    # Draws 5 and 15 guarantee rarity 2, draws 10 and 20 are taken by the rarity 4 rule
+    assert report['guarantee_triggers'][2] == 2 * 100
+    assert report['guarantee_trigger_rate'] == 2 * 100 / report['total_draws'] * 100
+
+
+def test_schedule_matches_the_engine_guarantee_point():
+    cards = make_cards([1, 2, 3])
+    simulator = BlindBoxSimulator(cards, make_rules((10, 3), (5, 2)), history_limit=12)
+    schedule = simulator.guarantee_schedule(30)
+
+    assert np.flatnonzero(schedule == 3).tolist() == [9]
+    assert np.flatnonzero(schedule == 2).tolist() == [4]
@@ -0,0 +1,99 @@
+"""Tests of the per-turn session unit of work of the chat"""
+import asyncio
+import uuid
+
+import pytest
+from redis.asyncio.client import Redis
+
+from knowledge_api.chat.session_manager import ChatSessionManager
+from knowledge_api.framework.redis.cache_system.session_cache import SessionCacheManager
+
+pytestmark = pytest.mark.usefixtures("redis_available")
+
+PREFIX = "test:chat_session:"
+
+
+def manager():
+    session_manager = ChatSessionManager("default")
+    session_manager.session_prefix = PREFIX
+    return session_manager
+
+
+def add_message(turn):
+    """Counter update merged with the fresh session on conflict"""
+    turn.update({"message_count": turn.data["message_count"] + 1},
+                merge=lambda fresh: {"message_count": fresh["message_count"] + 1})
+
+
+def test_turn_reads_and_writes_the_session_once(monkeypatch):
+    session_id = uuid.uuid4().hex
+    session_manager = manager()
+    commands = []
+    execute_command = Redis.execute_command
+
+    async def counting(client, *args, **options):
+        commands.append(str(args[0]).upper())
+        return await execute_command(client, *args, **options)
+
+    async def scenario():
+        turn = await session_manager.begin_turn(session_id)
+        turn.create(session_manager.new_session_data(session_id))
+        assert await turn.flush()
+
+        monkeypatch.setattr(Redis, "execute_command", counting)
+        turn = await session_manager.begin_turn(session_id)
+        add_message(turn)
+        turn.update({"current_prompt_id": "prompt_1"})
+        turn.update({"user_info": {"user": "player"}})
+        flushed = await turn.flush()
+        monkeypatch.setattr(Redis, "execute_command", execute_command)
+
+        stored = await SessionCacheManager.load_session(session_id, prefix=PREFIX)
+        await SessionCacheManager.delete_session(session_id, prefix=PREFIX)
+        return flushed, stored
+
+    flushed, stored = asyncio.run(scenario())
+    assert flushed
+    assert commands == ["MGET", "EVALSHA"]
+    assert stored["message_count"] == 1
+    assert stored["current_prompt_id"] == "prompt_1"
+
+
+def test_concurrent_turns_merge_instead_of_losing_an_update():
+    session_id = uuid.uuid4().hex
+    session_manager = manager()
+
+    async def scenario():
+        turn = await session_manager.begin_turn(session_id)
+        turn.create(session_manager.new_session_data(session_id))
+        await turn.flush()
+
+        first = await session_manager.begin_turn(session_id)
+        second = await session_manager.begin_turn(session_id)
+        add_message(first)
+        first.update({"current_prompt_id": "first"})
+        add_message(second)
+        second.update({"current_prompt_id": "second"})
+        flushed = [await first.flush(), await second.flush()]
+
+        stored = await SessionCacheManager.load_session(session_id, prefix=PREFIX)
+        await SessionCacheManager.delete_session(session_id, prefix=PREFIX)
+        return flushed, stored
+
+    flushed, stored = asyncio.run(scenario())
+    assert flushed == [True, True]
+    assert stored["message_count"] == 2
+    assert stored["current_prompt_id"] == "second"
+
+
+def test_turn_of_a_missing_session_writes_nothing():
+    session_id = uuid.uuid4().hex
+    session_manager = manager()
+
+    async def scenario():
+        turn = await session_manager.begin_turn(session_id)
+        updated = turn.update({"message_count": 1})
+        flushed = await turn.flush()
+        return turn.get(), updated, flushed, await SessionCacheManager.load_session(session_id, prefix=PREFIX)
+
+    assert asyncio.run(scenario()) == (None, None, True, None)
@@ -0,0 +1,96 @@
+"""Tests of the tail window restore and the batched turn writes of the chat history"""
+import asyncio
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from knowledge_api.mapper.chat_session.base import Session as ChatSession
+from knowledge_api.mapper.chat_session.crud import SessionCRUD
+from knowledge_api.mapper.chat_session_summary.base import ChatSessionSummary
+from knowledge_api.mapper.chat_session_summary.crud import ChatSessionSummaryCRUD
+from knowledge_api.mapper.conversations.base import Conversation, ConversationCreate
+from knowledge_api.mapper.conversations.crud import ConversationCRUD
+
+try:
+    from app_rag_chat.service.rag_chat_base import RAGChatService
+except ImportError:
+    # The RAG chat service imports modelscope through the knowledge base plugins
+    RAGChatService = None
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    SQLModel.metadata.create_all(engine, tables=[Conversation.__table__, ChatSession.__table__,
+                                                 ChatSessionSummary.__table__])
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def turn(session_id, i):
+    return [
+        ConversationCreate(user_id="user", session_id=session_id, conversation_id=session_id, message_id="",
+                           role="user", content=f"question {i}"),
+        ConversationCreate(user_id="user", session_id=session_id, conversation_id=session_id, message_id="",
+                           role="assistant", content=f"answer {i}"),
+    ]
+
+
+def write_turns(crud, session_id, rounds):
+    async def write():
+        for i in range(rounds):
+            assert await crud.create_many(turn(session_id, i)) == 2
+
+    asyncio.run(write())
+
+
+def test_turn_is_written_in_one_batch_with_message_ids(db):
+    crud = ConversationCRUD(db)
+    write_turns(crud, "s1", 1)
+    messages = asyncio.run(crud.get_by_session_id("s1"))
+    assert [(m.role, m.content) for m in messages] == [("user", "question 0"), ("assistant", "answer 0")]
+    assert all(m.message_id for m in messages)
+    assert len({m.message_id for m in messages}) == 2
+    assert asyncio.run(crud.create_many([])) == 0
+
+
+def test_recent_window_returns_the_last_messages_oldest_first(db):
+    crud = ConversationCRUD(db)
+    write_turns(crud, "s1", 6)
+    write_turns(crud, "s2", 2)
+    window = asyncio.run(crud.get_recent_by_session_id("s1", limit=4))
+    assert [m.content for m in window] == ["question 4", "answer 4", "question 5", "answer 5"]
+    assert len(asyncio.run(crud.get_recent_by_session_id("s1", limit=None))) == 12
+
+
+def test_summary_covering_fewer_rounds_does_not_replace_a_newer_one(db):
+    crud = ChatSessionSummaryCRUD(db)
+    assert asyncio.run(crud.save("s1", "summary of 4", 4)).summarized_rounds == 4
+    assert asyncio.run(crud.save("s1", "summary of 2", 2)) is None
+    assert asyncio.run(crud.save("s1", "summary of 6", 6)).summary == "summary of 6"
+    assert asyncio.run(crud.get_by_id("s1")).summary == "summary of 6"
+    assert asyncio.run(crud.get_by_id("unknown")) is None
+
+
+@pytest.mark.skipif(RAGChatService is None, reason="modelscope is not installed")
+def test_restore_window_loads_the_rounds_the_summary_does_not_cover(db):
+    service = RAGChatService.__new__(RAGChatService)
+    service.msg_db = ConversationCRUD(db)
+    service.session_db = SessionCRUD(db)
+    service.summary_db = ChatSessionSummaryCRUD(db)
+    db.add(ChatSession(session_id="s1", user_id="user", role_id="role", type_session="user"))
+    db.commit()
+    write_turns(service.msg_db, "s1", 8)
+
+    messages, summary, rounds = asyncio.run(service.load_history_window("s1", turns=1))
+    assert summary is None and rounds == 8 and len(messages) == 16
+
+    asyncio.run(service.summary_db.save("s1", "first six rounds", 6))
+    messages, summary, rounds = asyncio.run(service.load_history_window("s1", turns=1))
+    assert summary.summary == "first six rounds"
+    assert [m.content for m in messages] == ["question 6", "answer 6", "question 7", "answer 7"]
+
+    messages, _, _ = asyncio.run(service.load_history_window("s1", turns=3))
+    assert len(messages) == 6
+    assert asyncio.run(service.load_history_window("unknown")) is None
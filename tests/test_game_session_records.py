@@ -0,0 +1,50 @@
+"""Tests of the game record log of GameSessionManager (needs a Redis server)"""
+import asyncio
+import uuid
+
+import pytest
+
+from knowledge_api.game_play.game_session_manager import GameSessionManager
+
+GAME_TYPE = "test_records"
+
+pytestmark = pytest.mark.usefixtures("redis_available")
+
+
+def message(index):
+    return {"msgId": f"m{index}", "role": "system", "content": f"message {index}"}
+
+
+def test_legacy_records_are_migrated_once():
+    session_id = uuid.uuid4().hex
+
+    async def scenario():
+        await GameSessionManager.save_game_session(
+            session_id, {"game_type": GAME_TYPE, "game_record": [message(1), message(2)]}, GAME_TYPE)
+        records = await GameSessionManager.get_game_records(session_id, GAME_TYPE)
+        session_data = await GameSessionManager.load_game_session(session_id, GAME_TYPE)
+        await GameSessionManager.append_game_record(session_id, message(2), GAME_TYPE)
+        count = await GameSessionManager.count_game_records(session_id, GAME_TYPE)
+        await GameSessionManager.clear_game_records(session_id, GAME_TYPE)
+        await GameSessionManager.delete_session(session_id, GAME_TYPE)
+        return records, session_data, count
+
+    records, session_data, count = asyncio.run(scenario())
+    assert [record["msgId"] for record in records] == ["m1", "m2"]
+    assert "game_record" not in session_data
+    # A msgId already in the log is not appended again
+    assert count == 2
+
+
+def test_migrated_sessions_are_bounded(monkeypatch):
+    monkeypatch.setattr(GameSessionManager, "MIGRATED_SESSIONS_MAX", 3)
+    session_ids = [uuid.uuid4().hex for _ in range(5)]
+
+    async def scenario():
+        for session_id in session_ids:
+            await GameSessionManager.count_game_records(session_id, GAME_TYPE)
+
+    asyncio.run(scenario())
+    migrated = list(GameSessionManager._migrated_sessions)
+    assert len(migrated) == 3
+    assert migrated == [f"{session_id}:{GAME_TYPE}" for session_id in session_ids[-3:]]
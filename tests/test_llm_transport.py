@@ -0,0 +1,161 @@
+"""Tests of the deadlines, retries, circuit breakers and failover of the LLM transport"""
+import asyncio
+import time
+from typing import AsyncGenerator, List, Optional
+
+import pytest
+
+from knowledge_api.framework.ai_collect.base_llm import BaseLLM
+from knowledge_api.framework.ai_collect.transport import (CircuitBreaker, CircuitOpenError, TransportPolicy,
+                                                          get_latency_tracker, is_retryable,
+                                                          set_transport_policy)
+from knowledge_api.model.llm_token_model import LLMTokenResponse
+
+POLICY = TransportPolicy(attempt_timeout=0.3, first_token_timeout=0.2, total_timeout=3.0, max_retries=2,
+                         retry_base_delay=0.01, retry_max_delay=0.05, breaker_failure_rate=0.5,
+                         breaker_window=10, breaker_min_requests=4, breaker_reset=60.0,
+                         hedge_percentile=90, hedge_min_samples=5)
+
+
+class ProviderError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class ScriptedLLM(BaseLLM):
+    """Client whose attempts follow a script: an exception to raise, a delay to wait, or "ok" """
+
+    def __init__(self, provider: str, script: Optional[List] = None, latency: float = 0.0):
+        super().__init__(api_key="mock", model=f"{provider}-model")
+        self.llm_type = provider
+        self.script = list(script or [])
+        self.latency = latency
+        self.attempts = 0
+
+    def _initialize(self) -> None:
+        self.headers = {}
+
+    async def _next_step(self):
+        self.attempts += 1
+        step = self.script.pop(0) if self.script else "ok"
+        if isinstance(step, BaseException):
+            raise step
+        await asyncio.sleep(step if isinstance(step, float) else self.latency)
+
+    async def _chat_completion_impl(self, messages, temperature=0.7, max_tokens=None, **kwargs) -> LLMTokenResponse:
+        await self._next_step()
+        return LLMTokenResponse(id="answer", model=self.model, content=self.llm_type)
+
+    async def _chat_completion_stream_impl(self, messages, temperature=0.7, max_tokens=None,
+                                           **kwargs) -> AsyncGenerator[LLMTokenResponse, None]:
+        await self._next_step()
+        for token in (self.llm_type, " done"):
+            yield LLMTokenResponse(id="stream", model=self.model, content=token)
+
+    async def _function_call_impl(self, messages, tools, model=None):
+        raise NotImplementedError
+
+    def completion(self, prompt, temperature=0.7, max_tokens=None, **kwargs):
+        raise NotImplementedError
+
+    def embeddings(self, texts):
+        raise NotImplementedError
+
+    async def _log_token_stats(self, response, start_time=None, messages=None, application_scenario=None) -> float:
+        return 0.0
+
+
+MESSAGES = [{"role": "user", "content": "Is the man alive?"}]
+
+
+@pytest.fixture(autouse=True)
+def transport_policy():
+    set_transport_policy(POLICY)
+    yield
+    set_transport_policy(None)
+
+
+def chat(client):
+    return asyncio.run(client.chat_completion(MESSAGES))
+
+
+def test_retryable_errors_are_retried():
+    client = ScriptedLLM("primary", [ProviderError(503), ProviderError(429)])
+    assert chat(client).content == "primary"
+    assert client.attempts == 3
+
+
+def test_request_errors_are_not_retried():
+    client = ScriptedLLM("primary", [ProviderError(400)])
+    with pytest.raises(ProviderError):
+        chat(client)
+    assert client.attempts == 1
+
+
+def test_hung_attempt_is_cut_at_the_attempt_deadline():
+    client = ScriptedLLM("primary", [10.0])
+    start = time.perf_counter()
+    assert chat(client).content == "primary"
+    assert time.perf_counter() - start < 1.0
+    assert client.attempts == 2
+
+
+def test_open_circuit_fails_fast_and_fails_over():
+    client = ScriptedLLM("primary", [ProviderError(503)] * 100)
+
+    async def outage():
+        for _ in range(POLICY.breaker_min_requests):
+            with pytest.raises(ProviderError):
+                await client.chat_completion(MESSAGES)
+        attempts = client.attempts
+        with pytest.raises(CircuitOpenError):
+            await client.chat_completion(MESSAGES)
+        assert client.attempts == attempts
+        client.fallback = ScriptedLLM("secondary")
+        return await client.chat_completion(MESSAGES)
+
+    assert asyncio.run(outage()).content == "secondary"
+
+
+def test_half_open_trial_closes_the_circuit():
+    breaker = CircuitBreaker("provider", failure_rate=0.5, window=4, min_requests=2, reset_timeout=0.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    trial = breaker.before_request()
+    assert trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success(trial)
+    assert breaker.state == "closed"
+
+
+def test_slow_request_is_hedged_to_the_secondary_provider():
+    tracker = get_latency_tracker("primary")
+    for _ in range(POLICY.hedge_min_samples):
+        tracker.add(0.02)
+    client = ScriptedLLM("primary", [0.25])
+    client.fallback = ScriptedLLM("secondary", latency=0.01)
+    start = time.perf_counter()
+    assert chat(client).content == "secondary"
+    assert time.perf_counter() - start < 0.2
+
+
+def test_stalled_stream_is_retried_before_the_first_token():
+    client = ScriptedLLM("primary", [10.0])
+
+    async def stream():
+        return [chunk async for chunk in client.chat_completion_stream(MESSAGES)]
+
+    chunks = asyncio.run(stream())
+    assert "".join(chunk.content for chunk in chunks) == "primary done"
+    assert all(chunk.finish_reason != "error" for chunk in chunks)
+    assert client.attempts == 2
+
+
+def test_is_retryable():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(ProviderError(502))
+    assert not is_retryable(ProviderError(401))
+    assert not is_retryable(ValueError("bad request"))
@@ -0,0 +1,69 @@
+"""Tests of the LLM usage rollups against the raw usage records"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from knowledge_api.mapper.llm_usage_records.base import LLMUsageRecord
+from knowledge_api.mapper.llm_usage_records.crud import LLMUsageRecordCRUD
+from knowledge_api.mapper.llm_usage_rollups.base import LLMUsageRollup
+from knowledge_api.mapper.llm_usage_rollups.crud import LLMUsageRollupCRUD
+
+
+def make_records(count):
+    start = (datetime.utcnow() - timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+    return [
+        LLMUsageRecord(vendor_type="doubao", model_id=f"model-{i % 2}", input_tokens=10 + i, output_tokens=5,
+                       total_tokens=15 + i, total_price=0.01, elapsed_time=0.5, content="", role="assistant",
+                       application_scenario="chat", created_at=start + timedelta(minutes=37 * i),
+                       updated_at=start)
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    SQLModel.metadata.create_all(engine, tables=[LLMUsageRecord.__table__])
+    return engine
+
+
+def statistics(engine):
+    with Session(engine) as db:
+        raw = asyncio.run(LLMUsageRecordCRUD(db).get_statistics())
+        rollup = asyncio.run(LLMUsageRollupCRUD(db).get_statistics())
+    return raw, rollup
+
+
+def test_increments_match_the_raw_records_and_rebuild_does_not_double_count(engine):
+    LLMUsageRollupCRUD.create_table(engine)
+    with Session(engine) as db:
+        records = make_records(40)
+        db.add_all(records)
+        db.flush()
+        LLMUsageRollupCRUD(db).upsert_records(records)
+        db.commit()
+
+    raw, rollup = statistics(engine)
+    assert rollup.total_records == raw.total_records == 40
+    assert rollup.total_tokens == raw.total_tokens
+
+    with Session(engine) as db:
+        asyncio.run(LLMUsageRollupCRUD(db).rebuild(datetime.utcnow() - timedelta(days=5), datetime.utcnow()))
+    raw, rollup = statistics(engine)
+    assert rollup.total_records == raw.total_records == 40
+    assert rollup.total_tokens == raw.total_tokens
+
+
+def test_new_table_is_backfilled_from_the_raw_records(engine):
+    with Session(engine) as db:
+        db.add_all(make_records(10))
+        db.commit()
+
+    assert LLMUsageRollupCRUD.create_table(engine) is True
+    assert LLMUsageRollupCRUD.create_table(engine) is False
+
+    raw, rollup = statistics(engine)
+    assert rollup.total_records == raw.total_records == 10
+    assert rollup.total_tokens == raw.total_tokens
@@ -0,0 +1,104 @@
+"""Tests of the asynchronous logging pipeline"""
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from knowledge_api.utils.log_config import (APILogger, AsyncQueueHandler, DailyFileHandler, JsonFormatter,
+                                            LogConfig, LogThrottle)
+
+
+def record(level=logging.INFO, msg="message", name="fastapi-app", created=None, **extra):
+    values = {"name": name, "levelno": level, "levelname": logging.getLevelName(level), "msg": msg,
+              "pathname": __file__, "module": "test_log_pipeline"}
+    if created is not None:
+        values["created"] = created
+    values.update(extra)
+    return logging.makeLogRecord(values)
+
+
+def test_throttle_samples_and_rate_limits_only_records_below_warning():
+    module = "tests.test_log_pipeline"
+    sampled = LogThrottle(sample_rates={"tests": 1.0, module: 0.0})
+    assert not sampled.filter(record())
+    assert sampled.filter(record(logging.WARNING))
+    assert sampled.sampled == 1
+
+    limited = LogThrottle(rate_limits={module: 3})
+    now = time.time()
+    kept = [limited.filter(record(created=now)) for _ in range(5)]
+    assert kept == [True, True, True, False, False]
+    assert limited.rate_limited == 2
+    assert limited.filter(record(created=now + 1))
+
+
+def test_full_queue_drops_info_and_reports_the_drops():
+    handler = AsyncQueueHandler(queue.Queue(2))
+    handler.handle(record(msg="first %s", args=("a",)))
+    handler.handle(record(msg="second"))
+    handler.handle(record(msg="dropped"))
+    assert handler.dropped == 1
+
+    first = handler.queue.get_nowait()
+    assert first.msg == "first a" and first.args is None
+    handler.queue.get_nowait()
+    handler.handle(record(msg="third"))
+    queued = [handler.queue.get_nowait().getMessage() for _ in range(2)]
+    assert queued[0] == "third"
+    assert "丢弃 1 条" in queued[1] and handler.queue.empty()
+
+
+def test_daily_file_switches_at_midnight_and_purges_old_days(tmp_path):
+    old = (datetime.now() - timedelta(days=10)).strftime("%Y-%m-%d")
+    (tmp_path / f"app_{old}.log").write_text("old\n")
+    handler = DailyFileHandler(str(tmp_path), "app", backup_days=3)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.emit(record(msg="today"))
+    tomorrow = handler._rollover_at + 1
+    handler.emit(record(msg="tomorrow", created=tomorrow))
+    handler.close()
+
+    files = sorted(os.path.basename(path) for path in glob.glob(str(tmp_path / "app_*.log")))
+    today, next_day = (datetime.now().strftime("%Y-%m-%d"),
+                       datetime.fromtimestamp(tomorrow).strftime("%Y-%m-%d"))
+    assert files == [f"app_{today}.log", f"app_{next_day}.log"]
+    assert (tmp_path / f"app_{next_day}.log").read_text() == "tomorrow\n"
+
+
+def test_json_output_keeps_the_extra_fields():
+    entry = json.loads(JsonFormatter().format(record(msg="turn %d", args=(3,), session_id="s1")))
+    assert entry["message"] == "turn 3"
+    assert entry["level"] == "INFO"
+    assert entry["session_id"] == "s1"
+    assert entry["module"] == "tests.test_log_pipeline"
+
+
+def test_async_pipeline_writes_on_the_listener_thread(tmp_path, monkeypatch):
+    # The pipeline of the test replaces the global logger and the uvicorn access handlers
+    monkeypatch.setattr(APILogger, "_logger", APILogger._logger)
+    uvicorn_access = logging.getLogger("uvicorn.access")
+    monkeypatch.setattr(uvicorn_access, "handlers", list(uvicorn_access.handlers))
+    monkeypatch.setattr(uvicorn_access, "filters", list(uvicorn_access.filters))
+    writers = set()
+
+    class RecordingFormatter(logging.Formatter):
+        def format(self, log_record):
+            writers.add(threading.current_thread().name)
+            return super().format(log_record)
+
+    instance = APILogger(LogConfig(log_dir=str(tmp_path), app_name="log-pipeline-test", console_log=False))
+    try:
+        file_handler = instance._pipelines[0][1].handlers[0]
+        file_handler.setFormatter(RecordingFormatter("%(message)s"))
+        for i in range(100):
+            instance.get_logger().info(f"line {i}")
+    finally:
+        instance.shutdown()
+
+    lines = open(glob.glob(str(tmp_path / "log-pipeline-test_*.log"))[0], encoding="utf-8").read().splitlines()
+    assert lines == [f"line {i}" for i in range(100)]
+    assert threading.current_thread().name not in writers
@@ -0,0 +1,141 @@
+"""Tests of the partitioned memory ingestion"""
+import asyncio
+import uuid
+
+import pytest
+
+try:
+    from plugIns.memory_system.cache_system.memory_ingestion import PartitionedMemoryIngestion
+except ImportError:
+    # The memory system plugins import modelscope through their package
+    PartitionedMemoryIngestion = None
+
+from knowledge_api.framework.redis.connection import get_async_redis
+
+pytestmark = [
+    pytest.mark.usefixtures("redis_available"),
+    pytest.mark.skipif(PartitionedMemoryIngestion is None, reason="modelscope is not installed"),
+]
+
+
+class Store:
+    """Records the stored dialogs per session, store_batch may fail or defer dialogs"""
+
+    def __init__(self, fail_batches=0, defer_first=None):
+        self.stored = {}
+        self.batches = []
+        self.fail_batches = fail_batches
+        self.defer_first = defer_first
+
+    async def store_batch(self, user_id, role_id, session_id, dialogs):
+        self.batches.append([dialog["content"] for dialog in dialogs])
+        if self.fail_batches:
+            self.fail_batches -= 1
+            raise RuntimeError("memory system unavailable")
+        pending = [dialog for dialog in dialogs if dialog["content"] == self.defer_first]
+        if pending:
+            self.defer_first = None
+        self.stored.setdefault(session_id, []).extend(
+            dialog["content"] for dialog in dialogs if dialog not in pending)
+        return pending
+
+
+def ingestion(store, prefix, batch_size=2):
+    return PartitionedMemoryIngestion(store.store_batch, batch_size, partitions=2, worker_count=1,
+                                      block_ms=50, stream_prefix=prefix)
+
+
+async def until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+async def clean(prefix):
+    redis = await get_async_redis()
+    keys = [key async for key in redis.scan_iter(match=f"{prefix}:*")]
+    if keys:
+        await redis.delete(*keys)
+
+
+def test_sessions_are_stored_in_order_and_batches():
+    prefix = f"test:memory_ingest:{uuid.uuid4().hex}"
+
+    async def scenario():
+        store = Store()
+        consumer = ingestion(store, prefix)
+        await consumer.start()
+        items = [{"data": {"content": f"s{s}-{i}"}, "user_id": "u1", "role_id": "r1", "session_id": f"s{s}"}
+                 for i in range(5) for s in range(3)]
+        submitted = await consumer.submit_many(items)
+        for s in range(3):
+            await consumer.flush("u1", "r1", f"s{s}")
+        await until(lambda: sum(map(len, store.stored.values())) == 15)
+        status = await consumer.get_status()
+        await consumer.close()
+        await clean(prefix)
+        return submitted, store, status
+
+    submitted, store, status = asyncio.run(scenario())
+    assert submitted == 15
+    for s in range(3):
+        assert store.stored[f"s{s}"] == [f"s{s}-{i}" for i in range(5)]
+    # Two full batches and the flushed remainder per session
+    assert sorted(map(len, store.batches)) == [1, 1, 1] + [2] * 6
+    assert status["stored_dialogs"] == 15 and status["buffered_dialogs"] == 0
+    assert sum(status["partition_lengths"].values()) == 0
+
+
+def test_deferred_and_failed_dialogs_are_retried_in_order():
+    prefix = f"test:memory_ingest:{uuid.uuid4().hex}"
+
+    async def scenario():
+        store = Store(fail_batches=1, defer_first="d1")
+        consumer = ingestion(store, prefix)
+        await consumer.start()
+        for i in range(4):
+            await consumer.submit({"content": f"d{i}"}, "u1", "r1", "s1")
+        await until(lambda: len(store.batches) >= 3)
+        await consumer.flush("u1", "r1", "s1")
+        await until(lambda: len(store.stored.get("s1", [])) == 4)
+        status = await consumer.get_status()
+        await consumer.close()
+        await clean(prefix)
+        return store, status
+
+    store, status = asyncio.run(scenario())
+    # The failed batch is kept whole, the deferred dialog goes out with the next dialogs
+    assert store.batches[0] == ["d0", "d1"]
+    assert store.batches[1] == ["d0", "d1", "d2"]
+    assert store.batches[2] == ["d1", "d3"]
+    assert store.stored["s1"] == ["d0", "d2", "d1", "d3"]
+    assert status["error_count"] == 1 and status["retry_count"] == 3
+
+
+def test_unstored_dialogs_are_claimed_by_the_next_consumer():
+    prefix = f"test:memory_ingest:{uuid.uuid4().hex}"
+
+    async def scenario():
+        first_store = Store()
+        first = ingestion(first_store, prefix, batch_size=10)
+        await first.start()
+        for i in range(3):
+            await first.submit({"content": f"d{i}"}, "u1", "r1", "s1")
+        await until(lambda: first.pending_count("u1", "r1", "s1") == 3)
+        # Read but unacknowledged, the messages stay in the partition
+        await first.close()
+
+        second_store = Store()
+        second = ingestion(second_store, prefix, batch_size=10)
+        await second.start()
+        await until(lambda: second.pending_count("u1", "r1", "s1") == 3)
+        await second.flush("u1", "r1", "s1")
+        await until(lambda: "s1" in second_store.stored)
+        await second.close()
+        await clean(prefix)
+        return first_store, second_store
+
+    first_store, second_store = asyncio.run(scenario())
+    assert first_store.batches == []
+    assert second_store.stored["s1"] == ["d0", "d1", "d2"]
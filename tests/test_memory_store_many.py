@@ -0,0 +1,137 @@
+"""Tests of the batched memory writes and their per-dialog results"""
+import asyncio
+
+import pytest
+
+from knowledge_manage.vectorstores.base import VectorStore
+from knowledge_manage.vectorstores.dashvector_http_store import DashVectorHTTPStore
+
+try:
+    from plugIns.memory_system.conversation_rag_memory.conversation_rag_memory import ConversationRAGMemory
+    from plugIns.memory_system.model import MemoryContext, UserMetadata
+    from plugIns.memory_system.processors.dialog_batch_processor import DialogBatchProcessor
+except ImportError:
+    # The memory system plugins import modelscope through their package
+    ConversationRAGMemory = None
+
+requires_memory_system = pytest.mark.skipif(ConversationRAGMemory is None, reason="modelscope is not installed")
+
+
+class CountingStore(VectorStore):
+    """Vector store confirming only some of the documents of a write"""
+
+    def __init__(self, added=None, statuses=None):
+        super().__init__("test", 2, "cosine")
+        self.added = added
+        self.statuses = statuses
+        self.writes = []
+
+    async def _add_processed_documents(self, processed_docs):
+        self.writes.append([doc["text"] for doc in processed_docs])
+        return len(processed_docs) if self.added is None else self.added
+
+    async def add_documents_status(self, documents, embeddings):
+        if self.statuses is None:
+            return await super().add_documents_status(documents, embeddings)
+        self.writes.append([doc["text"] for doc in documents])
+        return list(self.statuses)
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[0.1, 0.2] for _ in texts]
+
+
+def documents(count):
+    return [{"text": f"t{i}", "id": f"d{i}"} for i in range(count)]
+
+
+def test_base_store_only_confirms_complete_writes():
+    vectors = [[0.1, 0.2], [0.3, 0.4]]
+    assert asyncio.run(CountingStore().add_documents_status(documents(2), vectors)) == [True, True]
+    # A partial count cannot tell which documents were written
+    assert asyncio.run(CountingStore(added=1).add_documents_status(documents(2), vectors)) == [False, False]
+    assert asyncio.run(CountingStore().add_documents_status([], [])) == []
+
+
+def test_dashvector_reports_the_insert_code_of_each_document(monkeypatch):
+    store = DashVectorHTTPStore(api_key="key", endpoint="dashvector.test", dimension=2,
+                                fields_schema={"text": "STRING"})
+    responses = [{"output": [{"code": 0}, {"code": -2021}, {"code": 0}]}, RuntimeError("connection reset")]
+
+    async def make_request(method, url, data=None):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        assert len(data["docs"]) == 3
+        return response
+
+    monkeypatch.setattr(store, "_make_request", make_request)
+
+    async def scenario():
+        vectors = [[0.1, 0.2]] * 3
+        first = await store.add_documents_status(documents(3), vectors)
+        second = await store.add_documents_status(documents(3), vectors)
+        await store.client.aclose()
+        return first, second
+
+    assert asyncio.run(scenario()) == ([True, False, True], [False, False, False])
+
+
+def memory_with(store):
+    memory = ConversationRAGMemory(collection_name="test")
+    memory._embedding_engine = CountingEmbeddings()
+    memory._vector_store = store
+    memory._is_initialized = True
+    return memory
+
+
+@requires_memory_system
+def test_store_many_embeds_and_writes_once_and_marks_unconfirmed_items():
+    memory = memory_with(CountingStore(statuses=[True, False]))
+    items = [MemoryContext(content="hello"), MemoryContext(content=""), MemoryContext(content="bye")]
+    results = asyncio.run(memory.store_many(items, UserMetadata(user_id="u1", role_id="r1", session_id="s1")))
+    assert memory._embedding_engine.calls == [["hello", "bye"]]
+    assert memory._vector_store.writes == [["hello", "bye"]]
+    # The empty dialog is skipped, the unconfirmed one is retryable
+    assert results[0] is None and results[1] is None
+    assert isinstance(results[2], RuntimeError)
+
+
+@requires_memory_system
+def test_store_many_rejects_items_without_user_metadata():
+    memory = memory_with(CountingStore())
+    results = asyncio.run(memory.store_many([MemoryContext(content="hello")], UserMetadata(user_id="u1", role_id="")))
+    assert len(results) == 1 and isinstance(results[0], ValueError)
+    assert memory._embedding_engine.calls == []
+
+
+class History:
+    async def store_dialog_batch(self, user_id, role_id, session_id, dialog_batch):
+        return True
+
+
+class Manager:
+    """Memory manager interface used by the batch processor"""
+
+    def __init__(self, memory):
+        self._current_memory = memory
+        self._history_manager = History()
+        self._auto_summarize = False
+
+    async def get_or_create_user_metadata(self, user_id, role_id, session_id=None):
+        return UserMetadata(user_id=user_id, role_id=role_id, session_id=session_id)
+
+
+@requires_memory_system
+def test_batch_processor_retries_only_the_unconfirmed_dialogs():
+    memory = memory_with(CountingStore(statuses=[True, False, True]))
+    processor = DialogBatchProcessor(Manager(memory))
+    batch = [{"content": f"d{i}", "source": "user"} for i in range(3)] + [{"source": "user"}]
+    pending = asyncio.run(processor.store_dialog_batch("u1", "r1", "s1", batch))
+    # The invalid dialog without content is rejected, not retried
+    assert pending == [batch[1]]
@@ -0,0 +1,135 @@
+"""Tests of the shared Redis client, its metered pool and the background health checks"""
+import asyncio
+import socket
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from knowledge_api.framework.redis.config import get_redis_config
+from knowledge_api.framework.redis.connection import MeteredConnectionPool, RedisConnectionManager
+
+pytestmark = pytest.mark.usefixtures("redis_available")
+
+
+def pool(**kwargs):
+    config = get_redis_config()
+    return MeteredConnectionPool(host=config.HOST, port=config.PORT, db=config.DB, **kwargs)
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_client_is_shared_per_event_loop_without_a_round_trip(monkeypatch):
+    manager = RedisConnectionManager()
+    commands = []
+    execute_command = Redis.execute_command
+
+    async def counting(client, *args, **options):
+        commands.append(args[0])
+        return await execute_command(client, *args, **options)
+
+    monkeypatch.setattr(Redis, "execute_command", counting)
+
+    async def scenario():
+        clients = [await manager.get_client() for _ in range(3)]
+        await clients[0].delete("test:redis_connection")
+        metered = manager.pool
+        manager._drop_pool()
+        await metered.disconnect()
+        return clients
+
+    first = asyncio.run(scenario())
+    second = asyncio.run(scenario())
+    assert first[0] is first[1] is first[2]
+    # A new event loop gets a new client, its connections belong to the loop
+    assert second[0] is not first[0]
+    assert commands == ["DEL", "DEL"]
+
+
+def test_pool_waits_for_a_free_connection_and_counts_the_wait():
+    async def scenario():
+        metered = pool(max_connections=2, timeout=2)
+        held = [await metered.get_connection("PING") for _ in range(2)]
+
+        async def release_later():
+            await asyncio.sleep(0.1)
+            await metered.release(held.pop())
+
+        releasing = asyncio.create_task(release_later())
+        third = await metered.get_connection("PING")
+        await releasing
+        stats = metered.stats()
+        await metered.release(third)
+        await metered.release(held.pop())
+        await metered.disconnect()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["acquired"] == 3 and stats["wait_timeouts"] == 0
+    assert stats["max_connections"] == 2 and stats["in_use"] == 2
+    assert stats["max_wait_ms"] >= 90
+
+
+def test_pool_counts_the_acquisitions_that_time_out():
+    async def scenario():
+        metered = pool(max_connections=1, timeout=0.05)
+        held = await metered.get_connection("PING")
+        with pytest.raises(RedisConnectionError):
+            await metered.get_connection("PING")
+        await metered.release(held)
+        await metered.disconnect()
+        return metered.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["acquired"] == 1 and stats["wait_timeouts"] == 1
+
+
+def test_health_check_marks_the_server_down_and_recovers():
+    async def scenario():
+        manager = RedisConnectionManager()
+        manager.pool = MeteredConnectionPool(host="127.0.0.1", port=closed_port(), socket_connect_timeout=0.2)
+        manager.client = Redis(connection_pool=manager.pool)
+        down = await manager.health_check()
+        unhealthy = manager.healthy
+        manager.pool = pool()
+        manager.client = Redis(connection_pool=manager.pool)
+        up = await manager.health_check()
+        await manager.pool.disconnect()
+        return down, unhealthy, up, manager.get_stats()
+
+    down, unhealthy, up, stats = asyncio.run(scenario())
+    assert not down and not unhealthy and up
+    assert stats["healthy"] and stats["health_checks"] == 2 and stats["health_check_failures"] == 1
+    assert stats["last_ping_ms"] is not None
+
+
+def test_reported_connection_errors_trigger_a_health_check_right_away():
+    async def scenario():
+        manager = RedisConnectionManager()
+        await manager.get_client()
+        await asyncio.sleep(0.01)
+        before = manager.health_checks
+        # Errors of the command itself do not mean the connection is broken
+        manager.report_error(ValueError("bad payload"))
+        await asyncio.sleep(0.05)
+        unchanged = manager.health_checks == before
+        manager.report_error(RedisConnectionError("connection reset"))
+        for _ in range(100):
+            if manager.last_ping_ms is not None:
+                break
+            await asyncio.sleep(0.01)
+        checks = manager.health_checks - before
+        metered = manager.pool
+        pool_stats = metered.stats()
+        healthy = manager.healthy
+        manager._drop_pool()
+        await metered.disconnect()
+        return unchanged, checks, manager.errors_reported, healthy, pool_stats
+
+    unchanged, checks, errors, healthy, pool_stats = asyncio.run(scenario())
+    assert unchanged and checks == 1 and errors == 2
+    assert healthy and pool_stats["acquired"] == 1
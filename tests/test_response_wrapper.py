@@ -0,0 +1,69 @@
+"""Tests of the standard response envelope and the pure ASGI response wrapper"""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from knowledge_api.framework.exception.response_wrapper import (
+    ResponseWrapperMiddleware, StandardJSONResponse, WRAPPED_HEADER
+)
+
+
+def build_app() -> FastAPI:
+    app = FastAPI(default_response_class=StandardJSONResponse)
+    app.add_middleware(ResponseWrapperMiddleware)
+
+    @app.get("/items")
+    async def items():
+        return [1, 2, 3]
+
+    @app.get("/custom")
+    async def custom():
+        return JSONResponse({"value": 1})
+
+    @app.get("/standard")
+    async def standard():
+        return JSONResponse({"code": 201, "message": "created", "data": None})
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for chunk in ("a", "b", "c"):
+                yield chunk
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return app
+
+
+def get(path: str) -> httpx.Response:
+    async def request():
+        transport = httpx.ASGITransport(app=build_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+
+    return asyncio.run(request())
+
+
+def test_route_results_are_wrapped_once_without_the_internal_marker():
+    response = get("/items")
+    assert response.json() == {"code": 200, "message": "Operation successful", "data": [1, 2, 3]}
+    assert WRAPPED_HEADER.decode() not in response.headers
+
+
+def test_json_responses_built_elsewhere_are_wrapped():
+    response = get("/custom")
+    assert response.json() == {"code": 200, "message": "Operation successful", "data": {"value": 1}}
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    assert get("/standard").json() == {"code": 201, "message": "created", "data": None}
+
+    missing = get("/missing")
+    assert missing.status_code == 404
+    assert missing.json()["code"] == 404
+
+
+def test_streaming_responses_pass_through():
+    response = get("/stream")
+    assert response.text == "abc"
+    assert response.headers["content-type"].startswith("text/plain")
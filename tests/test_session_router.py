@@ -0,0 +1,84 @@
+"""Tests of the cross-worker routing of the websocket session events"""
+import asyncio
+import uuid
+
+import pytest
+
+from knowledge_api.framework.redis.session_router import SessionRouter
+
+pytestmark = pytest.mark.usefixtures("redis_available")
+
+
+async def wait_for(predicate, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+def test_events_reach_the_other_workers_but_not_the_publisher():
+    session_id = uuid.uuid4().hex
+
+    async def scenario():
+        first, second = SessionRouter(enabled=True), SessionRouter(enabled=True)
+        received = {"first_a": [], "first_b": [], "second": []}
+
+        def recorder(name):
+            async def handler(_session_id, event):
+                received[name].append(event)
+            return handler
+
+        try:
+            await first.subscribe(session_id, "a", recorder("first_a"))
+            await first.subscribe(session_id, "b", recorder("first_b"))
+            await second.subscribe(session_id, "c", recorder("second"))
+            await asyncio.sleep(0.2)
+            subscribed = await first.publish(session_id, {"type": "message", "content": "hi"}, subscriber="a")
+            delivered = await wait_for(lambda: received["first_b"] and received["second"])
+            await asyncio.sleep(0.2)
+        finally:
+            await first.close()
+            await second.close()
+        return subscribed, delivered, received
+
+    subscribed, delivered, received = asyncio.run(scenario())
+    assert subscribed == 2
+    assert delivered
+    assert received["first_a"] == []
+    assert received["first_b"] == [{"type": "message", "content": "hi"}]
+    assert received["second"] == [{"type": "message", "content": "hi"}]
+
+
+def test_only_one_worker_owns_a_session_until_it_releases_it():
+    session_id = uuid.uuid4().hex
+
+    async def scenario():
+        first, second = SessionRouter(enabled=True), SessionRouter(enabled=True)
+        try:
+            claims = [await first.claim_session(session_id), await second.claim_session(session_id),
+                      await first.claim_session(session_id)]
+            owner = await first.get_owner(session_id)
+            owns = (first.owns(session_id), second.owns(session_id))
+            await first.release_session(session_id)
+            released_owner = await second.get_owner(session_id)
+            taken_over = await second.claim_session(session_id)
+        finally:
+            await first.close()
+            await second.close()
+        return claims, owner, owns, released_owner, taken_over, first.worker_id
+
+    claims, owner, owns, released_owner, taken_over, first_worker = asyncio.run(scenario())
+    assert claims == [True, False, True]
+    assert owner == first_worker
+    assert owns == (True, False)
+    assert released_owner is None
+    assert taken_over
+
+
+def test_disabled_router_keeps_sessions_local():
+    router = SessionRouter()
+    assert asyncio.run(router.publish("s", {"type": "message"})) == 0
+    assert asyncio.run(router.claim_session("s"))
+    assert router.owns("s")
@@ -0,0 +1,119 @@
+"""Tests of the simultaneous AI player turns and the batch judge of turtle soup"""
+import asyncio
+import time
+
+import pytest
+
+from knowledge_api.framework.ai_collect.base_llm import get_provider_semaphore
+from knowledge_api.framework.workflow.nodes.ai_player_speak import AIPlayerSpeakNode
+from knowledge_api.framework.workflow.types import WorkflowContext
+from knowledge_api.game_play.game_session_manager import GameSessionManager
+from knowledge_api.game_play.turtle_soup import TurtleSoup
+from knowledge_api.model.agent.game_agent import GameRole, TurtleSoupGameAgent, gather_agent_calls
+from knowledge_api.model.task_game_model import TaskGameInput
+
+LATENCY = 0.1
+
+
+class SlowPlayer:
+    """Player whose chat answers after a latency, the later players answer first"""
+
+    def __init__(self, index, players):
+        self.name = f"player_{index}"
+        self.identity = "player"
+        self.latency = LATENCY * (players - index) / players
+
+    async def chat(self, message):
+        await asyncio.sleep(self.latency)
+        return f"{self.name} asks"
+
+
+def test_gather_agent_calls_keeps_the_agent_order_and_the_provider_limit():
+    active, peak = 0, 0
+
+    class Agent:
+        def __init__(self, index, semaphore):
+            self.index = index
+            self.provider_semaphore = semaphore
+
+    async def call(agent):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(LATENCY / (agent.index + 1))
+        active -= 1
+        if agent.index == 2:
+            raise RuntimeError("provider error")
+        return agent.index
+
+    async def scenario():
+        semaphore = asyncio.Semaphore(2)
+        return await gather_agent_calls([Agent(i, semaphore) for i in range(5)], call)
+
+    results = asyncio.run(scenario())
+    assert [result for result in results if not isinstance(result, Exception)] == [0, 1, 3, 4]
+    assert isinstance(results[2], RuntimeError)
+    assert peak == 2
+
+
+def test_provider_semaphores_are_shared_per_event_loop():
+    async def pair():
+        return get_provider_semaphore("mock"), get_provider_semaphore("mock")
+
+    first, same = asyncio.run(pair())
+    second, _ = asyncio.run(pair())
+    assert first is same
+    assert first is not second
+
+
+@pytest.mark.parametrize("speak_mode", ["sequential", "simultaneous"])
+def test_speak_node_emits_the_speeches_in_player_order(speak_mode):
+    players = [SlowPlayer(i, 6) for i in range(6)]
+    node = AIPlayerSpeakNode("speak", "speak", {"speaker_id": "none", "speak_mode": speak_mode,
+                                                "speech_template": "Ask your question."})
+    context = WorkflowContext(data={"players": players, "current_node_inputs": {"players": players}})
+
+    start = time.perf_counter()
+    result = asyncio.run(node.process(context))
+    elapsed = time.perf_counter() - start
+
+    assert result["message"].split("\n") == [f"player_{i} asks" for i in range(6)]
+    if speak_mode == "simultaneous":
+        assert elapsed < LATENCY * 2
+    else:
+        assert elapsed >= LATENCY * 3
+
+
+def turtle_soup(monkeypatch, tool_content):
+    game = TurtleSoup(None, TaskGameInput(task_id="0", session_id="batch-judge-test",
+                                          game_type=TurtleSoup.game_type, roles=[], user_info={}))
+    game.game_config = {}
+    game._register_tool()
+    game.agents = [TurtleSoupGameAgent(GameRole(role_id="setter", model_id="mock", role_info={"name": "setter"}),
+                                       system="You are the questioner.", identity="setter")]
+
+    async def function_call(agent, messages, model=None, tools=None):
+        return [{"content": tool_content}], {"role": "assistant", "content": ""}, None
+
+    async def save_agent_objects(*args, **kwargs):
+        return True
+
+    monkeypatch.setattr(game, "function_call", function_call)
+    monkeypatch.setattr(GameSessionManager, "save_agent_objects", save_agent_objects)
+    return game
+
+
+def test_batch_judge_orders_the_judgements_and_skips_invalid_indexes(monkeypatch):
+    game = turtle_soup(monkeypatch, {"judgements": [
+        {"index": "2", "is_solved": 0, "answer": "no."},
+        {"index": "first", "is_solved": 1, "answer": "yes."},
+        {"index": 1, "is_solved": 0, "answer": "irrelevant."},
+    ]})
+    judgements, _ = asyncio.run(game.batch_judge_answers([("a", "is it a boat?"), ("b", "is it night?")]))
+    assert [judgement["answer"] for judgement in judgements] == ["irrelevant.", "no."]
+
+
+def test_batch_judge_without_every_question_judged_falls_back(monkeypatch):
+    game = turtle_soup(monkeypatch, {"judgements": [{"index": None, "answer": "no."},
+                                                    {"index": 1, "answer": "no."}]})
+    assert asyncio.run(game.batch_judge_answers([("a", "q1"), ("b", "q2")])) is None
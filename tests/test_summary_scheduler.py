@@ -0,0 +1,153 @@
+"""Tests of the central conversation summary scheduler"""
+import asyncio
+from types import SimpleNamespace
+
+from knowledge_api.framework.memory.conversation_summarizer import ConversationSummarizer
+from knowledge_api.framework.memory.enhanced_chat_memory_manager import EnhancedChatMemoryManager
+from knowledge_api.framework.memory.summary_scheduler import SummaryScheduler
+
+
+class FakeMemory:
+    def __init__(self, backlog=5):
+        self.backlog = backlog
+        self.marked = []
+
+    def get_exchange_count(self):
+        return self.backlog
+
+    def get_summary_backlog(self):
+        return self.backlog
+
+    def mark_summarized(self, exchange_count):
+        self.marked.append(exchange_count)
+
+
+class FakeSummarizer:
+    """Records the summarized conversations, the first summary waits until released"""
+
+    def __init__(self):
+        self.summarized = []
+        self.release = asyncio.Event()
+        self.started = asyncio.Event()
+
+    async def summarize_now(self, memory_manager, usage=None):
+        self.summarized.append(memory_manager)
+        usage["calls"] += 1
+        self.started.set()
+        await self.release.wait()
+        return "summary"
+
+
+def test_events_of_a_queued_or_running_conversation_are_coalesced():
+    async def scenario():
+        scheduler = SummaryScheduler(workers=1)
+        summarizer = FakeSummarizer()
+        memory = FakeMemory()
+        for _ in range(3):
+            scheduler.notify("c1", memory, summarizer)
+        await summarizer.started.wait()
+        # Arriving while c1 is summarized: one more summary once it is done
+        for _ in range(3):
+            scheduler.notify("c1", memory, summarizer)
+        summarizer.release.set()
+        while scheduler.stats()["completed"] < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        stats = scheduler.stats()
+        await scheduler.close()
+        return summarizer, memory, stats
+
+    summarizer, memory, stats = asyncio.run(scenario())
+    assert len(summarizer.summarized) == 2
+    assert memory.marked == [5, 5]
+    assert stats["events"] == 6 and stats["coalesced"] == 4
+    assert stats["llm"]["calls"] == 2
+    assert stats["queued"] == 0 and stats["running"] == 0
+
+
+def run_order(priority):
+    async def scenario():
+        scheduler = SummaryScheduler(workers=1, priority=priority)
+        summarizer = FakeSummarizer()
+        busy = FakeMemory()
+        scheduler.notify("busy", busy, summarizer)
+        await summarizer.started.wait()
+        memories = {"small": FakeMemory(backlog=5), "large": FakeMemory(backlog=20)}
+        for name, memory in memories.items():
+            scheduler.notify(name, memory, summarizer)
+        stats = scheduler.stats()
+        summarizer.release.set()
+        while scheduler.stats()["completed"] < 3:
+            await asyncio.sleep(0.01)
+        await scheduler.close()
+        names = {id(memory): name for name, memory in memories.items()}
+        return [names[id(memory)] for memory in summarizer.summarized[1:]], stats
+
+    return asyncio.run(scenario())
+
+
+def test_priority_orders_the_waiting_conversations():
+    oldest, stats = run_order("oldest")
+    assert oldest == ["small", "large"]
+    assert stats["queued"] == 2 and stats["running"] == 1 and stats["backlog_exchanges"] == 25
+    backlog, _ = run_order("backlog")
+    assert backlog == ["large", "small"]
+
+
+def test_events_beyond_the_queue_limit_are_dropped():
+    async def scenario():
+        scheduler = SummaryScheduler(workers=1, max_queued=1)
+        summarizer = FakeSummarizer()
+        accepted = [scheduler.notify("busy", FakeMemory(), summarizer)]
+        await summarizer.started.wait()
+        accepted += [scheduler.notify("c1", FakeMemory(), summarizer), scheduler.notify("c2", FakeMemory(), summarizer)]
+        stats = scheduler.stats()
+        await scheduler.close()
+        return accepted, stats
+
+    accepted, stats = asyncio.run(scenario())
+    assert accepted == [True, True, False]
+    assert stats["dropped"] == 1
+
+
+class StubLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def agenerate(self, prompts):
+        self.calls += 1
+        return SimpleNamespace(generations=[[SimpleNamespace(text=f"summary {self.calls}")]])
+
+
+def test_memory_manager_reports_the_threshold_to_the_scheduler():
+    async def scenario():
+        scheduler = SummaryScheduler(workers=2)
+        llm = StubLLM()
+        summarizer = ConversationSummarizer(llm=llm, summary_interval=3, max_retry_attempts=1, scheduler=scheduler)
+        memory = EnhancedChatMemoryManager(system_message="", k=4)
+        stored = []
+
+        async def on_summary(manager):
+            stored.append(manager.summary_message)
+
+        summarizer.watch(memory, "c1", on_summary)
+        for i in range(2):
+            memory.add_user_message(f"question {i}")
+            memory.add_ai_message(f"answer {i}")
+        await asyncio.sleep(0.05)
+        calls_below_threshold = llm.calls
+        memory.add_user_message("question 2")
+        memory.add_ai_message("answer 2")
+        while not stored:
+            await asyncio.sleep(0.01)
+        stats = scheduler.stats()
+        await scheduler.close()
+        return calls_below_threshold, llm.calls, stored, memory, stats
+
+    calls_below_threshold, calls, stored, memory, stats = asyncio.run(scenario())
+    assert calls_below_threshold == 0
+    assert calls == 1
+    assert len(stored) == 1 and stored[0].endswith("summary 1")
+    assert memory.summarized_exchange_count == 3
+    assert memory.get_summary_backlog() == 0
+    assert stats["completed"] == 1 and stats["llm"]["calls"] == 1
@@ -0,0 +1,118 @@
+"""Tests of the priority lanes and the backpressure of the task manager"""
+import asyncio
+
+import pytest
+
+from knowledge_api.framework.task import TaskLane, TaskManager, TaskRejectedError, TaskStatus
+from knowledge_api.framework.task.task_lanes import DEFAULT_LANE, LatencyHistogram, parse_lanes
+
+
+def manager(*lanes, max_concurrency=1, **kwargs):
+    return TaskManager(max_concurrency=max_concurrency, lanes=list(lanes), **kwargs)
+
+
+async def hold(gate, order=None, name=None):
+    await gate.wait()
+    if order is not None:
+        order.append(name)
+    return name
+
+
+def test_parse_lanes_keeps_the_priority_order_and_adds_the_default_lane():
+    lanes = parse_lanes("chat=8/2000/block, bulk=2/200/shed, tools=3")
+    assert [(lane.name, lane.priority, lane.concurrency, lane.max_queued, lane.overflow) for lane in lanes] == [
+        ("chat", 0, 8, 2000, "block"), ("bulk", 1, 2, 200, "shed"), ("tools", 2, 3, 0, "block"),
+        (DEFAULT_LANE, 3, lanes[-1].concurrency, 0, "block")]
+    with pytest.raises(ValueError):
+        parse_lanes("chat=1/1/drop")
+
+
+def test_freed_slots_go_to_the_highest_priority_lane():
+    async def scenario():
+        tasks = manager(TaskLane("chat", 0, 1, 0), TaskLane(DEFAULT_LANE, 1, 1, 0))
+        gate, order = asyncio.Event(), []
+        await tasks.submit(hold, gate, order, "running")
+        for i in range(3):
+            await tasks.submit(hold, gate, order, f"default-{i}")
+        await tasks.submit(hold, gate, order, "chat", lane="chat")
+        stats = tasks.get_lane_stats()
+        gate.set()
+        await asyncio.gather(*(task._task for task in list(tasks.tasks.values())))
+        return order, stats
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["running", "chat", "default-0", "default-1", "default-2"]
+    assert stats["running"] == 1
+    assert stats["lanes"]["default"]["queued"] == 3 and stats["lanes"]["chat"]["queued"] == 1
+
+
+def test_reject_lane_raises_when_the_queue_is_full():
+    async def scenario():
+        tasks = manager(TaskLane(DEFAULT_LANE, 0, 1, 2, "reject"))
+        gate = asyncio.Event()
+        for _ in range(3):
+            await tasks.submit(hold, gate)
+        with pytest.raises(TaskRejectedError):
+            await tasks.submit(hold, gate)
+        gate.set()
+        await asyncio.gather(*(task._task for task in list(tasks.tasks.values())))
+        return tasks.get_lane_stats()["lanes"][DEFAULT_LANE]
+
+    stats = asyncio.run(scenario())
+    assert stats["submitted"] == 3 and stats["rejected"] == 1 and stats["completed"] == 3
+    assert stats["wait_latency"]["count"] == 3 and stats["run_latency"]["count"] == 3
+
+
+def test_shed_lane_cancels_the_oldest_queued_task():
+    async def scenario():
+        tasks = manager(TaskLane(DEFAULT_LANE, 0, 1, 2, "shed"))
+        gate = asyncio.Event()
+        ids = [await tasks.submit(hold, gate, task_id=f"t{i}") for i in range(4)]
+        gate.set()
+        await asyncio.gather(*(task._task for task in list(tasks.tasks.values())), return_exceptions=True)
+        return {task_id: tasks.tasks[task_id].status for task_id in ids}, tasks.get_lane_stats()["lanes"][DEFAULT_LANE]
+
+    statuses, stats = asyncio.run(scenario())
+    assert statuses == {"t0": TaskStatus.COMPLETED, "t1": TaskStatus.CANCELLED,
+                        "t2": TaskStatus.COMPLETED, "t3": TaskStatus.COMPLETED}
+    assert stats["shed"] == 1
+
+
+def test_block_lane_makes_submit_wait_for_queue_room():
+    async def scenario():
+        tasks = manager(TaskLane(DEFAULT_LANE, 0, 1, 1, "block"))
+        gate = asyncio.Event()
+        await tasks.submit(hold, gate)
+        await tasks.submit(hold, gate)
+        blocked = asyncio.create_task(tasks.submit(hold, gate))
+        await asyncio.sleep(0.05)
+        waiting = not blocked.done() and tasks.get_lane_stats()["lanes"][DEFAULT_LANE]["blocked"] == 1
+        gate.set()
+        await blocked
+        await asyncio.gather(*(task._task for task in list(tasks.tasks.values())))
+        return waiting, tasks.get_lane_stats()["lanes"][DEFAULT_LANE]
+
+    waiting, stats = asyncio.run(scenario())
+    assert waiting
+    assert stats["blocked"] == 1 and stats["completed"] == 3
+
+
+def test_finished_task_records_are_evicted_beyond_the_history_size():
+    async def scenario():
+        tasks = manager(TaskLane(DEFAULT_LANE, 0, 4, 0), max_concurrency=4, history_size=2)
+        for i in range(5):
+            await tasks.submit(asyncio.sleep, 0, task_id=f"t{i}", wait=True)
+        return sorted(tasks.tasks)
+
+    assert asyncio.run(scenario()) == ["t3", "t4"]
+
+
+def test_latency_histogram_counts_samples_per_bucket():
+    histogram = LatencyHistogram(samples=3)
+    for seconds in (0.001, 0.02, 0.2, 100):
+        histogram.record(seconds)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 3
+    assert snapshot["buckets"]["<=25ms"] == 1 and snapshot["buckets"]["<=250ms"] == 1
+    assert snapshot["buckets"][">60000ms"] == 1
+    assert snapshot["max"] == 100
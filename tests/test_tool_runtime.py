@@ -0,0 +1,165 @@
+"""Tests of the parallel tool runtime: timeouts, concurrency limits and turn reuse"""
+import asyncio
+import json
+import time
+
+from knowledge_api.framework.ai_collect.function_call.tool_manager import ToolManager, tool_turn
+from knowledge_api.framework.ai_collect.function_call.tool_registry import ToolRegistry
+
+
+def call(name, call_id=None, **arguments):
+    return {"id": call_id or f"call_{name}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def runtime(**kwargs):
+    registry = ToolRegistry()
+    executions = []
+
+    async def lookup(card: str):
+        executions.append(("lookup", card))
+        await asyncio.sleep(0.1)
+        return {"card": card, "tags": ["rare"]}
+
+    def archive(note: str):
+        executions.append(("archive", note))
+        time.sleep(0.3)
+        return "archived"
+
+    async def roll(sides: int):
+        executions.append(("roll", sides))
+        await asyncio.sleep(0.05)
+        return 4
+
+    registry.register(lookup, pure=True)
+    registry.register(archive, timeout=0.05)
+    registry.register(roll, idempotent=True)
+    return ToolManager(registry, **kwargs), registry, executions
+
+
+def test_tool_calls_of_a_response_run_in_parallel_in_call_order():
+    manager, _, executions = runtime()
+
+    async def scenario():
+        started = time.perf_counter()
+        results = await manager.handle_tool_calls_async(
+            [call("lookup", f"c{i}", card=f"card-{i}") for i in range(4)])
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.3
+    assert [result["tool_call_id"] for result in results] == ["c0", "c1", "c2", "c3"]
+    assert [result["content"]["card"] for result in results] == [f"card-{i}" for i in range(4)]
+
+
+def test_a_hung_tool_times_out_without_holding_the_others():
+    manager, _, _ = runtime()
+
+    async def scenario():
+        started = time.perf_counter()
+        results = await manager.handle_tool_calls_async([call("archive", note="x"), call("roll", sides=6),
+                                                         call("missing")])
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert "超时" in results[0]["content"]["error"]
+    assert results[1]["content"] == 4
+    assert "missing" in results[2]["content"]["error"]
+
+
+def test_tool_and_manager_concurrency_limits():
+    async def scenario(tool_limit, manager_limit):
+        registry = ToolRegistry()
+        running, peak = 0, 0
+
+        async def work(n: int):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            return n
+
+        registry.register(work, max_concurrency=tool_limit)
+        manager = ToolManager(registry, max_concurrency=manager_limit)
+        await manager.handle_tool_calls_async([call("work", f"c{i}", n=i) for i in range(6)])
+        return peak
+
+    assert asyncio.run(scenario(2, 8)) == 2
+    assert asyncio.run(scenario(None, 3)) == 3
+
+
+def test_pure_results_are_reused_within_the_turn_and_copied():
+    manager, _, executions = runtime()
+
+    async def scenario():
+        with tool_turn() as turn:
+            first = await manager.handle_tool_calls_async([call("lookup", card="ace"), call("roll", sides=6)])
+            first[0]["content"]["tags"].append("changed")
+            # Nested turns share the pure results of the enclosing turn
+            with tool_turn() as nested:
+                second = await manager.handle_tool_calls_async([call("lookup", card="ace"), call("roll", sides=6)])
+        with tool_turn():
+            third = await manager.handle_tool_calls_async([call("lookup", card="ace")])
+        return first, second, third, turn, nested
+
+    first, second, third, turn, nested = asyncio.run(scenario())
+    assert executions == [("lookup", "ace"), ("roll", 6), ("roll", 6), ("lookup", "ace")]
+    assert second[0]["content"] == {"card": "ace", "tags": ["rare"]}
+    assert turn.calls == 2 and nested.reused == 1
+    assert third[0]["content"]["card"] == "ace"
+
+
+def test_identical_idempotent_calls_of_one_step_run_once():
+    manager, _, executions = runtime()
+
+    async def scenario():
+        return await manager.handle_tool_calls_async([call("roll", "a", sides=6), call("roll", "b", sides=6),
+                                                      call("roll", "c", sides=20)])
+
+    results = asyncio.run(scenario())
+    assert executions == [("roll", 6), ("roll", 20)]
+    assert [result["tool_call_id"] for result in results] == ["a", "b", "c"]
+
+
+def test_failed_pure_calls_are_not_reused():
+    registry = ToolRegistry()
+    attempts = []
+
+    async def flaky(key: str):
+        attempts.append(key)
+        if len(attempts) == 1:
+            raise RuntimeError("backend busy")
+        return key
+
+    registry.register(flaky, pure=True)
+    manager = ToolManager(registry)
+
+    async def scenario():
+        with tool_turn():
+            first = await manager.handle_tool_calls_async([call("flaky", key="k")])
+            second = await manager.handle_tool_calls_async([call("flaky", key="k")])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert "backend busy" in first[0]["content"]["error"]
+    assert second[0]["content"] == "k" and attempts == ["k", "k"]
+
+
+def test_listener_receives_each_result_as_its_tool_returns():
+    manager, _, _ = runtime()
+    received = []
+
+    async def scenario():
+        started = time.perf_counter()
+
+        async def listener(result):
+            received.append((result["tool_call_id"], time.perf_counter() - started))
+
+        with tool_turn(on_result=listener):
+            await manager.handle_tool_calls_async([call("lookup", "slow", card="a"), call("roll", "fast", sides=6)])
+
+    asyncio.run(scenario())
+    assert [call_id for call_id, _ in received] == ["fast", "slow"]
+    assert received[0][1] < 0.09
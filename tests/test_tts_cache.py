@@ -0,0 +1,157 @@
+"""Tests of the shared TTS client and the content addressed audio cache"""
+import asyncio
+import base64
+import os
+
+import pytest
+from aiohttp import web
+
+from knowledge_api.framework.tts import tts_service
+from knowledge_api.framework.tts.tts_cache import DiskAudioCache, audio_cache_key, set_audio_cache
+from knowledge_api.framework.tts.tts_service import ByteDanceTTS, close_http_client, get_http_client
+from knowledge_api.framework.tts.tts_utils import TTSManager
+
+
+def test_cache_key_covers_every_synthesis_parameter():
+    key = audio_cache_key("你好", "voice")
+    assert key == audio_cache_key("你好", "voice", 1, 1.0, 1.0, "mp3")
+    variants = [audio_cache_key("你好！", "voice"), audio_cache_key("你好", "other"),
+                audio_cache_key("你好", "voice", speed_ratio=1.2), audio_cache_key("你好", "voice", volume_ratio=0.8),
+                audio_cache_key("你好", "voice", pitch_ratio=0.9), audio_cache_key("你好", "voice", encoding="wav")]
+    assert len({key, *variants}) == 7
+
+
+def test_disk_cache_evicts_the_least_recently_used_audio(tmp_path):
+    async def scenario():
+        cache = DiskAudioCache(str(tmp_path), max_bytes=30)
+        for key in ("a", "b", "c"):
+            await cache.put(key * 64, key.encode() * 10)
+        # Reading a keeps it, b is the least recently used
+        assert await cache.get("a" * 64) == b"a" * 10
+        await cache.put("d" * 64, b"d" * 10)
+        present = [await cache.get(key * 64) is not None for key in "abcd"]
+        await cache.put("e" * 64, b"e" * 31)
+        return cache, present
+
+    cache, present = asyncio.run(scenario())
+    assert present == [True, False, True, True]
+    assert cache.size == 30
+    assert cache.stats["evictions"] == 1
+    # Audio larger than the cache is not stored
+    assert asyncio.run(cache.get("e" * 64)) is None
+
+
+def test_disk_cache_keeps_the_access_order_across_restarts(tmp_path):
+    async def fill():
+        cache = DiskAudioCache(str(tmp_path), max_bytes=100)
+        for i, key in enumerate(("a", "b", "c")):
+            await cache.put(key * 64, key.encode() * 10)
+            os.utime(cache._path(key * 64, "mp3"), (1000 + i, 1000 + i))
+        await cache.get("a" * 64)
+
+    async def restart():
+        cache = DiskAudioCache(str(tmp_path), max_bytes=20)
+        present = [await cache.get(key * 64) is not None for key in "abc"]
+        return present
+
+    asyncio.run(fill())
+    assert asyncio.run(restart()) == [True, False, True]
+
+
+class FakeEndpoint:
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+
+    async def handle(self, request):
+        text = (await request.json())["request"]["text"]
+        self.requests.append(text)
+        await asyncio.sleep(0.05)
+        if self.fail:
+            return web.json_response({"code": 3001, "message": "invalid request"})
+        return web.json_response({"code": 3000, "message": "Success",
+                                  "data": base64.b64encode(text.encode("utf-8")).decode()})
+
+
+@pytest.fixture
+def audio_cache(tmp_path):
+    cache = DiskAudioCache(str(tmp_path), max_bytes=1024 * 1024)
+    set_audio_cache(cache)
+    yield cache
+    set_audio_cache(None)
+
+
+def with_endpoint(scenario):
+    endpoint = FakeEndpoint()
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/api/v1/tts", endpoint.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        tts = ByteDanceTTS("appid", "token", "cluster", api_url=f"http://127.0.0.1:{port}/api/v1/tts")
+        try:
+            return await scenario(tts, endpoint)
+        finally:
+            await close_http_client()
+            await runner.cleanup()
+
+    return asyncio.run(run()), endpoint
+
+
+def test_repeated_and_concurrent_requests_are_synthesized_once(audio_cache):
+    async def scenario(tts, endpoint):
+        burst = await asyncio.gather(*(tts.text_to_speech("欢迎回来。", "voice") for _ in range(5)))
+        again = await tts.text_to_speech("欢迎回来。", "voice")
+        other_voice = await tts.text_to_speech("欢迎回来。", "other")
+        return burst, again, other_voice
+
+    (burst, again, other_voice), endpoint = with_endpoint(scenario)
+    assert endpoint.requests == ["欢迎回来。", "欢迎回来。"]
+    assert all(base64.b64decode(result["data"]) == "欢迎回来。".encode("utf-8") for result in burst)
+    assert again.get("cached") is True
+    assert other_voice.get("cached") is None
+    assert not tts_service._inflight
+
+
+def test_failed_synthesis_is_not_cached(audio_cache):
+    async def scenario(tts, endpoint):
+        endpoint.fail = True
+        failed = await tts.text_to_speech("出错了。", "voice")
+        endpoint.fail = False
+        retried = await tts.text_to_speech("出错了。", "voice")
+        return failed, retried
+
+    (failed, retried), endpoint = with_endpoint(scenario)
+    assert "data" not in failed
+    assert retried["data"] and not retried.get("cached")
+    assert len(endpoint.requests) == 2
+
+
+def test_requests_share_one_keep_alive_client(audio_cache):
+    async def scenario(tts, endpoint):
+        client = get_http_client()
+        await tts.text_to_speech("第一句。", "voice", use_cache=False)
+        await tts.text_to_speech("第二句。", "voice", use_cache=False)
+        return client is get_http_client()
+
+    shared, endpoint = with_endpoint(scenario)
+    assert shared
+    assert len(endpoint.requests) == 2
+
+
+def test_prewarm_fills_the_cache_with_each_prologue_once(audio_cache):
+    async def scenario(tts, endpoint):
+        manager = TTSManager()
+        manager.bytedance_tts = tts
+        done = await manager.prewarm(["你来了。", "你来了。", "", "好久不见。"], "voice")
+        cached = await tts.text_to_speech("好久不见。", "voice")
+        return done, cached
+
+    (done, cached), endpoint = with_endpoint(scenario)
+    assert done == 2
+    assert sorted(endpoint.requests) == sorted(["你来了。", "好久不见。"])
+    assert cached.get("cached") is True
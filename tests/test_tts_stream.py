@@ -0,0 +1,133 @@
+"""Tests of the sentence level streaming TTS"""
+import asyncio
+import base64
+import time
+
+from aiohttp import web
+
+from knowledge_api.framework.tts.tts_service import ByteDanceTTS
+from knowledge_api.framework.tts.tts_stream import SentenceSegmenter, SpeechPipeline, audio_bytes
+
+
+def segment(chunks, **limits):
+    segmenter = SentenceSegmenter(**limits)
+    sentences = []
+    for chunk in chunks:
+        sentences.extend(segmenter.feed(chunk))
+    return sentences, segmenter.flush()
+
+
+def test_segmenter_cuts_sentences_across_chunks():
+    sentences, rest = segment(["（他放下杯子。）你来", "了。好", "！", "！真的吗？我不信"], min_chars=4, max_chars=80)
+    # The action in parentheses is not spoken, repeated punctuation stays with its sentence
+    # and a sentence shorter than min_chars is joined with the next one
+    assert sentences == ["你来了。", "好！！真的吗？"]
+    assert rest == ["我不信"]
+
+
+def test_segmenter_cuts_long_sentences_at_a_clause():
+    sentences, rest = segment(["我不信，因为你总是这样说，从来都没有做到过，所以我不信。"], min_chars=4, max_chars=20)
+    assert sentences[0] == "我不信，因为你总是这样说，"
+    assert "".join(sentences + rest) == "我不信，因为你总是这样说，从来都没有做到过，所以我不信。"
+
+
+class FakeTTS:
+    """TTS client answering the text as audio, the first sentence is the slowest"""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.active = 0
+        self.peak = 0
+
+    async def text_to_speech(self, text, voice_type, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays.pop(0))
+        finally:
+            self.active -= 1
+        if "失败" in text:
+            return {"error": "synthesis failed"}
+        return {"data": base64.b64encode(text.encode("utf-8")).decode()}
+
+
+async def text_stream(chunks, delay):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+def run_pipeline(tts, chunks, delay=0.01, concurrency=2):
+    async def scenario():
+        speech = SpeechPipeline(tts, "voice", concurrency=concurrency, segmenter=SentenceSegmenter(min_chars=2))
+
+        async def fed():
+            async for chunk in text_stream(chunks, delay):
+                speech.feed(chunk)
+                yield chunk
+
+        return [item async for item in speech.interleave(fed())], speech
+
+    return asyncio.run(scenario())
+
+
+def test_audio_segments_keep_the_sentence_order_and_the_concurrency_limit():
+    tts = FakeTTS([0.1, 0.01, 0.01, 0.01])
+    items, _ = run_pipeline(tts, ["第一句。", "第二句。", "第三句。", "第四句"])
+    audio = [item for kind, item in items if kind == "audio"]
+    assert [segment["seq"] for segment in audio] == [0, 1, 2, 3]
+    assert [audio_bytes(segment).decode("utf-8") for segment in audio] == ["第一句。", "第二句。", "第三句。", "第四句"]
+    assert [item for kind, item in items if kind == "text"] == ["第一句。", "第二句。", "第三句。", "第四句"]
+    assert tts.peak == 2
+
+
+def test_first_audio_is_sent_while_the_answer_is_generated():
+    tts = FakeTTS([0.01] * 3)
+    items, speech = run_pipeline(tts, ["你好。"] + ["还在生成"] * 10 + ["。", "结束。"], delay=0.02)
+    kinds = [kind for kind, _ in items]
+    assert kinds.index("audio") < len(kinds) - 3
+    assert speech.time_to_first_audio < 0.1
+
+
+def test_failed_sentence_does_not_stop_the_stream():
+    tts = FakeTTS([0.01] * 3)
+    items, _ = run_pipeline(tts, ["第一句。", "合成失败。", "第三句。"])
+    audio = [item for kind, item in items if kind == "audio"]
+    assert [segment["data"] is None for segment in audio] == [False, True, False]
+
+
+def test_sentences_are_synthesized_by_the_tts_endpoint():
+    requests = []
+
+    async def handle(request):
+        text = (await request.json())["request"]["text"]
+        requests.append(text)
+        await asyncio.sleep(0.05)
+        return web.json_response({"code": 3000, "message": "Success",
+                                  "data": base64.b64encode(text.encode("utf-8")).decode()})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/api/v1/tts", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        tts = ByteDanceTTS("appid", "token", "cluster", api_url=f"http://127.0.0.1:{port}/api/v1/tts")
+        try:
+            speech = SpeechPipeline(tts, "voice", concurrency=3, use_cache=False)
+            start = time.perf_counter()
+            speech.feed("你终于来了，我等你很久了。昨晚镇上又有人失踪了！")
+            speech.feed("守卫什么都没看到。")
+            audio = [segment async for segment in speech.drain()]
+            return audio, time.perf_counter() - start
+        finally:
+            await runner.cleanup()
+
+    audio, elapsed = asyncio.run(scenario())
+    assert [audio_bytes(segment).decode("utf-8") for segment in audio] == [
+        "你终于来了，我等你很久了。", "昨晚镇上又有人失踪了！", "守卫什么都没看到。"]
+    assert sorted(requests) == sorted(segment["text"] for segment in audio)
+    # Three sentences synthesized at the same time
+    assert elapsed < 0.15
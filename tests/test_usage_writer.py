@@ -0,0 +1,100 @@
+"""Tests of the batched LLM usage record writer"""
+import json
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from knowledge_api.framework.ai_collect.usage_writer import LLMUsageWriter
+
+
+def entry(index):
+    return {"index": index}
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_writer(tmp_path, **kwargs):
+    writer = LLMUsageWriter(spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+    writer._create_tables = lambda: None
+    return writer
+
+
+def test_entries_are_written_in_batches(tmp_path):
+    writer = make_writer(tmp_path, batch_size=10, flush_interval_ms=50)
+    batches = []
+    writer._write_batch = lambda batch: batches.append([item["index"] for item in batch])
+
+    for index in range(25):
+        assert writer.submit(entry(index))
+    writer.stop()
+
+    assert [index for batch in batches for index in batch] == list(range(25))
+    assert max(len(batch) for batch in batches) <= 10
+    assert writer.get_metrics()["flushes"] == len(batches)
+
+
+def test_full_queue_drops_entries(tmp_path):
+    writer = make_writer(tmp_path, max_queue_size=2)
+    # Not started, the entries stay in the queue
+    writer._thread = threading.Thread(target=lambda: None)
+
+    assert [writer.submit(entry(index)) for index in range(3)] == [True, True, False]
+    assert writer.get_metrics()["dropped"] == 1
+
+
+def test_failed_batch_is_spilled_and_replayed(tmp_path):
+    writer = make_writer(tmp_path)
+    down = OperationalError("INSERT", {}, Exception("connection refused"))
+    written = []
+
+    def write_batch(batch):
+        if not written and batch[0]["index"] == 0:
+            raise down
+        written.extend(item["index"] for item in batch)
+
+    writer._write_batch = write_batch
+    writer._flush([entry(0), entry(1)])
+    assert read_lines(writer.spill_path) == [entry(0), entry(1)]
+
+    written.append("up")
+    writer._flush([entry(2)])
+    assert written == ["up", 2, 0, 1]
+    assert not (tmp_path / "spill.jsonl").exists()
+    assert writer.get_metrics()["replayed"] == 2
+
+
+def test_replay_stops_on_connection_errors_without_counting_attempts(tmp_path):
+    writer = make_writer(tmp_path, max_attempts=1)
+    writer._spill([entry(0), entry(1)])
+
+    def write_batch(batch):
+        raise OperationalError("INSERT", {}, Exception("connection refused"))
+
+    writer._write_batch = write_batch
+    writer._replay_spill()
+
+    assert read_lines(writer.spill_path) == [entry(0), entry(1)]
+    assert not (tmp_path / "spill.quarantine.jsonl").exists()
+
+
+def test_entries_rejected_for_their_data_are_quarantined(tmp_path):
+    writer = make_writer(tmp_path, max_attempts=2)
+    writer._spill([entry(0), entry(1), entry(2)])
+    written = []
+
+    def write_batch(batch):
+        if any(item["index"] == 1 for item in batch):
+            raise ValueError("bad entry")
+        written.extend(item["index"] for item in batch)
+
+    writer._write_batch = write_batch
+    writer._replay_spill()
+    assert written == [0, 2]
+    assert read_lines(writer.spill_path) == [{"index": 1, "_attempts": 1}]
+
+    writer._replay_spill()
+    assert read_lines(writer.quarantine_path) == [{"index": 1, "_attempts": 2}]
+    assert not (tmp_path / "spill.jsonl").exists()
@@ -0,0 +1,135 @@
+"""Tests of the dependency-aware startup warmup"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from knowledge_api.framework.warmup import WarmupOrchestrator, WarmupStatus
+
+
+def sleeper(seconds, log=None, name=None):
+    async def load():
+        if log is not None:
+            log.append(("start", name))
+        await asyncio.sleep(seconds)
+        if log is not None:
+            log.append(("end", name))
+    return load
+
+
+def test_independent_components_load_in_parallel_after_their_dependencies():
+    async def scenario():
+        log = []
+        warmup = WarmupOrchestrator(concurrency=4)
+        warmup.register("db", sleeper(0.1, log, "db"))
+        warmup.register("embeddings", sleeper(0.2, log, "embeddings"))
+        warmup.register("rag", sleeper(0.1, log, "rag"), depends_on=["db", "embeddings"])
+        warmup.register("tts", sleeper(0.1, log, "tts"), critical=False)
+        started = time.perf_counter()
+        warmup.start()
+        await warmup.wait_settled()
+        ready_after = time.perf_counter() - started
+        report = warmup.report()
+        await warmup._background
+        return log, ready_after, report, warmup.report()
+
+    log, ready_after, report, final = asyncio.run(scenario())
+    # db and embeddings overlap, rag waits for both
+    assert log.index(("start", "embeddings")) < log.index(("end", "db"))
+    assert ready_after >= 0.28
+    assert log.index(("start", "rag")) > max(log.index(("end", "db")), log.index(("end", "embeddings")))
+    assert report["ready"] and report["ready_after"] is not None
+    # The non-critical component does not gate readiness and is warmed after the critical ones
+    assert log.index(("start", "tts")) > log.index(("end", "rag"))
+    assert final["components"]["tts"]["status"] == WarmupStatus.READY.value
+
+
+def test_failed_dependency_skips_its_dependents_and_settles_not_ready():
+    async def scenario():
+        warmup = WarmupOrchestrator()
+
+        async def broken():
+            raise RuntimeError("model file missing")
+
+        warmup.register("model", broken)
+        warmup.register("service", sleeper(0), depends_on=["model"])
+        warmup.register("slow", sleeper(1), timeout=0.05)
+        warmup.start()
+        settled = await warmup.wait_settled(2)
+        await warmup.close()
+        return settled, warmup
+
+    settled, warmup = asyncio.run(scenario())
+    assert settled and warmup.settled and not warmup.ready
+    assert warmup.components["model"].status == WarmupStatus.FAILED
+    assert warmup.components["model"].error == "model file missing"
+    assert warmup.components["service"].status == WarmupStatus.SKIPPED
+    assert warmup.components["slow"].status == WarmupStatus.FAILED
+
+
+@pytest.mark.parametrize("dependencies, message", [
+    ({"a": ["b"], "b": ["a"]}, "cycle"),
+    ({"a": ["missing"]}, "unknown component"),
+])
+def test_start_rejects_invalid_dependencies(dependencies, message):
+    async def scenario():
+        warmup = WarmupOrchestrator()
+        for name, depends_on in dependencies.items():
+            warmup.register(name, sleeper(0), depends_on=depends_on)
+        warmup.start()
+
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(scenario())
+
+
+def test_duplicate_registration_is_rejected():
+    warmup = WarmupOrchestrator()
+    warmup.register("db", sleeper(0))
+    with pytest.raises(ValueError):
+        warmup.register("db", sleeper(0))
+
+
+def test_ensure_loads_a_component_once_on_demand():
+    async def scenario():
+        calls = []
+        warmup = WarmupOrchestrator()
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+
+        warmup.register("rag", load)
+        # Before start, concurrent requests share one load
+        results = await asyncio.gather(warmup.ensure("rag"), warmup.ensure("rag"), warmup.ensure("unknown"))
+        warmup.start()
+        await warmup.wait_settled()
+        await warmup._background
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == [1]
+    assert results == [True, True, True]
+
+
+def test_synchronous_loaders_run_off_the_event_loop():
+    async def scenario():
+        threads = []
+        warmup = WarmupOrchestrator()
+
+        def load():
+            threads.append(threading.get_ident())
+            time.sleep(0.1)
+
+        warmup.register("model", load)
+        warmup.start()
+        ticks = 0
+        while not warmup.settled:
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return threads, ticks, warmup.ready
+
+    threads, ticks, ready = asyncio.run(scenario())
+    assert ready and threads[0] != threading.get_ident()
+    # The loop kept running while the model loaded
+    assert ticks >= 5
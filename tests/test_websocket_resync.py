@@ -0,0 +1,99 @@
+"""Tests of the reconnect resync of the game and workflow websockets"""
+import asyncio
+import uuid
+
+import pytest
+
+from knowledge_api.game_play.base_game import BaseGame
+from knowledge_api.game_play.game_session_manager import GameSessionManager
+from knowledge_api.manage.ws import workflow_play
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_json(self, data):
+        self.frames.append(data)
+
+
+class ResyncGame(BaseGame):
+    """BaseGame with only the state needed by the websocket registration"""
+    game_type = "test_resync"
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self._local_websockets = {}
+        self._local_message_queue = {}
+
+
+def contents(frames):
+    return [[message["content"] for message in frame["messages"]] if frame.get("type") == "history"
+            else frame["content"] for frame in frames]
+
+
+@pytest.mark.usefixtures("redis_available")
+def test_replay_sends_the_missed_messages_in_batched_frames(monkeypatch):
+    monkeypatch.setattr(GameSessionManager, "REPLAY_CHUNK_SIZE", 2)
+    session_id = uuid.uuid4().hex
+    game = ResyncGame(session_id)
+
+    async def scenario():
+        for i in range(5):
+            await game.send_message({"type": "message", "role": "system", "content": f"m{i}"})
+        first = (await GameSessionManager.get_game_records(session_id, game.game_type))[0]["msgId"]
+        websocket = RecordingWebSocket()
+        await game.register_websocket(session_id, websocket, last_msg_id=first)
+        await game.unregister_websocket(session_id, websocket)
+        await GameSessionManager.clear_game_records(session_id, game.game_type)
+        return websocket.frames
+
+    frames = asyncio.run(scenario())
+    assert contents(frames) == [["m1", "m2"], ["m3", "m4"]]
+    assert [frame["hasMore"] for frame in frames] == [True, False]
+
+
+@pytest.mark.usefixtures("redis_available")
+def test_queued_messages_missing_from_the_log_are_sent_after_the_replay(monkeypatch):
+    session_id = uuid.uuid4().hex
+    game = ResyncGame(session_id)
+    append = GameSessionManager.append_game_record.__func__
+
+    async def flaky_append(cls, session_id, message, game_type=None):
+        if message["content"] == "lost":
+            return False
+        return await append(cls, session_id, message, game_type)
+
+    monkeypatch.setattr(GameSessionManager, "append_game_record", classmethod(flaky_append))
+
+    async def scenario():
+        for content in ("kept", "lost"):
+            # No connection: the message also waits in the local queue
+            await game.send_message({"type": "message", "role": "system", "content": content})
+        websocket = RecordingWebSocket()
+        await game.register_websocket(session_id, websocket)
+        await game.unregister_websocket(session_id, websocket)
+        await GameSessionManager.clear_game_records(session_id, game.game_type)
+        return websocket.frames
+
+    assert contents(asyncio.run(scenario())) == [["kept"], "lost"]
+
+
+def test_workflow_history_frames_follow_the_last_seen_message(monkeypatch):
+    monkeypatch.setattr(workflow_play, "REPLAY_CHUNK_SIZE", 2)
+    monkeypatch.setattr(workflow_play, "MESSAGE_LOG_SIZE", 4)
+    session_id = uuid.uuid4().hex
+    try:
+        for i in range(7):
+            workflow_play.record_message(session_id, {"type": "agent_message", "content": f"m{i}"})
+        log = workflow_play.message_logs[session_id]
+        # The log is trimmed a chunk at a time to its last MESSAGE_LOG_SIZE messages
+        assert [message["content"] for message in log] == ["m2", "m3", "m4", "m5", "m6"]
+
+        frames = workflow_play.history_frames(session_id, log[1]["msg_id"])
+        assert contents(frames) == [["m4", "m5"], ["m6"]]
+        assert [frame["has_more"] for frame in frames] == [True, False]
+        # A trimmed or unknown msg_id replays the whole log
+        assert contents(workflow_play.history_frames(session_id, "unknown"))[0] == ["m2", "m3"]
+    finally:
+        workflow_play.drop_message_log(session_id)
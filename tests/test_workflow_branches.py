@@ -0,0 +1,83 @@
+"""Tests of the parallel branches of the workflow engine and the loop node"""
+import asyncio
+import time
+
+from knowledge_api.framework.workflow.compiler import get_workflow_plan
+from knowledge_api.framework.workflow.engine import WorkflowEngine
+from knowledge_api.framework.workflow.nodes.loop import LoopNode
+from knowledge_api.framework.workflow.types import WorkflowContext
+
+LATENCY = 0.2
+BRANCHES = 4
+
+
+def graph():
+    """A start node forking to BRANCHES slow function tools, joined by a message node"""
+    nodes = [{"id": "start", "name": "start", "component_type": "message",
+              "config": {"initialMessage": "start"}, "inputs": [], "outputs": []}]
+    edges = []
+    for i in range(BRANCHES):
+        node_id = f"speaker_{i}"
+        impl = ("async def main(args, context):\n"
+                "    import asyncio\n"
+                f"    await asyncio.sleep({LATENCY})\n"
+                f"    return {{'speech_{i}': 'spoke {i}'}}\n")
+        nodes.append({"id": node_id, "name": node_id, "component_type": "function_tool",
+                      "config": {"function_impl": impl, "parallel": True}, "inputs": [],
+                      "outputs": [{"key": f"speech_{i}", "type": "string"}]})
+        edges.append({"source": "start", "target": node_id})
+        edges.append({"source": node_id, "target": "join"})
+    nodes.append({"id": "join", "name": "join", "component_type": "message",
+                  "config": {"initialMessage": "all spoke"}, "inputs": [], "outputs": []})
+    return nodes, edges
+
+
+async def broadcast_message(session_id, message):
+    return None
+
+
+def context_data():
+    return {"session_id": "branch-test", "broadcast_message": broadcast_message}
+
+
+def run_workflow(limit):
+    nodes, edges = graph()
+
+    async def scenario():
+        engine = WorkflowEngine.from_plan(get_workflow_plan({"id": "branch_test", "start_node": "start",
+                                                             "nodes": nodes, "edges": edges}))
+        engine._branch_semaphore = asyncio.Semaphore(limit)
+        start = time.perf_counter()
+        data = await engine.execute_workflow(context_data())
+        return time.perf_counter() - start, data, list(engine.node_results)
+
+    return asyncio.run(scenario())
+
+
+def test_independent_branches_take_one_latency_and_merge_at_the_join():
+    elapsed, data, executed = run_workflow(limit=BRANCHES)
+    assert elapsed < LATENCY * 2
+    assert [data[f"speech_{i}"][f"speech_{i}"] for i in range(BRANCHES)] == [f"spoke {i}" for i in range(BRANCHES)]
+    assert executed[0] == "start" and executed[-1] == "join"
+    assert len(executed) == BRANCHES + 2
+
+
+def test_session_concurrency_limit_serializes_the_branches():
+    elapsed, data, executed = run_workflow(limit=1)
+    assert elapsed >= LATENCY * BRANCHES * 0.9
+    assert executed[-1] == "join"
+
+
+def test_loop_runs_its_independent_internal_nodes_concurrently():
+    nodes, edges = graph()
+    loop = LoopNode("loop", "loop", {"loop_mode": "fixed", "max_iterations": 1,
+                                     "internal_nodes": nodes, "internal_edges": edges})
+
+    async def scenario():
+        start = time.perf_counter()
+        result = await loop.execute(WorkflowContext(data=context_data()))
+        return time.perf_counter() - start, result
+
+    elapsed, result = asyncio.run(scenario())
+    assert elapsed < LATENCY * 2
+    assert len(result["loop_results"][0]["internal_results"]) == len(nodes)
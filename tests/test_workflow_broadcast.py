@@ -0,0 +1,71 @@
+"""Tests of the workflow broadcast fan-out through per-connection outbound queues"""
+import asyncio
+import json
+import uuid
+
+from knowledge_api.manage.ws import workflow_play
+from knowledge_api.manage.ws.workflow_play import ConnectionSender
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = []
+        self.close_code = None
+
+    async def send_text(self, payload):
+        await asyncio.sleep(self.delay)
+        self.received.append(json.loads(payload))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def connect(session_id, websocket, **kwargs):
+    workflow_play.websockets.setdefault(session_id, set()).add(websocket)
+    workflow_play.connection_senders[websocket] = ConnectionSender(session_id, websocket, **kwargs)
+
+
+def test_slow_connection_is_evicted_without_delaying_the_others():
+    session_id = uuid.uuid4().hex
+    fast, slow = FakeWebSocket(), FakeWebSocket(delay=10)
+
+    async def scenario():
+        connect(session_id, fast)
+        connect(session_id, slow, send_timeout=0.05)
+        for i in range(3):
+            workflow_play.deliver_message(session_id, {"type": "agent_message", "content": f"m{i}"})
+        await asyncio.sleep(0.2)
+        for websocket in (fast, slow):
+            await workflow_play.unregister_websocket(session_id, websocket)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        workflow_play.websockets.pop(session_id, None)
+
+    assert [message["content"] for message in fast.received] == ["m0", "m1", "m2"]
+    assert slow.received == []
+    assert slow.close_code == 1013
+
+
+def test_full_outbound_queue_evicts_the_connection():
+    session_id = uuid.uuid4().hex
+    stuck = FakeWebSocket(delay=10)
+
+    async def scenario():
+        connect(session_id, stuck, queue_size=2)
+        for i in range(4):
+            workflow_play.deliver_message(session_id, {"type": "agent_message", "content": f"m{i}"})
+        evicted = stuck not in workflow_play.websockets[session_id]
+        await asyncio.sleep(0.01)
+        return evicted
+
+    try:
+        evicted = asyncio.run(scenario())
+    finally:
+        workflow_play.websockets.pop(session_id, None)
+
+    assert evicted
+    assert stuck not in workflow_play.connection_senders
+    assert stuck.close_code == 1013
@@ -0,0 +1,97 @@
+"""Tests of the compiled workflow plans"""
+import asyncio
+import json
+import os
+
+from knowledge_api.framework.workflow.compiler import (clear_plan_cache, get_template_plan,
+                                                       get_workflow_plan)
+from knowledge_api.framework.workflow.engine import WorkflowEngine
+from knowledge_api.framework.workflow.nodes.loop import LoopNode
+from knowledge_api.framework.workflow.types import WorkflowContext
+
+
+def message_node(node_id, content="Round {{ loop_index }}: {{ state.status }}"):
+    return {
+        "id": node_id, "name": node_id, "component_type": "message",
+        "config": {"content_template": content},
+        "inputs": [], "outputs": [{"key": "message", "type": "string"}],
+    }
+
+
+def template():
+    return {
+        "id": "compiler_test", "name": "compiler test", "start_node": "a",
+        # Defined out of order, the plan orders them along the edges
+        "nodes": [message_node("c"), message_node("a"), message_node("b")],
+        "edges": [{"source": "a", "target": "b"}, {"source": "b", "target": "c"}],
+    }
+
+
+def test_plan_is_shared_by_equal_templates_and_ordered_along_the_edges():
+    clear_plan_cache()
+    plan = get_workflow_plan(template())
+    reordered = json.loads(json.dumps(template(), sort_keys=True))
+    assert get_workflow_plan(reordered) is plan
+    assert plan.order == ("a", "b", "c")
+    assert plan.start_nodes == ("a",)
+    assert plan.connections["a"] == ("b",)
+    assert set(plan.nodes["a"].template_vars) == {"loop_index", "state.status"}
+
+
+def test_sessions_of_a_plan_get_their_own_node_instances():
+    clear_plan_cache()
+    plan = get_workflow_plan(template())
+    first, second = WorkflowEngine.from_plan(plan), WorkflowEngine.from_plan(plan)
+    assert first.nodes["a"] is not second.nodes["a"]
+    first.nodes["a"].config["content_template"] = "changed"
+    assert second.nodes["a"].config["content_template"] != "changed"
+    assert plan.nodes["a"].config["content_template"] != "changed"
+
+
+def test_template_file_is_read_again_only_when_it_changes(tmp_path):
+    clear_plan_cache()
+    path = tmp_path / "template.json"
+    path.write_text(json.dumps(template()), encoding="utf-8")
+    plan = get_template_plan(str(path))
+    assert get_template_plan(str(path)) is plan
+
+    changed = template()
+    changed["nodes"].append(message_node("d"))
+    path.write_text(json.dumps(changed), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    reloaded = get_template_plan(str(path))
+    assert reloaded is not plan
+    assert "d" in reloaded.nodes
+
+
+def test_loop_reuses_its_internal_nodes_across_iterations():
+    clear_plan_cache()
+    node = LoopNode("loop", "loop", {
+        "loop_mode": "fixed", "max_iterations": 5,
+        "internal_nodes": [message_node("inner_0"), message_node("inner_1")],
+        "internal_edges": [{"source": "inner_0", "target": "inner_1"}],
+    })
+    created = []
+    instantiate = node._get_internal_node_instances
+
+    def recording():
+        instances = instantiate()
+        created.append(instances)
+        return instances
+
+    node._get_internal_node_instances = recording
+
+    async def broadcast_message(session_id, message):
+        return None
+
+    context = WorkflowContext(data={
+        "session_id": "compiler-test",
+        "broadcast_message": broadcast_message,
+        "global": {"state": {"status": "running"}},
+        "state": {"status": "running"},
+    })
+    result = asyncio.run(node.execute(context))
+    assert result["total_iterations"] == 5
+    assert len(created) == 5
+    assert all(instances is created[0] for instances in created)